@@ -6,9 +6,14 @@ import * as apigw from 'aws-cdk-lib/aws-apigateway';
 import * as cdk from 'aws-cdk-lib';
 import * as constructs from 'constructs';
 import * as ec2 from 'aws-cdk-lib/aws-ec2';
+import * as events from 'aws-cdk-lib/aws-events';
+import * as eventsTargets from 'aws-cdk-lib/aws-events-targets';
 import * as iam from 'aws-cdk-lib/aws-iam';
 import * as s3 from 'aws-cdk-lib/aws-s3';
+import * as secretsmanager from 'aws-cdk-lib/aws-secretsmanager';
+import * as sqs from 'aws-cdk-lib/aws-sqs';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
+import * as lambdaEventSources from 'aws-cdk-lib/aws-lambda-event-sources';
 import * as pylambda from "@aws-cdk/aws-lambda-python-alpha";
 import * as ddb from 'aws-cdk-lib/aws-dynamodb';
 
@@ -35,11 +40,63 @@ export class MyNotesApiStack extends cdk.NestedStack {
       removalPolicy: cdk.RemovalPolicy.RETAIN
     });
 
+    // Inverted index from tags to notes, maintained by the note functions
+    const noteTagsTable = new ddb.Table(this, "NoteTagsTable", {
+      tableName: "NoteTags",
+      billingMode: ddb.BillingMode.PAY_PER_REQUEST,
+      partitionKey: {
+        name: "tag_and_author",
+        type: ddb.AttributeType.STRING,
+      },
+      sortKey: {
+        name: "note_id",
+        type: ddb.AttributeType.STRING,
+      },
+      removalPolicy: cdk.RemovalPolicy.RETAIN
+    });
+
+    // Reference counts of content-addressed note content (NOTES_CONTENT_DEDUP_ENABLED)
+    const noteContentReferencesTable = new ddb.Table(this, "NoteContentReferencesTable", {
+      tableName: "NoteContentReferences",
+      billingMode: ddb.BillingMode.PAY_PER_REQUEST,
+      partitionKey: {
+        name: "content_hash",
+        type: ddb.AttributeType.STRING,
+      },
+      removalPolicy: cdk.RemovalPolicy.RETAIN
+    });
+
+    // Responses of the note creations made with an idempotency key, deleted by DynamoDB once expired
+    const noteIdempotencyTable = new ddb.Table(this, "NoteIdempotencyTable", {
+      tableName: "NoteIdempotency",
+      billingMode: ddb.BillingMode.PAY_PER_REQUEST,
+      partitionKey: {
+        name: "idempotency_key",
+        type: ddb.AttributeType.STRING,
+      },
+      timeToLiveAttribute: "expiration",
+      removalPolicy: cdk.RemovalPolicy.RETAIN
+    });
+
     const notesContentBucket = new s3.Bucket(this, 'NotesContentBucket', {
       versioned: true,
       encryption: s3.BucketEncryption.S3_MANAGED
     });
 
+    // Notes accepted by the create function, when NOTES_ASYNC_INGESTION_ENABLED, and created by the ingestion function.
+    // Messages failing repeatedly end up in the dead-letter queue
+    const noteIngestionDeadLetterQueue = new sqs.Queue(this, "NoteIngestionDeadLetterQueue", {
+      retentionPeriod: cdk.Duration.days(14)
+    });
+    const noteIngestionQueue = new sqs.Queue(this, "NoteIngestionQueue", {
+      // At least 6 times the timeout of the ingestion function
+      visibilityTimeout: cdk.Duration.minutes(3),
+      deadLetterQueue: {
+        queue: noteIngestionDeadLetterQueue,
+        maxReceiveCount: 5
+      }
+    });
+
     const apiGateway = new apigw.RestApi(this, "note-api", {
       restApiName: "My Notes REST API",
       description: "API for managing notes",
@@ -67,9 +124,24 @@ export class MyNotesApiStack extends cdk.NestedStack {
     //   }
     // });
 
+    // Signs the continuation tokens: all the functions must share it. Functions get its ARN and read it when first
+    // needed, so that the value is neither in the template nor in their environment
+    const cursorSigningKey = new secretsmanager.Secret(this, "CursorSigningKey", {
+      description: "Key signing the continuation tokens of note listings",
+      generateSecretString: {
+        passwordLength: 64,
+        excludePunctuation: true
+      }
+    });
+
     const lambdaEnvironment = {
       "NOTES_CONTENT_BUCKET_NAME": notesContentBucket.bucketName,
-      "NOTES_TABLE_NAME": notesTable.tableName
+      "NOTES_TABLE_NAME": notesTable.tableName,
+      "NOTE_TAGS_TABLE_NAME": noteTagsTable.tableName,
+      "NOTE_CONTENT_REFERENCES_TABLE_NAME": noteContentReferencesTable.tableName,
+      "NOTE_IDEMPOTENCY_TABLE_NAME": noteIdempotencyTable.tableName,
+      "NOTES_INGESTION_QUEUE_URL": noteIngestionQueue.queueUrl,
+      "NOTES_CURSOR_SIGNING_KEY_SECRET_ARN": cursorSigningKey.secretArn
     }
 
     const createNoteFunction = new pylambda.PythonFunction(this, "CreateNoteFunction", {
@@ -88,10 +160,161 @@ export class MyNotesApiStack extends cdk.NestedStack {
     });
 
     notesTable.grantFullAccess(createNoteFunction);
+    noteTagsTable.grantReadWriteData(createNoteFunction);
+    noteContentReferencesTable.grantReadWriteData(createNoteFunction);
+    noteIdempotencyTable.grantReadWriteData(createNoteFunction);
+    noteIngestionQueue.grantSendMessages(createNoteFunction);
     notesContentBucket.grantReadWrite(createNoteFunction);
 
     noteResource.addMethod("POST", new apigw.LambdaIntegration(createNoteFunction))
 
+    const ingestNotesFunction = new pylambda.PythonFunction(this, "IngestNotesFunction", {
+      functionName: "IngestNotes",
+      description: "Create the queued notes in batch",
+      vpc: props.vpc,
+      vpcSubnets: {
+        subnetType: ec2.SubnetType.PRIVATE_ISOLATED,
+      },
+      entry: "../lambda", // required
+      index: "mynotes/port/notes.py",
+      handler: "handler_ingest_notes",
+      runtime: lambda.Runtime.PYTHON_3_8,
+      memorySize: 512,
+      timeout: cdk.Duration.seconds(30),
+      environment: lambdaEnvironment
+    });
+
+    notesTable.grantFullAccess(ingestNotesFunction);
+    noteTagsTable.grantReadWriteData(ingestNotesFunction);
+    noteContentReferencesTable.grantReadWriteData(ingestNotesFunction);
+    notesContentBucket.grantReadWrite(ingestNotesFunction);
+
+    // Only the failed messages of a batch are delivered again
+    ingestNotesFunction.addEventSource(new lambdaEventSources.SqsEventSource(noteIngestionQueue, {
+      batchSize: 100,
+      maxBatchingWindow: cdk.Duration.seconds(1),
+      reportBatchItemFailures: true
+    }));
+
+    const createNotesBatchFunction = new pylambda.PythonFunction(this, "CreateNotesBatchFunction", {
+      functionName: "CreateNotesBatch",
+      description: "Create notes in batch",
+      vpc: props.vpc,
+      vpcSubnets: {
+        subnetType: ec2.SubnetType.PRIVATE_ISOLATED,
+      },
+      entry: "../lambda", // required
+      index: "mynotes/port/notes.py",
+      handler: "handler_create_notes_batch",
+      runtime: lambda.Runtime.PYTHON_3_8,
+      memorySize: 256,
+      environment: lambdaEnvironment
+    });
+
+    notesTable.grantFullAccess(createNotesBatchFunction);
+    noteTagsTable.grantReadWriteData(createNotesBatchFunction);
+    noteContentReferencesTable.grantReadWriteData(createNotesBatchFunction);
+    notesContentBucket.grantReadWrite(createNotesBatchFunction);
+
+    const noteBatchResource = noteResource.addResource("batch");
+
+    noteBatchResource.addMethod("POST", new apigw.LambdaIntegration(createNotesBatchFunction))
+
+    const deleteNotesBatchFunction = new pylambda.PythonFunction(this, "DeleteNotesBatchFunction", {
+      functionName: "DeleteNotesBatch",
+      description: "Delete notes in batch",
+      vpc: props.vpc,
+      vpcSubnets: {
+        subnetType: ec2.SubnetType.PRIVATE_ISOLATED,
+      },
+      entry: "../lambda", // required
+      index: "mynotes/port/notes.py",
+      handler: "handler_delete_notes_batch",
+      runtime: lambda.Runtime.PYTHON_3_8,
+      memorySize: 256,
+      environment: lambdaEnvironment
+    });
+
+    notesTable.grantFullAccess(deleteNotesBatchFunction);
+    noteTagsTable.grantReadWriteData(deleteNotesBatchFunction);
+    noteContentReferencesTable.grantReadWriteData(deleteNotesBatchFunction);
+    notesContentBucket.grantReadWrite(deleteNotesBatchFunction);
+
+    noteBatchResource
+      .addResource("delete")
+      .addMethod("POST", new apigw.LambdaIntegration(deleteNotesBatchFunction))
+
+    const findNotesFunction = new pylambda.PythonFunction(this, "FindNotesFunction", {
+      functionName: "FindNotes",
+      description: "Find notes by ids or list notes by type and creation time",
+      vpc: props.vpc,
+      vpcSubnets: {
+        subnetType: ec2.SubnetType.PRIVATE_ISOLATED,
+      },
+      entry: "../lambda", // required
+      index: "mynotes/port/notes.py",
+      handler: "handler_find_notes",
+      runtime: lambda.Runtime.PYTHON_3_8,
+      memorySize: 256,
+      environment: lambdaEnvironment
+    });
+
+    notesTable.grantReadData(findNotesFunction);
+    noteTagsTable.grantReadData(findNotesFunction);
+    cursorSigningKey.grantRead(findNotesFunction);
+
+    noteResource.addMethod("GET", new apigw.LambdaIntegration(findNotesFunction))
+
+    const searchNotesFunction = new pylambda.PythonFunction(this, "SearchNotesFunction", {
+      functionName: "SearchNotes",
+      description: "Full-text search over the content of notes",
+      vpc: props.vpc,
+      vpcSubnets: {
+        subnetType: ec2.SubnetType.PRIVATE_ISOLATED,
+      },
+      entry: "../lambda", // required
+      index: "mynotes/port/notes.py",
+      handler: "handler_search_notes",
+      runtime: lambda.Runtime.PYTHON_3_8,
+      memorySize: 512,
+      environment: lambdaEnvironment
+    });
+
+    notesTable.grantReadData(searchNotesFunction);
+    notesContentBucket.grantRead(searchNotesFunction);
+
+    noteResource
+      .addResource("search")
+      .addMethod("GET", new apigw.LambdaIntegration(searchNotesFunction))
+
+    // Every note creation and deletion adds a search segment (with NOTES_SEARCH_ENABLED): they are merged
+    // regularly, so that searches don't read more and more segments
+    const compactSearchIndexFunction = new pylambda.PythonFunction(this, "CompactSearchIndexFunction", {
+      functionName: "CompactSearchIndex",
+      description: "Merge the segments of the search index",
+      vpc: props.vpc,
+      vpcSubnets: {
+        subnetType: ec2.SubnetType.PRIVATE_ISOLATED,
+      },
+      entry: "../lambda", // required
+      index: "mynotes/port/notes.py",
+      handler: "handler_compact_search_index",
+      runtime: lambda.Runtime.PYTHON_3_8,
+      memorySize: 1024,
+      timeout: cdk.Duration.minutes(5),
+      // One compaction at a time
+      reservedConcurrentExecutions: 1,
+      environment: lambdaEnvironment
+    });
+
+    notesContentBucket.grantReadWrite(compactSearchIndexFunction);
+
+    new events.Rule(this, "CompactSearchIndexSchedule", {
+      description: "Compact the search index",
+      schedule: events.Schedule.rate(cdk.Duration.minutes(15)),
+      targets: [new eventsTargets.LambdaFunction(compactSearchIndexFunction)]
+    });
+
     const noteResourceWithId = noteResource.addResource("{id}");
     
     const deleteNoteFunction = new pylambda.PythonFunction(this, "DeleteNoteFunction", {
@@ -110,6 +333,8 @@ export class MyNotesApiStack extends cdk.NestedStack {
     });
 
     notesTable.grantFullAccess(deleteNoteFunction);
+    noteTagsTable.grantReadWriteData(deleteNoteFunction);
+    noteContentReferencesTable.grantReadWriteData(deleteNoteFunction);
     notesContentBucket.grantReadWrite(deleteNoteFunction);
 
     noteResourceWithId.addMethod("DELETE", new apigw.LambdaIntegration(deleteNoteFunction))
@@ -134,6 +359,28 @@ export class MyNotesApiStack extends cdk.NestedStack {
 
     noteResourceWithId.addMethod("GET", new apigw.LambdaIntegration(findNoteByIdFunction))
 
+    const getNoteContentFunction = new pylambda.PythonFunction(this, "GetNoteContentFunction", {
+      functionName: "GetNoteContent",
+      description: "Get note content",
+      vpc: props.vpc,
+      vpcSubnets: {
+        subnetType: ec2.SubnetType.PRIVATE_ISOLATED,
+      },
+      entry: "../lambda", // required
+      index: "mynotes/port/notes.py",
+      handler: "handler_get_content",
+      runtime: lambda.Runtime.PYTHON_3_8,
+      memorySize: 256,
+      environment: lambdaEnvironment
+    });
+
+    notesTable.grantReadData(getNoteContentFunction);
+    notesContentBucket.grantRead(getNoteContentFunction);
+
+    noteResourceWithId
+      .addResource("content")
+      .addMethod("GET", new apigw.LambdaIntegration(getNoteContentFunction))
+
     // TODO  DELETE /note/{noteId}
 
     // TODO PUT /note
@@ -49,5 +49,19 @@ export class NetworkStack extends NestedStack {
     this.vpc.addGatewayEndpoint('dynamodb-endpoint', {
       service: ec2.GatewayVpcEndpointAwsService.DYNAMODB
     });
+    // SQS has no gateway endpoint: the queue of the asynchronous note creation is reached through an interface one
+    this.vpc.addInterfaceEndpoint('sqs-endpoint', {
+      service: ec2.InterfaceVpcEndpointAwsService.SQS,
+      subnets: {
+        subnetType: ec2.SubnetType.PRIVATE_ISOLATED
+      }
+    });
+    // The key signing continuation tokens is read from Secrets Manager
+    this.vpc.addInterfaceEndpoint('secretsmanager-endpoint', {
+      service: ec2.InterfaceVpcEndpointAwsService.SECRETS_MANAGER,
+      subnets: {
+        subnetType: ec2.SubnetType.PRIVATE_ISOLATED
+      }
+    });
   }
 }
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Size and latency trade-off of the content codecs on a corpus of sample notes.
+
+Run from the 'lambda/' directory:
+
+    python -m benchmarks.codecs_benchmark [--corpus DIR] [--repeat N]
+
+Without '--corpus', a synthetic corpus of Markdown notes of different sizes is used.
+"""
+import argparse
+import random
+import time
+from pathlib import Path
+from typing import List
+
+from mynotes.core.compression import available_codec_names, get_codec
+
+# Sizes (in paragraphs) of the notes in the synthetic corpus
+SYNTHETIC_NOTE_SIZES = [1, 5, 20, 100, 500, 2000]
+
+WORDS = (
+    "note interview question answer design system cloud lambda bucket table index query latency "
+    "throughput cache memory python markdown section example performance storage cost"
+).split()
+
+def synthetic_note(paragraphs: int, rng: random.Random) -> str:
+    lines = [f"# Note with {paragraphs} paragraphs"]
+    for i in range(paragraphs):
+        if i % 10 == 0:
+            lines.append(f"## Section {i // 10 + 1}")
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 60))) + ".")
+        if i % 4 == 0:
+            lines.extend(f"* {rng.choice(WORDS)} {rng.choice(WORDS)}" for _ in range(3))
+    return "\n\n".join(lines)
+
+def load_corpus(corpus_dir: str = None) -> List[bytes]:
+    if corpus_dir:
+        return [path.read_bytes() for path in sorted(Path(corpus_dir).rglob("*.md"))]
+
+    rng = random.Random(42)
+    return [synthetic_note(size, rng).encode("utf-8") for size in SYNTHETIC_NOTE_SIZES for _ in range(5)]
+
+def run(corpus: List[bytes], repeat: int) -> None:
+    original_size = sum(len(note) for note in corpus)
+    print(f"Corpus: {len(corpus)} notes, {original_size} bytes, {repeat} repetitions")
+    print(f"{'codec':<10} {'size':>12} {'ratio':>7} {'compress MB/s':>14} {'decompress MB/s':>16}")
+
+    for codec_name in available_codec_names():
+        codec = get_codec(codec_name)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            compressed_corpus = [codec.compress(note) for note in corpus]
+        compress_seconds = (time.perf_counter() - start) / repeat
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for compressed_note in compressed_corpus:
+                codec.decompress(compressed_note)
+        decompress_seconds = (time.perf_counter() - start) / repeat
+
+        compressed_size = sum(len(note) for note in compressed_corpus)
+        megabytes = original_size / (1024 * 1024)
+        print(
+            f"{codec_name:<10} {compressed_size:>12} {original_size / compressed_size:>6.2f}x "
+            f"{megabytes / compress_seconds:>14.1f} {megabytes / decompress_seconds:>16.1f}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare content codecs on a corpus of notes")
+    parser.add_argument("--corpus", help="directory containing Markdown (*.md) notes")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions for each measure")
+    args = parser.parse_args()
+
+    run(load_corpus(args.corpus), args.repeat)
+
+if __name__ == "__main__":
+    main()
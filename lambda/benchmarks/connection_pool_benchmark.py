@@ -0,0 +1,125 @@
+"""
+Connection pool exhaustion of the S3 client under concurrency: botocore defaults versus the shared client
+configuration (see get_aws_client_config() in mynotes/adapter/config.py).
+
+Threads share one client and read objects from a moto server (moto[server] is required), over real HTTP connections.
+When more threads than pooled connections call the client at once, urllib3 opens extra connections and drops them
+when they are returned ("Connection pool is full, discarding connection"): every call beyond the pool size pays for a
+new connection, which on AWS also means a TLS handshake.
+
+Run from the 'lambda/' directory:
+
+    python -m benchmarks.connection_pool_benchmark [--threads 32] [--requests 50] [--object-size 4096]
+"""
+import argparse
+import logging
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import boto3
+from botocore.config import Config
+
+from mynotes.adapter.config import get_aws_client_config
+
+# Fake credentials for moto, set before any AWS client is created
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+BUCKET_NAME = "benchmark"
+OBJECT_KEY = "notes/benchmark.md"
+
+class ConnectionCounter(logging.Handler):
+    """Counts the connections opened and discarded by urllib3, from its log records (handle() serializes emit())"""
+    def __init__(self) -> None:
+        super().__init__(logging.DEBUG)
+        self.opened = 0
+        self.discarded = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        message = record.getMessage()
+        if message.startswith("Starting new HTTP"):
+            self.opened += 1
+        elif message.startswith("Connection pool is full"):
+            self.discarded += 1
+
+def start_moto_server() -> Any:
+    from moto.server import ThreadedMotoServer
+
+    with socket.socket() as free_socket:
+        free_socket.bind(("127.0.0.1", 0))
+        port = free_socket.getsockname()[1]
+
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    return server, f"http://127.0.0.1:{port}"
+
+def percentile(latencies: List[float], fraction: float) -> float:
+    return sorted(latencies)[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+def run_config(name: str, config: Config, endpoint_url: str, threads: int, requests: int) -> Dict[str, Any]:
+    client = boto3.client("s3", region_name="us-east-1", endpoint_url=endpoint_url, config=config)
+    # Warm up: credentials, endpoint resolution and one pooled connection
+    client.head_object(Bucket=BUCKET_NAME, Key=OBJECT_KEY)
+
+    counter = ConnectionCounter()
+    urllib3_logger = logging.getLogger("urllib3.connectionpool")
+    urllib3_logger.addHandler(counter)
+
+    def read_objects() -> List[float]:
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.get_object(Bucket=BUCKET_NAME, Key=OBJECT_KEY)["Body"].read()
+            latencies.append(1000 * (time.perf_counter() - start))
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = [latency for futures in [executor.submit(read_objects) for _ in range(threads)] for latency in futures.result()]
+    elapsed = time.perf_counter() - start
+    urllib3_logger.removeHandler(counter)
+
+    return {
+        "name": name,
+        "pool": config.max_pool_connections or 10,
+        "opened": counter.opened,
+        "discarded": counter.discarded,
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+        "rate": len(latencies) / elapsed
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare S3 client connection pools under concurrency")
+    parser.add_argument("--threads", type=int, default=32, help="threads calling the client at once")
+    parser.add_argument("--requests", type=int, default=50, help="GetObject calls per thread")
+    parser.add_argument("--object-size", type=int, default=4096, help="size of the object read, in bytes")
+    args = parser.parse_args()
+
+    # The counter relies on the debug records of urllib3
+    logging.getLogger("urllib3.connectionpool").setLevel(logging.DEBUG)
+    logging.getLogger("urllib3.connectionpool").propagate = False
+    # The moto server logs every request: the results would be lost among them
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    server, endpoint_url = start_moto_server()
+    try:
+        setup_client = boto3.client("s3", region_name="us-east-1", endpoint_url=endpoint_url)
+        setup_client.create_bucket(Bucket=BUCKET_NAME)
+        setup_client.put_object(Bucket=BUCKET_NAME, Key=OBJECT_KEY, Body=b"x" * args.object_size)
+
+        print(f"{args.threads} threads x {args.requests} requests")
+        print(f"{'config':<10} {'pool':>5} {'opened':>7} {'discarded':>10} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>8}")
+        for name, config in [("default", Config()), ("shared", get_aws_client_config())]:
+            result = run_config(name, config, endpoint_url, args.threads, args.requests)
+            print(f"{result['name']:<10} {result['pool']:>5} {result['opened']:>7} {result['discarded']:>10} "
+                  f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['rate']:>8.0f}")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
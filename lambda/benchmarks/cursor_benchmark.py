@@ -0,0 +1,55 @@
+"""
+Size and encode/decode throughput of the legacy (Base64 JSON) and signed continuation tokens.
+
+Run from the 'lambda/' directory:
+
+    python -m benchmarks.cursor_benchmark [--repeat N]
+"""
+import argparse
+import logging
+import os
+import time
+from typing import Any, Callable, Dict
+
+# Legacy tokens are rejected by default, accept them to compare both formats
+os.environ.setdefault("NOTES_LEGACY_CURSORS_ENABLED", "true")
+
+from mynotes.adapter.utils import decode_str_as_dict, encode_continuation_token, encode_dict_to_base64
+
+# Continuation tokens of the note listings, by query
+SAMPLE_KEYS = {
+    "by type": {
+        "creation_time": {"S": "2022-03-23T22:02:36.233752+0000"},
+        "author_id_and_type": {"S": "c8d3f0a6-3b1e-4c59-9a0e-6f1d2b7e4a90#F"},
+        "id": {"S": "5f0c9a2e-8d41-4b7a-b3f6-2e9d1c7a0b84"}
+    },
+    "by tags": {"after_note_id": "5f0c9a2e-8d41-4b7a-b3f6-2e9d1c7a0b84"}
+}
+
+def measure(function: Callable[[], Any], repeat: int) -> float:
+    """Operations per second"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return repeat / (time.perf_counter() - start)
+
+def run_key(name: str, key: Dict[str, Any], repeat: int) -> None:
+    for format_name, encode in [("legacy", encode_dict_to_base64), ("signed", encode_continuation_token)]:
+        token = encode(key)
+        encode_rate = measure(lambda: encode(key), repeat)
+        decode_rate = measure(lambda: decode_str_as_dict(token), repeat)
+        print(f"{name:<8} {format_name:<7} {len(token):>6} {encode_rate:>12.0f} {decode_rate:>12.0f}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare continuation token formats")
+    parser.add_argument("--repeat", type=int, default=100000, help="operations per measure")
+    args = parser.parse_args()
+    # Every accepted legacy token is logged as a warning
+    logging.getLogger().setLevel(logging.ERROR)
+
+    print(f"{'query':<8} {'format':<7} {'chars':>6} {'encode op/s':>12} {'decode op/s':>12}")
+    for name, key in SAMPLE_KEYS.items():
+        run_key(name, key, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Throughput and latency of the Lambda handlers, end to end, against moto-mocked S3 and DynamoDB.
+
+This is a pytest module (it reuses the moto fixtures of the unit tests), run from the 'lambda/' directory:
+
+    PYTHONPATH=.:tests python -m pytest benchmarks/handlers_benchmark.py
+
+Every operation is measured for notes of several sizes. Results are written as JSON (to
+'benchmarks/results/handlers.json' by default), then compared with the stored baseline: the last test
+fails if the median latency or the throughput of an operation is worse than the baseline by more than
+the threshold. Settings, as environment variables:
+
+    MYNOTES_BENCHMARK_NOTES: notes created for each size (default 50)
+    MYNOTES_BENCHMARK_SIZES: comma separated note sizes, in bytes (default 256,4096,65536)
+    MYNOTES_BENCHMARK_OUTPUT: where results are written
+    MYNOTES_BENCHMARK_BASELINE: the baseline results (default 'benchmarks/handlers_baseline.json')
+    MYNOTES_BENCHMARK_THRESHOLD: accepted slowdown, as a fraction (default 0.5)
+    MYNOTES_BENCHMARK_UPDATE_BASELINE: set to 'true' to write the results as the new baseline
+
+Moto runs in process, so the numbers are the cost of our code, boto3 and pynamodb, without the network.
+Timings depend on the machine: regenerate the baseline where the comparison runs (the committed one is
+the median of 5 runs on a development machine).
+"""
+import json
+import os
+import platform
+import random
+import string
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import pytest
+
+from mynotes.adapter.config import NOTES_CONTENT_BUCKET_NAME
+from mynotes.adapter.notes_adapter import NoteModel, NoteTagModel
+from mynotes.core.search.index import SearchIndex
+from mynotes.port import notes
+from mynotes.port.container import ApplicationContainer
+
+from unit.mynotes.adapter.custom_boto3_mocks import aws_credentials, dynamodb_resource, s3_resource
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+N_NOTES = int(os.getenv("MYNOTES_BENCHMARK_NOTES", "50"))
+NOTE_SIZES = [int(size) for size in os.getenv("MYNOTES_BENCHMARK_SIZES", "256,4096,65536").split(",")]
+OUTPUT_PATH = os.getenv("MYNOTES_BENCHMARK_OUTPUT", os.path.join(BENCHMARKS_DIR, "results", "handlers.json"))
+BASELINE_PATH = os.getenv("MYNOTES_BENCHMARK_BASELINE", os.path.join(BENCHMARKS_DIR, "handlers_baseline.json"))
+REGRESSION_THRESHOLD = float(os.getenv("MYNOTES_BENCHMARK_THRESHOLD", "0.5"))
+UPDATE_BASELINE = os.getenv("MYNOTES_BENCHMARK_UPDATE_BASELINE", "false").lower() == "true"
+
+# Notes listed by each page request
+LIST_PAGE_SIZE = 5
+WORDS = "note interview question answer design system cloud lambda bucket table index query latency cache".split()
+
+# Measures of every operation, by "<operation>[<note size>]"
+RESULTS: Dict[str, Dict[str, float]] = {}
+
+@pytest.fixture(scope="module")
+def container(s3_resource: Any, dynamodb_resource: Any, tmp_path_factory: Any) -> Iterator[ApplicationContainer]:
+    """The handlers, wired to moto: the same objects as in Lambda, except for the search cache folder"""
+    s3_resource.create_bucket(Bucket=NOTES_CONTENT_BUCKET_NAME)
+    for model in (NoteModel, NoteTagModel):
+        model.create_table(wait=True, read_capacity_units=1, write_capacity_units=1)
+
+    container = ApplicationContainer()
+    container.s3_resource = s3_resource
+    container.search_index = SearchIndex(container.object_store, str(tmp_path_factory.mktemp("search")))
+
+    original_container = notes.container
+    notes.container = container
+    yield container
+
+    notes.container = original_container
+    for model in (NoteModel, NoteTagModel):
+        model.delete_table()
+
+def synthetic_content(size: int, rng: random.Random) -> str:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS) if rng.random() < 0.8 else "".join(rng.choices(string.ascii_lowercase, k=8))
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+def call(handler: Callable[[Dict[str, Any], Any], Dict[str, Any]], event: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+    """Invoke a handler, returning its response and the elapsed milliseconds"""
+    start = time.perf_counter()
+    response = handler(event, None)
+    elapsed_ms = 1000 * (time.perf_counter() - start)
+
+    # The delete handler answers with {"status": 204}
+    assert response.get("statusCode", response.get("status")) in (200, 204), response
+    return response, elapsed_ms
+
+def percentile(latencies: List[float], fraction: float) -> float:
+    return sorted(latencies)[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+def record(operation: str, note_size: int, latencies: List[float]) -> None:
+    RESULTS[f"{operation}[{note_size}]"] = {
+        "calls": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.5), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "throughput_per_s": round(1000 * len(latencies) / sum(latencies), 1)
+    }
+
+@pytest.mark.parametrize("note_size", NOTE_SIZES)
+def test_note_lifecycle(container: ApplicationContainer, note_size: int) -> None:
+    rng = random.Random(note_size)
+    tag = f"benchmark-{note_size}"
+    latencies: Dict[str, List[float]] = {operation: [] for operation in ("create", "find_by_id", "get_content", "list", "delete")}
+
+    ids = []
+    for _ in range(N_NOTES):
+        body = json.dumps({"content": synthetic_content(note_size, rng), "tags": [tag]})
+        response, elapsed_ms = call(notes.handler_create_note, {"body": body})
+        ids.append(json.loads(response["body"])["id"])
+        latencies["create"].append(elapsed_ms)
+
+    for id in ids:
+        latencies["find_by_id"].append(call(notes.handler_find_by_id, {"pathParameters": {"id": id}})[1])
+        latencies["get_content"].append(call(notes.handler_get_content, {"pathParameters": {"id": id}})[1])
+
+    continuation_token = None
+    while True:
+        query = {"type": "FREE", "page_size": str(LIST_PAGE_SIZE)}
+        if continuation_token:
+            query["continuation_token"] = continuation_token
+        response, elapsed_ms = call(notes.handler_find_notes, {"queryStringParameters": query})
+        latencies["list"].append(elapsed_ms)
+        continuation_token = json.loads(response["body"])["continuation_token"]
+        if not continuation_token:
+            break
+
+    for id in ids:
+        latencies["delete"].append(call(notes.handler_delete_by_id, {"pathParameters": {"id": id}})[1])
+
+    for operation, operation_latencies in latencies.items():
+        record(operation, note_size, operation_latencies)
+
+def find_regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """
+    Compare results with a baseline.
+
+    Args:
+        results: the measures of the current run, by operation
+        baseline: the reference measures, by operation (operations missing on either side are skipped)
+        threshold: accepted slowdown, as a fraction (0.5 means up to 50% slower)
+    Returns:
+        a description of each regression
+    """
+    regressions = []
+    for operation, measures in results.items():
+        reference = baseline.get(operation)
+        if not reference:
+            continue
+        if measures["p50_ms"] > reference["p50_ms"] * (1 + threshold):
+            regressions.append(f"{operation}: median latency {measures['p50_ms']} ms, baseline {reference['p50_ms']} ms")
+        if measures["throughput_per_s"] < reference["throughput_per_s"] / (1 + threshold):
+            regressions.append(f"{operation}: throughput {measures['throughput_per_s']}/s, baseline {reference['throughput_per_s']}/s")
+    return regressions
+
+def test_find_regressions() -> None:
+    baseline = {"create[256]": {"p50_ms": 10.0, "throughput_per_s": 100.0}}
+
+    assert find_regressions({"create[256]": {"p50_ms": 14.0, "throughput_per_s": 70.0}}, baseline, 0.5) == []
+    assert len(find_regressions({"create[256]": {"p50_ms": 16.0, "throughput_per_s": 60.0}}, baseline, 0.5)) == 2
+    assert find_regressions({"delete[256]": {"p50_ms": 99.0, "throughput_per_s": 1.0}}, baseline, 0.5) == []
+
+def test_no_regression_against_baseline() -> None:
+    """Runs last: writes the results and compares them with the baseline"""
+    assert RESULTS, "No operation was measured"
+
+    report = {"python": platform.python_version(), "notes": N_NOTES, "results": RESULTS}
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+    with open(OUTPUT_PATH, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+
+    if UPDATE_BASELINE or not os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        return
+
+    with open(BASELINE_PATH) as baseline_file:
+        baseline = json.load(baseline_file)["results"]
+
+    regressions = find_regressions(RESULTS, baseline, REGRESSION_THRESHOLD)
+    assert not regressions, "Slower than the baseline:\n" + "\n".join(regressions)
@@ -0,0 +1,49 @@
+"""
+Cold start import time of the handlers module, checked against a budget.
+
+Run from the 'lambda/' directory:
+
+    python -m benchmarks.import_time_benchmark [--budget-us N] [--runs N]
+
+Exits with status 1 when the best run is over the budget.
+"""
+import argparse
+import subprocess
+import sys
+
+# Module loaded by AWS Lambda when the handlers are cold started
+HANDLERS_MODULE = "mynotes.port.notes"
+
+def measure_import_time(module_name: str) -> int:
+    """Cumulative import time (in microseconds) of the module, imported in a fresh interpreter using '-X importtime'"""
+    completed_process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        capture_output=True, text=True, check=True
+    )
+
+    for line in completed_process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, imported_module = line[len("import time:"):].split("|")
+        if imported_module.strip() == module_name:
+            return int(cumulative_us)
+
+    raise ValueError(f"No import time reported for {module_name}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the cold start import time of the handlers")
+    parser.add_argument("--budget-us", type=int, default=150000, help="cumulative import time budget, in microseconds")
+    parser.add_argument("--runs", type=int, default=3, help="the best of N runs is checked")
+    args = parser.parse_args()
+
+    import_times_us = [measure_import_time(HANDLERS_MODULE) for _ in range(args.runs)]
+    best_import_time_us = min(import_times_us)
+    print(f"{HANDLERS_MODULE}: best {best_import_time_us} us, worst {max(import_times_us)} us, "
+          f"budget {args.budget_us} us")
+
+    if best_import_time_us > args.budget_us:
+        print("Over budget!")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
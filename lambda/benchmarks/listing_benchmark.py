@@ -0,0 +1,136 @@
+"""
+Compares full listings (all attributes projected) with summary listings (keys only projected)
+of the notes of one author, against a moto-mocked DynamoDB.
+
+Run from the 'lambda/' directory (moto is a development dependency):
+
+    python -m benchmarks.listing_benchmark [--notes 10000] [--tags 10] [--page-size 100]
+
+Moto does not account for consumed capacity, so read capacity units are estimated from the
+size of the returned items, the way DynamoDB does for eventually consistent queries
+(0.5 RCU per 4 KB read, rounded up for each query).
+"""
+import argparse
+import math
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+# Fake credentials for moto, set before any AWS client is created
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import boto3
+from moto import mock_dynamodb2
+
+from mynotes.adapter.notes_adapter import DynamoDBNoteRepository, NoteModel, NoteTagModel
+from mynotes.core.architecture import DataPageQuery
+from mynotes.core.notes import Note, NoteType
+
+# DynamoDB reads are billed by blocks of this size
+READ_UNIT_SIZE = 4 * 1024
+AUTHOR_ID = "benchmark-author"
+
+def estimate_item_size(item: Dict[str, Any]) -> int:
+    """Size of a (low-level) DynamoDB item: attribute names plus values"""
+    size = 0
+    for name, value in item.items():
+        size += len(name.encode("utf-8"))
+        for value_type, raw_value in value.items():
+            if value_type == "SS":
+                size += sum(len(member.encode("utf-8")) for member in raw_value)
+            else:
+                size += len(str(raw_value).encode("utf-8"))
+    return size
+
+def create_notes(n_notes: int, n_tags: int) -> None:
+    start_time = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    notes = [
+        Note(
+            author_id=AUTHOR_ID,
+            type=NoteType.FREE,
+            creation_time=start_time + timedelta(minutes=i),
+            tags=[f"tag-{i}-{t}-some-longer-tag-name" for t in range(n_tags)]
+        )
+        for i in range(n_notes)
+    ]
+    DynamoDBNoteRepository().save_all(notes)
+
+def measure_latency(summary: bool, page_size: int) -> Dict[str, float]:
+    repository = DynamoDBNoteRepository()
+    continuation_token = None
+    n_items = 0
+    n_pages = 0
+
+    start = time.perf_counter()
+    while True:
+        data_page = repository.find_all_by_type(
+            NoteType.FREE, author_id=AUTHOR_ID,
+            data_page_query=DataPageQuery(page_size=page_size, continuation_token=continuation_token),
+            summary=summary
+        )
+        n_items += data_page.page_size
+        n_pages += 1
+        continuation_token = data_page.continuation_token
+        if not continuation_token:
+            break
+    seconds = time.perf_counter() - start
+
+    return {"items": n_items, "pages": n_pages, "seconds": seconds}
+
+def estimate_read_capacity(index_name: str, page_size: int) -> Dict[str, float]:
+    client = boto3.client("dynamodb", region_name=NoteModel.Meta.region)
+    query_args = {
+        "TableName": NoteModel.Meta.table_name,
+        "IndexName": index_name,
+        "KeyConditionExpression": "author_id_and_type = :pk",
+        "ExpressionAttributeValues": {":pk": {"S": f"{AUTHOR_ID}#{NoteType.FREE.value}"}},
+        "Limit": page_size
+    }
+
+    read_bytes = 0
+    read_capacity_units = 0.0
+    while True:
+        response = client.query(**query_args)
+        page_bytes = sum(estimate_item_size(item) for item in response["Items"])
+        read_bytes += page_bytes
+        read_capacity_units += 0.5 * max(1, math.ceil(page_bytes / READ_UNIT_SIZE))
+        if "LastEvaluatedKey" not in response:
+            break
+        query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    return {"bytes": read_bytes, "rcu": read_capacity_units}
+
+def run(n_notes: int, n_tags: int, page_size: int) -> None:
+    with mock_dynamodb2():
+        for model in (NoteModel, NoteTagModel):
+            model.create_table(wait=True, read_capacity_units=1, write_capacity_units=1)
+        create_notes(n_notes, n_tags)
+
+        print(f"{n_notes} notes with {n_tags} tags each, pages of {page_size} notes")
+        print(f"{'mode':<10} {'items':>7} {'pages':>6} {'seconds':>9} {'read bytes':>12} {'est. RCU':>9}")
+        modes = [
+            ("full", False, NoteModel.search_by_author_and_type_index.Meta.index_name),
+            ("summary", True, NoteModel.summary_by_author_and_type_index.Meta.index_name)
+        ]
+        for mode, summary, index_name in modes:
+            latency = measure_latency(summary, page_size)
+            capacity = estimate_read_capacity(index_name, page_size)
+            print(
+                f"{mode:<10} {latency['items']:>7} {latency['pages']:>6} {latency['seconds']:>9.3f} "
+                f"{capacity['bytes']:>12} {capacity['rcu']:>9.1f}"
+            )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare full and summary listings of notes")
+    parser.add_argument("--notes", type=int, default=10000, help="notes for the author")
+    parser.add_argument("--tags", type=int, default=10, help="tags for each note")
+    parser.add_argument("--page-size", type=int, default=100, help="notes for each page")
+    args = parser.parse_args()
+
+    run(args.notes, args.tags, args.page_size)
+
+if __name__ == "__main__":
+    main()
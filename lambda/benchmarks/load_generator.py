@@ -0,0 +1,297 @@
+"""
+Replays a mix of API Gateway events against the note handlers, in process, and reports latency
+percentiles, error rates and peak memory.
+
+Run from the 'lambda/' directory (moto is a development dependency):
+
+    python -m benchmarks.load_generator [--events FILE ...] [--mix create=2,find=6,delete=2]
+        [--concurrency 8] [--mode threads|processes] [--rate 100] [--requests 1000 | --duration 30]
+
+Events files hold one API Gateway event, a list of events, or just a request body (like
+'infrastructure/docs/api-calls/sample-note.json'), which is used to create notes. Recorded events are
+routed by 'httpMethod' and 'resource': POST /note creates, GET /note/{id} finds and DELETE /note/{id}
+deletes a note; the ids of find and delete events are replaced by the ids of notes created by the run.
+Operations without recorded events get synthetic ones. With several threads, a note can be deleted
+while another thread is finding it: such 404 responses are counted as errors, as they would be in production.
+
+With '--target moto' (the default), S3 and DynamoDB are mocked in every worker process; with
+'--target aws' the handlers use the AWS (or LocalStack) environment they are configured for.
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import string
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Fake credentials for moto, set before any AWS client is created
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from mynotes.port import notes
+
+OPERATION_CREATE = "create"
+OPERATION_FIND = "find"
+OPERATION_DELETE = "delete"
+
+HANDLERS: Dict[str, Callable[[Dict[str, Any], Any], Dict[str, Any]]] = {
+    OPERATION_CREATE: notes.handler_create_note,
+    OPERATION_FIND: notes.handler_find_by_id,
+    OPERATION_DELETE: notes.handler_delete_by_id,
+}
+
+# API Gateway routes of the operations
+ROUTES = {
+    ("POST", "/note"): OPERATION_CREATE,
+    ("GET", "/note/{id}"): OPERATION_FIND,
+    ("DELETE", "/note/{id}"): OPERATION_DELETE,
+}
+
+WORDS = "note interview question answer design system cloud lambda bucket table index query latency cache".split()
+
+@dataclass
+class Sample:
+    """Outcome of one request"""
+    operation: str
+    latency_ms: float
+    is_error: bool
+
+@dataclass
+class LoadSettings:
+    events: Dict[str, List[Dict[str, Any]]]
+    mix: Dict[str, float]
+    threads: int
+    rate: float
+    requests: Optional[int]
+    duration: Optional[float]
+    seed_notes: int
+    note_size: int
+    target: str
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse a traffic mix, e.g. 'create=2,find=6,delete=2' (weights, not necessarily percentages)"""
+    mix = {}
+    for item in value.split(","):
+        operation, weight = item.split("=", 1)
+        if operation.strip() not in HANDLERS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {operation}, use one of {', '.join(HANDLERS)}")
+        mix[operation.strip()] = float(weight)
+    return mix
+
+def load_events(paths: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Recorded events, by operation"""
+    events: Dict[str, List[Dict[str, Any]]] = {operation: [] for operation in HANDLERS}
+    for path in paths:
+        with open(path) as events_file:
+            content = json.load(events_file)
+
+        for event in content if isinstance(content, list) else [content]:
+            if "httpMethod" not in event:
+                # Just a request body
+                event = {"httpMethod": "POST", "resource": "/note", "body": json.dumps(event)}
+            operation = ROUTES.get((event.get("httpMethod"), event.get("resource")))
+            if operation:
+                events[operation].append(event)
+    return events
+
+def synthetic_create_event(rng: random.Random, note_size: int) -> Dict[str, Any]:
+    words = []
+    while sum(len(word) + 1 for word in words) < note_size:
+        words.append(rng.choice(WORDS) if rng.random() < 0.8 else "".join(rng.choices(string.ascii_lowercase, k=8)))
+    return {"httpMethod": "POST", "resource": "/note", "body": json.dumps({"content": " ".join(words)[:note_size], "tags": ["load"]})}
+
+class NotePool:
+    """Ids of the notes created so far, shared by the worker threads"""
+    def __init__(self) -> None:
+        self.ids: List[str] = []
+        self.lock = threading.Lock()
+
+    def add(self, id: str) -> None:
+        with self.lock:
+            self.ids.append(id)
+
+    def pick(self, rng: random.Random, remove: bool) -> Optional[str]:
+        with self.lock:
+            if not self.ids:
+                return None
+            index = rng.randrange(len(self.ids))
+            if remove:
+                self.ids[index], self.ids[-1] = self.ids[-1], self.ids[index]
+                return self.ids.pop()
+            return self.ids[index]
+
+class Schedule:
+    """Start times of the requests: evenly spaced for a target rate, as soon as possible otherwise"""
+    def __init__(self, rate: float, requests: Optional[int], duration: Optional[float]) -> None:
+        self.interval = 1 / rate if rate > 0 else 0
+        self.requests = requests
+        self.start = time.perf_counter()
+        self.deadline = self.start + duration if duration else None
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def next_slot(self) -> Optional[float]:
+        """When the next request must start, None when the run is over"""
+        with self.lock:
+            if self.requests is not None and self.count >= self.requests:
+                return None
+            slot = self.start + self.count * self.interval
+            if self.deadline and max(slot, time.perf_counter()) >= self.deadline:
+                return None
+            self.count += 1
+            return slot
+
+def start_target(target: str) -> Any:
+    """Mock AWS in this process when targeting moto; returns what has to be stopped at the end"""
+    if target != "moto":
+        return None
+
+    from moto import mock_dynamodb2, mock_s3
+
+    from mynotes.adapter.config import NOTES_CONTENT_BUCKET_NAME
+    from mynotes.adapter.notes_adapter import NoteModel, NoteTagModel
+
+    mocks = [mock_s3(), mock_dynamodb2()]
+    for mock in mocks:
+        mock.start()
+    notes.container.s3_resource.create_bucket(Bucket=NOTES_CONTENT_BUCKET_NAME)
+    for model in (NoteModel, NoteTagModel):
+        model.create_table(wait=True, read_capacity_units=1, write_capacity_units=1)
+    return mocks
+
+def invoke(operation: str, settings: LoadSettings, pool: NotePool, rng: random.Random) -> Sample:
+    """Run one request of an operation (a creation if there is no note to find or delete)"""
+    recorded_events = settings.events[operation]
+    event = copy.deepcopy(rng.choice(recorded_events)) if recorded_events else None
+
+    if operation == OPERATION_CREATE:
+        event = event or synthetic_create_event(rng, settings.note_size)
+    else:
+        id = pool.pick(rng, remove=operation == OPERATION_DELETE)
+        if id is None:
+            # Nothing to find or delete yet
+            return invoke(OPERATION_CREATE, settings, pool, rng)
+        event = event or {"httpMethod": "DELETE" if operation == OPERATION_DELETE else "GET", "resource": "/note/{id}"}
+        event["pathParameters"] = {**(event.get("pathParameters") or {}), "id": id}
+
+    start = time.perf_counter()
+    try:
+        response = HANDLERS[operation](event, None)
+        # The delete handler answers with {"status": 204}
+        status_code = response.get("statusCode", response.get("status", 500))
+    except Exception:
+        status_code = 500
+    latency_ms = 1000 * (time.perf_counter() - start)
+
+    if operation == OPERATION_CREATE and status_code == 200:
+        pool.add(json.loads(response["body"])["id"])
+    return Sample(operation, latency_ms, status_code >= 400)
+
+def run_process(settings: LoadSettings, process_index: int) -> Tuple[List[Sample], float, int]:
+    """Run a share of the load with threads; returns the samples, the seconds it took and the peak RSS (KB) of the process"""
+    mocks = start_target(settings.target)
+    try:
+        pool = NotePool()
+        rng = random.Random(process_index)
+        for _ in range(settings.seed_notes):
+            invoke(OPERATION_CREATE, settings, pool, rng)
+
+        schedule = Schedule(settings.rate, settings.requests, settings.duration)
+        operations = list(settings.mix)
+        weights = [settings.mix[operation] for operation in operations]
+        samples: List[Sample] = []
+        samples_lock = threading.Lock()
+
+        def run_thread(thread_index: int) -> None:
+            thread_rng = random.Random(process_index * 1000 + thread_index)
+            while True:
+                slot = schedule.next_slot()
+                if slot is None:
+                    return
+                delay = slot - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+                sample = invoke(thread_rng.choices(operations, weights)[0], settings, pool, thread_rng)
+                with samples_lock:
+                    samples.append(sample)
+
+        with ThreadPoolExecutor(max_workers=settings.threads) as executor:
+            list(executor.map(run_thread, range(settings.threads)))
+        seconds = time.perf_counter() - schedule.start
+    finally:
+        for mock in mocks or []:
+            mock.stop()
+
+    return samples, seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def percentile(latencies: List[float], fraction: float) -> float:
+    return sorted(latencies)[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+def report(samples: List[Sample], seconds: float, peak_rss_kb: int) -> None:
+    print(f"{len(samples)} requests in {seconds:.1f} s ({len(samples) / seconds:.1f}/s), peak RSS {peak_rss_kb / 1024:.1f} MiB")
+    print(f"{'operation':<10} {'requests':>9} {'errors':>7} {'error %':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for operation in HANDLERS:
+        operation_samples = [sample for sample in samples if sample.operation == operation]
+        if not operation_samples:
+            continue
+        latencies = [sample.latency_ms for sample in operation_samples]
+        errors = sum(sample.is_error for sample in operation_samples)
+        print(
+            f"{operation:<10} {len(operation_samples):>9} {errors:>7} {100 * errors / len(operation_samples):>7.1f}% "
+            f"{percentile(latencies, 0.5):>8.1f} {percentile(latencies, 0.95):>8.1f} {percentile(latencies, 0.99):>8.1f} "
+            f"{statistics.mean(latencies):>8.1f}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay API Gateway events against the note handlers")
+    parser.add_argument("--events", nargs="*", default=[], help="JSON files with recorded events or request bodies")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("create=2,find=6,delete=2"), help="weights of the operations")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent workers")
+    parser.add_argument("--mode", choices=["threads", "processes"], default="threads", help="what the workers are")
+    parser.add_argument("--rate", type=float, default=0, help="target requests per second, overall (0 for as fast as possible)")
+    parser.add_argument("--requests", type=int, help="total requests (default 1000 unless --duration is set)")
+    parser.add_argument("--duration", type=float, help="seconds to run for")
+    parser.add_argument("--seed-notes", type=int, default=50, help="notes created by each process before the run")
+    parser.add_argument("--note-size", type=int, default=1024, help="content size of synthetic notes, in bytes")
+    parser.add_argument("--target", choices=["moto", "aws"], default="moto", help="mocked or configured AWS services")
+    parser.add_argument("--verbose", action="store_true", help="keep the request logs of the handlers")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger("mynotes.request").setLevel(logging.WARNING)
+
+    n_processes = args.concurrency if args.mode == "processes" else 1
+    requests = args.requests if args.requests or args.duration else 1000
+    settings = LoadSettings(
+        events=load_events(args.events),
+        mix=args.mix,
+        threads=1 if args.mode == "processes" else args.concurrency,
+        rate=args.rate / n_processes,
+        requests=-(-requests // n_processes) if requests else None,
+        duration=args.duration,
+        seed_notes=args.seed_notes,
+        note_size=args.note_size,
+        target=args.target
+    )
+
+    if n_processes == 1:
+        results = [run_process(settings, 0)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_processes) as executor:
+            results = list(executor.map(run_process, [settings] * n_processes, range(n_processes)))
+
+    samples = [sample for process_samples, _, _ in results for sample in process_samples]
+    report(samples, max(seconds for _, seconds, _ in results), max(peak_rss_kb for _, _, peak_rss_kb in results))
+
+if __name__ == "__main__":
+    main()
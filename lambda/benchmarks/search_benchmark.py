@@ -0,0 +1,113 @@
+"""
+Query latency of the full-text search index over a synthetic corpus of notes.
+
+Run from the 'lambda/' directory:
+
+    python -m benchmarks.search_benchmark [--notes N] [--segments N] [--queries N]
+
+Notes are indexed in '--segments' segments (1 is the state right after a compaction), which are
+then read back from a local cache folder, memory-mapped, as in the Lambda functions.
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from typing import Dict, Iterator, List
+
+from mynotes.core.architecture import ObjectStore, StoredObject
+from mynotes.core.search.index import SearchIndex
+from mynotes.core.search.segment import build_segment
+from mynotes.core.utils.common import now
+
+# Distinct words in the corpus: word frequencies follow Zipf's law, like in natural language
+VOCABULARY_SIZE = 50000
+# Min and max number of words in a note
+NOTE_LENGTHS = (50, 400)
+
+class InMemoryObjectStore(ObjectStore):
+    """Object store keeping the objects in a dict"""
+    def __init__(self) -> None:
+        self.objects: Dict[str, bytes] = {}
+
+    def store_bytes(self, object_key: str, content: bytes) -> None:
+        self.objects[object_key] = content
+
+    def load_bytes(self, object_key: str) -> bytes:
+        return self.objects[object_key]
+
+    def list_objects(self, prefix: str) -> Iterator[StoredObject]:
+        return iter([StoredObject(key, now()) for key in sorted(self.objects) if key.startswith(prefix)])
+
+    def delete_all(self, object_keys: List[str]) -> List[str]:
+        for object_key in object_keys:
+            self.objects.pop(object_key, None)
+        return []
+
+def synthetic_documents(n_notes: int, rng: random.Random) -> Dict[str, List[str]]:
+    words = [f"word{rank}" for rank in range(VOCABULARY_SIZE)]
+    weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+    return {
+        f"note-{i:08}": rng.choices(words, weights, k=rng.randint(*NOTE_LENGTHS))
+        for i in range(n_notes)
+    }
+
+def synthetic_queries(n_queries: int, rng: random.Random) -> List[str]:
+    """Queries of 1 to 3 words, from the most frequent words (long posting lists) to rare ones"""
+    return [
+        " ".join(f"word{int(rng.paretovariate(0.5)) % VOCABULARY_SIZE}" for _ in range(rng.randint(1, 3)))
+        for _ in range(n_queries)
+    ]
+
+def percentile(values: List[float], fraction: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))]
+
+def run(n_notes: int, n_segments: int, n_queries: int) -> None:
+    rng = random.Random(42)
+    documents = synthetic_documents(n_notes, rng)
+    queries = synthetic_queries(n_queries, rng)
+
+    object_store = InMemoryObjectStore()
+    writer = SearchIndex(object_store)
+    note_ids = sorted(documents)
+    segment_size = -(-n_notes // n_segments)
+
+    start = time.perf_counter()
+    for offset in range(0, n_notes, segment_size):
+        writer._write_segment(build_segment({note_id: documents[note_id] for note_id in note_ids[offset:offset + segment_size]}))
+    build_seconds = time.perf_counter() - start
+
+    index_size = sum(len(data) for data in object_store.objects.values())
+    n_tokens = sum(len(tokens) for tokens in documents.values())
+    print(f"{n_notes} notes, {n_tokens} words, {n_segments} segments: {index_size / 2**20:.1f} MiB index built in {build_seconds:.1f} s")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        reader = SearchIndex(object_store, cache_dir)
+
+        start = time.perf_counter()
+        reader.search(queries[0])
+        print(f"first query (download and memory-map segments): {1000 * (time.perf_counter() - start):.1f} ms")
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            reader.search(query)
+            latencies.append(1000 * (time.perf_counter() - start))
+
+    print(f"{'queries':>8} {'mean ms':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'max ms':>7}")
+    print(
+        f"{len(latencies):>8} {statistics.mean(latencies):>8.1f} {percentile(latencies, 0.5):>7.1f} "
+        f"{percentile(latencies, 0.95):>7.1f} {percentile(latencies, 0.99):>7.1f} {max(latencies):>7.1f}"
+    )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure full-text search query latency")
+    parser.add_argument("--notes", type=int, default=100000, help="notes in the index")
+    parser.add_argument("--segments", type=int, default=1, help="segments the notes are split into")
+    parser.add_argument("--queries", type=int, default=200, help="queries to run")
+    args = parser.parse_args()
+
+    run(args.notes, args.segments, args.queries)
+
+if __name__ == "__main__":
+    main()
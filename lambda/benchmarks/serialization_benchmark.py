@@ -0,0 +1,59 @@
+"""
+Serialization time of API responses: jsons (reflection on every call) against the precompiled encoders.
+
+Run from the 'lambda/' directory:
+
+    python -m benchmarks.serialization_benchmark [--page-size N] [--repeat N]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict
+
+import jsons
+
+from mynotes.core.architecture import DataPage
+from mynotes.core.notes import Note, NoteType
+from mynotes.port import serialization
+
+def sample_bodies(page_size: int) -> Dict[str, Any]:
+    start_time = datetime(2022, 3, 23, tzinfo=timezone.utc)
+    notes = [
+        Note(
+            id=f"5f0c9a2e-8d41-4b7a-b3f6-{i:012}", author_id="mario", type=NoteType.QUESTION,
+            creation_time=start_time + timedelta(seconds=i, microseconds=i), tags=["python", "aws", "lambda"], version=1
+        )
+        for i in range(page_size)
+    ]
+    return {
+        "note": notes[0],
+        "listing page": DataPage(notes, page_size, "AQMCgAAF2unjHsgYAQEMX19QVUJMSUNfXyNGAAEBMbTnhVYlUDIlRXYKupRt0_g"),
+        "error": {"error_message": "Invalid attribute page_size: An integer value is required!", "error_code": "err-0002"}
+    }
+
+def measure(function: Callable[[], Any], repeat: int) -> float:
+    """Microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return 1000000 * (time.perf_counter() - start) / repeat
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare JSON serializers for API responses")
+    parser.add_argument("--page-size", type=int, default=100, help="notes in the listing page")
+    parser.add_argument("--repeat", type=int, default=200, help="serializations per measure")
+    args = parser.parse_args()
+
+    serializers = {
+        "jsons": jsons.dumps,
+        "json": lambda body: serialization.dumps(body, serialization.JSON_BACKEND),
+        "orjson": lambda body: serialization.dumps(body, serialization.ORJSON_BACKEND)
+    }
+
+    print(f"{'body':<13} " + " ".join(f"{name + ' us':>10}" for name in serializers) + f" {'speedup':>8}")
+    for body_name, body in sample_bodies(args.page_size).items():
+        timings = [measure(lambda: serialize(body), args.repeat) for serialize in serializers.values()]
+        print(f"{body_name:<13} " + " ".join(f"{timing:>10.1f}" for timing in timings) + f" {timings[0] / min(timings[1:]):>7.1f}x")
+
+if __name__ == "__main__":
+    main()
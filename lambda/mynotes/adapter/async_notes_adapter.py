@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from mynotes.adapter.notes_adapter import (BATCH_WRITE_CHUNK_SIZE, NoteModel, NoteTagModel, _get_tag_postings, get_version_condition,
+                                           map_to_note, map_to_note_model)
+from mynotes.core.architecture import RepositoryException, instrumented
+from mynotes.core.async_notes import AsyncNoteRepository
+from mynotes.core.notes import Note
+
+# Max amount of keys that DynamoDB accepts in a single BatchGetItem request
+BATCH_GET_CHUNK_SIZE = 100
+# Unprocessed items of batch requests are retried this many times, with exponential backoff (like PynamoDB does)
+MAX_BATCH_RETRY_ATTEMPTS = 3
+BATCH_RETRY_BASE_BACKOFF_SECONDS = 0.025
+
+@instrumented
+class AsyncDynamoDBNoteRepository(AsyncNoteRepository):
+    """
+    Asynchronous repository on an aiobotocore DynamoDB client. Items are read and written in the same format
+    as DynamoDBNoteRepository (the PynamoDB models serialize them), tag index included.
+    """
+    dynamodb_client: Any
+
+    def __init__(self, dynamodb_client: Any) -> None:
+        """
+        Args:
+            dynamodb_client: the aiobotocore DynamoDB client (it must be used within the event loop that created it)
+        """
+        self.dynamodb_client = dynamodb_client
+
+    async def save(self, note: Note) -> None:
+        """
+        Save a note with optimistic locking (the same version condition as NoteModel.save()), then update the tag index.
+        """
+        note_model = map_to_note_model(note)
+
+        item = note_model.serialize()
+        version_condition = get_version_condition(note_model, item)
+        placeholder_names: Dict[str, str] = {}
+        expression_attribute_values: Dict[str, Any] = {}
+        condition_expression = version_condition.serialize(placeholder_names, expression_attribute_values)
+
+        response = await self.dynamodb_client.put_item(
+            TableName=NoteModel.Meta.table_name,
+            Item=item,
+            ConditionExpression=condition_expression,
+            ExpressionAttributeNames={placeholder: name for name, placeholder in placeholder_names.items()},
+            ExpressionAttributeValues=expression_attribute_values,
+            ReturnValues="ALL_OLD"
+        )
+        note_model.update_local_version_attribute()
+        note.version = note_model.version
+
+        old_note_model = NoteModel.from_raw_data(response["Attributes"]) if response.get("Attributes") else None
+        await self._update_tag_index(old_note_model, note_model)
+
+    async def find_by_id(self, id: str) -> Optional[Note]:
+        response = await self.dynamodb_client.get_item(TableName=NoteModel.Meta.table_name, Key={"id": {"S": id}})
+
+        if not response.get("Item"):
+            logging.debug("Note with id %s was not found!", id)
+            return None
+        return map_to_note(NoteModel.from_raw_data(response["Item"]))
+
+    async def find_by_ids(self, ids: List[str]) -> List[Note]:
+        """
+        Fetch notes using BatchGetItem requests of up to 100 keys, all of them sent concurrently.
+        """
+        chunks = await asyncio.gather(*(
+            self._batch_get(ids[start:start + BATCH_GET_CHUNK_SIZE]) for start in range(0, len(ids), BATCH_GET_CHUNK_SIZE)
+        ))
+        return [map_to_note(NoteModel.from_raw_data(item)) for chunk in chunks for item in chunk]
+
+    async def _batch_get(self, ids: List[str]) -> List[Dict[str, Any]]:
+        table_name = NoteModel.Meta.table_name
+        request_items = {table_name: {"Keys": [{"id": {"S": id}} for id in ids]}}
+        items = []
+
+        for attempt in range(MAX_BATCH_RETRY_ATTEMPTS + 1):
+            if attempt:
+                await asyncio.sleep(BATCH_RETRY_BASE_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            response = await self.dynamodb_client.batch_get_item(RequestItems=request_items)
+            items.extend(response.get("Responses", {}).get(table_name, []))
+            request_items = response.get("UnprocessedKeys")
+            if not request_items:
+                return items
+
+        raise RepositoryException(f"{len(request_items[table_name]['Keys'])} notes could not be read")
+
+    async def delete_by_id(self, id: str) -> Optional[Note]:
+        """
+        Delete a note with a single DeleteItem request: the deleted note is the old item returned by DynamoDB.
+        """
+        response = await self.dynamodb_client.delete_item(TableName=NoteModel.Meta.table_name, Key={"id": {"S": id}}, ReturnValues="ALL_OLD")
+
+        if not response.get("Attributes"):
+            logging.debug("Note with id %s was not found!", id)
+            return None
+
+        # The old item tells which postings of the tag index must go
+        old_note_model = NoteModel.from_raw_data(response["Attributes"])
+        await self._update_tag_index(old_note_model, None)
+        return map_to_note(old_note_model)
+
+    async def _update_tag_index(self, old_note_model: Optional[NoteModel], new_note_model: Optional[NoteModel]) -> None:
+        """Writes only the postings of the tags that were added and deletes the ones of the tags that were removed"""
+        old_postings = _get_tag_postings(old_note_model)
+        new_postings = _get_tag_postings(new_note_model)
+
+        write_requests = [
+            {"PutRequest": {"Item": new_postings[key].serialize()}} for key in new_postings.keys() - old_postings.keys()
+        ] + [
+            {"DeleteRequest": {"Key": _get_posting_key(old_postings[key])}} for key in old_postings.keys() - new_postings.keys()
+        ]
+        if not write_requests:
+            return
+
+        failed_requests = await self._batch_write(NoteTagModel.Meta.table_name, write_requests)
+        if failed_requests:
+            # The note itself is saved (or deleted): it is just missing from (or left in) tag queries
+            logging.error("Tag index update failed for %s postings", len(failed_requests))
+
+    async def _batch_write(self, table_name: str, write_requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Send BatchWriteItem requests (up to 25 items each) concurrently.
+
+        Returns:
+            the write requests still unprocessed after the retries
+        """
+        chunks = await asyncio.gather(*(
+            self._batch_write_chunk(table_name, write_requests[start:start + BATCH_WRITE_CHUNK_SIZE])
+            for start in range(0, len(write_requests), BATCH_WRITE_CHUNK_SIZE)
+        ))
+        return [write_request for chunk in chunks for write_request in chunk]
+
+    async def _batch_write_chunk(self, table_name: str, write_requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        for attempt in range(MAX_BATCH_RETRY_ATTEMPTS + 1):
+            if attempt:
+                await asyncio.sleep(BATCH_RETRY_BASE_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            response = await self.dynamodb_client.batch_write_item(RequestItems={table_name: write_requests})
+            write_requests = response.get("UnprocessedItems", {}).get(table_name)
+            if not write_requests:
+                return []
+
+        return write_requests
+
+def _get_posting_key(posting: NoteTagModel) -> Dict[str, Any]:
+    item = posting.serialize()
+    return {name: item[name] for name in ("tag_and_author", "note_id")}
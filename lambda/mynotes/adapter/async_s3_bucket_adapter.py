@@ -0,0 +1,135 @@
+import logging
+from typing import Any, List, Optional
+
+from botocore.exceptions import ClientError
+from mynotes.adapter.s3_bucket_adapter import CONTENT_CHAR_ENCODING, CONTENT_TYPE, DELETE_OBJECTS_CHUNK_SIZE
+from mynotes.core.architecture import DEFAULT_CHUNK_SIZE, AsyncObjectStore, ContentUploadException, instrumented
+from mynotes.core.compression import Codec, IdentityCodec, get_codec
+
+@instrumented
+class AsyncS3BucketAdapter(AsyncObjectStore):
+    """
+        Asynchronous adapter implementation for the S3 object store, on an aiobotocore client.
+        Objects are stored exactly like S3BucketAdapter does (same content type and compression).
+    """
+    bucket_name: str
+    s3_client: Any
+    codec: Codec
+
+    def __init__(self, s3_client: Any, bucket_name: str, codec: Codec = None) -> None:
+        """
+        Args:
+            s3_client: the aiobotocore S3 client (it must be used within the event loop that created it)
+            bucket_name: the bucket where objects are stored
+            codec: the codec used to compress new objects (no compression by default)
+        """
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.codec = codec or IdentityCodec()
+
+    async def store(self, object_key: str, content: str) -> None:
+        put_args = {
+            "Bucket": self.bucket_name,
+            "Key": object_key,
+            "Body": self.codec.compress(content.encode(CONTENT_CHAR_ENCODING)),
+            "ContentType": CONTENT_TYPE
+        }
+        if not self._is_identity(self.codec):
+            put_args["ContentEncoding"] = self.codec.name
+
+        result = await self.s3_client.put_object(**put_args)
+
+        res = result.get('ResponseMetadata')
+        if not res.get('HTTPStatusCode') == 200:
+            raise ContentUploadException(f"Upload to bucket {self.bucket_name} failed for key {object_key}!")
+
+    async def load(self, object_key: str) -> str:
+        response = await self.s3_client.get_object(Bucket=self.bucket_name, Key=object_key)
+
+        raw_content = await self._read_body(response)
+        return get_codec(response.get("ContentEncoding")).decompress(raw_content).decode(CONTENT_CHAR_ENCODING)
+
+    async def load_range(self, object_key: str, start: int, end: int) -> bytes:
+        """
+        Ranges refer to the uncompressed content, as with S3BucketAdapter.load_range().
+        """
+        try:
+            response = await self.s3_client.get_object(Bucket=self.bucket_name, Key=object_key, Range=f"bytes={start}-{end}")
+        except ClientError as e:
+            if not e.response.get("Error", {}).get("Code") == "InvalidRange":
+                raise
+            # The range may still be valid for the uncompressed content of a compressed object
+            head = await self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)
+            if self._is_identity(get_codec(head.get("ContentEncoding"))):
+                return b""
+            return await self._slice_content(object_key, start, end)
+
+        if self._is_identity(get_codec(response.get("ContentEncoding"))):
+            return await self._read_body(response)
+        # The object was compressed when stored: the ranged content is useless
+        response['Body'].close()
+
+        return await self._slice_content(object_key, start, end)
+
+    async def _slice_content(self, object_key: str, start: int, end: int) -> bytes:
+        response = await self.s3_client.get_object(Bucket=self.bucket_name, Key=object_key)
+
+        decompressor = get_codec(response.get("ContentEncoding")).decompressor()
+        content_range = bytearray()
+        offset = 0
+        body = response['Body']
+        try:
+            while offset <= end:
+                raw_chunk = await body.read(DEFAULT_CHUNK_SIZE)
+                content_chunk = decompressor.decompress(raw_chunk) if raw_chunk else decompressor.flush()
+                chunk_end = offset + len(content_chunk)
+                if chunk_end > start:
+                    content_range += content_chunk[max(start - offset, 0):end - offset + 1]
+                offset = chunk_end
+                if not raw_chunk:
+                    break
+        finally:
+            body.close()
+
+        return bytes(content_range)
+
+    async def _read_body(self, response: Any) -> bytes:
+        body = response['Body']
+        try:
+            return await body.read()
+        finally:
+            body.close()
+
+    def _is_identity(self, codec: Codec) -> bool:
+        return codec.name == IdentityCodec.name
+
+    async def get_etag(self, object_key: str) -> Optional[str]:
+        try:
+            # HEAD request: the content is not transferred
+            response = await self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return None
+            raise
+
+        return response["ETag"].strip('"')
+
+    async def delete(self, object_key: str) -> None:
+        # Either the object was deleted (if present) or it was not present!
+        await self.s3_client.delete_object(Bucket=self.bucket_name, Key=object_key)
+
+    async def delete_all(self, object_keys: List[str]) -> List[str]:
+        failed_object_keys = []
+
+        for start in range(0, len(object_keys), DELETE_OBJECTS_CHUNK_SIZE):
+            chunk = object_keys[start:start + DELETE_OBJECTS_CHUNK_SIZE]
+            # Quiet mode: only the keys that could not be deleted are returned
+            result = await self.s3_client.delete_objects(Bucket=self.bucket_name, Delete={
+                "Objects": [{"Key": object_key} for object_key in chunk],
+                "Quiet": True
+            })
+            for error in result.get("Errors", []):
+                logging.error("Delete from bucket %s failed for key %s: %s", self.bucket_name, error.get("Key"), error.get("Message"))
+                failed_object_keys.append(error.get("Key"))
+
+        return failed_object_keys
@@ -0,0 +1,109 @@
+import copy
+import logging
+from typing import Iterator, List, Optional, Union
+
+from mynotes.core.architecture import DataPage, DataPageQuery
+from mynotes.core.notes import TAG_MATCH_ALL, Note, NoteRepository, NoteSummary, NoteType
+from mynotes.core.utils.cache import CacheStats, LRUCache
+
+# Version floor used for deleted notes: no cached copy is ever acceptable again
+DELETED_NOTE_VERSION = float("inf")
+
+class CachedNoteRepository(NoteRepository):
+    """
+    NoteRepository decorator that keeps recently read notes in memory, so that they survive
+    across warm invocations of the same Lambda process.
+
+    Entries are dropped when the note is saved or deleted through this repository. Writes also record
+    the latest known version of the note, so that a read that was in flight during the write cannot
+    put an older version back into the cache. Changes made by other processes (every handler is a separate
+    Lambda function) are only picked up when entries expire, or by find_latest_by_id().
+    """
+    def __init__(self, delegate: NoteRepository, max_size: int, ttl_seconds: float) -> None:
+        self.delegate = delegate
+        self.cache: LRUCache[Note] = LRUCache(max_size, ttl_seconds)
+        # Latest known version for notes written by this process
+        self.version_floors: LRUCache[float] = LRUCache(max_size, 2 * ttl_seconds)
+
+    def save(self, note: Note) -> None:
+        self.delegate.save(note)
+        self._invalidate(note.id, note.version or 0)
+
+    def save_all(self, notes: List[Note]) -> List[str]:
+        failed_note_ids = self.delegate.save_all(notes)
+        for note in notes:
+            self._invalidate(note.id, note.version or 0)
+        return failed_note_ids
+
+    def find_by_id(self, id: str) -> Note:
+        note = self.cache.get(id)
+        if note is None:
+            note = self.delegate.find_by_id(id)
+            if note is None:
+                return None
+            self._populate(note)
+
+        return copy.deepcopy(note)
+
+    def find_latest_by_id(self, id: str) -> Note:
+        # The cached copy is replaced: it may be stale, if the note was changed by another process
+        self.cache.invalidate(id)
+        note = self.delegate.find_by_id(id)
+        if note is None:
+            return None
+        self._populate(note)
+
+        return copy.deepcopy(note)
+
+    def find_by_ids(self, ids: List[str]) -> List[Note]:
+        notes = []
+        missing_ids = []
+        for id in ids:
+            note = self.cache.get(id)
+            if note is None:
+                missing_ids.append(id)
+            else:
+                notes.append(note)
+
+        if missing_ids:
+            for note in self.delegate.find_by_ids(missing_ids):
+                self._populate(note)
+                notes.append(note)
+
+        return [copy.deepcopy(note) for note in notes]
+
+    def delete_by_id(self, id: str) -> Optional[Note]:
+        deleted_note = self.delegate.delete_by_id(id)
+        self._invalidate(id, DELETED_NOTE_VERSION)
+        return deleted_note
+
+    def delete_all_by_ids(self, ids: List[str]) -> List[str]:
+        failed_note_ids = self.delegate.delete_all_by_ids(ids)
+        for id in ids:
+            self._invalidate(id, DELETED_NOTE_VERSION)
+        return failed_note_ids
+
+    def find_all_by_type(self, note_type: NoteType, author_id: str = None, data_page_query: DataPageQuery = None, summary: bool = False) -> Union[DataPage[Note], DataPage[NoteSummary]]:
+        return self.delegate.find_all_by_type(note_type, author_id=author_id, data_page_query=data_page_query, summary=summary)
+
+    def iter_all_by_type(self, note_type: NoteType, author_id: str = None, max_items: int = None) -> Iterator[Note]:
+        return self.delegate.iter_all_by_type(note_type, author_id=author_id, max_items=max_items)
+
+    def find_by_tags(self, tags: List[str], author_id: str = None, mode: str = TAG_MATCH_ALL, data_page_query: DataPageQuery = None, summary: bool = False) -> Union[DataPage[Note], DataPage[NoteSummary]]:
+        return self.delegate.find_by_tags(tags, author_id=author_id, mode=mode, data_page_query=data_page_query, summary=summary)
+
+    def stats(self) -> CacheStats:
+        """Returns hit/miss/eviction counters for the note cache"""
+        return self.cache.stats()
+
+    def _populate(self, note: Note) -> None:
+        version_floor = self.version_floors.get(note.id)
+        if version_floor is not None and (note.version or 0) < version_floor:
+            logging.debug("Not caching stale version %s of note %s", note.version, note.id)
+            return
+
+        self.cache.put(note.id, copy.deepcopy(note))
+
+    def _invalidate(self, id: str, version_floor: float) -> None:
+        self.version_floors.put(id, version_floor)
+        self.cache.invalidate(id)
@@ -1,11 +1,165 @@
+import functools
+import logging
 import os
+from typing import Any
+
+from mynotes.core.architecture import ApplicationException
 
 # Stack region - This is set directly by AWS
 AWS_REGION = os.getenv("AWS_REGION", "eu-west-1")
 
 # DynamoDB used for storing the note metadata 
 NOTES_TABLE_NAME = os.getenv("NOTES_TABLE_NAME", "Notes")
+# DynamoDB table used as inverted index from tags to notes
+NOTE_TAGS_TABLE_NAME = os.getenv("NOTE_TAGS_TABLE_NAME", "NoteTags")
 NOTES_CONTENT_BUCKET_NAME = os.getenv("NOTES_CONTENT_BUCKET_NAME", "NotesContent")
+# DynamoDB table with the reference counts of content-addressed note content
+NOTE_CONTENT_REFERENCES_TABLE_NAME = os.getenv("NOTE_CONTENT_REFERENCES_TABLE_NAME", "NoteContentReferences")
+# DynamoDB table with the responses of the requests made with an idempotency key
+NOTE_IDEMPOTENCY_TABLE_NAME = os.getenv("NOTE_IDEMPOTENCY_TABLE_NAME", "NoteIdempotency")
 
 # Localstack endpoint, if available
 LOCALSTACK_ENDPOINT = os.getenv("LOCALSTACK_ENDPOINT", None)
+
+# HTTP connections of the AWS clients (S3, DynamoDB): the pool of a client must fit all the threads using it at once
+# (batch upload workers, prefetching, the handler itself), otherwise connections are opened and dropped on every call
+NOTES_AWS_MAX_POOL_CONNECTIONS = int(os.getenv("NOTES_AWS_MAX_POOL_CONNECTIONS", "32"))
+NOTES_AWS_CONNECT_TIMEOUT_SECONDS = float(os.getenv("NOTES_AWS_CONNECT_TIMEOUT_SECONDS", "2"))
+NOTES_AWS_READ_TIMEOUT_SECONDS = float(os.getenv("NOTES_AWS_READ_TIMEOUT_SECONDS", "10"))
+# botocore retry mode ("legacy", "standard" or "adaptive", which also slows down requests when throttled) and attempts
+NOTES_AWS_RETRY_MODE = os.getenv("NOTES_AWS_RETRY_MODE", "adaptive")
+NOTES_AWS_MAX_ATTEMPTS = int(os.getenv("NOTES_AWS_MAX_ATTEMPTS", "3"))
+
+# Max number of concurrent content uploads when creating notes
+NOTES_BATCH_UPLOAD_MAX_WORKERS = int(os.getenv("NOTES_BATCH_UPLOAD_MAX_WORKERS", "8"))
+# Max number of notes accepted by a single batch creation request
+NOTES_BATCH_MAX_SIZE = int(os.getenv("NOTES_BATCH_MAX_SIZE", "100"))
+# Max number of note ids accepted by a single bulk delete request
+NOTES_BULK_DELETE_MAX_SIZE = int(os.getenv("NOTES_BULK_DELETE_MAX_SIZE", "1000"))
+# Content without metadata is deleted by the orphan sweeper only when older than this (creates in flight are not orphans)
+NOTES_ORPHAN_GRACE_PERIOD_SECONDS = int(os.getenv("NOTES_ORPHAN_GRACE_PERIOD_SECONDS", "3600"))
+# Idempotency keys: responses are replayed for this long, requests in progress are taken over when older than the
+# timeout (it must exceed the function timeout) and retries wait this long for a request in progress before a 409
+NOTES_IDEMPOTENCY_TTL_SECONDS = int(os.getenv("NOTES_IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+NOTES_IDEMPOTENCY_IN_PROGRESS_TIMEOUT_SECONDS = int(os.getenv("NOTES_IDEMPOTENCY_IN_PROGRESS_TIMEOUT_SECONDS", "60"))
+NOTES_IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("NOTES_IDEMPOTENCY_WAIT_SECONDS", "1"))
+# Asynchronous creation: notes are queued on SQS (202 with the note id) and created in batches by handler_ingest_notes().
+# Notes whose message would exceed the max size (in bytes, SQS allows 256 KiB) are created synchronously
+NOTES_ASYNC_INGESTION_ENABLED = os.getenv("NOTES_ASYNC_INGESTION_ENABLED", "false").lower() == "true"
+NOTES_INGESTION_QUEUE_URL = os.getenv("NOTES_INGESTION_QUEUE_URL", "")
+NOTES_INGESTION_MAX_MESSAGE_SIZE = int(os.getenv("NOTES_INGESTION_MAX_MESSAGE_SIZE", str(256 * 1024)))
+# Max number of note ids accepted by a single multi-get request
+NOTES_MULTI_GET_MAX_SIZE = int(os.getenv("NOTES_MULTI_GET_MAX_SIZE", "100"))
+# Max page size accepted by note listings
+NOTES_LIST_MAX_PAGE_SIZE = int(os.getenv("NOTES_LIST_MAX_PAGE_SIZE", "100"))
+# Max number of tags accepted by a single tag query
+NOTES_TAG_QUERY_MAX_TAGS = int(os.getenv("NOTES_TAG_QUERY_MAX_TAGS", "10"))
+
+# Secret used to sign continuation tokens: it must be the same for all the functions, otherwise tokens only
+# work within the process that issued them. Read from Secrets Manager (by ARN) when first needed, unless given as is
+NOTES_CURSOR_SIGNING_KEY = os.getenv("NOTES_CURSOR_SIGNING_KEY", "")
+NOTES_CURSOR_SIGNING_KEY_SECRET_ARN = os.getenv("NOTES_CURSOR_SIGNING_KEY_SECRET_ARN", "")
+# Accept the unsigned continuation tokens issued before signed tokens were introduced. Clients can forge them: enable
+# it only while clients still hold such tokens (each use is logged as a warning)
+NOTES_LEGACY_CURSORS_ENABLED = os.getenv("NOTES_LEGACY_CURSORS_ENABLED", "false").lower() == "true"
+
+# In-memory cache for note metadata, kept across warm invocations (disabled by default, with max size 0). Every handler
+# is a separate function with its own cache: deletes and updates made by the others are only seen once entries expire,
+# so reads may return deleted or outdated notes up to the TTL old. Conditional requests (If-None-Match) always read
+# the latest metadata before a 304. Enable it only where that staleness is acceptable
+NOTES_CACHE_MAX_SIZE = int(os.getenv("NOTES_CACHE_MAX_SIZE", "0"))
+NOTES_CACHE_TTL_SECONDS = float(os.getenv("NOTES_CACHE_TTL_SECONDS", "30"))
+
+# Max number of content bytes returned by a single ranged content request
+NOTES_CONTENT_MAX_RANGE_SIZE = int(os.getenv("NOTES_CONTENT_MAX_RANGE_SIZE", str(1024 * 1024)))
+
+# JSON library used for API responses: "json", or "orjson" if installed (faster, but compact output)
+NOTES_JSON_BACKEND = os.getenv("NOTES_JSON_BACKEND", "json")
+
+# Codec used to compress new note content ("identity", "gzip" or "zstd" if the zstandard package is installed)
+NOTES_CONTENT_CODEC = os.getenv("NOTES_CONTENT_CODEC", "gzip")
+# Content-addressed storage of new notes: identical content is stored once, by SHA-256 hash. Once enabled, keep it
+# enabled: the content of the notes created meanwhile is found (and released on deletion) through reference counts
+NOTES_CONTENT_DEDUP_ENABLED = os.getenv("NOTES_CONTENT_DEDUP_ENABLED", "false").lower() == "true"
+
+# Full-text search over note content: segments are stored in the content bucket and cached in this local folder.
+# Disabled by default: once enabled, every note creation and deletion writes a segment to S3 before answering, and
+# searches get slower with the number of segments, unless handler_compact_search_index() runs on a schedule
+NOTES_SEARCH_ENABLED = os.getenv("NOTES_SEARCH_ENABLED", "false").lower() == "true"
+NOTES_SEARCH_CACHE_DIR = os.getenv("NOTES_SEARCH_CACHE_DIR", "/tmp/mynotes-search")
+# How long searches reuse the list of segments: notes indexed by other functions are found once it expires
+NOTES_SEARCH_MANIFEST_TTL_SECONDS = float(os.getenv("NOTES_SEARCH_MANIFEST_TTL_SECONDS", "10"))
+# Max number of results returned by a single search
+NOTES_SEARCH_MAX_RESULTS = int(os.getenv("NOTES_SEARCH_MAX_RESULTS", "50"))
+
+# Request logging: level of the 'mynotes' loggers, then the fraction of successful requests that are logged
+# (failed ones always are), with optional overrides by handler, e.g. "handler_find_notes=0.01,handler_create_note=1"
+NOTES_LOG_LEVEL = os.getenv("NOTES_LOG_LEVEL", "INFO")
+NOTES_REQUEST_LOG_SAMPLE_RATE = float(os.getenv("NOTES_REQUEST_LOG_SAMPLE_RATE", "0.1"))
+NOTES_REQUEST_LOG_SAMPLE_RATES = os.getenv("NOTES_REQUEST_LOG_SAMPLE_RATES", "handler_sweep_orphan_content=1,handler_compact_search_index=1")
+# Headers and parameters that are never logged (case insensitive)
+NOTES_LOG_REDACTED_FIELDS = os.getenv("NOTES_LOG_REDACTED_FIELDS", "authorization,cookie,x-api-key,x-amz-security-token,continuation_token")
+# Size caps of logged values (characters), of logged headers and parameters (items) and of whole records (characters)
+NOTES_LOG_MAX_VALUE_SIZE = int(os.getenv("NOTES_LOG_MAX_VALUE_SIZE", "256"))
+NOTES_LOG_MAX_ITEMS = int(os.getenv("NOTES_LOG_MAX_ITEMS", "20"))
+NOTES_LOG_MAX_RECORD_SIZE = int(os.getenv("NOTES_LOG_MAX_RECORD_SIZE", "4096"))
+
+# Timing of adapters, use cases and serialization, written as one CloudWatch Embedded Metric Format line per invocation
+NOTES_METRICS_ENABLED = os.getenv("NOTES_METRICS_ENABLED", "false").lower() == "true"
+NOTES_METRICS_NAMESPACE = os.getenv("NOTES_METRICS_NAMESPACE", "MyNotes")
+
+def get_aws_client_config(**overrides: Any) -> Any:
+    """
+    The botocore configuration shared by the AWS clients (pool size, timeouts and retries set above).
+
+    Args:
+        overrides: botocore Config options replacing the shared ones
+    Returns:
+        a botocore Config
+    """
+    # botocore is not imported at cold start
+    from botocore.config import Config
+
+    options = {
+        "max_pool_connections": NOTES_AWS_MAX_POOL_CONNECTIONS,
+        "connect_timeout": NOTES_AWS_CONNECT_TIMEOUT_SECONDS,
+        "read_timeout": NOTES_AWS_READ_TIMEOUT_SECONDS,
+        "retries": {"mode": NOTES_AWS_RETRY_MODE, "max_attempts": NOTES_AWS_MAX_ATTEMPTS}
+    }
+    options.update(overrides)
+    return Config(**options)
+
+def create_aws_resource(service_name: str, **kwargs: Any) -> Any:
+    """Returns a boto3 resource using the shared client configuration (kwargs are passed to boto3.resource())"""
+    import boto3
+
+    return boto3.resource(service_name, config=get_aws_client_config(), **kwargs)
+
+def create_aws_client(service_name: str, **kwargs: Any) -> Any:
+    """Returns a boto3 client using the shared client configuration (kwargs are passed to boto3.client())"""
+    import boto3
+
+    return boto3.client(service_name, config=get_aws_client_config(), **kwargs)
+
+@functools.lru_cache(maxsize=None)
+def get_cursor_signing_key() -> bytes:
+    """
+    The key used to sign continuation tokens, read once per container.
+
+    Returns:
+        NOTES_CURSOR_SIGNING_KEY if set, the value of the NOTES_CURSOR_SIGNING_KEY_SECRET_ARN secret otherwise. Outside
+        Lambda (tests, local runs), a random key if neither is set: tokens only work within this process
+    Throws:
+        ApplicationException if neither is set in a Lambda function
+    """
+    if NOTES_CURSOR_SIGNING_KEY:
+        return NOTES_CURSOR_SIGNING_KEY.encode("utf-8")
+
+    if NOTES_CURSOR_SIGNING_KEY_SECRET_ARN:
+        secrets = create_aws_client("secretsmanager", region_name=AWS_REGION, endpoint_url=LOCALSTACK_ENDPOINT)
+        return secrets.get_secret_value(SecretId=NOTES_CURSOR_SIGNING_KEY_SECRET_ARN)["SecretString"].encode("utf-8")
+
+    if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        raise ApplicationException("Neither NOTES_CURSOR_SIGNING_KEY nor NOTES_CURSOR_SIGNING_KEY_SECRET_ARN is set")
+    logging.warning("No cursor signing key configured: continuation tokens are signed with a random key and only work within this process")
+    return os.urandom(32)
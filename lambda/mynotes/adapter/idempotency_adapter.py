@@ -0,0 +1,92 @@
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from pynamodb.attributes import JSONAttribute, TTLAttribute, UnicodeAttribute
+from pynamodb.exceptions import DeleteError, PutError, UpdateError
+from pynamodb.models import Model
+
+from mynotes.adapter.config import AWS_REGION, LOCALSTACK_ENDPOINT, NOTE_IDEMPOTENCY_TABLE_NAME
+from mynotes.adapter.notes_adapter import _ConnectionMeta, _is_conditional_check_failure
+from mynotes.core.architecture import instrumented
+from mynotes.core.idempotency import IdempotencyRecord, IdempotencyStatus, IdempotencyStore
+from mynotes.core.utils.common import now
+
+class IdempotencyRecordModel(Model):
+    """
+    DynamoDB model for the requests made with an idempotency key. The expiration is the TTL attribute of the table:
+    the timeout of the request while in progress, the end of the replay period once completed.
+    """
+    class Meta(_ConnectionMeta):
+        region = AWS_REGION
+        table_name = NOTE_IDEMPOTENCY_TABLE_NAME
+
+    if LOCALSTACK_ENDPOINT:
+        setattr(Meta, "host", LOCALSTACK_ENDPOINT)
+
+    idempotency_key = UnicodeAttribute(hash_key = True)
+    fingerprint = UnicodeAttribute()
+    status = UnicodeAttribute()
+    response = JSONAttribute(null = True)
+    expiration = TTLAttribute()
+
+def map_to_idempotency_record(record_model: IdempotencyRecordModel) -> IdempotencyRecord:
+    return IdempotencyRecord(
+        key = record_model.idempotency_key,
+        fingerprint = record_model.fingerprint,
+        status = IdempotencyStatus(record_model.status),
+        response = record_model.response
+    )
+
+@instrumented
+class DynamoDBIdempotencyStore(IdempotencyStore):
+    """
+    Records written with conditional requests, so that a single function runs the request with a given key. DynamoDB
+    deletes expired items lazily: they are checked by the conditions too.
+    """
+    def __init__(self, ttl: timedelta, in_progress_timeout: timedelta) -> None:
+        self.ttl = ttl
+        self.in_progress_timeout = in_progress_timeout
+
+    def start(self, key: str, fingerprint: str) -> Optional[IdempotencyRecord]:
+        record_model = IdempotencyRecordModel(
+            key,
+            fingerprint = fingerprint,
+            status = IdempotencyStatus.IN_PROGRESS.value,
+            expiration = self.in_progress_timeout
+        )
+        try:
+            record_model.save(condition=IdempotencyRecordModel.idempotency_key.does_not_exist() | (IdempotencyRecordModel.expiration < now()))
+            return None
+        except PutError as e:
+            if not _is_conditional_check_failure(e):
+                raise
+
+        try:
+            return map_to_idempotency_record(IdempotencyRecordModel.get(key, consistent_read=True))
+        except IdempotencyRecordModel.DoesNotExist:
+            # Cancelled since: reported as in progress, for the caller to try again
+            return IdempotencyRecord(key, fingerprint, IdempotencyStatus.IN_PROGRESS)
+
+    def complete(self, key: str, response: Dict[str, Any]) -> None:
+        try:
+            IdempotencyRecordModel(key).update(
+                actions=[
+                    IdempotencyRecordModel.status.set(IdempotencyStatus.COMPLETED.value),
+                    IdempotencyRecordModel.response.set(response),
+                    IdempotencyRecordModel.expiration.set(self.ttl)
+                ],
+                condition=IdempotencyRecordModel.status == IdempotencyStatus.IN_PROGRESS.value
+            )
+        except UpdateError as e:
+            if not _is_conditional_check_failure(e):
+                raise
+            # The request timed out and was retried meanwhile: the response of the retry is the recorded one
+            logging.warning("Request with idempotency key %s was no longer in progress when completed", key)
+
+    def cancel(self, key: str) -> None:
+        try:
+            IdempotencyRecordModel(key).delete(condition=IdempotencyRecordModel.status == IdempotencyStatus.IN_PROGRESS.value)
+        except DeleteError as e:
+            if not _is_conditional_check_failure(e):
+                raise
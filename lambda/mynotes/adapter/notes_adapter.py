@@ -1,15 +1,25 @@
 from ast import Global
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import heapq
+import itertools
 import logging
-from typing import List
+import uuid
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set, Tuple, Union
 from pynamodb.attributes import UnicodeAttribute, UTCDateTimeAttribute, UnicodeSetAttribute, VersionAttribute, NumberAttribute
+from pynamodb.constants import ALL_OLD, NUMBER
+from pynamodb.expressions.condition import Condition
+from pynamodb.exceptions import DeleteError, PutError, UpdateError
 from pynamodb.models import Model
-from pynamodb.indexes import GlobalSecondaryIndex, AllProjection
+from pynamodb.indexes import GlobalSecondaryIndex, AllProjection, KeysOnlyProjection
 
-from mynotes.core.architecture import DataPage, DataPageQuery
-from mynotes.adapter.utils import encode_dict_to_base64, decode_str_as_dict
-from mynotes.core.notes import Note, NoteRepository, NoteType
-from mynotes.adapter.config import NOTES_TABLE_NAME, LOCALSTACK_ENDPOINT, AWS_REGION
+from mynotes.core.architecture import DataPage, DataPageQuery, instrumented
+from mynotes.adapter.utils import encode_continuation_token, decode_str_as_dict
+from mynotes.core.notes import TAG_MATCH_ALL, ContentReference, ContentReferenceRepository, Note, NoteRepository, NoteSummary, NoteType
+from mynotes.adapter.config import (NOTES_TABLE_NAME, NOTE_TAGS_TABLE_NAME, NOTE_CONTENT_REFERENCES_TABLE_NAME, LOCALSTACK_ENDPOINT, AWS_REGION,
+                                    NOTES_AWS_CONNECT_TIMEOUT_SECONDS, NOTES_AWS_MAX_ATTEMPTS, NOTES_AWS_MAX_POOL_CONNECTIONS,
+                                    NOTES_AWS_READ_TIMEOUT_SECONDS)
 import json
 import base64
 
@@ -17,6 +27,22 @@ import base64
 PUBLIC_AUTHOR_ID = "__PUBLIC__"
 # Max amount of data page that will be returned by query responses
 DEFAULT_DATA_PAGE_LIMIT = 10
+# Amount of notes fetched with each query when iterating over all the notes of a type
+DEFAULT_ITERATION_PAGE_SIZE = 100
+# Max amount of items that DynamoDB accepts in a single BatchWriteItem request
+BATCH_WRITE_CHUNK_SIZE = 25
+
+class _ConnectionMeta:
+    """
+    Connection settings of the models, shared with the other AWS clients (see get_aws_client_config()).
+    PynamoDB creates its own botocore client and retries requests itself, with jittered exponential backoff:
+    only the pool size, the timeouts and the number of attempts apply.
+    """
+    max_pool_connections = NOTES_AWS_MAX_POOL_CONNECTIONS
+    connect_timeout_seconds = NOTES_AWS_CONNECT_TIMEOUT_SECONDS
+    read_timeout_seconds = NOTES_AWS_READ_TIMEOUT_SECONDS
+    # Retries, not counting the first attempt
+    max_retry_attempts = NOTES_AWS_MAX_ATTEMPTS - 1
 
 class NoteModelSearchByAuthorAndTypeIndex(GlobalSecondaryIndex):
     """
@@ -34,11 +60,27 @@ class NoteModelSearchByAuthorAndTypeIndex(GlobalSecondaryIndex):
     author_id_and_type = UnicodeAttribute(hash_key = True)
     creation_time = UTCDateTimeAttribute(range_key = True)  
 
+class NoteModelSummaryByAuthorAndTypeIndex(GlobalSecondaryIndex):
+    """
+    DynamodDB GSI that supports cheap listings by author and type for notes: only keys are projected,
+    so queries read (and pay for) a few bytes per note whatever the size of the tags.
+    """
+    class Meta:
+        index_name = "SummaryByAuthorAndTypeIndex"
+        read_capacity_units = 1
+        write_capacity_units = 1
+        # Only the note id, author/type and creation time are projected
+        projection = KeysOnlyProjection()
+        region = AWS_REGION
+
+    author_id_and_type = UnicodeAttribute(hash_key = True)
+    creation_time = UTCDateTimeAttribute(range_key = True)
+
 class NoteModel(Model):
     """
     DynamoDB model for Notes
     """
-    class Meta:
+    class Meta(_ConnectionMeta):
         region = AWS_REGION
         table_name = NOTES_TABLE_NAME
 
@@ -52,9 +94,45 @@ class NoteModel(Model):
     author_id_and_type = UnicodeAttribute()
     tags = UnicodeSetAttribute()
     version = VersionAttribute(null=True)
+    # Only for content-addressed content
+    content_hash = UnicodeAttribute(null=True)
+    content_generation = UnicodeAttribute(null=True)
 
     search_by_author_and_type_index = NoteModelSearchByAuthorAndTypeIndex()
+    summary_by_author_and_type_index = NoteModelSummaryByAuthorAndTypeIndex()
+
+class NoteTagModel(Model):
+    """
+    DynamoDB model for the tag inverted index: one item (posting) per tag of a note. The notes of an author
+    with a tag are read with a single query, sorted by note id.
+    """
+    class Meta(_ConnectionMeta):
+        region = AWS_REGION
+        table_name = NOTE_TAGS_TABLE_NAME
+
+    if LOCALSTACK_ENDPOINT:
+        setattr(Meta, "host", LOCALSTACK_ENDPOINT)
+
+    # Format: <TAG>#<USER_ID>
+    tag_and_author = UnicodeAttribute(hash_key = True)
+    note_id = UnicodeAttribute(range_key = True)
+    creation_time = UTCDateTimeAttribute()
 
+class ContentReferenceModel(Model):
+    """
+    DynamoDB model for the references to content-addressed note content: one item per content hash, with the number
+    of notes referencing the content and the generation of its object. Items are deleted with their last reference.
+    """
+    class Meta(_ConnectionMeta):
+        region = AWS_REGION
+        table_name = NOTE_CONTENT_REFERENCES_TABLE_NAME
+
+    if LOCALSTACK_ENDPOINT:
+        setattr(Meta, "host", LOCALSTACK_ENDPOINT)
+
+    content_hash = UnicodeAttribute(hash_key = True)
+    reference_count = NumberAttribute()
+    generation = UnicodeAttribute()
 
 def map_to_note_model(note: Note) -> NoteModel:
     model = NoteModel(
@@ -65,6 +143,8 @@ def map_to_note_model(note: Note) -> NoteModel:
     model.tags = set(note.tags) if note.tags else {}
     if note.version:
         model.version = note.version
+    model.content_hash = note.content_hash
+    model.content_generation = note.content_generation
 
     return model
 
@@ -77,14 +157,216 @@ def map_to_note(note_model: NoteModel) -> Note:
         creation_time = note_model.creation_time,
         tags = list(note_model.tags) if note_model.tags else list(),
         author_id = author_id,
-        version = note_model.version
+        version = note_model.version,
+        content_hash = note_model.content_hash,
+        content_generation = note_model.content_generation
+    )
+
+def map_to_note_summary(note_model: NoteModel) -> NoteSummary:
+    return NoteSummary(
+        id = note_model.id,
+        creation_time = note_model.creation_time
     )
 
+def get_tag_and_author(tag: str, author_id: str) -> str:
+    return f"{tag}#{author_id}"
+
+def _get_tag_postings(note_model: Optional[NoteModel]) -> Dict[str, NoteTagModel]:
+    """Index items for the tags of a note, by hash key"""
+    if not note_model or not note_model.tags:
+        return {}
+
+    author_id = note_model.author_id_and_type.split("#")[0]
+    return {
+        tag_and_author: NoteTagModel(tag_and_author, note_model.id, creation_time=note_model.creation_time)
+        for tag_and_author in (get_tag_and_author(tag, author_id) for tag in note_model.tags)
+    }
+
+def _update_tag_index(old_note_model: Optional[NoteModel], new_note_model: Optional[NoteModel]) -> None:
+    """Writes only the postings of the tags that were added and deletes the ones of the tags that were removed"""
+    old_postings = _get_tag_postings(old_note_model)
+    new_postings = _get_tag_postings(new_note_model)
+
+    added_keys = new_postings.keys() - old_postings.keys()
+    removed_keys = old_postings.keys() - new_postings.keys()
+    if not added_keys and not removed_keys:
+        return
+
+    with NoteTagModel.batch_write() as batch:
+        for key in added_keys:
+            batch.save(new_postings[key])
+        for key in removed_keys:
+            batch.delete(old_postings[key])
+
+def get_version_condition(note_model: NoteModel, item: Dict[str, Any]) -> Condition:
+    """
+    The optimistic locking of NoteModel.save(): the stored note must still have the version of the note model
+    (or not exist, for notes never saved). The serialized item gets the next version.
+    """
+    if note_model.version is None:
+        condition = NoteModel.version.does_not_exist()
+        next_version = 1
+    else:
+        condition = NoteModel.version == note_model.version
+        next_version = note_model.version + 1
+
+    item[NoteModel.version.attr_name] = {NUMBER: NoteModel.version.serialize(next_version)}
+    return condition
+
+def _write_note_item(note_id: str, item: Dict[str, Any] = None, condition: Condition = None) -> Optional[NoteModel]:
+    """
+    Puts a note item (the serialized note, without its id) or deletes it, without an item, with a single request
+    returning the previous item (None if there was none). NoteModel.save() and NoteModel.delete() can't return it:
+    this is the only place where the connection of NoteModel is used directly.
+    """
+    connection = NoteModel._get_connection()
+    if item is None:
+        response = connection.delete_item(note_id, condition=condition, return_values=ALL_OLD)
+    else:
+        response = connection.put_item(note_id, attributes=item, condition=condition, return_values=ALL_OLD)
+
+    return NoteModel.from_raw_data(response["Attributes"]) if response.get("Attributes") else None
+
+class _PostingListCursor:
+    """
+    Reads the posting list of a tag in note id order, one query page at a time. Seeking past the
+    loaded page starts a new query from the wanted note id, so skipped postings are never read.
+    """
+    def __init__(self, tag_and_author: str, after_note_id: str = None, page_size: int = DEFAULT_ITERATION_PAGE_SIZE) -> None:
+        self.tag_and_author = tag_and_author
+        self.page_size = page_size
+        self.buffer: Deque[NoteTagModel] = deque()
+        self._query(NoteTagModel.note_id > after_note_id if after_note_id else None)
+
+    def _query(self, range_key_condition: Optional[Condition], last_evaluated_key: Dict[str, Any] = None) -> None:
+        self.range_key_condition = range_key_condition
+        page_results = NoteTagModel.query(
+            self.tag_and_author,
+            range_key_condition=range_key_condition,
+            limit=self.page_size,
+            last_evaluated_key=last_evaluated_key
+        )
+        self.buffer.extend(page_results)
+        self.last_evaluated_key = page_results.last_evaluated_key
+
+    def peek(self) -> Optional[NoteTagModel]:
+        """The current posting, or None once the list is exhausted"""
+        while not self.buffer and self.last_evaluated_key:
+            self._query(self.range_key_condition, self.last_evaluated_key)
+        return self.buffer[0] if self.buffer else None
+
+    def advance(self) -> None:
+        self.buffer.popleft()
+
+    def seek(self, note_id: str) -> None:
+        """Moves to the first posting with an id not lower than 'note_id'"""
+        while self.buffer and self.buffer[0].note_id < note_id:
+            self.buffer.popleft()
+        if not self.buffer and self.last_evaluated_key:
+            self._query(NoteTagModel.note_id >= note_id)
+
+    def __iter__(self) -> Iterator[NoteTagModel]:
+        posting = self.peek()
+        while posting:
+            yield posting
+            self.advance()
+            posting = self.peek()
+
+def _intersect_postings(cursors: List[_PostingListCursor]) -> Iterator[NoteTagModel]:
+    """Leapfrog join: every list jumps to the highest current note id until they all agree"""
+    while True:
+        postings = [cursor.peek() for cursor in cursors]
+        if not all(postings):
+            return
+
+        max_note_id = max(posting.note_id for posting in postings)
+        if all(posting.note_id == max_note_id for posting in postings):
+            yield postings[0]
+            for cursor in cursors:
+                cursor.advance()
+        else:
+            for cursor in cursors:
+                cursor.seek(max_note_id)
+
+def _union_postings(cursors: List[_PostingListCursor]) -> Iterator[NoteTagModel]:
+    """K-way merge of the lists, each note being returned once"""
+    last_note_id = None
+    for posting in heapq.merge(*cursors, key=lambda posting: posting.note_id):
+        if posting.note_id != last_note_id:
+            last_note_id = posting.note_id
+            yield posting
+
+def _get_creation_time_condition(since: Optional[datetime], until: Optional[datetime]) -> Optional[Condition]:
+    creation_time = NoteModelSearchByAuthorAndTypeIndex.creation_time
+    if since and until:
+        return creation_time.between(since, until)
+    if since:
+        return creation_time >= since
+    if until:
+        return creation_time <= until
+    return None
+
+@instrumented
 class DynamoDBNoteRepository(NoteRepository):
     def save(self, note: Note) -> None:
+        """
+        Save a note with optimistic locking. The previous item is returned by the same PutItem request,
+        so that only the postings of added or removed tags are written to the tag index.
+        """
         note_model = map_to_note_model(note)
-        
-        note_model.save()
+
+        item = note_model.serialize()
+        item.pop(NoteModel.id.attr_name)
+        old_note_model = _write_note_item(note_model.id, item, get_version_condition(note_model, item))
+        # The version is incremented on save: keep the note in sync
+        note_model.update_local_version_attribute()
+        note.version = note_model.version
+
+        _update_tag_index(old_note_model, note_model)
+
+    def save_all(self, notes: List[Note]) -> List[str]:
+        """
+        Save new notes using BatchWriteItem requests (up to 25 notes each). Unprocessed items are
+        retried by PynamoDB with exponential backoff: notes still unprocessed after that are reported as failed.
+
+        Note that batch writes are not conditional, so there is no optimistic locking: this is meant for new notes only
+        (the postings of the tag index are added, never removed).
+        """
+        failed_note_ids = []
+        saved_note_models = []
+
+        for start in range(0, len(notes), BATCH_WRITE_CHUNK_SIZE):
+            chunk = notes[start:start + BATCH_WRITE_CHUNK_SIZE]
+            batch = NoteModel.batch_write()
+            try:
+                note_models = []
+                with batch:
+                    for note in chunk:
+                        note.version = note.version or 1
+                        note_models.append(map_to_note_model(note))
+                        batch.save(note_models[-1])
+                saved_note_models.extend(note_models)
+            except PutError as e:
+                logging.error("Batch write failed for %s notes: %s", len(chunk), e)
+                unprocessed_ids = {
+                    item["PutRequest"]["Item"]["id"]["S"] for item in batch.failed_operations
+                } if batch.failed_operations else {note.id for note in chunk}
+                failed_note_ids.extend(note.id for note in chunk if note.id in unprocessed_ids)
+                saved_note_models.extend(note_model for note_model in note_models if note_model.id not in unprocessed_ids)
+
+        self._add_tag_postings(saved_note_models)
+
+        return failed_note_ids
+
+    def _add_tag_postings(self, note_models: List[NoteModel]) -> None:
+        try:
+            with NoteTagModel.batch_write() as batch:
+                for note_model in note_models:
+                    for posting in _get_tag_postings(note_model).values():
+                        batch.save(posting)
+        except PutError as e:
+            # The notes themselves are saved: they are just missing from tag queries
+            logging.error("Tag index update failed for %s notes: %s", len(note_models), e)
 
     def find_by_id(self, id: str) -> Note:
         try:
@@ -92,40 +374,231 @@ class DynamoDBNoteRepository(NoteRepository):
 
             return map_to_note(note_model)
         except NoteModel.DoesNotExist:
-            logging.debug(f"Note with id {id} was not found!")
+            logging.debug("Note with id %s was not found!", id)
             return None
 
-    def delete_by_id(self, id: str) -> None:
+    def find_by_ids(self, ids: List[str]) -> List[Note]:
+        """
+        Fetch notes using BatchGetItem: PynamoDB splits the keys into requests of 100 keys
+        and re-submits any unprocessed keys until all of them have been read.
+        """
+        return [map_to_note(note_model) for note_model in NoteModel.batch_get(ids)]
+
+    def delete_by_id(self, id: str) -> Optional[Note]:
+        """
+        Delete a note with a single DeleteItem request: the deleted note is the old item returned by DynamoDB.
+        """
+        old_note_model = _write_note_item(id)
+        if not old_note_model:
+            logging.debug("Note with id %s was not found!", id)
+            return None
+
+        # The old item tells which postings of the tag index must go
+        _update_tag_index(old_note_model, None)
+        return map_to_note(old_note_model)
+
+    def delete_all_by_ids(self, ids: List[str]) -> List[str]:
+        """
+        Delete notes using BatchWriteItem requests (up to 25 notes each). Unprocessed items are
+        retried by PynamoDB with exponential backoff: notes still unprocessed after that are reported as failed.
+
+        Batch deletes can't return the old items: the tags of the notes are read first (with BatchGetItem),
+        so that their postings can be removed from the tag index.
+        """
+        failed_note_ids = []
+        tagged_note_models = [
+            note_model for note_model in NoteModel.batch_get(ids, attributes_to_get=["id", "author_id_and_type", "creation_time", "tags"])
+            if note_model.tags
+        ]
+
+        for start in range(0, len(ids), BATCH_WRITE_CHUNK_SIZE):
+            chunk = ids[start:start + BATCH_WRITE_CHUNK_SIZE]
+            batch = NoteModel.batch_write()
+            try:
+                with batch:
+                    for id in chunk:
+                        batch.delete(NoteModel(id))
+            except PutError as e:
+                logging.error("Batch delete failed for %s notes: %s", len(chunk), e)
+                unprocessed_ids = {
+                    item["DeleteRequest"]["Key"]["id"]["S"] for item in batch.failed_operations
+                } if batch.failed_operations else set(chunk)
+                failed_note_ids.extend(id for id in chunk if id in unprocessed_ids)
+
+        self._remove_tag_postings([note_model for note_model in tagged_note_models if note_model.id not in failed_note_ids])
+
+        return failed_note_ids
+
+    def _remove_tag_postings(self, note_models: List[NoteModel]) -> None:
         try:
-            # XXX Review this implementation - I should not need to do 
-            # a "get" before a "delete" :|
-            note_model = NoteModel.get(id)
-            note_model.delete()
-#            note_model.delete(NoteModel.id == id)
-        except NoteModel.DoesNotExist:
-            logging.debug(f"Note with id {id} was not found!")
+            with NoteTagModel.batch_write() as batch:
+                for note_model in note_models:
+                    for posting in _get_tag_postings(note_model).values():
+                        batch.delete(posting)
+        except PutError as e:
+            # Stale postings are harmless for full results (deleted notes are not found), not for summaries
+            logging.error("Tag index cleanup failed for %s notes: %s", len(note_models), e)
 
-    def find_all_by_type(self, note_type: NoteType, author_id: str = None, data_page_query: DataPageQuery = None) -> DataPage[Note]:
+    def find_all_by_type(self, note_type: NoteType, author_id: str = None, data_page_query: DataPageQuery = None, summary: bool = False) -> Union[DataPage[Note], DataPage[NoteSummary]]:
+        """
+        Returns a page of notes of the specified type. With 'summary' set, only ids and creation times are returned,
+        read from an index that does not project the other attributes.
+        """
         author_id = author_id or PUBLIC_AUTHOR_ID
         pk = f"{author_id}#{note_type.value}"
 
-        page_size = data_page_query.page_size if data_page_query else DEFAULT_DATA_PAGE_LIMIT
-        continuation_token = data_page_query.continuation_token if data_page_query else None
+        data_page_query = data_page_query or DataPageQuery(page_size=DEFAULT_DATA_PAGE_LIMIT)
 
-        page_results = NoteModel.search_by_author_and_type_index.query(
+        index = NoteModel.summary_by_author_and_type_index if summary else NoteModel.search_by_author_and_type_index
+        mapper = map_to_note_summary if summary else map_to_note
+
+        page_results = index.query(
             pk, 
-#            NoteModelSearchByAuthorAndTypeIndex.creation_time > datetime(2008, 8, 12, 12, 20, 30, 656234),
-            limit=page_size,
-            last_evaluated_key=decode_str_as_dict(continuation_token)
+            # Time bounds are part of the key condition (creation time is the index range key): nothing is filtered afterwards
+            range_key_condition=_get_creation_time_condition(data_page_query.since, data_page_query.until),
+            scan_index_forward=not data_page_query.newest_first,
+            limit=data_page_query.page_size,
+            last_evaluated_key=decode_str_as_dict(data_page_query.continuation_token)
         )
 
-        items = [map_to_note(item) for item in page_results]
+        items = [mapper(item) for item in page_results]
         n_items = len(items)
 
-        continuation_token = encode_dict_to_base64(page_results.last_evaluated_key) if page_results.last_evaluated_key else None
+        continuation_token = encode_continuation_token(page_results.last_evaluated_key) if page_results.last_evaluated_key else None
 
         return DataPage(
             items,
             n_items,
             continuation_token 
         )
+
+    def find_by_tags(self, tags: List[str], author_id: str = None, mode: str = TAG_MATCH_ALL, data_page_query: DataPageQuery = None, summary: bool = False) -> Union[DataPage[Note], DataPage[NoteSummary]]:
+        """
+        Returns a page of the notes with all (TAG_MATCH_ALL) or any (TAG_MATCH_ANY) of the tags, sorted by note id.
+        The posting lists of the tags are read lazily and merged as they are read: with TAG_MATCH_ALL,
+        lists skip ahead to the next candidate note instead of being read in full.
+        With 'summary' set, results come from the tag index only, without reading the notes.
+        """
+        author_id = author_id or PUBLIC_AUTHOR_ID
+        data_page_query = data_page_query or DataPageQuery(page_size=DEFAULT_DATA_PAGE_LIMIT)
+        after_note_id = (decode_str_as_dict(data_page_query.continuation_token) or {}).get("after_note_id")
+
+        cursors = [
+            _PostingListCursor(get_tag_and_author(tag, author_id), after_note_id)
+            for tag in dict.fromkeys(tags)
+        ]
+        postings = _intersect_postings(cursors) if mode == TAG_MATCH_ALL else _union_postings(cursors)
+
+        # One more posting tells whether there is a next page
+        page_postings = list(itertools.islice(postings, data_page_query.page_size + 1))
+        continuation_token = None
+        if len(page_postings) > data_page_query.page_size:
+            page_postings = page_postings[:data_page_query.page_size]
+            continuation_token = encode_continuation_token({"after_note_id": page_postings[-1].note_id})
+
+        if summary:
+            items = [NoteSummary(id=posting.note_id, creation_time=posting.creation_time) for posting in page_postings]
+        else:
+            notes_by_id = {note.id: note for note in self.find_by_ids([posting.note_id for posting in page_postings])}
+            items = [notes_by_id[posting.note_id] for posting in page_postings if posting.note_id in notes_by_id]
+
+        return DataPage(
+            items,
+            len(items),
+            continuation_token
+        )
+
+    def iter_all_by_type(self, note_type: NoteType, author_id: str = None, max_items: int = None, page_size: int = DEFAULT_ITERATION_PAGE_SIZE) -> Iterator[Note]:
+        """
+        Lazily iterate over all the notes of a type. While the caller processes a page, the next one
+        is fetched on a background thread, so that I/O and processing overlap.
+
+        Args:
+            note_type: the type of the wanted notes
+            author_id: the author of the notes (public notes if not specified)
+            max_items: stop after this number of notes (no limit if not specified)
+            page_size: the number of notes fetched with each query
+        """
+        author_id = author_id or PUBLIC_AUTHOR_ID
+        pk = f"{author_id}#{note_type.value}"
+
+        def fetch_page(last_evaluated_key: Optional[Dict[str, Any]], limit: int) -> Tuple[List[Note], Optional[Dict[str, Any]]]:
+            page_results = NoteModel.search_by_author_and_type_index.query(
+                pk,
+                limit=limit,
+                last_evaluated_key=last_evaluated_key
+            )
+            return [map_to_note(item) for item in page_results], page_results.last_evaluated_key
+
+        remaining = max_items
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            next_page = executor.submit(fetch_page, None, min(page_size, remaining) if remaining is not None else page_size)
+            while next_page:
+                items, last_evaluated_key = next_page.result()
+                if remaining is not None:
+                    items = items[:remaining]
+                    remaining -= len(items)
+
+                next_page = None
+                if last_evaluated_key and (remaining is None or remaining > 0):
+                    next_page = executor.submit(fetch_page, last_evaluated_key, min(page_size, remaining) if remaining is not None else page_size)
+
+                yield from items
+        finally:
+            # The caller may stop early: don't wait for a prefetch nobody needs
+            executor.shutdown(wait=False)
+
+def _is_conditional_check_failure(error: Exception) -> bool:
+    return getattr(error, "cause_response_code", None) == "ConditionalCheckFailedException"
+
+@instrumented
+class DynamoDBContentReferenceRepository(ContentReferenceRepository):
+    """
+    Reference counts kept with atomic updates, so that concurrent functions never lose a reference. An item
+    is deleted (and its content collected) only if no reference was added since its count went down to zero.
+    """
+    def acquire(self, content_hash: str, count: int = 1) -> ContentReference:
+        """
+        Increments the count with a single UpdateItem request, which also starts a new generation if the content
+        was not referenced (the new generation is kept only if there is no item).
+        """
+        new_generation = uuid.uuid4().hex
+        reference_model = ContentReferenceModel(content_hash)
+        # Attributes are updated with the new item
+        reference_model.update(actions=[
+            ContentReferenceModel.reference_count.add(count),
+            ContentReferenceModel.generation.set(ContentReferenceModel.generation | new_generation)
+        ])
+
+        return ContentReference(content_hash, reference_model.generation, created=reference_model.generation == new_generation)
+
+    def release(self, content_hash: str, generation: str, count: int = 1) -> bool:
+        """
+        Decrements the count, then deletes the item if the count is still zero (or less): the generation
+        is checked by both requests, as an item of a newer generation has its own references.
+        """
+        reference_model = ContentReferenceModel(content_hash)
+        try:
+            reference_model.update(
+                actions=[ContentReferenceModel.reference_count.add(-count)],
+                condition=ContentReferenceModel.generation == generation
+            )
+        except UpdateError as e:
+            if not _is_conditional_check_failure(e):
+                raise
+            logging.error("References to content %s were already released (generation %s)", content_hash, generation)
+            return False
+
+        if reference_model.reference_count > 0:
+            return False
+
+        try:
+            reference_model.delete(condition=(ContentReferenceModel.reference_count <= 0) & (ContentReferenceModel.generation == generation))
+        except DeleteError as e:
+            if not _is_conditional_check_failure(e):
+                raise
+            # Referenced again meanwhile: the object of this generation is still needed
+            return False
+
+        return True
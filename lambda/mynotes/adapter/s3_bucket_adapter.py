@@ -1,31 +1,162 @@
-from typing import Any
-from mynotes.core.architecture import ContentUploadException, ObjectStore
+import codecs
+import logging
+from typing import Any, Iterator, List, Optional
 
+from botocore.exceptions import ClientError
+from mynotes.core.architecture import DEFAULT_CHUNK_SIZE, ContentUploadException, ObjectStore, StoredObject, instrumented
+from mynotes.core.compression import Codec, IdentityCodec, get_codec
+
+# The character encoding used for the note content
+CONTENT_CHAR_ENCODING = "utf-8"
+# Max amount of keys that S3 accepts in a single DeleteObjects request
+DELETE_OBJECTS_CHUNK_SIZE = 1000
+# Content type for the note content
+CONTENT_TYPE = f"text/markdown; charset={CONTENT_CHAR_ENCODING}"
+# Content type for binary objects
+BINARY_CONTENT_TYPE = "application/octet-stream"
+
+@instrumented
 class S3BucketAdapter(ObjectStore):
     """
         Adapter implementation for the S3 object store.
     """
     bucket_name: str
     s3_resource: Any
+    codec: Codec
 
-    def __init__(self, s3_resource: Any, bucket_name: str) -> None:
+    def __init__(self, s3_resource: Any, bucket_name: str, codec: Codec = None) -> None:
+        """
+        Args:
+            s3_resource: the boto3 S3 resource
+            bucket_name: the bucket where objects are stored
+            codec: the codec used to compress new objects (no compression by default). Objects are
+                read according to their 'Content-Encoding', so this can be changed at any time.
+        """
         self.s3_resource = s3_resource
         self.bucket_name = bucket_name
+        self.codec = codec or IdentityCodec()
 
     def store(self, object_key: str, content: str) -> None:
         object = self.s3_resource.Object(self.bucket_name, object_key)
 
-        result = object.put(Body=content)
+        put_args = {
+            "Body": self.codec.compress(content.encode(CONTENT_CHAR_ENCODING)),
+            "ContentType": CONTENT_TYPE
+        }
+        if not self._is_identity(self.codec):
+            put_args["ContentEncoding"] = self.codec.name
+
+        result = object.put(**put_args)
 
         res = result.get('ResponseMetadata')
         if not res.get('HTTPStatusCode') == 200:
             raise ContentUploadException(f"Upload to bucket {self.bucket_name} failed for key {object_key}!")
 
+    def store_bytes(self, object_key: str, content: bytes) -> None:
+        object = self.s3_resource.Object(self.bucket_name, object_key)
+
+        result = object.put(Body=content, ContentType=BINARY_CONTENT_TYPE)
+
+        res = result.get('ResponseMetadata')
+        if not res.get('HTTPStatusCode') == 200:
+            raise ContentUploadException(f"Upload to bucket {self.bucket_name} failed for key {object_key}!")
+
+    def load_bytes(self, object_key: str) -> bytes:
+        object = self.s3_resource.Object(self.bucket_name, object_key)
+
+        return b"".join(self._iter_content_bytes(object.get(), DEFAULT_CHUNK_SIZE))
+
     def load(self, object_key: str) -> str:
+        # Decoding chunk by chunk avoids holding both the raw bytes and the decoded text of the whole object
+        return "".join(self.iter_chunks(object_key))
+
+    def iter_chunks(self, object_key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+        object = self.s3_resource.Object(self.bucket_name, object_key)
+
+        # Multi-byte characters may be split across chunks: the incremental decoder keeps the partial ones
+        decoder = codecs.getincrementaldecoder(CONTENT_CHAR_ENCODING)()
+        for content_chunk in self._iter_content_bytes(object.get(), chunk_size):
+            text = decoder.decode(content_chunk)
+            if text:
+                yield text
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+    def load_range(self, object_key: str, start: int, end: int) -> bytes:
+        """
+        Ranges refer to the uncompressed content. Objects are read with a ranged GET, which is enough when they
+        are stored uncompressed (whatever the codec of new objects); compressed objects are decompressed as a
+        stream up to the end of the range, keeping only the requested bytes.
+        """
         object = self.s3_resource.Object(self.bucket_name, object_key)
-        content = object.get()['Body'].read().decode('utf-8')
 
-        return content
+        try:
+            response = object.get(Range=f"bytes={start}-{end}")
+        except ClientError as e:
+            if not e.response.get("Error", {}).get("Code") == "InvalidRange":
+                raise
+            # The range may still be valid for the uncompressed content of a compressed object
+            object.load()
+            if self._is_identity(get_codec(object.content_encoding)):
+                return b""
+            return self._slice_content(object.get(), start, end)
+
+        if self._is_identity(get_codec(response.get("ContentEncoding"))):
+            return response['Body'].read()
+        # The object was compressed when stored: the ranged content is useless
+        response['Body'].close()
+
+        return self._slice_content(object.get(), start, end)
+
+    def _slice_content(self, response: Any, start: int, end: int) -> bytes:
+        content_range = bytearray()
+        offset = 0
+        for content_chunk in self._iter_content_bytes(response, DEFAULT_CHUNK_SIZE):
+            chunk_end = offset + len(content_chunk)
+            if chunk_end > start:
+                content_range += content_chunk[max(start - offset, 0):end - offset + 1]
+            offset = chunk_end
+            if offset > end:
+                break
+
+        return bytes(content_range)
+
+    def _iter_content_bytes(self, response: Any, chunk_size: int) -> Iterator[bytes]:
+        """Stream the (uncompressed) content of a GetObject response"""
+        decompressor = get_codec(response.get("ContentEncoding")).decompressor()
+        body = response['Body']
+        try:
+            for raw_chunk in body.iter_chunks(chunk_size):
+                content_chunk = decompressor.decompress(raw_chunk)
+                if content_chunk:
+                    yield content_chunk
+            content_chunk = decompressor.flush()
+            if content_chunk:
+                yield content_chunk
+        finally:
+            body.close()
+
+    def _is_identity(self, codec: Codec) -> bool:
+        return codec.name == IdentityCodec.name
+
+    def get_etag(self, object_key: str) -> Optional[str]:
+        object = self.s3_resource.Object(self.bucket_name, object_key)
+        try:
+            # HEAD request: the content is not transferred
+            object.load()
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return None
+            raise
+
+        return object.e_tag.strip('"')
+
+    def list_objects(self, prefix: str) -> Iterator[StoredObject]:
+        bucket = self.s3_resource.Bucket(self.bucket_name)
+        # ListObjectsV2 pages (up to 1000 keys each) are fetched lazily while iterating
+        for object_summary in bucket.objects.filter(Prefix=prefix):
+            yield StoredObject(object_summary.key, object_summary.last_modified)
 
     def delete(self, object_key: str) -> None:
         object = self.s3_resource.Object(self.bucket_name, object_key)
@@ -33,3 +164,20 @@ class S3BucketAdapter(ObjectStore):
         # or it was not present!
         object.delete()
 
+    def delete_all(self, object_keys: List[str]) -> List[str]:
+        bucket = self.s3_resource.Bucket(self.bucket_name)
+        failed_object_keys = []
+
+        for start in range(0, len(object_keys), DELETE_OBJECTS_CHUNK_SIZE):
+            chunk = object_keys[start:start + DELETE_OBJECTS_CHUNK_SIZE]
+            # Quiet mode: only the keys that could not be deleted are returned
+            result = bucket.delete_objects(Delete={
+                "Objects": [{"Key": object_key} for object_key in chunk],
+                "Quiet": True
+            })
+            for error in result.get("Errors", []):
+                logging.error("Delete from bucket %s failed for key %s: %s", self.bucket_name, error.get("Key"), error.get("Message"))
+                failed_object_keys.append(error.get("Key"))
+
+        return failed_object_keys
+
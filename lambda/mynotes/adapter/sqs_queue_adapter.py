@@ -0,0 +1,28 @@
+from typing import Any
+
+from botocore.exceptions import ClientError
+from mynotes.core.architecture import instrumented
+from mynotes.core.ingestion import NoteCreationMessage, NoteQueue, NoteQueueException, encode_note_creation_message
+
+@instrumented
+class SQSNoteQueue(NoteQueue):
+    """
+        Adapter implementation for a note queue on SQS.
+    """
+    sqs_client: Any
+    queue_url: str
+
+    def __init__(self, sqs_client: Any, queue_url: str) -> None:
+        """
+        Args:
+            sqs_client: the boto3 SQS client
+            queue_url: the URL of the queue
+        """
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+
+    def send(self, message: NoteCreationMessage) -> None:
+        try:
+            self.sqs_client.send_message(QueueUrl=self.queue_url, MessageBody=encode_note_creation_message(message))
+        except ClientError as e:
+            raise NoteQueueException(f"Queueing note {message.id} to {self.queue_url} failed: {e}")
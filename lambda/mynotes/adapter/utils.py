@@ -1,11 +1,43 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 
 import json
 import base64
+import logging
+import hashlib
+import hmac
+import re
+import struct
+from datetime import datetime, timedelta, timezone
+
+from mynotes.adapter.config import NOTES_LEGACY_CURSORS_ENABLED, get_cursor_signing_key
+from mynotes.core.architecture import ValidationException
 
 # The character encoding that we use during Base64 encoding/deconding operations
 INTERNAL_CHAR_ENCODING = "utf-8"
 
+# Continuation tokens: a version byte, the packed key values and a truncated HMAC-SHA256 of both,
+# encoded as unpadded URL-safe Base64. Legacy tokens (Base64 JSON) always start with this prefix
+CURSOR_VERSION = 1
+CURSOR_SIGNATURE_SIZE = 16
+LEGACY_CURSOR_PREFIX = "ey"
+
+# Attribute names are packed as a single byte (index in this list): append new names, never reorder
+CURSOR_ATTRIBUTE_NAMES = ["id", "author_id_and_type", "creation_time", "tag_and_author", "note_id", "after_note_id"]
+# Attribute not in CURSOR_ATTRIBUTE_NAMES: the name follows, as a string
+CURSOR_CUSTOM_ATTRIBUTE = 0xFF
+# Plain string value (not a DynamoDB attribute value such as {"S": "..."})
+CURSOR_PLAIN_VALUE = "_"
+CURSOR_VALUE_TYPES = [CURSOR_PLAIN_VALUE, "S", "N"]
+# String value holding a pynamodb UTCDateTimeAttribute, packed as microseconds since the epoch (8 bytes instead of 31)
+CURSOR_DATETIME_VALUE = 0x80
+CURSOR_DATETIME_PATTERN = re.compile(r"(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})\.(\d{6})\+0000\Z")
+CURSOR_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+class InvalidContinuationTokenException(ValidationException):
+    """The continuation token is malformed, was not issued by this service or was tampered with"""
+    def __init__(self) -> None:
+        super().__init__("continuation_token", "Invalid continuation token")
+
 def encode_dict_to_base64(dictionary: Dict[str,Any]) -> str:
     """
     Encode a dictionary into a Base64 string. This method is designed to work as a companio 
@@ -22,19 +54,143 @@ def encode_dict_to_base64(dictionary: Dict[str,Any]) -> str:
 
     return base64.b64encode(json_content_bytes).decode(INTERNAL_CHAR_ENCODING)
 
-def decode_str_as_dict(base64_str: str) -> Dict[str,Any]:
+def decode_str_as_dict(base64_str: str, signing_key: bytes = None) -> Dict[str,Any]:
     """
-    Decode a Base64 encoded dictionary. This method is designed to work as a companio 
-    to 'encode_dict_to_base64' in this same module
+    Decode a continuation token. This method is designed to work as a companion
+    to 'encode_continuation_token' in this same module, and also accepts tokens
+    encoded by 'encode_dict_to_base64' if legacy tokens are enabled in the configuration
 
     Args:
         - base64_str the encoded dictionary object
+        - signing_key the HMAC key used to sign the token (the configured one by default)
     
     Returns:
         - the decoded dictionary object or None if the input string was None.
+    Throws:
+        - InvalidContinuationTokenException if the token is malformed or its signature does not match
     """
     if not base64_str:
         return None
-    
-    json_content = base64.b64decode(base64_str).decode(INTERNAL_CHAR_ENCODING)
-    return json.loads(json_content)
+
+    if not base64_str.startswith(LEGACY_CURSOR_PREFIX):
+        return _decode_continuation_token(base64_str, signing_key or get_cursor_signing_key())
+
+    if not NOTES_LEGACY_CURSORS_ENABLED:
+        raise InvalidContinuationTokenException()
+    try:
+        json_content = base64.b64decode(base64_str).decode(INTERNAL_CHAR_ENCODING)
+        dictionary = json.loads(json_content)
+    except ValueError:
+        raise InvalidContinuationTokenException()
+    logging.warning("Accepted an unsigned legacy continuation token")
+    return dictionary
+
+def encode_continuation_token(dictionary: Dict[str, Any], signing_key: bytes = None) -> str:
+    """
+    Encode a continuation token (a pynamodb 'last_evaluated_key' or a flat dictionary of strings)
+    into a compact, signed, URL-safe string. This method is designed to work as a companion
+    to 'decode_str_as_dict' in this same module
+
+    Args:
+        - dictionary the key values to encode
+        - signing_key the HMAC key (the configured one by default), tokens signed with another key are rejected
+
+    Returns:
+        - the encoded token
+    """
+    payload = bytearray([CURSOR_VERSION, len(dictionary)])
+    for name, value in dictionary.items():
+        if name in CURSOR_ATTRIBUTE_NAMES:
+            payload.append(CURSOR_ATTRIBUTE_NAMES.index(name))
+        else:
+            payload.append(CURSOR_CUSTOM_ATTRIBUTE)
+            _pack_string(name, payload)
+
+        if isinstance(value, dict):
+            (value_type, value), = value.items()
+        else:
+            value_type = CURSOR_PLAIN_VALUE
+        timestamp = _parse_datetime(value) if value_type == "S" else None
+        if timestamp is not None:
+            payload.append(CURSOR_DATETIME_VALUE)
+            payload += struct.pack(">q", timestamp)
+        else:
+            payload.append(CURSOR_VALUE_TYPES.index(value_type))
+            _pack_string(value, payload)
+
+    token = bytes(payload) + _sign(bytes(payload), signing_key or get_cursor_signing_key())
+    return base64.urlsafe_b64encode(token).rstrip(b"=").decode(INTERNAL_CHAR_ENCODING)
+
+def _sign(payload: bytes, signing_key: bytes) -> bytes:
+    return hmac.new(signing_key, payload, hashlib.sha256).digest()[:CURSOR_SIGNATURE_SIZE]
+
+def _parse_datetime(value: str) -> Optional[int]:
+    """Microseconds since the epoch of a UTC date time in the pynamodb format, None for any other string"""
+    match = CURSOR_DATETIME_PATTERN.match(value)
+    if not match:
+        return None
+    try:
+        parsed_datetime = datetime(*map(int, match.groups()), tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return (parsed_datetime - CURSOR_EPOCH) // timedelta(microseconds=1)
+
+def _format_datetime(timestamp: int) -> str:
+    value = CURSOR_EPOCH + timedelta(microseconds=timestamp)
+    return f"{value.year:04}-{value.month:02}-{value.day:02}T{value.hour:02}:{value.minute:02}:{value.second:02}.{value.microsecond:06}+0000"
+
+def _pack_string(value: str, buffer: bytearray) -> None:
+    """Append a string as its UTF-8 length (varint) and bytes"""
+    data = value.encode(INTERNAL_CHAR_ENCODING)
+    length = len(data)
+    while length >= 0x80:
+        buffer.append((length & 0x7F) | 0x80)
+        length >>= 7
+    buffer.append(length)
+    buffer += data
+
+def _unpack_string(data: bytes, position: int) -> Tuple[str, int]:
+    """Returns the string at 'position' and the position after it"""
+    length = 0
+    shift = 0
+    while data[position] & 0x80:
+        length |= (data[position] & 0x7F) << shift
+        shift += 7
+        position += 1
+    length |= data[position] << shift
+    position += 1
+    if position + length > len(data):
+        raise IndexError(position + length)
+    return data[position:position + length].decode(INTERNAL_CHAR_ENCODING), position + length
+
+def _decode_continuation_token(token: str, signing_key: bytes) -> Dict[str, Any]:
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except ValueError:
+        raise InvalidContinuationTokenException()
+
+    payload, signature = data[:-CURSOR_SIGNATURE_SIZE], data[-CURSOR_SIGNATURE_SIZE:]
+    if len(payload) < 2 or payload[0] != CURSOR_VERSION or not hmac.compare_digest(signature, _sign(payload, signing_key)):
+        raise InvalidContinuationTokenException()
+
+    # The payload is signed: it was packed by 'encode_continuation_token'
+    dictionary = {}
+    position = 2
+    for _ in range(payload[1]):
+        name_code = payload[position]
+        position += 1
+        if name_code == CURSOR_CUSTOM_ATTRIBUTE:
+            name, position = _unpack_string(payload, position)
+        else:
+            name = CURSOR_ATTRIBUTE_NAMES[name_code]
+
+        if payload[position] == CURSOR_DATETIME_VALUE:
+            timestamp, = struct.unpack_from(">q", payload, position + 1)
+            dictionary[name] = {"S": _format_datetime(timestamp)}
+            position += 9
+            continue
+
+        value_type = CURSOR_VALUE_TYPES[payload[position]]
+        value, position = _unpack_string(payload, position + 1)
+        dictionary[name] = value if value_type == CURSOR_PLAIN_VALUE else {value_type: value}
+    return dictionary
@@ -1,11 +1,15 @@
+from collections import defaultdict
 from dataclasses import dataclass
 import logging
 import functools
+import inspect
+import threading
+import time
 
 from abc import ABC, abstractmethod
 
 from datetime import datetime
-from typing import Any, Generic, List, TypeVar
+from typing import Any, Dict, Generic, Iterator, List, Optional, TypeVar
 
 import uuid
 
@@ -29,6 +33,11 @@ class ResourceNotFoundException(RepositoryException):
         self.resource_type = resource_type
         self.resource_id = resource_id
 
+class FeatureNotEnabledException(ApplicationException):
+    """The requested feature is disabled in the configuration"""
+    def __init__(self, feature: str) -> None:
+        self.feature = feature
+
 class User:
     """A user within the system"""
     def __init__(self, user_id: str) -> None:
@@ -47,6 +56,11 @@ class DataPageQuery:
     """
     page_size: int = 10
     continuation_token: str = None
+    # Optional bounds (both included) on the creation time of the returned items
+    since: datetime = None
+    until: datetime = None
+    # Return the most recent items first
+    newest_first: bool = False
 
 # Generic data type per items in a data page
 T = TypeVar("T")
@@ -82,17 +96,136 @@ def wrap_exceptions(function):
     """
     @functools.wraps(function)
     def wrap(*args, **kwargs):
-        logging.debug(f"Before {function.__name__}()")
+        # Messages are formatted only if they are actually logged
+        logging.debug("Before %s()", function.__name__)
         try:
             return function(*args, **kwargs)
         except Exception as e:
-            logging.error(f"Whops, when running {function.__name__}():\n{e}")
+            logging.error("Whops, when running %s():\n%s", function.__name__, e)
             raise ApplicationException(e)
         finally:
-            logging.debug(f"After {function.__name__}()")
+            logging.debug("After %s()", function.__name__)
 
     return wrap
 
+class MetricsSink(ABC):
+    """Destination of the durations recorded during an invocation"""
+    @abstractmethod
+    def emit(self, timings: Dict[str, List[float]], dimensions: Dict[str, str]) -> None:
+        """
+        Args:
+            timings: the durations (in milliseconds) of every call, by operation name
+            dimensions: what the timings refer to (e.g. the handler)
+        """
+        pass
+
+class Instrumentation:
+    """
+    Collects the durations of the instrumented calls of the current invocation, for all threads.
+    While disabled, instrumented calls only check the 'enabled' flag.
+    """
+    def __init__(self) -> None:
+        self.enabled = False
+        self.sink: Optional[MetricsSink] = None
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def enable(self, sink: MetricsSink) -> None:
+        self.sink = sink
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        self.sink = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop the timings recorded so far"""
+        with self.lock:
+            self.timings = defaultdict(list)
+
+    def record(self, name: str, duration_ms: float) -> None:
+        with self.lock:
+            self.timings[name].append(duration_ms)
+
+    def flush(self, dimensions: Dict[str, str] = None) -> None:
+        """Send the timings recorded so far to the sink (if any) and start over"""
+        with self.lock:
+            timings, self.timings = self.timings, defaultdict(list)
+        if timings and self.sink:
+            self.sink.emit(dict(timings), dimensions or {})
+
+instrumentation = Instrumentation()
+
+class timed:
+    """
+    Record the duration of a block ('with timed("name"):') or of every call of a function ('@timed("name")').
+    """
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.start = None
+
+    def __enter__(self) -> "timed":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if instrumentation.enabled:
+            instrumentation.record(self.name, 1000 * (time.perf_counter() - self.start))
+
+    def __call__(self, function):
+        name = self.name
+
+        if inspect.iscoroutinefunction(function):
+            # The time spent awaiting the coroutine, not only creating it
+            @functools.wraps(function)
+            async def timed_coroutine_function(*args, **kwargs):
+                if not instrumentation.enabled:
+                    return await function(*args, **kwargs)
+
+                start = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    instrumentation.record(name, 1000 * (time.perf_counter() - start))
+
+            return timed_coroutine_function
+
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            if not instrumentation.enabled:
+                return function(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                instrumentation.record(name, 1000 * (time.perf_counter() - start))
+
+        return timed_function
+
+def instrumented(cls):
+    """
+    Time every public method of a class, as '<class name>.<method name>' (coroutine methods until they complete).
+    Generator methods are left alone: their calls return immediately, the actual work happens while the results are consumed.
+    """
+    for name, member in list(vars(cls).items()):
+        if (not name.startswith("_") and inspect.isfunction(member)
+                and not inspect.isgeneratorfunction(member) and not inspect.isasyncgenfunction(member)):
+            setattr(cls, name, timed(f"{cls.__name__}.{name}")(member))
+    return cls
+
+@dataclass
+class StoredObject:
+    """
+    Summary of an object in an object store.
+    """
+    key: str
+    last_modified: datetime
+
+# Default size (in bytes) of the chunks read when streaming objects
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
 class ObjectStore:
     """
     Generic abstraction of an object store.
@@ -105,10 +238,105 @@ class ObjectStore:
     def load(self, object_key: str) -> str:
         pass
 
+    @abstractmethod
+    def store_bytes(self, object_key: str, content: bytes) -> None:
+        """
+        Store binary content as is.
+        """
+        pass
+
+    @abstractmethod
+    def load_bytes(self, object_key: str) -> bytes:
+        """
+        Returns the content of an object as bytes (as stored by 'store_bytes').
+        """
+        pass
+
+    @abstractmethod
+    def iter_chunks(self, object_key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+        """
+        Stream the content of an object as text, reading at most 'chunk_size' bytes at a time.
+        """
+        pass
+
+    @abstractmethod
+    def load_range(self, object_key: str, start: int, end: int) -> bytes:
+        """
+        Returns the raw bytes of an object from 'start' to 'end' (both included, like HTTP Range requests):
+        the returned range is shorter if the object ends before 'end' and empty if it ends before 'start'.
+        """
+        pass
+
+    @abstractmethod
+    def get_etag(self, object_key: str) -> Optional[str]:
+        """
+        Returns an opaque tag that changes whenever the object content changes (without reading the content),
+        or None if there is no such object.
+        """
+        pass
+
+    @abstractmethod
+    def list_objects(self, prefix: str) -> Iterator[StoredObject]:
+        """
+        Iterate over all the objects whose key starts with 'prefix', fetching them a page at a time.
+        """
+        pass
+
     @abstractmethod
     def delete(self, object_key: str) -> None:
         pass
 
+    @abstractmethod
+    def delete_all(self, object_keys: List[str]) -> List[str]:
+        """
+        Delete several objects at once (missing objects are fine).
+
+        Returns:
+            the keys of the objects that could not be deleted
+        """
+        pass
+
+class AsyncObjectStore(ABC):
+    """
+    Asynchronous counterpart of ObjectStore, for the calls that are awaited concurrently (e.g. with asyncio.gather).
+    Objects are the same: what is stored by one store can be read by the other.
+    """
+    @abstractmethod
+    async def store(self, object_key: str, content: str) -> None:
+        pass
+
+    @abstractmethod
+    async def load(self, object_key: str) -> str:
+        pass
+
+    @abstractmethod
+    async def load_range(self, object_key: str, start: int, end: int) -> bytes:
+        """
+        Returns the raw bytes of an object from 'start' to 'end' (both included), like ObjectStore.load_range().
+        """
+        pass
+
+    @abstractmethod
+    async def get_etag(self, object_key: str) -> Optional[str]:
+        """
+        Returns an opaque tag that changes whenever the object content changes, or None if there is no such object.
+        """
+        pass
+
+    @abstractmethod
+    async def delete(self, object_key: str) -> None:
+        pass
+
+    @abstractmethod
+    async def delete_all(self, object_keys: List[str]) -> List[str]:
+        """
+        Delete several objects at once (missing objects are fine).
+
+        Returns:
+            the keys of the objects that could not be deleted
+        """
+        pass
+
 class ContentUploadException(ApplicationException):
     """
     Exception thrown by ObjectStore instances if issues are found when saving content
@@ -0,0 +1,289 @@
+import asyncio
+import functools
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Optional
+
+from mynotes.core.architecture import AsyncObjectStore, ResourceNotFoundException, T, User, instrumented, wrap_exceptions
+from mynotes.core.notes import (ContentReference, ContentReferenceRepository, Note, NoteLookupResult, get_content_hash, get_content_object_key,
+                                get_object_key_for_note, new_note)
+from mynotes.core.search.index import SearchIndex
+
+
+@dataclass
+class NoteContentLookup:
+    """A note with the tag of its content and, if it was asked for, the content itself"""
+    note: Note
+    content_etag: str
+    content: Optional[str] = None
+
+class AsyncNoteRepository(ABC):
+    """
+    Asynchronous counterpart of NoteRepository, for the operations that the async use cases need.
+    """
+    @abstractmethod
+    async def save(self, note: Note) -> None:
+        pass
+
+    @abstractmethod
+    async def find_by_id(self, id: str) -> Optional[Note]:
+        pass
+
+    @abstractmethod
+    async def find_by_ids(self, ids: List[str]) -> List[Note]:
+        """
+        Returns the notes matching the given ids: ids without a matching note are skipped.
+        """
+        pass
+
+    @abstractmethod
+    async def delete_by_id(self, id: str) -> Optional[Note]:
+        """
+        Delete a note, if present.
+
+        Returns:
+            the deleted note, as it was stored, or None if there was no such note
+        """
+        pass
+
+@wrap_exceptions
+@instrumented
+class AsyncNoteUseCases:
+    """
+        Use cases supported for Notes, with independent calls to the object store and the repository
+        awaited concurrently. The search index and the content reference counts are synchronous: they are
+        called on the default executor.
+    """
+    bucket_adapter: AsyncObjectStore
+    note_repository: AsyncNoteRepository
+    search_index: Optional[SearchIndex]
+    content_references: Optional[ContentReferenceRepository]
+
+    def __init__(self, bucket_adapter: AsyncObjectStore, note_repository: AsyncNoteRepository, search_index: SearchIndex = None,
+                 content_references: ContentReferenceRepository = None) -> None:
+        self.bucket_adapter = bucket_adapter
+        self.note_repository = note_repository
+        # Full-text search is disabled without an index
+        self.search_index = search_index
+        # Content-addressed content for new notes (see NoteUseCases)
+        self.content_references = content_references
+
+    async def create_note(self, author: User, content: str, tags: List[str] = None) -> Note:
+        """
+        Create a new note, based on Markdown standard.
+
+        Args:
+            author: the identified for the user who is creating this note
+            content: the content of the note
+        Returns:
+            the Note instance representing the created note
+        """
+        note = new_note(author, tags)
+        # The content hash is part of the metadata: the reference is added before they are saved
+        content_reference = await self._add_content_reference(content.strip(), note) if self.content_references else None
+        object_key = get_content_object_key(note)
+
+        # Content upload and metadata save run concurrently: if either fails, the other one is undone
+        upload_error, save_error = [_get_error(result) for result in await asyncio.gather(
+            self._store_content(object_key, content.strip(), content_reference),
+            self.note_repository.save(note),
+            return_exceptions=True
+        )]
+
+        if upload_error and not save_error:
+            logging.error("Content upload failed for note %s, removing its metadata: %s", note.id, upload_error)
+            if await self._compensate(self.note_repository.delete_by_id, note.id) and content_reference:
+                await self._compensate(self._delete_content, note)
+        elif save_error and not upload_error:
+            logging.error("Metadata save failed for note %s, removing its content: %s", note.id, save_error)
+            await self._compensate(self._delete_content, note)
+        elif save_error and content_reference:
+            # Nothing was written but the reference
+            await self._compensate(self._delete_content, note)
+
+        if save_error or upload_error:
+            raise save_error or upload_error
+
+        await self._update_search_index("add_notes", {note.id: content})
+
+        return note
+
+    async def find_note_by_id(self, note_id: str) -> Note:
+        """
+        Returns a note by its id.
+
+        Throws:
+            a ResourceNotFoundException if there is not such note
+        """
+        note = await self.note_repository.find_by_id(note_id)
+        if not note:
+            raise ResourceNotFoundException("Note", note_id)
+        return note
+
+    async def find_notes_by_ids(self, note_ids: List[str]) -> NoteLookupResult:
+        """
+        Returns the notes matching the specified ids (see NoteUseCases.find_notes_by_ids()).
+        """
+        unique_ids = list(dict.fromkeys(note_ids))
+
+        notes_by_id = {note.id: note for note in await self.note_repository.find_by_ids(unique_ids)} if unique_ids else {}
+
+        return NoteLookupResult(
+            items = [notes_by_id[note_id] for note_id in unique_ids if note_id in notes_by_id],
+            missing_ids = [note_id for note_id in unique_ids if note_id not in notes_by_id]
+        )
+
+    async def get_note_content_etag(self, note_id: str) -> str:
+        """
+        Returns a tag that changes whenever the content of a note changes, without reading the content.
+
+        Throws:
+            a ResourceNotFoundException if there is no content for such note
+        """
+        if self.content_references:
+            # Content-addressed content is found through the note
+            object_key = get_content_object_key(await self.find_note_by_id(note_id))
+        else:
+            object_key = self._get_object_key_for_note(note_id)
+
+        etag = await self.bucket_adapter.get_etag(object_key)
+        if not etag:
+            raise ResourceNotFoundException("Note", note_id)
+        return etag
+
+    async def find_note_content(self, note_id: str, load_content: bool = True) -> NoteContentLookup:
+        """
+        Returns a note and the tag of its content, plus the content unless 'load_content' is False:
+        metadata, tag and content are read concurrently (content-addressed content once the note is read).
+
+        Throws:
+            a ResourceNotFoundException if there is not such note or no content for it
+        """
+        note = await self.find_note_by_id(note_id) if self.content_references else None
+        object_key = get_content_object_key(note) if note else self._get_object_key_for_note(note_id)
+
+        reads = [self.bucket_adapter.get_etag(object_key)]
+        if load_content:
+            reads.append(self.bucket_adapter.load(object_key))
+        if not note:
+            reads.insert(0, self.find_note_by_id(note_id))
+
+        results = await asyncio.gather(*reads, return_exceptions=True)
+        if not note:
+            note = _raise_if_error(results.pop(0))
+        content_etag = _raise_if_error(results[0])
+        if not content_etag:
+            raise ResourceNotFoundException("Note", note_id)
+
+        return NoteContentLookup(note, content_etag, _raise_if_error(results[1]) if load_content else None)
+
+    async def load_note_content(self, note_id: str) -> str:
+        """
+        Returns the Markdown content of a note: the content is read while the note metadata are checked.
+
+        Throws:
+            a ResourceNotFoundException if there is not such note
+        """
+        return await self._load_with_note_check(note_id, self.bucket_adapter.load)
+
+    async def load_note_content_range(self, note_id: str, start: int, end: int) -> bytes:
+        """
+        Returns a byte range of the content of a note (see NoteUseCases.load_note_content_range()).
+
+        Throws:
+            a ResourceNotFoundException if there is not such note
+        """
+        return await self._load_with_note_check(note_id, lambda object_key: self.bucket_adapter.load_range(object_key, start, end))
+
+    async def delete_note_by_id(self, note_id: str) -> None:
+        """
+        Deletes a note with the specified id, if present: metadata and content are deleted concurrently
+        (deleting the content of a note that does not exist is harmless), unless the content may be content-addressed.
+        """
+        if self.content_references:
+            # Content-addressed content is found through the deleted note
+            note = await self.note_repository.delete_by_id(note_id)
+            if note:
+                await self._delete_content(note)
+        else:
+            note, _ = await asyncio.gather(
+                self.note_repository.delete_by_id(note_id),
+                self.bucket_adapter.delete(self._get_object_key_for_note(note_id))
+            )
+
+        if note:
+            await self._update_search_index("remove_notes", [note_id])
+
+    async def _load_with_note_check(self, note_id: str, load: Callable[[str], Awaitable[T]]) -> T:
+        """
+        Await a content read (by object key) together with the note lookup: a missing note wins over a missing object.
+        Content-addressed content is found through the note: it is read once the note is.
+        """
+        if self.content_references:
+            return await load(get_content_object_key(await self.find_note_by_id(note_id)))
+
+        note_result, content_result = await asyncio.gather(self.find_note_by_id(note_id), load(self._get_object_key_for_note(note_id)), return_exceptions=True)
+        _raise_if_error(note_result)
+        return _raise_if_error(content_result)
+
+    async def _update_search_index(self, update_name: str, *args) -> None:
+        """Notes are created or deleted even if the search index can't be updated (see NoteUseCases)"""
+        if not self.search_index:
+            return
+        try:
+            await _run_in_executor(getattr(self.search_index, update_name), *args)
+        except Exception as e:
+            logging.error("Search index update %s() failed: %s", update_name, e)
+
+    async def _compensate(self, undo_function, *args) -> bool:
+        """Best-effort undo of a partial write: what cannot be undone is left to the orphan content sweeper"""
+        try:
+            await undo_function(*args)
+            return True
+        except Exception as e:
+            logging.error("Compensation %s() failed: %s", undo_function.__name__, e)
+            return False
+
+    async def _add_content_reference(self, content: str, note: Note) -> ContentReference:
+        content_reference = await _run_in_executor(self.content_references.acquire, get_content_hash(content))
+        note.content_hash = content_reference.content_hash
+        note.content_generation = content_reference.generation
+        return content_reference
+
+    async def _store_content(self, object_key: str, content: str, content_reference: ContentReference = None) -> None:
+        """Content-addressed content is uploaded only if it is not stored yet, as found with a HEAD request"""
+        if content_reference and not content_reference.created and await self.bucket_adapter.get_etag(object_key):
+            return
+        await self.bucket_adapter.store(object_key, content)
+
+    async def _delete_content(self, note: Note) -> None:
+        """Delete the content of a note that is gone (or was never saved), or release its reference (see NoteUseCases)"""
+        if not note.content_hash:
+            await self.bucket_adapter.delete(self._get_object_key_for_note(note.id))
+            return
+
+        try:
+            unreferenced = await _run_in_executor(self.content_references.release, note.content_hash, note.content_generation)
+        except Exception as e:
+            # The content is kept: a leaked reference only wastes storage
+            logging.error("Release of the reference to content %s failed: %s", note.content_hash, e)
+            return
+        if unreferenced:
+            await self.bucket_adapter.delete(get_content_object_key(note))
+
+    def _get_object_key_for_note(self, note_id: str) -> str:
+        return get_object_key_for_note(note_id)
+
+async def _run_in_executor(function: Callable[..., T], *args: Any) -> T:
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(function, *args))
+
+def _get_error(result: Any) -> Optional[BaseException]:
+    """Results of 'asyncio.gather(..., return_exceptions=True)' are either values or exceptions"""
+    return result if isinstance(result, BaseException) else None
+
+def _raise_if_error(result: T) -> T:
+    error = _get_error(result)
+    if error:
+        raise error
+    return result
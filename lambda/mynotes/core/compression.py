@@ -0,0 +1,132 @@
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+from mynotes.core.architecture import ApplicationException
+
+class UnsupportedCodecException(ApplicationException):
+    """The content was encoded with a codec that is not available in this environment"""
+    def __init__(self, codec_name: str) -> None:
+        super().__init__(f"Unsupported codec: {codec_name}")
+        self.codec_name = codec_name
+
+class Decompressor(ABC):
+    """Incremental decompressor, fed one chunk at a time"""
+    @abstractmethod
+    def decompress(self, chunk: bytes) -> bytes:
+        pass
+
+    @abstractmethod
+    def flush(self) -> bytes:
+        pass
+
+class Codec(ABC):
+    """
+    Compression algorithm for object content. The name is used as HTTP 'Content-Encoding' value.
+    """
+    name: str
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+    @abstractmethod
+    def decompressor(self) -> Decompressor:
+        pass
+
+    def decompress(self, data: bytes) -> bytes:
+        decompressor = self.decompressor()
+        return decompressor.decompress(data) + decompressor.flush()
+
+class _IdentityDecompressor(Decompressor):
+    def decompress(self, chunk: bytes) -> bytes:
+        return chunk
+
+    def flush(self) -> bytes:
+        return b""
+
+class IdentityCodec(Codec):
+    """No compression at all: this is also how content stored before compression was introduced is read"""
+    name = "identity"
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompressor(self) -> Decompressor:
+        return _IdentityDecompressor()
+
+class _ZlibDecompressor(Decompressor):
+    def __init__(self, wbits: int) -> None:
+        self._decompressobj = zlib.decompressobj(wbits)
+
+    def decompress(self, chunk: bytes) -> bytes:
+        return self._decompressobj.decompress(chunk)
+
+    def flush(self) -> bytes:
+        return self._decompressobj.flush()
+
+class GzipCodec(Codec):
+    """gzip compression (zlib with gzip header), available everywhere"""
+    name = "gzip"
+
+    def __init__(self, level: int = 6) -> None:
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        compressobj = zlib.compressobj(self.level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+        return compressobj.compress(data) + compressobj.flush()
+
+    def decompressor(self) -> Decompressor:
+        return _ZlibDecompressor(zlib.MAX_WBITS | 16)
+
+class _ZstdDecompressor(Decompressor):
+    def __init__(self) -> None:
+        self._decompressobj = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, chunk: bytes) -> bytes:
+        return self._decompressobj.decompress(chunk)
+
+    def flush(self) -> bytes:
+        return b""
+
+class ZstdCodec(Codec):
+    """Zstandard compression: only available if the 'zstandard' package is installed"""
+    name = "zstd"
+
+    def __init__(self, level: int = 3) -> None:
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def decompressor(self) -> Decompressor:
+        return _ZstdDecompressor()
+
+def _available_codecs() -> Dict[str, Codec]:
+    codecs = [IdentityCodec(), GzipCodec()]
+    if zstandard:
+        codecs.append(ZstdCodec())
+    return {codec.name: codec for codec in codecs}
+
+CODECS = _available_codecs()
+
+def get_codec(name: Optional[str]) -> Codec:
+    """
+    Returns the codec for a 'Content-Encoding' value: no value means no compression.
+
+    Throws:
+        UnsupportedCodecException if the codec is not available
+    """
+    codec = CODECS.get(name or IdentityCodec.name)
+    if not codec:
+        raise UnsupportedCodecException(name)
+    return codec
+
+def available_codec_names() -> List[str]:
+    """Returns the names of the codecs available in this environment"""
+    return list(CODECS.keys())
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from mynotes.core.architecture import ApplicationException, ValidationException
+
+# Time between two checks of a request in progress, while waiting for its response
+DEFAULT_IDEMPOTENCY_POLL_INTERVAL_SECONDS = 0.1
+
+class IdempotencyStatus(Enum):
+    IN_PROGRESS = "IN_PROGRESS"
+    COMPLETED = "COMPLETED"
+
+@dataclass
+class IdempotencyRecord:
+    """
+    A request recorded under an idempotency key: the fingerprint of its payload and, once completed, its response.
+    """
+    key: str
+    fingerprint: str
+    status: IdempotencyStatus
+    response: Optional[Dict[str, Any]] = None
+
+class IdempotencyConflictException(ApplicationException):
+    """A request with the same idempotency key is still in progress"""
+    def __init__(self, key: str) -> None:
+        self.key = key
+
+class IdempotencyStore(ABC):
+    """
+    Records the requests made with an idempotency key, until they expire.
+    """
+    @abstractmethod
+    def start(self, key: str, fingerprint: str) -> Optional[IdempotencyRecord]:
+        """
+        Records the key as in progress, atomically, unless it is already recorded. Records that expired, including
+        the ones of requests that never completed, are replaced.
+
+        Args:
+            key: the idempotency key
+            fingerprint: the fingerprint of the request payload
+        Returns:
+            None if the key was recorded for the caller, the existing record otherwise
+        """
+        pass
+
+    @abstractmethod
+    def complete(self, key: str, response: Dict[str, Any]) -> None:
+        """Records the response of the request in progress with the given key"""
+        pass
+
+    @abstractmethod
+    def cancel(self, key: str) -> None:
+        """Forgets the request in progress with the given key (it failed), so that it can be retried"""
+        pass
+
+def get_request_fingerprint(payload: Any) -> str:
+    """Returns the SHA-256 hex digest of a JSON-serializable request payload (independent of the order of its keys)"""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def run_idempotently(store: IdempotencyStore, key: str, fingerprint: str, operation: Callable[[], Dict[str, Any]], wait_seconds: float = 0,
+                     poll_interval_seconds: float = DEFAULT_IDEMPOTENCY_POLL_INTERVAL_SECONDS) -> Tuple[Dict[str, Any], bool]:
+    """
+    Runs the operation once per idempotency key: later requests with the same key get the recorded response.
+
+    Args:
+        store: the store of the idempotency records
+        key: the idempotency key
+        fingerprint: the fingerprint of the request payload, which must be the same for all the requests with the key
+        operation: the operation, returning a JSON-serializable response (it is not recorded if it raises an exception)
+        wait_seconds: how long to wait for a request with the same key that is still in progress
+        poll_interval_seconds: how often the request in progress is checked meanwhile
+    Returns:
+        the response and whether it was recorded by a previous request
+    Throws:
+        ValidationException if the key was used with a different payload
+        IdempotencyConflictException if the request with the same key is still in progress after waiting
+    """
+    deadline = time.monotonic() + wait_seconds
+    while True:
+        record = store.start(key, fingerprint)
+        if not record:
+            break
+        if record.fingerprint != fingerprint:
+            raise ValidationException("idempotency_key", "The key was already used with a different request")
+        if record.status == IdempotencyStatus.COMPLETED:
+            return record.response, True
+        if time.monotonic() >= deadline:
+            raise IdempotencyConflictException(key)
+        time.sleep(poll_interval_seconds)
+
+    try:
+        response = operation()
+    except Exception:
+        try:
+            store.cancel(key)
+        except Exception:
+            # The key stays in progress until its record expires: retries are rejected meanwhile
+            logging.exception("Failed to cancel request with idempotency key %s", key)
+        raise
+
+    try:
+        store.complete(key, response)
+    except Exception:
+        # The operation succeeded: its response is returned anyway, but retries are rejected until the record in
+        # progress expires, then run the operation again
+        logging.exception("Failed to record the response of the request with idempotency key %s", key)
+
+    return response, False
@@ -0,0 +1,163 @@
+import json
+import logging
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from mynotes.core.architecture import ApplicationException, User, ValidationException, instrumented
+from mynotes.core.notes import Note, NoteCreationRequest, NoteUseCases, new_note
+
+# Max size (in bytes) of a queued message, as encoded: SQS message bodies are at most 256 KiB
+DEFAULT_MAX_MESSAGE_SIZE = 256 * 1024
+
+@dataclass
+class NoteCreationMessage:
+    """A note accepted for creation, with its id and creation time, until a consumer creates it"""
+    id: str
+    author_id: str
+    creation_time: datetime
+    content: str
+    tags: List[str] = None
+
+def encode_note_creation_message(message: NoteCreationMessage) -> str:
+    # Non-ASCII characters are not escaped: an escaped CJK character takes 6 bytes instead of 3
+    return json.dumps({
+        "id": message.id,
+        "author_id": message.author_id,
+        "creation_time": message.creation_time.isoformat(),
+        "content": message.content,
+        "tags": message.tags
+    }, ensure_ascii=False)
+
+def get_note_creation_message_size(message: NoteCreationMessage) -> int:
+    """Returns the size (in bytes) of a message, as sent"""
+    return len(encode_note_creation_message(message).encode("utf-8"))
+
+def decode_note_creation_message(body: str) -> NoteCreationMessage:
+    """
+    Throws:
+        ValueError, KeyError or TypeError if the message is malformed
+    """
+    message = json.loads(body)
+    return NoteCreationMessage(
+        id = message["id"],
+        author_id = message["author_id"],
+        creation_time = datetime.fromisoformat(message["creation_time"]),
+        content = message["content"],
+        tags = message.get("tags")
+    )
+
+class NoteQueueException(ApplicationException):
+    """
+    Exception thrown by NoteQueue instances if messages can't be sent
+    """
+    pass
+
+class NoteQueue(ABC):
+    """Queue of the notes accepted for creation"""
+    @abstractmethod
+    def send(self, message: NoteCreationMessage) -> None:
+        pass
+
+@dataclass
+class IngestionResult:
+    """Outcome of the creation of a batch of queued notes, by message id"""
+    created_ids: List[str] = field(default_factory=list)
+    # Messages to deliver again (e.g. content upload failures)
+    failed_message_ids: List[str] = field(default_factory=list)
+    # Messages that can never be created (malformed or without content), dropped
+    rejected_message_ids: List[str] = field(default_factory=list)
+
+@instrumented
+class NoteIngestion:
+    """
+    Asynchronous creation of notes: requests are validated and queued, then created in batches by a consumer,
+    with the bulk creation of the note use cases (concurrent uploads, batched metadata writes).
+    """
+    def __init__(self, usecase: NoteUseCases, queue: NoteQueue, max_message_size: int = DEFAULT_MAX_MESSAGE_SIZE) -> None:
+        self.usecase = usecase
+        self.queue = queue
+        self.max_message_size = max_message_size
+
+    def submit_note(self, author: User, content: str, tags: List[str] = None) -> Optional[Note]:
+        """
+        Queue the creation of a new note, unless it doesn't fit in a message.
+
+        Args:
+            author: the identified for the user who is creating this note
+            content: the content of the note
+            tags: the tags of the note
+        Returns:
+            the note to be created, with its id, or None if the message would be too large: the note must
+            be created synchronously
+        Throws:
+            a ValidationException if the content is missing
+        """
+        if not content or not content.strip():
+            raise ValidationException("content", "Note content is required")
+
+        note = new_note(author, tags)
+        message = NoteCreationMessage(note.id, note.author_id, note.creation_time, content, note.tags)
+        if get_note_creation_message_size(message) > self.max_message_size:
+            return None
+
+        self.queue.send(message)
+
+        return note
+
+    def ingest(self, message_bodies: Dict[str, str]) -> IngestionResult:
+        """
+        Create the notes of a batch of messages, with one bulk creation per author. Messages are delivered at
+        least once: notes that already exist (created by a previous delivery) are not created again.
+
+        Args:
+            message_bodies: the bodies of the messages, by message id
+        Returns:
+            the created note ids and the messages that failed, to be retried, or were rejected
+        """
+        result = IngestionResult()
+
+        message_ids_by_note_id = defaultdict(list)
+        messages_by_author_id = defaultdict(dict)
+        for message_id, body in message_bodies.items():
+            try:
+                message = decode_note_creation_message(body)
+            except (ValueError, KeyError, TypeError) as e:
+                logging.error("Rejected malformed note creation message %s: %s", message_id, e)
+                result.rejected_message_ids.append(message_id)
+                continue
+            if not isinstance(message.content, str) or not message.content.strip():
+                logging.error("Rejected note creation message %s without content", message_id)
+                result.rejected_message_ids.append(message_id)
+                continue
+
+            # The same message may be delivered twice in a batch: the note is created once
+            message_ids_by_note_id[message.id].append(message_id)
+            messages_by_author_id[message.author_id][message.id] = message
+
+        existing_ids = set(note.id for note in self.usecase.find_notes_by_ids(list(message_ids_by_note_id)).items) if message_ids_by_note_id else set()
+        # Created by a previous delivery
+        result.created_ids.extend(sorted(existing_ids))
+
+        for author_id, messages_by_note_id in messages_by_author_id.items():
+            messages = [message for note_id, message in messages_by_note_id.items() if note_id not in existing_ids]
+            if not messages:
+                continue
+
+            try:
+                creation_results = self.usecase.create_notes(User(author_id), [
+                    NoteCreationRequest(message.content, message.tags, message.id, message.creation_time) for message in messages
+                ])
+            except Exception as e:
+                logging.error("Creation of %s queued notes of %s failed: %s", len(messages), author_id, e)
+                creation_results = [None] * len(messages)
+
+            for message, creation_result in zip(messages, creation_results):
+                if creation_result and creation_result.note:
+                    result.created_ids.append(message.id)
+                else:
+                    result.failed_message_ids.extend(message_ids_by_note_id[message.id])
+
+        return result
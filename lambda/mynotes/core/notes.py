@@ -1,13 +1,17 @@
+import hashlib
 import logging
 import uuid
 from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
-from typing import List
+from typing import Iterator, List, Optional, Union
 
-from mynotes.core.architecture import (DataPage, DataPageQuery, DomainEntity, ObjectStore, ResourceNotFoundException, User,
-                                       wrap_exceptions)
+from mynotes.core.architecture import (DEFAULT_CHUNK_SIZE, DataPage, DataPageQuery, DomainEntity, FeatureNotEnabledException, ObjectStore,
+                                       ResourceNotFoundException, User, ValidationException, instrumented, wrap_exceptions)
+from mynotes.core.search.index import DEFAULT_SEARCH_LIMIT, SearchIndex
 from mynotes.core.utils.common import now
 
 
@@ -24,44 +28,240 @@ class Note(DomainEntity):
     creation_time: datetime
     tags: List[str]
     version: int
+    # Content-addressed content only (see ContentReferenceRepository): None for notes with their own content object
+    content_hash: Optional[str]
+    content_generation: Optional[str]
 
     """Entity class representing metadata associated to a Note entity"""
-    def __init__(self, id: str = None, author_id: str = None, type: NoteType = None, creation_time: datetime = None, tags: List[str] = None, version: int = None) -> None:
+    def __init__(self, id: str = None, author_id: str = None, type: NoteType = None, creation_time: datetime = None, tags: List[str] = None, version: int = None,
+                 content_hash: str = None, content_generation: str = None) -> None:
         super().__init__(id)
         self.author_id = author_id
         self.creation_time = creation_time
         self.type = type or NoteType.FREE
         self.tags = tags
         self.version = version or None
+        self.content_hash = content_hash
+        self.content_generation = content_generation
+
+@dataclass
+class NoteSummary:
+    """Lightweight view of a note, as used by listings"""
+    id: str
+    creation_time: datetime
+
+@dataclass
+class NoteCreationRequest:
+    """Content and tags for a note to be created as part of a batch"""
+    content: str
+    tags: List[str] = None
+    # Id and creation time given when the note was accepted, if created later (e.g. queued)
+    id: Optional[str] = None
+    creation_time: Optional[datetime] = None
+
+@dataclass
+class NoteCreationResult:
+    """Outcome of a single note creation within a batch: either the created note or the reason of the failure"""
+    note: Note = None
+    error_message: str = None
+
+@dataclass
+class NoteLookupResult:
+    """Notes found when looking up several ids at once, plus the ids that did not match any note"""
+    items: List[Note]
+    missing_ids: List[str]
+
+@dataclass
+class NoteSearchHit:
+    """A note matching a full-text search, with its relevance score (higher is better)"""
+    note: Note
+    score: float
+
+@dataclass
+class NoteBulkDeletionResult:
+    """Outcome of the deletion of several notes at once"""
+    deleted_ids: List[str]
+    failed_ids: List[str]
+
+# Max number of concurrent content uploads while creating notes
+DEFAULT_MAX_UPLOAD_WORKERS = 8
+# Folder where the content of notes is stored
+NOTE_CONTENT_PREFIX = "notes/"
+NOTE_CONTENT_SUFFIX = ".md"
+# Folder where content-addressed content is stored, by content hash: objects are deleted when no note references
+# them anymore (see ContentReferenceRepository), so the orphan content sweeper leaves them alone
+CONTENT_BLOB_PREFIX = "blobs/"
+# Tag query modes: notes with all the requested tags, or with at least one of them
+TAG_MATCH_ALL = "all"
+TAG_MATCH_ANY = "any"
+
+def get_object_key_for_note(note_id: str) -> str:
+    """Returns the key of the object storing the content of a note"""
+    return f"{NOTE_CONTENT_PREFIX}{note_id}{NOTE_CONTENT_SUFFIX}"
+
+def get_note_id_for_object_key(object_key: str) -> Optional[str]:
+    """Returns the id of the note whose content is stored with the given key, or None if it is not note content"""
+    if not object_key.startswith(NOTE_CONTENT_PREFIX) or not object_key.endswith(NOTE_CONTENT_SUFFIX):
+        return None
+    return object_key[len(NOTE_CONTENT_PREFIX):-len(NOTE_CONTENT_SUFFIX)] or None
+
+def get_content_hash(content: str) -> str:
+    """Returns the SHA-256 digest (hex) of note content, as stored"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def get_object_key_for_content(content_hash: str, generation: str) -> str:
+    """Returns the key of the object storing content-addressed content"""
+    return f"{CONTENT_BLOB_PREFIX}{content_hash}/{generation}{NOTE_CONTENT_SUFFIX}"
+
+def get_content_object_key(note: Note) -> str:
+    """Returns the key of the object storing the content of a note, whether content-addressed or not"""
+    if note.content_hash:
+        return get_object_key_for_content(note.content_hash, note.content_generation)
+    return get_object_key_for_note(note.id)
+
+def new_note(author: User, tags: List[str] = None) -> Note:
+    """Returns a new free note of an author, with a new id (nothing is saved)"""
+    return Note(
+        id = str(uuid.uuid4()),
+        creation_time = now(),
+        author_id = author.user_id, 
+        type = NoteType.FREE,
+        tags = tags or []
+    )
 
 class NoteRepository(ABC):
     @abstractmethod
     def save(self, note: Note) -> None:
         pass
 
+    @abstractmethod
+    def save_all(self, notes: List[Note]) -> List[str]:
+        """
+        Save new notes in bulk.
+
+        Returns:
+            the ids of the notes that could not be saved
+        """
+        pass
+
     @abstractmethod
     def find_by_id(self, id: str) -> None:
         pass
 
+    def find_latest_by_id(self, id: str) -> Optional[Note]:
+        """
+        Returns a note by its id like find_by_id(), bypassing any cache.
+        """
+        return self.find_by_id(id)
+
+    @abstractmethod
+    def find_by_ids(self, ids: List[str]) -> List[Note]:
+        """
+        Returns the notes matching the given ids: ids without a matching note are skipped.
+        """
+        pass
+
+    @abstractmethod
+    def delete_by_id(self, id: str) -> Optional[Note]:
+        """
+        Delete a note, if present.
+
+        Returns:
+            the deleted note, as it was stored, or None if there was no such note
+        """
+        pass
+
+    @abstractmethod
+    def delete_all_by_ids(self, ids: List[str]) -> List[str]:
+        """
+        Delete notes in bulk (missing notes are fine).
+
+        Returns:
+            the ids of the notes that could not be deleted
+        """
+        pass
+
+    @abstractmethod
+    def find_all_by_type(self, note_type: NoteType, author_id: str = None, data_page_query: DataPageQuery = None, summary: bool = False) -> Union[DataPage[Note], DataPage[NoteSummary]]:
+        """
+        Returns a page of notes of a type, in creation order (optionally bounded and/or newest first, see DataPageQuery).
+        """
+        pass
+
+    @abstractmethod
+    def iter_all_by_type(self, note_type: NoteType, author_id: str = None, max_items: int = None) -> Iterator[Note]:
+        """
+        Lazily iterate over all the notes of a type, without dealing with pages and continuation tokens.
+        """
+        pass
+
+    @abstractmethod
+    def find_by_tags(self, tags: List[str], author_id: str = None, mode: str = TAG_MATCH_ALL, data_page_query: DataPageQuery = None, summary: bool = False) -> Union[DataPage[Note], DataPage[NoteSummary]]:
+        """
+        Returns a page of the notes of an author with all (TAG_MATCH_ALL) or any (TAG_MATCH_ANY) of the tags.
+        """
+        pass
+
+@dataclass
+class ContentReference:
+    """
+    References to content-addressed content. The generation identifies the stored object: it changes whenever
+    the content is referenced again after being garbage collected, so that a new object never shares its key
+    with one that is being deleted.
+    """
+    content_hash: str
+    generation: str
+    # Whether the references started a new generation, whose object is not stored yet
+    created: bool
+
+class ContentReferenceRepository(ABC):
+    """
+    Reference counts of content-addressed content: a content is stored once, whatever the number of notes with
+    the same content, and its object is deleted when the last of them is.
+    """
     @abstractmethod
-    def delete_by_id(self, id: str) -> None:
+    def acquire(self, content_hash: str, count: int = 1) -> ContentReference:
+        """
+        Add references to a content, before the notes referencing it are saved.
+
+        Returns:
+            the references, with the generation of the object to store (or already stored)
+        """
         pass
 
     @abstractmethod
-    def find_all_by_type(self, note_type: NoteType, data_page_query: DataPageQuery) -> DataPage[Note]:
+    def release(self, content_hash: str, generation: str, count: int = 1) -> bool:
+        """
+        Remove references to a content, once the notes referencing it are deleted (or could not be saved).
+
+        Returns:
+            True if the content is no longer referenced: its references are gone and the object of that
+            generation must be deleted, as no new reference can point to it
+        """
         pass
 
 @wrap_exceptions
+@instrumented
 class NoteUseCases:
     """
         Use cases supported for Notes.
     """
     bucket_adapter: ObjectStore
     note_repository: NoteRepository
+    search_index: Optional[SearchIndex]
+    content_references: Optional[ContentReferenceRepository]
+    executor: ThreadPoolExecutor
 
-    def __init__(self, bucket_adapter: ObjectStore, note_repository: NoteRepository) -> None:
+    def __init__(self, bucket_adapter: ObjectStore, note_repository: NoteRepository, max_upload_workers: int = DEFAULT_MAX_UPLOAD_WORKERS, search_index: SearchIndex = None,
+                 content_references: ContentReferenceRepository = None) -> None:
         self.bucket_adapter = bucket_adapter
         self.note_repository = note_repository
+        # Full-text search is disabled without an index
+        self.search_index = search_index
+        # New notes have content-addressed content only with reference counts: notes created before keep their own objects
+        self.content_references = content_references
+        # Threads are started on demand and reused across invocations
+        self.executor = ThreadPoolExecutor(max_workers=max_upload_workers)
 
     def create_note(self, author: User, content: str, tags: List[str] = None) -> Note:
         """
@@ -73,40 +273,298 @@ class NoteUseCases:
         Returns:
             the Note instance representing the created note
         """
-        note = Note(
-            id = str(uuid.uuid4()),
-            creation_time = now(),
-            author_id = author.user_id, 
-            type = NoteType.FREE,
-            tags = tags or []
-        )
+        note = self._new_note(author, tags)
+        # The content hash is part of the metadata: the reference is added before they are saved
+        content_reference = self._add_content_reference(content.strip(), [note]) if self.content_references else None
+        object_key = get_content_object_key(note)
 
-        self.bucket_adapter.store(
-            self._get_object_key_for_note(note.id),
-            content.strip()
-        )
+        # Content upload and metadata save run concurrently: if either fails, the other one is undone
+        upload = self.executor.submit(self._store_content, object_key, content.strip(), content_reference)
+        save_error = None
+        try:
+            self.note_repository.save(note)
+        except Exception as e:
+            save_error = e
+
+        upload_error = upload.exception()
+
+        if upload_error and not save_error:
+            logging.error("Content upload failed for note %s, removing its metadata: %s", note.id, upload_error)
+            if self._compensate(self.note_repository.delete_by_id, note.id) and content_reference:
+                self._compensate(self._delete_content, [note])
+        elif save_error and not upload_error:
+            logging.error("Metadata save failed for note %s, removing its content: %s", note.id, save_error)
+            if content_reference:
+                self._compensate(self._delete_content, [note])
+            else:
+                self._compensate(self.bucket_adapter.delete, object_key)
+        elif save_error and content_reference:
+            # Nothing was written but the reference
+            self._compensate(self._delete_content, [note])
+
+        if save_error or upload_error:
+            raise save_error or upload_error
+
+        self._update_search_index("add_notes", {note.id: content})
 
-        self.note_repository.save(note)
-        
         return note
 
-    def find_note_by_id(self, note_id: str) -> Note:
+    def create_notes(self, author: User, note_requests: List[NoteCreationRequest]) -> List[NoteCreationResult]:
+        """
+        Create several notes at once: contents are uploaded concurrently and metadata
+        are saved in bulk. A failure on a note does not prevent the others from being created.
+        With content-addressed content, notes with the same content share a single upload.
+
+        Args:
+            author: the identified for the user who is creating these notes
+            note_requests: content and tags for each note to create
+        Returns:
+            one result for each request, in the same order
+        """
+        results = [NoteCreationResult() for _ in note_requests]
+        uploaded_notes = {}
+
+        pending_uploads = {}
+        notes_by_content = defaultdict(list)
+        for index, note_request in enumerate(note_requests):
+            if not note_request.content or not note_request.content.strip():
+                results[index].error_message = "Note content is required"
+                continue
+
+            note = self._new_note(author, note_request.tags)
+            if note_request.id:
+                note.id = note_request.id
+                note.creation_time = note_request.creation_time or note.creation_time
+            if self.content_references:
+                notes_by_content[note_request.content.strip()].append((index, note))
+                continue
+
+            upload = self.executor.submit(
+                self.bucket_adapter.store,
+                self._get_object_key_for_note(note.id),
+                note_request.content.strip()
+            )
+            pending_uploads[upload] = [(index, note)]
+
+        for content, indexed_notes in notes_by_content.items():
+            upload = self.executor.submit(self._reference_and_store_content, content, [note for _, note in indexed_notes])
+            pending_uploads[upload] = indexed_notes
+
+        for upload in as_completed(pending_uploads):
+            try:
+                upload.result()
+                uploaded_notes.update(pending_uploads[upload])
+            except Exception as e:
+                for index, note in pending_uploads[upload]:
+                    logging.error("Content upload failed for note %s: %s", note.id, e)
+                    results[index].error_message = "Note content upload failed"
+
+        failed_note_ids = set(self.note_repository.save_all(
+            [uploaded_notes[index] for index in sorted(uploaded_notes)]
+        ))
+
+        for index, note in uploaded_notes.items():
+            if note.id in failed_note_ids:
+                results[index].error_message = "Note metadata could not be saved"
+            else:
+                results[index].note = note
+
+        if failed_note_ids:
+            self._compensate(self._delete_content, sorted(
+                (note for note in uploaded_notes.values() if note.id in failed_note_ids), key=lambda note: note.id
+            ))
+
+        # A single segment for the whole batch
+        self._update_search_index("add_notes", {
+            result.note.id: note_requests[index].content for index, result in enumerate(results) if result.note
+        })
+
+        return results
+
+    def find_note_by_id(self, note_id: str, revalidate: bool = False) -> Note:
         """
         Returns a note by its id, based on Markdown standard.
     
         Args:
             note_id: the id of the wanted note
+            revalidate: whether to read the latest metadata, bypassing any cache (the note may have been changed
+                by another function since it was cached)
         Returns:
             the Note instance matching the required id
 
         Throws:
             a ResourceNotFoundException if there is not such note
         """
-        note = self.note_repository.find_by_id(note_id)
+        note = self.note_repository.find_latest_by_id(note_id) if revalidate else self.note_repository.find_by_id(note_id)
         if not note:
             raise ResourceNotFoundException("Note", note_id)
         return note
 
+    def find_notes_by_ids(self, note_ids: List[str]) -> NoteLookupResult:
+        """
+        Returns the notes matching the specified ids, using a single repository lookup.
+    
+        Args:
+            note_ids: the ids of the wanted notes
+        Returns:
+            the found notes (in the same order as the requested ids) and the ids that were not found
+        """
+        unique_ids = list(dict.fromkeys(note_ids))
+
+        notes_by_id = {note.id: note for note in self.note_repository.find_by_ids(unique_ids)} if unique_ids else {}
+
+        return NoteLookupResult(
+            items = [notes_by_id[note_id] for note_id in unique_ids if note_id in notes_by_id],
+            missing_ids = [note_id for note_id in unique_ids if note_id not in notes_by_id]
+        )
+
+    def find_notes_by_type(self, author: User, note_type: NoteType, data_page_query: DataPageQuery = None, summary: bool = False) -> Union[DataPage[Note], DataPage[NoteSummary]]:
+        """
+        Returns a page of the notes of an author with the specified type.
+    
+        Args:
+            author: the author of the notes
+            note_type: the type of the wanted notes
+            data_page_query: page size, continuation token and optional creation time bounds and order
+            summary: whether only ids and creation times are needed
+        Returns:
+            a page of notes (or note summaries)
+
+        Throws:
+            a ValidationException if the creation time bounds are inconsistent
+        """
+        if data_page_query and data_page_query.since and data_page_query.until and data_page_query.since > data_page_query.until:
+            raise ValidationException("since", "The start of the time range must not follow its end")
+
+        return self.note_repository.find_all_by_type(note_type, author_id=author.user_id, data_page_query=data_page_query, summary=summary)
+
+    def find_notes_by_tags(self, author: User, tags: List[str], mode: str = TAG_MATCH_ALL, data_page_query: DataPageQuery = None, summary: bool = False) -> Union[DataPage[Note], DataPage[NoteSummary]]:
+        """
+        Returns a page of the notes of an author having all or any of the specified tags.
+    
+        Args:
+            author: the author of the notes
+            tags: the wanted tags
+            mode: TAG_MATCH_ALL for notes with every tag, TAG_MATCH_ANY for notes with at least one of them
+            data_page_query: page size and continuation token
+            summary: whether only ids and creation times are needed
+        Returns:
+            a page of notes (or note summaries)
+
+        Throws:
+            a ValidationException if there are no tags or the mode is not supported
+        """
+        tags = [tag for tag in dict.fromkeys(tags or []) if tag]
+        if not tags:
+            raise ValidationException("tags", "At least one tag is required")
+        if mode not in (TAG_MATCH_ALL, TAG_MATCH_ANY):
+            raise ValidationException("mode", f"Supported modes are '{TAG_MATCH_ALL}' and '{TAG_MATCH_ANY}'")
+
+        return self.note_repository.find_by_tags(tags, author_id=author.user_id, mode=mode, data_page_query=data_page_query, summary=summary)
+
+    def search_notes(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> List[NoteSearchHit]:
+        """
+        Full-text search over the content of the notes.
+    
+        Args:
+            query: the words to look for
+            limit: max number of results
+        Returns:
+            the matching notes, most relevant first
+
+        Throws:
+            a ValidationException if the query is empty
+            a FeatureNotEnabledException if full-text search is disabled
+        """
+        if not query or not query.strip():
+            raise ValidationException("query", "A search query is required")
+        if not self.search_index:
+            raise FeatureNotEnabledException("full-text search")
+
+        hits = self.search_index.search(query, limit)
+
+        # Notes deleted since they were indexed are not returned
+        notes_by_id = {note.id: note for note in self.note_repository.find_by_ids([hit.note_id for hit in hits])} if hits else {}
+        return [NoteSearchHit(notes_by_id[hit.note_id], hit.score) for hit in hits if hit.note_id in notes_by_id]
+
+    def get_note_content_etag(self, note_id: str, note: Note = None) -> str:
+        """
+        Returns a tag that changes whenever the content of a note changes, without reading the content.
+    
+        Args:
+            note_id: the id of the wanted note
+            note: the note, if already found (its metadata are not read again)
+        Returns:
+            the content tag
+
+        Throws:
+            a ResourceNotFoundException if there is no content for such note
+        """
+        if note or self.content_references:
+            # Content-addressed content is found through the note
+            object_key = get_content_object_key(note or self.find_note_by_id(note_id))
+        else:
+            object_key = self._get_object_key_for_note(note_id)
+
+        etag = self.bucket_adapter.get_etag(object_key)
+        if not etag:
+            raise ResourceNotFoundException("Note", note_id)
+        return etag
+
+    def iter_note_content(self, note_id: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+        """
+        Stream the Markdown content of a note, without loading it all in memory.
+    
+        Args:
+            note_id: the id of the wanted note
+            chunk_size: max number of bytes read from the object store at a time
+        Returns:
+            an iterator over the content text
+
+        Throws:
+            a ResourceNotFoundException if there is not such note
+        """
+        note = self.find_note_by_id(note_id)
+
+        return self.bucket_adapter.iter_chunks(get_content_object_key(note), chunk_size)
+
+    def load_note_content(self, note_id: str, note: Note = None) -> str:
+        """
+        Returns the Markdown content of a note, as a whole: notes too large to hold in memory are read with
+        iter_note_content() or a range at a time.
+    
+        Args:
+            note_id: the id of the wanted note
+            note: the note, if already found (its metadata are not read again)
+        Returns:
+            the content text
+
+        Throws:
+            a ResourceNotFoundException if there is not such note
+        """
+        note = note or self.find_note_by_id(note_id)
+
+        return self.bucket_adapter.load(get_content_object_key(note))
+
+    def load_note_content_range(self, note_id: str, start: int, end: int, note: Note = None) -> bytes:
+        """
+        Returns a byte range of the content of a note.
+    
+        Args:
+            note_id: the id of the wanted note
+            start: the first byte of the range
+            end: the last byte of the range (included)
+            note: the note, if already found (its metadata are not read again)
+        Returns:
+            the raw (UTF-8 encoded) bytes in the range: this is empty if the content ends before 'start'
+
+        Throws:
+            a ResourceNotFoundException if there is not such note
+        """
+        note = note or self.find_note_by_id(note_id)
+
+        return self.bucket_adapter.load_range(get_content_object_key(note), start, end)
+
     def delete_note_by_id(self, note_id: str) -> Note:
         """
         Deletes a note with the specified id, if present.
@@ -116,11 +574,117 @@ class NoteUseCases:
         Returns:
             nothing
         """
-        self.note_repository.delete_by_id(note_id)
+        # Content-addressed content is found through the deleted note
+        note = self.note_repository.delete_by_id(note_id)
+        if not note:
+            # There is no content for notes that don't exist
+            return
 
-        self.bucket_adapter.delete(
-            self._get_object_key_for_note(note_id)
+        if note.content_hash:
+            self._delete_content([note])
+        else:
+            self.bucket_adapter.delete(
+                self._get_object_key_for_note(note_id)
+            )
+
+        self._update_search_index("remove_notes", [note_id])
+
+    def delete_notes_by_ids(self, note_ids: List[str]) -> NoteBulkDeletionResult:
+        """
+        Deletes several notes at once: metadata are deleted in bulk first, then the content of 
+        the notes whose metadata were deleted.
+    
+        Args:
+            note_ids: the ids of the notes to delete (missing notes are fine)
+        Returns:
+            the ids of the deleted notes and of the ones that could not be deleted
+        """
+        unique_ids = list(dict.fromkeys(note_ids))
+
+        # Content-addressed content is found through the notes, read before they are deleted
+        notes_by_id = {note.id: note for note in self.note_repository.find_by_ids(unique_ids)} if self.content_references and unique_ids else {}
+
+        failed_ids = set(self.note_repository.delete_all_by_ids(unique_ids)) if unique_ids else set()
+        deleted_ids = [note_id for note_id in unique_ids if note_id not in failed_ids]
+
+        if deleted_ids:
+            # Without metadata the notes are gone for clients: content left behind is only an orphan to clean up
+            failed_object_keys = self._delete_content(
+                [notes_by_id.get(note_id) or Note(id=note_id) for note_id in deleted_ids]
+            )
+            if failed_object_keys:
+                logging.error("Content of %s deleted notes could not be deleted", len(failed_object_keys))
+
+            self._update_search_index("remove_notes", deleted_ids)
+
+        return NoteBulkDeletionResult(
+            deleted_ids = deleted_ids,
+            failed_ids = [note_id for note_id in unique_ids if note_id in failed_ids]
         )
 
+    def _new_note(self, author: User, tags: List[str] = None) -> Note:
+        return new_note(author, tags)
+
+    def _update_search_index(self, update_name: str, *args) -> None:
+        """Notes are created or deleted even if the search index can't be updated: they are just missing from (or left in) search results"""
+        if not self.search_index:
+            return
+        try:
+            getattr(self.search_index, update_name)(*args)
+        except Exception as e:
+            logging.error("Search index update %s() failed: %s", update_name, e)
+
+    def _compensate(self, undo_function, *args) -> bool:
+        """Best-effort undo of a partial write: what cannot be undone is left to the orphan content sweeper"""
+        try:
+            undo_function(*args)
+            return True
+        except Exception as e:
+            logging.error("Compensation %s() failed: %s", undo_function.__name__, e)
+            return False
+
+    def _add_content_reference(self, content: str, notes: List[Note]) -> ContentReference:
+        """The notes reference the content by its hash: nothing is uploaded yet"""
+        content_reference = self.content_references.acquire(get_content_hash(content), len(notes))
+        for note in notes:
+            note.content_hash = content_reference.content_hash
+            note.content_generation = content_reference.generation
+        return content_reference
+
+    def _store_content(self, object_key: str, content: str, content_reference: ContentReference = None) -> None:
+        """Content-addressed content is uploaded only if it is not stored yet, as found with a HEAD request"""
+        if content_reference and not content_reference.created and self.bucket_adapter.get_etag(object_key):
+            return
+        self.bucket_adapter.store(object_key, content)
+
+    def _reference_and_store_content(self, content: str, notes: List[Note]) -> None:
+        content_reference = self._add_content_reference(content, notes)
+        try:
+            self._store_content(get_content_object_key(notes[0]), content, content_reference)
+        except Exception:
+            self._compensate(self._delete_content, notes)
+            raise
+
+    def _delete_content(self, notes: List[Note]) -> List[str]:
+        """
+        Delete the content of notes that are gone (or were never saved): their own objects, or their references
+        to content-addressed content, whose objects are deleted once they are no longer referenced.
+
+        Returns:
+            the keys of the objects that could not be deleted
+        """
+        object_keys = [self._get_object_key_for_note(note.id) for note in notes if not note.content_hash]
+
+        reference_counts = Counter((note.content_hash, note.content_generation) for note in notes if note.content_hash)
+        for (content_hash, generation), count in reference_counts.items():
+            try:
+                if self.content_references.release(content_hash, generation, count):
+                    object_keys.append(get_object_key_for_content(content_hash, generation))
+            except Exception as e:
+                # The content is kept: a leaked reference only wastes storage, a lost one would lose content
+                logging.error("Release of %s references to content %s failed: %s", count, content_hash, e)
+
+        return self.bucket_adapter.delete_all(object_keys) if object_keys else []
+
     def _get_object_key_for_note(self, note_id: str) -> str:
-        return f"notes/{note_id}.md"
+        return get_object_key_for_note(note_id)
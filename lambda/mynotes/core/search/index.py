@@ -0,0 +1,262 @@
+import heapq
+import itertools
+import logging
+import math
+import mmap
+import operator
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from mynotes.core.architecture import ObjectStore
+from mynotes.core.search.segment import Segment, build_segment, merge_segments
+from mynotes.core.search.tokenizer import tokenize
+
+# Folder where the segments of the search index are stored (segment keys sort by creation time)
+SEARCH_SEGMENT_PREFIX = "search/segments/"
+SEARCH_SEGMENT_SUFFIX = ".seg"
+# Number of results returned by a search when no limit is specified
+DEFAULT_SEARCH_LIMIT = 10
+# Max number of segments downloaded concurrently
+MAX_SEGMENT_DOWNLOAD_WORKERS = 8
+# How long (in seconds) the list of segments is reused by searches before the segment folder is listed again
+DEFAULT_MANIFEST_TTL_SECONDS = 10.0
+
+# Okapi BM25 ranking parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+@dataclass
+class SearchHit:
+    """A note matching a search, with its relevance score (higher is better)"""
+    note_id: str
+    score: float
+
+@dataclass
+class CompactionResult:
+    """Outcome of a search index compaction"""
+    merged_keys: List[str] = field(default_factory=list)
+    segment_key: Optional[str] = None
+    failed_keys: List[str] = field(default_factory=list)
+
+class SearchIndex:
+    """
+    Full-text index over the content of notes, stored in the object store as immutable segments.
+
+    Every change writes a new, small segment: the terms of new notes, or the ids of deleted notes
+    (deletions apply to all the segments). Queries read every segment and rank the matching notes with BM25.
+    Segments are downloaded the first time they are needed and kept for the life of the process: with a cache
+    folder they are also written to disk and memory-mapped, so that they don't count against the process memory.
+    The list of segments (the manifest) is cached too, for a short time: segments written by other processes are
+    searched once it expires. Compaction merges all the segments into one, dropping deleted notes.
+    """
+    def __init__(self, object_store: ObjectStore, cache_dir: str = None, manifest_ttl: float = DEFAULT_MANIFEST_TTL_SECONDS) -> None:
+        """
+        Args:
+            object_store: where segments are stored
+            cache_dir: local folder for downloaded segments (e.g. in /tmp), segments are kept in memory if not set
+            manifest_ttl: how long (in seconds) searches reuse the list of segments, 0 to list them on every search
+        """
+        self.object_store = object_store
+        self.cache_dir = cache_dir
+        self.manifest_ttl = manifest_ttl
+        self.segments: Dict[str, Segment] = {}
+        self.manifest: Optional[List[str]] = None
+        self.manifest_expiration = 0.0
+        self.lock = threading.Lock()
+
+    def add_notes(self, contents: Dict[str, str]) -> Optional[str]:
+        """
+        Index the content of new notes.
+
+        Args:
+            contents: the Markdown content of each note, by note id
+        Returns:
+            the key of the new segment (None if there was nothing to index)
+        """
+        if not contents:
+            return None
+
+        return self._write_segment(build_segment({note_id: tokenize(content) for note_id, content in contents.items()}))
+
+    def remove_notes(self, note_ids: List[str]) -> Optional[str]:
+        """
+        Remove notes from the search results.
+
+        Args:
+            note_ids: the ids of the deleted notes
+        Returns:
+            the key of the new segment (None if there was nothing to remove)
+        """
+        if not note_ids:
+            return None
+
+        return self._write_segment(build_segment({}, note_ids))
+
+    def search(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> List[SearchHit]:
+        """
+        Returns the notes matching any term of the query, most relevant first.
+
+        Args:
+            query: the text to look for (tokenized like the content of notes)
+            limit: max number of results
+        Returns:
+            the matching notes, sorted by decreasing score
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or limit <= 0:
+            return []
+
+        segments = self._load_segments()
+        deleted_note_ids = set(itertools.chain.from_iterable(segment.deleted_note_ids() for segment in segments))
+        doc_count = sum(segment.doc_count for segment in segments)
+        if not doc_count:
+            return []
+
+        # Collection statistics (deleted documents are still counted until the next compaction)
+        average_doc_length = sum(segment.total_doc_length for segment in segments) / doc_count
+        idfs = {}
+        for term in terms:
+            doc_freq = sum(segment.doc_freq(term) for segment in segments)
+            if doc_freq:
+                idfs[term] = math.log(1 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+        best_hits: Dict[str, float] = {}
+        for segment in segments:
+            for note_id, score in self._search_segment(segment, idfs, average_doc_length, deleted_note_ids, limit):
+                # The same note may be in two segments after concurrent compactions
+                best_hits[note_id] = max(score, best_hits.get(note_id, score))
+
+        return [
+            SearchHit(note_id, score)
+            for note_id, score in heapq.nlargest(limit, best_hits.items(), key=lambda hit: (hit[1], hit[0]))
+        ]
+
+    def _search_segment(self, segment: Segment, idfs: Dict[str, float], average_doc_length: float, deleted_note_ids: Set[str], limit: int) -> List[Tuple[str, float]]:
+        scores: Dict[int, float] = {}
+        doc_lengths = segment.doc_lengths
+        length_factor = BM25_K1 * BM25_B / average_doc_length
+        base_factor = BM25_K1 * (1 - BM25_B)
+        for term, idf in idfs.items():
+            weight = idf * (BM25_K1 + 1)
+            for ordinal, term_frequency in segment.postings(term):
+                score = weight * term_frequency / (term_frequency + base_factor + length_factor * doc_lengths[ordinal])
+                scores[ordinal] = scores.get(ordinal, 0.0) + score
+
+        for note_id in deleted_note_ids:
+            ordinal = segment.find_ordinal(note_id)
+            if ordinal is not None:
+                scores.pop(ordinal, None)
+
+        top_scores = heapq.nlargest(limit, scores.items(), key=operator.itemgetter(1))
+        return [(segment.note_id(ordinal), score) for ordinal, score in top_scores]
+
+    def compact(self) -> CompactionResult:
+        """
+        Merge all the segments into a new one, then delete them. Segments written in the meantime are left
+        for the next compaction. This is meant to run on a schedule, one compaction at a time.
+
+        Returns:
+            the merged segment keys, the key of the new segment and the keys that could not be deleted
+        """
+        segment_keys = self._list_segment_keys()
+        if len(segment_keys) < 2:
+            return CompactionResult()
+
+        segments = self._load_segments(segment_keys)
+        segment_key = self._write_segment(merge_segments(segments))
+        failed_keys = self.object_store.delete_all(segment_keys)
+        self._update_manifest(removed_keys=set(segment_keys))
+
+        logging.info("Search index compaction merged %s segments into %s", len(segment_keys), segment_key)
+        return CompactionResult(segment_keys, segment_key, failed_keys)
+
+    def _list_segment_keys(self) -> List[str]:
+        return sorted(
+            stored_object.key for stored_object in self.object_store.list_objects(SEARCH_SEGMENT_PREFIX)
+            if stored_object.key.endswith(SEARCH_SEGMENT_SUFFIX)
+        )
+
+    def _get_manifest(self) -> List[str]:
+        """The keys of the current segments, listed again only once the cached list expires"""
+        with self.lock:
+            if self.manifest is not None and time.monotonic() < self.manifest_expiration:
+                return list(self.manifest)
+
+        segment_keys = self._list_segment_keys()
+        with self.lock:
+            self.manifest = segment_keys
+            self.manifest_expiration = time.monotonic() + self.manifest_ttl
+        return list(segment_keys)
+
+    def _update_manifest(self, added_key: str = None, removed_keys: Set[str] = frozenset()) -> None:
+        """The segments written and deleted by this process are known without listing them"""
+        with self.lock:
+            if self.manifest is None:
+                return
+            self.manifest = sorted(set(self.manifest) - removed_keys | ({added_key} if added_key else set()))
+
+    def _load_segments(self, segment_keys: List[str] = None) -> List[Segment]:
+        """Segments for the given keys (all the current segments by default), oldest first"""
+        if segment_keys is None:
+            segment_keys = self._get_manifest()
+            self._forget_segments(set(self.segments) - set(segment_keys))
+
+        missing_keys = [key for key in segment_keys if key not in self.segments]
+        if missing_keys:
+            try:
+                with ThreadPoolExecutor(max_workers=min(len(missing_keys), MAX_SEGMENT_DOWNLOAD_WORKERS)) as executor:
+                    loaded_segments = dict(zip(missing_keys, executor.map(self._load_segment, missing_keys)))
+            except Exception:
+                # The segment may have been deleted by a compaction since it was listed
+                with self.lock:
+                    self.manifest = None
+                raise
+            with self.lock:
+                self.segments.update(loaded_segments)
+
+        return [self.segments[key] for key in segment_keys]
+
+    def _load_segment(self, segment_key: str) -> Segment:
+        if not self.cache_dir:
+            return Segment(self.object_store.load_bytes(segment_key))
+
+        # Segments are immutable: a cached file is always up to date
+        path = self._get_cache_path(segment_key)
+        if not os.path.exists(path):
+            data = self.object_store.load_bytes(segment_key)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temporary_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(temporary_path, "wb") as file:
+                file.write(data)
+            os.replace(temporary_path, path)
+
+        with open(path, "rb") as file:
+            return Segment(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _forget_segments(self, segment_keys: Set[str]) -> None:
+        """Drop segments that were deleted by a compaction"""
+        with self.lock:
+            for segment_key in segment_keys:
+                self.segments.pop(segment_key, None)
+                if self.cache_dir:
+                    try:
+                        os.remove(self._get_cache_path(segment_key))
+                    except FileNotFoundError:
+                        pass
+
+    def _write_segment(self, data: bytes) -> str:
+        segment_key = f"{SEARCH_SEGMENT_PREFIX}{time.time_ns():020d}-{uuid.uuid4().hex}{SEARCH_SEGMENT_SUFFIX}"
+        self.object_store.store_bytes(segment_key, data)
+
+        with self.lock:
+            self.segments[segment_key] = Segment(data)
+        self._update_manifest(added_key=segment_key)
+        return segment_key
+
+    def _get_cache_path(self, segment_key: str) -> str:
+        return os.path.join(self.cache_dir, segment_key[len(SEARCH_SEGMENT_PREFIX):])
@@ -0,0 +1,315 @@
+import array
+import heapq
+import itertools
+import mmap
+import struct
+import sys
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from mynotes.core.architecture import ApplicationException
+
+SEGMENT_MAGIC = b"MNSG"
+SEGMENT_FORMAT_VERSION = 1
+
+# Magic and format version
+HEADER = struct.Struct("<4sB3x")
+# Sections, in file order. Offsets are relative to the start of the segment and aligned to 4 bytes:
+# - doc_lengths: number of terms of each document (uint32)
+# - doc_id_offsets, doc_ids: note ids of the documents, sorted (uint32 offsets into UTF-8 bytes)
+# - term_offsets, terms: indexed terms, sorted (uint32 offsets into UTF-8 bytes)
+# - doc_freqs: number of documents with each term (uint32)
+# - posting_offsets, postings: posting list of each term (uint32 offsets into varints)
+# - deleted_id_offsets, deleted_ids: note ids deleted since older segments were written, sorted
+SECTION_NAMES = (
+    "doc_lengths", "doc_id_offsets", "doc_ids", "term_offsets", "terms",
+    "doc_freqs", "posting_offsets", "postings", "deleted_id_offsets", "deleted_ids"
+)
+# Offset and length of each section, then the magic again (truncated segments are detected)
+FOOTER = struct.Struct("<" + "II" * len(SECTION_NAMES) + "4s")
+
+# Typecode for unsigned 32 bits integers (on the platforms where "I" is 16 bits, "L" is 32)
+UINT32_TYPECODE = "I" if array.array("I").itemsize == 4 else "L"
+# Sections are stored little-endian: on little-endian machines they are used in place, without copies
+IS_NATIVE_LITTLE_ENDIAN = sys.byteorder == "little"
+
+# Integer arrays, either decoded or viewed in place
+UInt32Array = Union[array.array, memoryview]
+
+class InvalidSegmentException(ApplicationException):
+    """The data is not a search index segment (or it was written with an unsupported format)"""
+    pass
+
+def encode_varint(value: int, buffer: bytearray) -> None:
+    """Append a non-negative integer using 7 bits per byte, the high bit telling that more bytes follow"""
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def decode_varints(data: bytes) -> List[int]:
+    """Decode a sequence of integers encoded by 'encode_varint'"""
+    if not data or max(data) < 0x80:
+        # Every value fits in one byte (typical of the posting lists of frequent terms)
+        return list(data)
+
+    values = []
+    value = 0
+    shift = 0
+    for byte in data:
+        if byte & 0x80:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+        else:
+            values.append(value | (byte << shift))
+            value = 0
+            shift = 0
+    return values
+
+def encode_postings(postings: Sequence[Tuple[int, int]]) -> bytes:
+    """
+    Encode a posting list, sorted by document ordinal, as pairs of varints: the gap from
+    the previous ordinal (small for frequent terms) and the term frequency.
+    """
+    buffer = bytearray()
+    previous_ordinal = 0
+    for ordinal, term_frequency in postings:
+        encode_varint(ordinal - previous_ordinal, buffer)
+        encode_varint(term_frequency, buffer)
+        previous_ordinal = ordinal
+    return bytes(buffer)
+
+def decode_postings(data: bytes) -> List[Tuple[int, int]]:
+    """Decode a posting list encoded by 'encode_postings' into (document ordinal, term frequency) pairs"""
+    values = decode_varints(data)
+    return list(zip(itertools.accumulate(values[0::2]), values[1::2]))
+
+def _to_uint32_bytes(values: Iterable[int]) -> bytes:
+    uint32_array = array.array(UINT32_TYPECODE, values)
+    if not IS_NATIVE_LITTLE_ENDIAN:
+        uint32_array.byteswap()
+    return uint32_array.tobytes()
+
+def _to_uint32_array(data: memoryview) -> UInt32Array:
+    if IS_NATIVE_LITTLE_ENDIAN:
+        return data.cast(UINT32_TYPECODE)
+    uint32_array = array.array(UINT32_TYPECODE, data.tobytes())
+    uint32_array.byteswap()
+    return uint32_array
+
+def _encode_strings(strings: Sequence[str]) -> Tuple[bytes, bytes]:
+    """Offsets (n + 1 uint32) and concatenated UTF-8 bytes of a list of strings"""
+    data = bytearray()
+    offsets = [0]
+    for string in strings:
+        data += string.encode("utf-8")
+        offsets.append(len(data))
+    return _to_uint32_bytes(offsets), bytes(data)
+
+def write_segment(note_ids: Sequence[str], doc_lengths: Sequence[int], postings: Iterable[Tuple[str, Sequence[Tuple[int, int]]]], deleted_note_ids: Iterable[str] = ()) -> bytes:
+    """
+    Serialize a segment.
+
+    Args:
+        note_ids: the ids of the documents, sorted (their position is the document ordinal)
+        doc_lengths: the number of terms of each document
+        postings: (term, posting list) pairs sorted by term, each posting list being sorted by ordinal
+        deleted_note_ids: ids of notes deleted from older segments
+    Returns:
+        the segment bytes
+    """
+    terms = []
+    doc_freqs = []
+    posting_offsets = [0]
+    posting_data = bytearray()
+    for term, term_postings in postings:
+        terms.append(term)
+        doc_freqs.append(len(term_postings))
+        posting_data += encode_postings(term_postings)
+        posting_offsets.append(len(posting_data))
+
+    doc_id_offsets, doc_ids = _encode_strings(note_ids)
+    term_offsets, term_data = _encode_strings(terms)
+    deleted_id_offsets, deleted_ids = _encode_strings(sorted(set(deleted_note_ids)))
+    sections = (
+        _to_uint32_bytes(doc_lengths), doc_id_offsets, doc_ids, term_offsets, term_data,
+        _to_uint32_bytes(doc_freqs), _to_uint32_bytes(posting_offsets), bytes(posting_data), deleted_id_offsets, deleted_ids
+    )
+
+    segment = bytearray(HEADER.pack(SEGMENT_MAGIC, SEGMENT_FORMAT_VERSION))
+    footer_values = []
+    for section in sections:
+        # Padding keeps uint32 sections aligned
+        segment += b"\0" * (-len(segment) % 4)
+        footer_values += [len(segment), len(section)]
+        segment += section
+    segment += FOOTER.pack(*footer_values, SEGMENT_MAGIC)
+
+    return bytes(segment)
+
+def build_segment(documents: Dict[str, List[str]], deleted_note_ids: Iterable[str] = ()) -> bytes:
+    """
+    Serialize a segment for some (tokenized) documents.
+
+    Args:
+        documents: the terms of each document, by note id
+        deleted_note_ids: ids of notes deleted from older segments
+    Returns:
+        the segment bytes
+    """
+    note_ids = sorted(documents)
+    term_postings: Dict[str, List[Tuple[int, int]]] = {}
+    for ordinal, note_id in enumerate(note_ids):
+        for term, term_frequency in Counter(documents[note_id]).items():
+            term_postings.setdefault(term, []).append((ordinal, term_frequency))
+
+    return write_segment(
+        note_ids,
+        [len(documents[note_id]) for note_id in note_ids],
+        sorted(term_postings.items()),
+        deleted_note_ids
+    )
+
+class Segment:
+    """
+    Read-only view over a serialized segment, either bytes or a memory-mapped file. Nothing is decoded
+    upfront: terms and note ids are found by binary search, and only the posting lists of the queried terms are read.
+    """
+    def __init__(self, data: Union[bytes, memoryview, mmap.mmap]) -> None:
+        view = memoryview(data)
+        if len(view) < HEADER.size + FOOTER.size:
+            raise InvalidSegmentException("Segment is too short")
+
+        magic, version = HEADER.unpack_from(view, 0)
+        footer = FOOTER.unpack_from(view, len(view) - FOOTER.size)
+        if magic != SEGMENT_MAGIC or footer[-1] != SEGMENT_MAGIC:
+            raise InvalidSegmentException("Not a search index segment")
+        if version != SEGMENT_FORMAT_VERSION:
+            raise InvalidSegmentException(f"Unsupported segment format version: {version}")
+
+        sections = {
+            name: view[offset:offset + length]
+            for name, offset, length in zip(SECTION_NAMES, footer[0:-1:2], footer[1:-1:2])
+        }
+        self.doc_lengths = _to_uint32_array(sections["doc_lengths"])
+        self._doc_id_offsets = _to_uint32_array(sections["doc_id_offsets"])
+        self._doc_ids = sections["doc_ids"]
+        self._term_offsets = _to_uint32_array(sections["term_offsets"])
+        self._terms = sections["terms"]
+        self._doc_freqs = _to_uint32_array(sections["doc_freqs"])
+        self._posting_offsets = _to_uint32_array(sections["posting_offsets"])
+        self._postings = sections["postings"]
+        self._deleted_id_offsets = _to_uint32_array(sections["deleted_id_offsets"])
+        self._deleted_ids = sections["deleted_ids"]
+
+        self.doc_count = len(self.doc_lengths)
+        self.term_count = len(self._doc_freqs)
+        self.total_doc_length = sum(self.doc_lengths)
+
+    def note_id(self, ordinal: int) -> str:
+        return _get_string(self._doc_ids, self._doc_id_offsets, ordinal)
+
+    def find_ordinal(self, note_id: str) -> Optional[int]:
+        """Ordinal of the document of a note, or None if the note is not in this segment"""
+        return _find_string(self._doc_ids, self._doc_id_offsets, self.doc_count, note_id)
+
+    def term(self, term_index: int) -> str:
+        return _get_string(self._terms, self._term_offsets, term_index)
+
+    def doc_freq(self, term: str) -> int:
+        term_index = _find_string(self._terms, self._term_offsets, self.term_count, term)
+        return self._doc_freqs[term_index] if term_index is not None else 0
+
+    def postings(self, term: str) -> List[Tuple[int, int]]:
+        """(document ordinal, term frequency) pairs for the documents with a term"""
+        term_index = _find_string(self._terms, self._term_offsets, self.term_count, term)
+        return self.postings_at(term_index) if term_index is not None else []
+
+    def postings_at(self, term_index: int) -> List[Tuple[int, int]]:
+        start = self._posting_offsets[term_index]
+        end = self._posting_offsets[term_index + 1]
+        return decode_postings(self._postings[start:end].tobytes())
+
+    def deleted_note_ids(self) -> List[str]:
+        return [
+            _get_string(self._deleted_ids, self._deleted_id_offsets, index)
+            for index in range(len(self._deleted_id_offsets) - 1)
+        ]
+
+def _get_string(data: memoryview, offsets: UInt32Array, index: int) -> str:
+    return data[offsets[index]:offsets[index + 1]].tobytes().decode("utf-8")
+
+def _find_string(data: memoryview, offsets: UInt32Array, count: int, value: str) -> Optional[int]:
+    """Binary search in a sorted list of strings (UTF-8 bytes sort like the strings they encode)"""
+    target = value.encode("utf-8")
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if data[offsets[middle]:offsets[middle + 1]].tobytes() < target:
+            low = middle + 1
+        else:
+            high = middle
+
+    if low < count and data[offsets[low]:offsets[low + 1]].tobytes() == target:
+        return low
+    return None
+
+def _iter_note_ids(segment: Segment, segment_index: int) -> Iterator[Tuple[str, int, int]]:
+    for ordinal in range(segment.doc_count):
+        yield segment.note_id(ordinal), segment_index, ordinal
+
+def _iter_terms(segment: Segment, segment_index: int) -> Iterator[Tuple[str, int, int]]:
+    for term_index in range(segment.term_count):
+        yield segment.term(term_index), segment_index, term_index
+
+def merge_segments(segments: Sequence[Segment]) -> bytes:
+    """
+    Serialize a segment with the live documents of some segments: documents of deleted notes are dropped,
+    and so are the deletions they matched. Terms and note ids are merged in order, so memory is only
+    needed for the output and the posting lists of one term at a time.
+
+    Args:
+        segments: the segments to merge, oldest first
+    Returns:
+        the merged segment bytes
+    """
+    deleted_note_ids = set(itertools.chain.from_iterable(segment.deleted_note_ids() for segment in segments))
+
+    # New ordinal of each document, by segment (-1 for dropped documents)
+    ordinal_mappings = [array.array("l", [-1]) * segment.doc_count for segment in segments]
+    note_ids: List[str] = []
+    doc_lengths: List[int] = []
+    matched_deleted_note_ids = set()
+    all_documents = heapq.merge(*(
+        _iter_note_ids(segment, segment_index) for segment_index, segment in enumerate(segments)
+    ))
+    for note_id, segment_index, ordinal in all_documents:
+        if note_id in deleted_note_ids:
+            matched_deleted_note_ids.add(note_id)
+            continue
+        if note_ids and note_ids[-1] == note_id:
+            # Indexed twice: the oldest document wins
+            continue
+        ordinal_mappings[segment_index][ordinal] = len(note_ids)
+        note_ids.append(note_id)
+        doc_lengths.append(segments[segment_index].doc_lengths[ordinal])
+
+    def merged_postings() -> Iterator[Tuple[str, List[Tuple[int, int]]]]:
+        all_terms = heapq.merge(*(
+            _iter_terms(segment, segment_index) for segment_index, segment in enumerate(segments)
+        ))
+        for term, entries in itertools.groupby(all_terms, key=lambda entry: entry[0]):
+            term_postings = []
+            for _, segment_index, term_index in entries:
+                ordinal_mapping = ordinal_mappings[segment_index]
+                term_postings.extend(
+                    (ordinal_mapping[ordinal], term_frequency)
+                    for ordinal, term_frequency in segments[segment_index].postings_at(term_index)
+                    if ordinal_mapping[ordinal] >= 0
+                )
+            if term_postings:
+                term_postings.sort()
+                yield term, term_postings
+
+    # Deletions that did not match any document are kept: the document may be in a segment written later
+    return write_segment(note_ids, doc_lengths, merged_postings(), deleted_note_ids - matched_deleted_note_ids)
@@ -0,0 +1,41 @@
+import re
+from typing import List
+
+# Targets of links and images ('[text](url)'): the text is indexed, the url is not
+MARKDOWN_LINK_TARGET_PATTERN = re.compile(r"\]\([^)]*\)")
+# Inline HTML tags
+MARKDOWN_HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+# Runs of letters and digits, in any script (Markdown markup and punctuation are separators)
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# Tokens outside these bounds are not indexed (single characters, hashes, base64 blobs, ...)
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 40
+
+# Frequent English words: they would only make posting lists longer
+STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "if", "in", "into", "is", "it",
+    "no", "not", "of", "on", "or", "such", "that", "the", "their", "then", "there", "these",
+    "they", "this", "to", "was", "will", "with"
+})
+
+def tokenize(markdown: str) -> List[str]:
+    """
+    Split Markdown text into the terms used by the search index: lowercase words and numbers,
+    without markup, link targets and stop words. Queries go through the same function.
+
+    Args:
+        markdown: the text to tokenize
+    Returns:
+        the terms, in the order they appear in the text (with repetitions)
+    """
+    if not markdown:
+        return []
+
+    text = MARKDOWN_LINK_TARGET_PATTERN.sub("]", markdown)
+    text = MARKDOWN_HTML_TAG_PATTERN.sub(" ", text)
+
+    return [
+        token for token in TOKEN_PATTERN.findall(text.casefold())
+        if MIN_TOKEN_LENGTH <= len(token) <= MAX_TOKEN_LENGTH and token not in STOP_WORDS
+    ]
@@ -0,0 +1,67 @@
+import logging
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import List
+
+from mynotes.core.architecture import ObjectStore, StoredObject
+from mynotes.core.notes import NOTE_CONTENT_PREFIX, NoteRepository, get_note_id_for_object_key
+from mynotes.core.utils.common import now
+
+# Number of content objects checked against the repository with a single lookup
+DEFAULT_SWEEP_PAGE_SIZE = 100
+
+@dataclass
+class SweepResult:
+    """Outcome of an orphan content sweep"""
+    scanned: int = 0
+    orphan_keys: List[str] = field(default_factory=list)
+    failed_keys: List[str] = field(default_factory=list)
+
+class OrphanContentSweeper:
+    """
+    Finds (and deletes) note content without metadata, as left behind by failed creations or deletions.
+
+    Content objects are listed from the object store and checked against the repository in bulk,
+    a page at a time. Content more recent than the grace period is never considered an orphan,
+    since its metadata may not have been written yet.
+    """
+    def __init__(self, bucket_adapter: ObjectStore, note_repository: NoteRepository, grace_period: timedelta, page_size: int = DEFAULT_SWEEP_PAGE_SIZE) -> None:
+        self.bucket_adapter = bucket_adapter
+        self.note_repository = note_repository
+        self.grace_period = grace_period
+        self.page_size = page_size
+
+    def sweep(self, dry_run: bool = False) -> SweepResult:
+        """
+        Args:
+            dry_run: if True, orphans are only reported
+        Returns:
+            the number of scanned objects, the orphan keys and the ones that could not be deleted
+        """
+        result = SweepResult()
+        oldest_allowed = now() - self.grace_period
+
+        page: List[StoredObject] = []
+        for stored_object in self.bucket_adapter.list_objects(NOTE_CONTENT_PREFIX):
+            result.scanned += 1
+            if stored_object.last_modified < oldest_allowed and get_note_id_for_object_key(stored_object.key):
+                page.append(stored_object)
+            if len(page) == self.page_size:
+                self._sweep_page(page, dry_run, result)
+                page = []
+
+        if page:
+            self._sweep_page(page, dry_run, result)
+
+        logging.info("Orphan sweep scanned %s objects and found %s orphans", result.scanned, len(result.orphan_keys))
+        return result
+
+    def _sweep_page(self, page: List[StoredObject], dry_run: bool, result: SweepResult) -> None:
+        note_ids = [get_note_id_for_object_key(stored_object.key) for stored_object in page]
+        existing_ids = {note.id for note in self.note_repository.find_by_ids(note_ids)}
+
+        orphan_keys = [stored_object.key for stored_object, note_id in zip(page, note_ids) if note_id not in existing_ids]
+        result.orphan_keys.extend(orphan_keys)
+
+        if orphan_keys and not dry_run:
+            result.failed_keys.extend(self.bucket_adapter.delete_all(orphan_keys))
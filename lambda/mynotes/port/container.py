@@ -0,0 +1,136 @@
+import contextlib
+import functools
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, AsyncIterator, Optional
+
+from mynotes.adapter.config import (AWS_REGION, LOCALSTACK_ENDPOINT, NOTES_BATCH_UPLOAD_MAX_WORKERS, NOTES_CACHE_MAX_SIZE,
+                                    NOTES_CACHE_TTL_SECONDS, NOTES_CONTENT_BUCKET_NAME, NOTES_CONTENT_CODEC, NOTES_CONTENT_DEDUP_ENABLED,
+                                    NOTES_IDEMPOTENCY_IN_PROGRESS_TIMEOUT_SECONDS, NOTES_IDEMPOTENCY_TTL_SECONDS, NOTES_INGESTION_MAX_MESSAGE_SIZE,
+                                    NOTES_INGESTION_QUEUE_URL, NOTES_ORPHAN_GRACE_PERIOD_SECONDS, NOTES_SEARCH_CACHE_DIR, NOTES_SEARCH_ENABLED,
+                                    NOTES_SEARCH_MANIFEST_TTL_SECONDS,
+                                    create_aws_client, create_aws_resource, get_aws_client_config)
+from mynotes.core.architecture import ObjectStore
+from mynotes.core.idempotency import IdempotencyStore
+from mynotes.core.ingestion import NoteIngestion, NoteQueue
+from mynotes.core.notes import ContentReferenceRepository, NoteRepository, NoteUseCases
+from mynotes.core.search.index import SearchIndex
+from mynotes.core.sweeper import OrphanContentSweeper
+
+if TYPE_CHECKING:
+    # asyncio is only imported by the async handlers
+    from mynotes.core.async_notes import AsyncNoteUseCases
+
+
+class ApplicationContainer:
+    """
+    Per-process holder for the objects used by the Lambda handlers.
+
+    Nothing is built at import time: AWS clients, adapters and use cases are created (and their
+    heavy modules, like boto3 and pynamodb, imported) the first time a handler needs them, and
+    then reused across warm invocations.
+    """
+    # Endpoint of the asynchronous AWS clients (e.g. Localstack or a moto server), AWS itself by default
+    aws_endpoint_url: Optional[str] = LOCALSTACK_ENDPOINT
+
+    @functools.cached_property
+    def s3_resource(self) -> Any:
+        return create_aws_resource("s3")
+
+    @functools.cached_property
+    def object_store(self) -> ObjectStore:
+        from mynotes.adapter.s3_bucket_adapter import S3BucketAdapter
+        from mynotes.core.compression import get_codec
+
+        return S3BucketAdapter(self.s3_resource, NOTES_CONTENT_BUCKET_NAME, get_codec(NOTES_CONTENT_CODEC))
+
+    @functools.cached_property
+    def note_repository(self) -> NoteRepository:
+        from mynotes.adapter.notes_adapter import DynamoDBNoteRepository
+
+        note_repository = DynamoDBNoteRepository()
+        if NOTES_CACHE_MAX_SIZE > 0:
+            from mynotes.adapter.cached_notes_adapter import CachedNoteRepository
+
+            note_repository = CachedNoteRepository(note_repository, NOTES_CACHE_MAX_SIZE, NOTES_CACHE_TTL_SECONDS)
+
+        return note_repository
+
+    @functools.cached_property
+    def content_references(self) -> Optional[ContentReferenceRepository]:
+        if not NOTES_CONTENT_DEDUP_ENABLED:
+            return None
+
+        from mynotes.adapter.notes_adapter import DynamoDBContentReferenceRepository
+
+        return DynamoDBContentReferenceRepository()
+
+    @functools.cached_property
+    def idempotency_store(self) -> IdempotencyStore:
+        from mynotes.adapter.idempotency_adapter import DynamoDBIdempotencyStore
+
+        return DynamoDBIdempotencyStore(
+            timedelta(seconds=NOTES_IDEMPOTENCY_TTL_SECONDS),
+            timedelta(seconds=NOTES_IDEMPOTENCY_IN_PROGRESS_TIMEOUT_SECONDS)
+        )
+
+    @functools.cached_property
+    def search_index(self) -> Optional[SearchIndex]:
+        if not NOTES_SEARCH_ENABLED:
+            return None
+
+        return SearchIndex(self.object_store, NOTES_SEARCH_CACHE_DIR or None, NOTES_SEARCH_MANIFEST_TTL_SECONDS)
+
+    @functools.cached_property
+    def usecase(self) -> NoteUseCases:
+        return NoteUseCases(self.object_store, self.note_repository, NOTES_BATCH_UPLOAD_MAX_WORKERS, self.search_index, self.content_references)
+
+    @functools.cached_property
+    def note_queue(self) -> NoteQueue:
+        from mynotes.adapter.sqs_queue_adapter import SQSNoteQueue
+
+        return SQSNoteQueue(create_aws_client("sqs"), NOTES_INGESTION_QUEUE_URL)
+
+    @functools.cached_property
+    def ingestion(self) -> NoteIngestion:
+        return NoteIngestion(self.usecase, self.note_queue, NOTES_INGESTION_MAX_MESSAGE_SIZE)
+
+    @functools.cached_property
+    def sweeper(self) -> OrphanContentSweeper:
+        return OrphanContentSweeper(
+            self.object_store,
+            self.note_repository,
+            timedelta(seconds=NOTES_ORPHAN_GRACE_PERIOD_SECONDS)
+        )
+
+    @functools.cached_property
+    def aio_session(self) -> Any:
+        """The aiobotocore session: service models are loaded once, then shared by the clients of all invocations"""
+        from aiobotocore.session import get_session
+
+        return get_session()
+
+    @contextlib.asynccontextmanager
+    async def async_usecase(self) -> AsyncIterator["AsyncNoteUseCases"]:
+        """
+        Async use cases, on clients bound to the running event loop: they are closed when the block ends,
+        since every invocation runs its own loop.
+        """
+        from mynotes.adapter.async_notes_adapter import AsyncDynamoDBNoteRepository
+        from mynotes.adapter.async_s3_bucket_adapter import AsyncS3BucketAdapter
+        from mynotes.core.async_notes import AsyncNoteUseCases
+        from mynotes.core.compression import get_codec
+
+        async with contextlib.AsyncExitStack() as clients:
+            s3_client, dynamodb_client = [
+                await clients.enter_async_context(
+                    self.aio_session.create_client(service_name, region_name=AWS_REGION, endpoint_url=self.aws_endpoint_url,
+                                                   config=get_aws_client_config())
+                )
+                for service_name in ("s3", "dynamodb")
+            ]
+            yield AsyncNoteUseCases(
+                AsyncS3BucketAdapter(s3_client, NOTES_CONTENT_BUCKET_NAME, get_codec(NOTES_CONTENT_CODEC)),
+                AsyncDynamoDBNoteRepository(dynamodb_client),
+                self.search_index,
+                self.content_references
+            )
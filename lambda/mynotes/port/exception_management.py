@@ -1,12 +1,15 @@
 import functools
 from typing import Dict, Any
 
-from mynotes.core.architecture import ApplicationException, ResourceNotFoundException, ValidationException
+from mynotes.core.architecture import ApplicationException, FeatureNotEnabledException, ResourceNotFoundException, ValidationException
+from mynotes.core.idempotency import IdempotencyConflictException
 from mynotes.port.lambda_utils import to_json_response
 
 INTERNAL_ERROR_CODE = "err-0000"
 RESOURCE_NOT_FOUND_ERROR_CODE = "err-0001"
 VALIDATION_ERROR_CODE = "err-0002"
+CONFLICT_ERROR_CODE = "err-0003"
+NOT_ENABLED_ERROR_CODE = "err-0004"
 
 def on_resource_not_found_exception(e: ResourceNotFoundException) -> Dict[str,Any]:
     return to_json_response(object_body={
@@ -20,6 +23,18 @@ def on_validation_exception(e: ValidationException) -> Dict[str,Any]:
         "error_code": VALIDATION_ERROR_CODE
     }, http_status_code=400)
 
+def on_idempotency_conflict_exception(e: IdempotencyConflictException) -> Dict[str,Any]:
+    return to_json_response(object_body={
+        "error_message": f"A request with idempotency key {e.key} is still in progress, retry later!",
+        "error_code": CONFLICT_ERROR_CODE
+    }, http_status_code=409)
+
+def on_feature_not_enabled_exception(e: FeatureNotEnabledException) -> Dict[str,Any]:
+    return to_json_response(object_body={
+        "error_message": f"The {e.feature} feature is not enabled!",
+        "error_code": NOT_ENABLED_ERROR_CODE
+    }, http_status_code=501)
+
 def on_application_exception(e: ApplicationException) -> Dict[str,Any]:
     return to_json_response(object_body={
         "error_message": f"Internal error: {str(e)}!",
@@ -35,6 +50,10 @@ def with_exception_management(wrapped_function) -> Dict[str, Any]:
             lambda_response = on_resource_not_found_exception(rnfe)
         except ValidationException as ve:
             lambda_response = on_validation_exception(ve)
+        except IdempotencyConflictException as ice:
+            lambda_response = on_idempotency_conflict_exception(ice)
+        except FeatureNotEnabledException as fne:
+            lambda_response = on_feature_not_enabled_exception(fne)
         except ApplicationException as ae:
             lambda_response = on_application_exception(ae)
         return lambda_response
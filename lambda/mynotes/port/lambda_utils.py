@@ -1,10 +1,12 @@
 import functools
 import json
-import jsons
-from typing import Dict, Optional, Any
+import re
+from datetime import datetime, timezone
+from typing import Dict, Optional, Any, Tuple, Union
 import base64
 
-from mynotes.core.architecture import ApplicationException, ResourceNotFoundException, ValidationException
+from mynotes.core.architecture import ApplicationException, ResourceNotFoundException, ValidationException, timed
+from mynotes.port import serialization
 
 def get_path_parameter(event, param_name: str) -> Optional[str]:
     """Returns the value for the specified path parameter
@@ -45,6 +47,176 @@ def get_path_parameter_with_default(event, param_name: str, default_value: str =
 
     return default_value
 
+def get_query_string_parameter_with_default(event, param_name: str, default_value: str = None) -> Optional[str]:
+    """Returns the value for the specified query string parameter or the 'default_value' if not found
+    
+    Args:
+        event: the AWS Lambda event (usually Application Gateway event)
+        param_name: the name of the query string parameter
+        default_value: the default value for the parameter
+
+    Returns:
+        the value in the event object of the specified query string parameter
+    """
+    map = event.get("queryStringParameters")
+    if map:
+        return map.get(param_name, default_value)
+
+    return default_value
+
+def get_int_query_string_parameter(event, param_name: str, default_value: int = None) -> Optional[int]:
+    """Returns the value for the specified query string parameter as an integer or the 'default_value' if not found
+    
+    Args:
+        event: the AWS Lambda event (usually Application Gateway event)
+        param_name: the name of the query string parameter
+        default_value: the default value for the parameter
+
+    Returns:
+        the integer value in the event object of the specified query string parameter
+    Throws:
+        ValidationException if the value is not an integer
+    """
+    value = get_query_string_parameter_with_default(event, param_name)
+    if value is None or value == "":
+        return default_value
+
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationException(param_name, "An integer value is required")
+
+# Accepted spellings for boolean query string parameters
+TRUE_VALUES = {"true", "1", "yes"}
+FALSE_VALUES = {"false", "0", "no"}
+
+def get_bool_query_string_parameter(event, param_name: str, default_value: bool = False) -> bool:
+    """Returns the value for the specified query string parameter as a boolean or the 'default_value' if not found
+    
+    Args:
+        event: the AWS Lambda event (usually Application Gateway event)
+        param_name: the name of the query string parameter
+        default_value: the default value for the parameter
+
+    Returns:
+        the boolean value in the event object of the specified query string parameter
+    Throws:
+        ValidationException if the value is not a boolean
+    """
+    value = get_query_string_parameter_with_default(event, param_name)
+    if value is None or value == "":
+        return default_value
+
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValidationException(param_name, "A boolean value ('true' or 'false') is required")
+
+def get_datetime_query_string_parameter(event, param_name: str) -> Optional[datetime]:
+    """Returns the value for the specified query string parameter as a datetime, or None if not found.
+    Values are ISO 8601 strings ('2022-03-01', '2022-03-01T10:00:00Z', ...); times without offset are taken as UTC.
+    
+    Args:
+        event: the AWS Lambda event (usually Application Gateway event)
+        param_name: the name of the query string parameter
+
+    Returns:
+        the (timezone aware) datetime in the event object of the specified query string parameter
+    Throws:
+        ValidationException if the value is not an ISO 8601 date or time
+    """
+    value = get_query_string_parameter_with_default(event, param_name)
+    if not value:
+        return None
+
+    value = value.strip()
+    # datetime.fromisoformat() does not accept the 'Z' suffix before Python 3.11
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+
+    try:
+        parsed_value = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValidationException(param_name, "An ISO 8601 date or time is required")
+
+    if not parsed_value.tzinfo:
+        parsed_value = parsed_value.replace(tzinfo=timezone.utc)
+    return parsed_value
+
+def get_header(event, header_name: str) -> Optional[str]:
+    """Returns the value for the specified HTTP header (case-insensitive) or None if not found
+    
+    Args:
+        event: the AWS Lambda event (usually Application Gateway event)
+        header_name: the name of the header
+
+    Returns:
+        the value in the event object of the specified header
+    """
+    map = event.get("headers")
+    if map:
+        header_name = header_name.lower()
+        for name, value in map.items():
+            if name.lower() == header_name:
+                return value
+
+    return None
+
+# Supported 'Range' header values: 'bytes=<start>-<end>' or 'bytes=<start>-'
+BYTE_RANGE_PATTERN = re.compile(r"^bytes=(\d+)-(\d*)$")
+
+def get_byte_range(event, max_range_size: int) -> Optional[Tuple[int, int]]:
+    """Returns the byte range requested through the 'Range' header, if any
+    
+    Args:
+        event: the AWS Lambda event (usually Application Gateway event)
+        max_range_size: ranges are shortened (or open ranges closed) so that they do not exceed this number of bytes
+
+    Returns:
+        a tuple with the first and last (included) byte of the range, or None if there is no 'Range' header
+    Throws:
+        ValidationException if the header is not a single byte range
+    """
+    range_header = get_header(event, "Range")
+    if not range_header:
+        return None
+
+    match = BYTE_RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        raise ValidationException("Range", "Only single byte ranges like 'bytes=0-1023' are supported")
+
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else None
+    if end is not None and end < start:
+        raise ValidationException("Range", "The end of the range must not precede its start")
+
+    max_end = start + max_range_size - 1
+    return start, min(end, max_end) if end is not None else max_end
+
+def is_not_modified(event, etag: str) -> bool:
+    """Tells whether the 'If-None-Match' header of the request matches the given entity tag,
+    that is whether the client already has the current representation of the resource
+    
+    Args:
+        event: the AWS Lambda event (usually Application Gateway event)
+        etag: the (quoted) entity tag of the current representation
+
+    Returns:
+        True if a '304 Not Modified' response can be returned
+    """
+    if_none_match = get_header(event, "If-None-Match")
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    # Weak comparison, as required for If-None-Match
+    requested_etags = {tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")}
+    return etag.replace("W/", "", 1) in requested_etags
+
 def get_json_body(event) -> Optional[Dict[str, Any]]:
     """Return the body as JSON object, if present; otherwise it will return None
     
@@ -65,6 +237,7 @@ def get_json_body(event) -> Optional[Dict[str, Any]]:
         return json.loads(body)
     return None
 
+@timed("to_json_response")
 def to_json_response(object_body: Any, http_status_code: int = 200, headers = None) -> Dict[str, Any]:
     """Wraps the inputs into an object that can be returned as part of AWS Lambda's execution using 
     the content type 'application/json'
@@ -82,7 +255,7 @@ def to_json_response(object_body: Any, http_status_code: int = 200, headers = No
         "headers": {
             "Content-Type": "application/json",
         },
-        "body": jsons.dumps(object_body)
+        "body": serialization.dumps(object_body)
     }
 
     if headers:
@@ -90,6 +263,52 @@ def to_json_response(object_body: Any, http_status_code: int = 200, headers = No
     
     return json_response
 
+def to_content_response(body: Union[str, bytes], http_status_code: int = 200, content_type: str = "text/markdown; charset=utf-8", headers = None) -> Dict[str, Any]:
+    """Wraps raw content into an object that can be returned as part of AWS Lambda's execution.
+    Binary content is Base64 encoded, as required by API Gateway.
+
+    Args:
+        body: the text or bytes to return
+        http_status_code: the HTTP status code that will be associated with this response
+        content_type: the content type of the body
+        headers: any additional header
+
+    Returns:
+        a wrapper dict that can be used as return value in AWS Lambda execution
+    """
+    is_base64_encoded = isinstance(body, bytes)
+
+    content_response = {
+        "statusCode": http_status_code,
+        "headers": {
+            "Content-Type": content_type,
+        },
+        "body": base64.b64encode(body).decode("utf-8") if is_base64_encoded else body,
+        "isBase64Encoded": is_base64_encoded
+    }
+
+    if headers:
+        content_response["headers"].update(headers)
+
+    return content_response
+
+def to_not_modified_response(etag: str) -> Dict[str, Any]:
+    """Returns a '304 Not Modified' response, with an empty body, for the given entity tag
+
+    Args:
+        etag: the (quoted) entity tag of the current representation
+
+    Returns:
+        a wrapper dict that can be used as return value in AWS Lambda execution
+    """
+    return {
+        "statusCode": 304,
+        "headers": {
+            "ETag": etag,
+        },
+        "body": ""
+    }
+
 def with_cors_headers(wrapped_function) -> Dict[str, Any]:
     @functools.wraps(wrapped_function)
     def apply_cors_headers(*args, **kwargs) -> Dict[str, Any]:
@@ -0,0 +1,69 @@
+"""
+Per-invocation timing metrics, written to CloudWatch with the Embedded Metric Format (EMF):
+https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+"""
+import functools
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List, TextIO
+
+from mynotes.adapter.config import NOTES_METRICS_ENABLED, NOTES_METRICS_NAMESPACE
+from mynotes.core.architecture import MetricsSink, instrumentation
+
+# EMF accepts at most 100 values for a metric in a single line
+MAX_VALUES_PER_METRIC = 100
+
+class EmbeddedMetricFormatSink(MetricsSink):
+    """Writes the timings as one EMF line (CloudWatch Logs turns it into metrics)"""
+    def __init__(self, namespace: str = NOTES_METRICS_NAMESPACE, stream: TextIO = None) -> None:
+        """
+        Args:
+            namespace: the CloudWatch namespace of the metrics
+            stream: where lines are written (standard output by default, that is the function log)
+        """
+        self.namespace = namespace
+        self.stream = stream
+
+    def emit(self, timings: Dict[str, List[float]], dimensions: Dict[str, str]) -> None:
+        document = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": [list(dimensions)],
+                    "Metrics": [{"Name": name, "Unit": "Milliseconds"} for name in timings]
+                }]
+            },
+            **dimensions,
+            **{name: [round(duration, 3) for duration in durations[:MAX_VALUES_PER_METRIC]] for name, durations in timings.items()}
+        }
+        stream = self.stream or sys.stdout
+        stream.write(json.dumps(document) + "\n")
+        stream.flush()
+
+def with_invocation_metrics(handler: Callable[[Dict[str, Any], Any], Dict[str, Any]]) -> Callable[[Dict[str, Any], Any], Dict[str, Any]]:
+    """
+    Emit the timings recorded while a Lambda handler runs, with the handler name as dimension,
+    plus the duration of the whole invocation.
+    """
+    handler_name = handler.__name__
+
+    @functools.wraps(handler)
+    def measure_invocation(event, context) -> Dict[str, Any]:
+        if not instrumentation.enabled:
+            return handler(event, context)
+
+        # Leftovers of previous invocations (e.g. background threads) are not counted
+        instrumentation.reset()
+        start = time.perf_counter()
+        try:
+            return handler(event, context)
+        finally:
+            instrumentation.record("Invocation", 1000 * (time.perf_counter() - start))
+            instrumentation.flush({"Handler": handler_name})
+
+    return measure_invocation
+
+if NOTES_METRICS_ENABLED:
+    instrumentation.enable(EmbeddedMetricFormatSink())
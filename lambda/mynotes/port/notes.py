@@ -1,23 +1,31 @@
-import json
-
-import boto3
-from mynotes.adapter.config import NOTES_CONTENT_BUCKET_NAME
-from mynotes.adapter.notes_adapter import DynamoDBNoteRepository
-from mynotes.adapter.s3_bucket_adapter import S3BucketAdapter
-from mynotes.core.architecture import User
-from mynotes.core.notes import NoteUseCases
+
+from typing import TYPE_CHECKING, Awaitable, Callable
+
+from mynotes.adapter.config import (NOTES_BATCH_MAX_SIZE, NOTES_BULK_DELETE_MAX_SIZE, NOTES_CONTENT_MAX_RANGE_SIZE,
+                                    NOTES_ASYNC_INGESTION_ENABLED, NOTES_IDEMPOTENCY_WAIT_SECONDS, NOTES_LIST_MAX_PAGE_SIZE, NOTES_MULTI_GET_MAX_SIZE, NOTES_SEARCH_MAX_RESULTS,
+                                    NOTES_TAG_QUERY_MAX_TAGS)
+from mynotes.core.architecture import DataPageQuery, T, User, ValidationException
+from mynotes.core.idempotency import get_request_fingerprint, run_idempotently
+from mynotes.core.notes import TAG_MATCH_ALL, Note, NoteCreationRequest, NoteType
+from mynotes.core.search.index import DEFAULT_SEARCH_LIMIT
 from mynotes.port import lambda_utils
+from mynotes.port.container import ApplicationContainer
 from mynotes.port.exception_management import with_exception_management
+from mynotes.port.metrics import with_invocation_metrics
+from mynotes.port.request_logging import with_request_logging
 
-object_store = S3BucketAdapter(
-    boto3.resource("s3"),
-    NOTES_CONTENT_BUCKET_NAME
-)
+if TYPE_CHECKING:
+    from mynotes.core.async_notes import AsyncNoteUseCases
 
-note_repository = DynamoDBNoteRepository()
+# Lazily initialized: clients are created by the first invocation that needs them
+container = ApplicationContainer()
 
-usecase = NoteUseCases(object_store, note_repository)
+# Client-generated key making note creations safe to retry (the 'id' of the request body is used if missing)
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
 
+@with_request_logging
+@with_invocation_metrics
 @with_exception_management
 def handler_create_note(event, context) -> dict:
     """Handler for creating a new note.
@@ -28,24 +36,70 @@ def handler_create_note(event, context) -> dict:
     Returns:
         a dict suitable as AWS Lambda response
     """
-    print(json.dumps(event))
-
     json_body = lambda_utils.get_json_body(event)
-    id = json_body.get("id", None)
     content = json_body.get("content")    
     tags = json_body.get("tags", None)
 
     # TODO Get user from authentication
     username = "mario"
 
-    note = usecase.create_note(
+    def create_note() -> dict:
+        if NOTES_ASYNC_INGESTION_ENABLED:
+            note = container.ingestion.submit_note(User(username), content, tags)
+            if note:
+                # Accepted: the note is created later, by handler_ingest_notes()
+                return lambda_utils.to_json_response(note, http_status_code=202)
+
+
+        note = container.usecase.create_note(
+            User(username),
+            content,
+            tags
+        )
+        return lambda_utils.to_json_response(note)
+
+    # Retries (e.g. after a timeout) don't create the note again
+    return _run_idempotently(event, json_body, "create_note", username, create_note)
+
+@with_request_logging
+@with_invocation_metrics
+@with_exception_management
+def handler_create_notes_batch(event, context) -> dict:
+    """Handler for creating several notes at once (POST /note/batch).
+    Args:
+        event: the AWS Lambda event
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict suitable as AWS Lambda response, with one result per requested note
+    """
+    json_body = lambda_utils.get_json_body(event) or {}
+    notes = json_body.get("notes")
+
+    if not notes or not isinstance(notes, list):
+        raise ValidationException("notes", "A non-empty list of notes is required")
+    if len(notes) > NOTES_BATCH_MAX_SIZE:
+        raise ValidationException("notes", f"At most {NOTES_BATCH_MAX_SIZE} notes can be created in a single batch")
+
+    note_requests = [
+        NoteCreationRequest(note.get("content"), note.get("tags")) if isinstance(note, dict) else NoteCreationRequest(None)
+        for note in notes
+    ]
+
+    # TODO Get user from authentication
+    username = "mario"
+
+    results = container.usecase.create_notes(
         User(username),
-        content,
-        tags
+        note_requests
     )
 
-    return lambda_utils.to_json_response(note)
+    return lambda_utils.to_json_response({
+        "items": results
+    })
 
+@with_request_logging
+@with_invocation_metrics
 @with_exception_management
 def handler_find_by_id(event, context) -> dict:
     """Handler for returning a note by its id.
@@ -56,14 +110,188 @@ def handler_find_by_id(event, context) -> dict:
     Returns:
         a dict suitable as AWS Lambda response
     """
-    print(json.dumps(event))
+    id = lambda_utils.get_path_parameter(event, "id")
+
+    # Cached metadata may be stale (the note may have been changed by another function): 304 is only answered
+    # after reading the latest ones
+    note = container.usecase.find_note_by_id(id, revalidate=_is_conditional(event))
+
+    # Checked before serializing anything: unchanged notes only cost the metadata read
+    etag = _get_note_etag(note)
+    if lambda_utils.is_not_modified(event, etag):
+        return lambda_utils.to_not_modified_response(etag)
 
+    return lambda_utils.to_json_response(note, headers={"ETag": etag})
+
+@with_request_logging
+@with_invocation_metrics
+@with_exception_management
+def handler_get_content(event, context) -> dict:
+    """Handler for returning the Markdown content of a note (GET /note/{id}/content).
+    A 'Range' header can be used to read large notes a piece at a time.
+    Args:
+        event: the AWS Lambda event
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict suitable as AWS Lambda response
+    """
     id = lambda_utils.get_path_parameter(event, "id")
+    byte_range = lambda_utils.get_byte_range(event, NOTES_CONTENT_MAX_RANGE_SIZE)
+
+    note = container.usecase.find_note_by_id(id, revalidate=_is_conditional(event))
+
+    # Checked before reading the content: unchanged notes only cost the metadata read and a HEAD request
+    etag = _get_note_etag(note, container.usecase.get_note_content_etag(id, note))
+    if lambda_utils.is_not_modified(event, etag):
+        return lambda_utils.to_not_modified_response(etag)
+
+    if not byte_range:
+        # The whole content is held in memory, but is bounded anyway by the size of Lambda responses (6 MB):
+        # larger notes are read with a 'Range' header
+        content = container.usecase.load_note_content(id, note)
+        return lambda_utils.to_content_response(content, headers={"ETag": etag})
+
+    start, end = byte_range
+    content = container.usecase.load_note_content_range(id, start, end, note)
+    if not content:
+        return lambda_utils.to_content_response(b"", 416, headers={"Content-Range": "bytes */*"})
+
+    return lambda_utils.to_content_response(content, 206, headers={
+        "Content-Range": f"bytes {start}-{start + len(content) - 1}/*",
+        "ETag": etag
+    })
+
+@with_request_logging
+@with_invocation_metrics
+@with_exception_management
+def handler_find_by_ids(event, context) -> dict:
+    """Handler for returning several notes by their ids (GET /note?ids=id1,id2,...).
+    Args:
+        event: the AWS Lambda event
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict suitable as AWS Lambda response, with the found notes and the ids that were not found
+    """
+    ids_parameter = lambda_utils.get_query_string_parameter_with_default(event, "ids", "")
+    ids = [id.strip() for id in ids_parameter.split(",") if id.strip()]
+
+    if not ids:
+        raise ValidationException("ids", "At least one note id is required")
+    if len(ids) > NOTES_MULTI_GET_MAX_SIZE:
+        raise ValidationException("ids", f"At most {NOTES_MULTI_GET_MAX_SIZE} notes can be requested at once")
+
+    lookup_result = container.usecase.find_notes_by_ids(ids)
+
+    return lambda_utils.to_json_response(lookup_result)
+
+def handler_find_notes(event, context) -> dict:
+    """Handler for GET /note: returns the notes with the ids in 'ids', if set, the notes with the tags in 'tags', if set,
+    or a page of notes of a type otherwise.
+    Args:
+        event: the AWS Lambda event
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict suitable as AWS Lambda response
+    """
+    if lambda_utils.get_query_string_parameter_with_default(event, "ids") is not None:
+        return handler_find_by_ids(event, context)
+    if lambda_utils.get_query_string_parameter_with_default(event, "tags") is not None:
+        return handler_find_by_tags(event, context)
+    return handler_find_all_by_type(event, context)
+
+@with_request_logging
+@with_invocation_metrics
+@with_exception_management
+def handler_find_all_by_type(event, context) -> dict:
+    """Handler for listing the notes of a type (GET /note?type=Q&since=...&until=...&newest_first=true).
+    Supported query string parameters: 'type' (name or code, free notes by default), 'page_size', 'continuation_token',
+    'since' and 'until' (ISO 8601, both included), 'newest_first' and 'summary' (ids and creation times only).
+    Args:
+        event: the AWS Lambda event
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict suitable as AWS Lambda response, with a page of notes and the token for the next one
+    """
+    note_type = _get_note_type(lambda_utils.get_query_string_parameter_with_default(event, "type", NoteType.FREE.value))
+
+    data_page_query = _get_data_page_query(event)
+    data_page_query.since = lambda_utils.get_datetime_query_string_parameter(event, "since")
+    data_page_query.until = lambda_utils.get_datetime_query_string_parameter(event, "until")
+    data_page_query.newest_first = lambda_utils.get_bool_query_string_parameter(event, "newest_first")
+
+    # TODO Get user from authentication
+    username = "mario"
+
+    data_page = container.usecase.find_notes_by_type(
+        User(username),
+        note_type,
+        data_page_query,
+        summary=lambda_utils.get_bool_query_string_parameter(event, "summary")
+    )
+
+    return lambda_utils.to_json_response(data_page)
+
+@with_request_logging
+@with_invocation_metrics
+@with_exception_management
+def handler_find_by_tags(event, context) -> dict:
+    """Handler for listing the notes with some tags (GET /note?tags=tag1,tag2&mode=any).
+    Supported query string parameters: 'tags', 'mode' ('all' tags, the default, or 'any' of them), 'page_size',
+    'continuation_token' and 'summary' (ids and creation times only).
+    Args:
+        event: the AWS Lambda event
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict suitable as AWS Lambda response, with a page of notes and the token for the next one
+    """
+    tags_parameter = lambda_utils.get_query_string_parameter_with_default(event, "tags", "")
+    tags = [tag.strip() for tag in tags_parameter.split(",") if tag.strip()]
+    if len(tags) > NOTES_TAG_QUERY_MAX_TAGS:
+        raise ValidationException("tags", f"At most {NOTES_TAG_QUERY_MAX_TAGS} tags can be queried at once")
+
+    # TODO Get user from authentication
+    username = "mario"
+
+    data_page = container.usecase.find_notes_by_tags(
+        User(username),
+        tags,
+        mode=lambda_utils.get_query_string_parameter_with_default(event, "mode", TAG_MATCH_ALL),
+        data_page_query=_get_data_page_query(event),
+        summary=lambda_utils.get_bool_query_string_parameter(event, "summary")
+    )
+
+    return lambda_utils.to_json_response(data_page)
+
+@with_request_logging
+@with_invocation_metrics
+@with_exception_management
+def handler_search_notes(event, context) -> dict:
+    """Handler for full-text search over the content of notes (GET /note/search?q=words&limit=10).
+    Args:
+        event: the AWS Lambda event
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict suitable as AWS Lambda response, with the matching notes (most relevant first) and their scores
+    """
+    query = lambda_utils.get_query_string_parameter_with_default(event, "q", "")
+    limit = lambda_utils.get_int_query_string_parameter(event, "limit", DEFAULT_SEARCH_LIMIT)
+    if not 0 < limit <= NOTES_SEARCH_MAX_RESULTS:
+        raise ValidationException("limit", f"The limit must be between 1 and {NOTES_SEARCH_MAX_RESULTS}")
 
-    note = usecase.find_note_by_id(id)
+    hits = container.usecase.search_notes(query, limit)
 
-    return lambda_utils.to_json_response(note)
+    return lambda_utils.to_json_response({
+        "items": hits
+    })
 
+@with_request_logging
+@with_invocation_metrics
 @with_exception_management
 def handler_delete_by_id(event, context) -> dict:
     """Handler for deleting a note.
@@ -74,13 +302,272 @@ def handler_delete_by_id(event, context) -> dict:
     Returns:
         a dict suitable as AWS Lambda response
     """
-    print(json.dumps(event))
+    id = lambda_utils.get_path_parameter(event, "id")
+
+    container.usecase.delete_note_by_id(id)
 
+    return {
+        "status": 204
+    }
+
+@with_request_logging
+@with_invocation_metrics
+@with_exception_management
+def handler_delete_notes_batch(event, context) -> dict:
+    """Handler for deleting several notes at once (POST /note/batch/delete).
+    Args:
+        event: the AWS Lambda event
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict suitable as AWS Lambda response, with the deleted ids and the ones that could not be deleted
+    """
+    json_body = lambda_utils.get_json_body(event) or {}
+    ids = json_body.get("ids")
+
+    if not ids or not isinstance(ids, list) or not all(isinstance(id, str) and id for id in ids):
+        raise ValidationException("ids", "A non-empty list of note ids is required")
+    if len(ids) > NOTES_BULK_DELETE_MAX_SIZE:
+        raise ValidationException("ids", f"At most {NOTES_BULK_DELETE_MAX_SIZE} notes can be deleted at once")
+
+    deletion_result = container.usecase.delete_notes_by_ids(ids)
+
+    return lambda_utils.to_json_response(deletion_result)
+
+@with_request_logging
+@with_invocation_metrics
+def handler_sweep_orphan_content(event, context) -> dict:
+    """Handler for deleting note content without metadata (meant to be run on a schedule).
+    Args:
+        event: the AWS Lambda event (set "dry_run" to true to only report orphans)
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict with the number of scanned objects and the orphan keys
+    """
+    sweep_result = container.sweeper.sweep(dry_run=bool(event.get("dry_run", False)))
+
+    return {
+        "scanned": sweep_result.scanned,
+        "orphan_keys": sweep_result.orphan_keys,
+        "failed_keys": sweep_result.failed_keys
+    }
+
+@with_request_logging
+@with_invocation_metrics
+def handler_ingest_notes(event, context) -> dict:
+    """Handler for creating the notes queued by handler_create_note() (SQS event source, reporting batch item failures).
+    Args:
+        event: the AWS Lambda event, with a batch of SQS messages
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict with the ids of the messages to deliver again, the others are deleted from the queue
+    """
+    message_bodies = {record["messageId"]: record["body"] for record in event.get("Records", [])}
+
+    ingestion_result = container.ingestion.ingest(message_bodies)
+
+    return {
+        "batchItemFailures": [{"itemIdentifier": message_id} for message_id in ingestion_result.failed_message_ids]
+    }
+
+@with_request_logging
+@with_invocation_metrics
+def handler_compact_search_index(event, context) -> dict:
+    """Handler for merging the segments of the search index (meant to be run on a schedule).
+    Args:
+        event: the AWS Lambda event
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict with the merged segment keys and the key of the new segment
+    """
+    if not container.search_index:
+        return {"merged_keys": [], "segment_key": None, "failed_keys": []}
+
+    compaction_result = container.search_index.compact()
+
+    return {
+        "merged_keys": compaction_result.merged_keys,
+        "segment_key": compaction_result.segment_key,
+        "failed_keys": compaction_result.failed_keys
+    }
+
+@with_request_logging
+@with_invocation_metrics
+@with_exception_management
+def handler_create_note_async(event, context) -> dict:
+    """Handler for creating a new note, like handler_create_note(), with the content upload and the metadata save
+    awaited concurrently on an event loop.
+    Args:
+        event: the AWS Lambda event
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict suitable as AWS Lambda response
+    """
+    json_body = lambda_utils.get_json_body(event)
+    content = json_body.get("content")
+    tags = json_body.get("tags", None)
+
+    # TODO Get user from authentication
+    username = "mario"
+
+    def create_note() -> dict:
+        note = _run_with_async_usecase(lambda usecase: usecase.create_note(User(username), content, tags))
+        return lambda_utils.to_json_response(note)
+
+    # Same idempotency keys as handler_create_note()
+    return _run_idempotently(event, json_body, "create_note", username, create_note)
+
+@with_request_logging
+@with_invocation_metrics
+@with_exception_management
+def handler_get_content_async(event, context) -> dict:
+    """Handler for returning the Markdown content of a note, like handler_get_content(). Metadata, content tag
+    and (unless the request is conditional or ranged) content are read concurrently, in a single round trip.
+    Args:
+        event: the AWS Lambda event
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict suitable as AWS Lambda response
+    """
     id = lambda_utils.get_path_parameter(event, "id")
+    byte_range = lambda_utils.get_byte_range(event, NOTES_CONTENT_MAX_RANGE_SIZE)
+    # Conditional requests are often answered with 304: the content is read only once the tag is checked
+    load_content = not byte_range and not lambda_utils.get_header(event, "If-None-Match")
+
+    async def get_content(usecase: "AsyncNoteUseCases") -> dict:
+        lookup = await usecase.find_note_content(id, load_content)
+
+        etag = _get_note_etag(lookup.note, lookup.content_etag)
+        if lambda_utils.is_not_modified(event, etag):
+            return lambda_utils.to_not_modified_response(etag)
+
+        if not byte_range:
+            content = lookup.content if load_content else await usecase.load_note_content(id)
+            return lambda_utils.to_content_response(content, headers={"ETag": etag})
+
+        start, end = byte_range
+        content = await usecase.load_note_content_range(id, start, end)
+        if not content:
+            return lambda_utils.to_content_response(b"", 416, headers={"Content-Range": "bytes */*"})
+
+        return lambda_utils.to_content_response(content, 206, headers={
+            "Content-Range": f"bytes {start}-{start + len(content) - 1}/*",
+            "ETag": etag
+        })
+
+    return _run_with_async_usecase(get_content)
+
+@with_request_logging
+@with_invocation_metrics
+@with_exception_management
+def handler_find_by_ids_async(event, context) -> dict:
+    """Handler for returning several notes by their ids, like handler_find_by_ids(), with the lookups of each
+    chunk of 100 ids sent concurrently.
+    Args:
+        event: the AWS Lambda event
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict suitable as AWS Lambda response, with the found notes and the ids that were not found
+    """
+    ids_parameter = lambda_utils.get_query_string_parameter_with_default(event, "ids", "")
+    ids = [id.strip() for id in ids_parameter.split(",") if id.strip()]
+
+    if not ids:
+        raise ValidationException("ids", "At least one note id is required")
+    if len(ids) > NOTES_MULTI_GET_MAX_SIZE:
+        raise ValidationException("ids", f"At most {NOTES_MULTI_GET_MAX_SIZE} notes can be requested at once")
+
+    lookup_result = _run_with_async_usecase(lambda usecase: usecase.find_notes_by_ids(ids))
 
-    usecase.delete_note_by_id(id)
+    return lambda_utils.to_json_response(lookup_result)
+
+@with_request_logging
+@with_invocation_metrics
+@with_exception_management
+def handler_delete_by_id_async(event, context) -> dict:
+    """Handler for deleting a note, like handler_delete_by_id(), with metadata and content deleted concurrently.
+    Args:
+        event: the AWS Lambda event
+        context: the AWS Lambda execution context
+    
+    Returns:
+        a dict suitable as AWS Lambda response
+    """
+    id = lambda_utils.get_path_parameter(event, "id")
+
+    _run_with_async_usecase(lambda usecase: usecase.delete_note_by_id(id))
 
     return {
         "status": 204
     }
 
+def _run_idempotently(event, json_body: dict, operation_name: str, username: str, handle: Callable[[], dict]) -> dict:
+    """
+    Returns the response of the handling function, which runs once per idempotency key of the user, if the
+    request has one: the retries get the recorded response, with an 'Idempotent-Replayed' header.
+    """
+    key = lambda_utils.get_header(event, IDEMPOTENCY_KEY_HEADER) or json_body.get("id")
+    if not key:
+        return handle()
+    if not isinstance(key, str) or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise ValidationException(IDEMPOTENCY_KEY_HEADER, f"A string of at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters is required")
+
+    response, replayed = run_idempotently(
+        container.idempotency_store,
+        f"{operation_name}#{username}#{key}",
+        get_request_fingerprint(json_body),
+        handle,
+        NOTES_IDEMPOTENCY_WAIT_SECONDS
+    )
+    if replayed:
+        response = dict(response, headers=dict(response.get("headers") or {}, **{"Idempotent-Replayed": "true"}))
+
+    return response
+
+def _run_with_async_usecase(handle: Callable[["AsyncNoteUseCases"], Awaitable[T]]) -> T:
+    """Runs the async part of a handler on a new event loop (one per invocation), with use cases bound to that loop"""
+    # Only the async handlers pay for importing asyncio
+    import asyncio
+
+    async def run() -> T:
+        async with container.async_usecase() as usecase:
+            return await handle(usecase)
+
+    return asyncio.run(run())
+
+def _get_data_page_query(event) -> DataPageQuery:
+    """Page size and continuation token of a listing request"""
+    page_size = lambda_utils.get_int_query_string_parameter(event, "page_size", DataPageQuery.page_size)
+    if not 0 < page_size <= NOTES_LIST_MAX_PAGE_SIZE:
+        raise ValidationException("page_size", f"The page size must be between 1 and {NOTES_LIST_MAX_PAGE_SIZE}")
+
+    return DataPageQuery(
+        page_size = page_size,
+        continuation_token = lambda_utils.get_query_string_parameter_with_default(event, "continuation_token")
+    )
+
+def _get_note_type(value: str) -> NoteType:
+    """Parses a note type given either by name ('QUESTION') or by code ('Q')"""
+    value = value.strip().upper()
+    if value in NoteType.__members__:
+        return NoteType[value]
+    try:
+        return NoteType(value)
+    except ValueError:
+        raise ValidationException("type", f"Unsupported note type, use one of {', '.join(NoteType.__members__)}")
+
+def _is_conditional(event) -> bool:
+    return lambda_utils.get_header(event, "If-None-Match") is not None
+
+def _get_note_etag(note: Note, content_etag: str = None) -> str:
+    """Entity tag for a note: metadata changes bump the note version, content changes the content tag"""
+    etag = f"v{note.version or 0}"
+    if content_etag:
+        etag = f"{etag}-{content_etag}"
+    return f'"{etag}"'
@@ -0,0 +1,136 @@
+"""
+Structured, sampled request logging for the Lambda handlers.
+
+Instead of dumping whole API Gateway events, handlers log one JSON record per request with a summary
+of the request (no body) and the response status. Records of successful requests are sampled with
+a rate that can be set per handler; failed requests (5xx) are always logged.
+"""
+import functools
+import json
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from mynotes.adapter.config import (NOTES_LOG_LEVEL, NOTES_LOG_MAX_ITEMS, NOTES_LOG_MAX_RECORD_SIZE, NOTES_LOG_MAX_VALUE_SIZE,
+                                    NOTES_LOG_REDACTED_FIELDS, NOTES_REQUEST_LOG_SAMPLE_RATE, NOTES_REQUEST_LOG_SAMPLE_RATES)
+
+logger = logging.getLogger("mynotes.request")
+
+REDACTED_VALUE = "***"
+# Responses with this status or above are always logged
+ALWAYS_LOGGED_STATUS_CODE = 500
+
+class StructuredMessage:
+    """
+    A log message made of fields, written as JSON. Formatting is deferred until a handler actually
+    emits the record, so messages filtered out by the log level cost nothing.
+    """
+    def __init__(self, fields: Dict[str, Any], max_size: int = NOTES_LOG_MAX_RECORD_SIZE) -> None:
+        self.fields = fields
+        self.max_size = max_size
+
+    def __str__(self) -> str:
+        text = json.dumps(self.fields, default=str)
+        if len(text) <= self.max_size:
+            return text
+
+        # Only the scalar fields are kept, so that the record is still valid JSON
+        scalar_fields = {name: value for name, value in self.fields.items() if not isinstance(value, (dict, list))}
+        scalar_fields["truncated"] = True
+        return json.dumps(scalar_fields, default=str)
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """
+    Parse per-handler sample rates, e.g. 'handler_find_notes=0.01,handler_create_note=1'.
+
+    Args:
+        value: comma separated 'handler=rate' pairs
+    Returns:
+        the sample rate of each listed handler
+    """
+    sample_rates = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, rate = item.split("=", 1)
+            sample_rates[name.strip()] = float(rate)
+    return sample_rates
+
+_SAMPLE_RATES = parse_sample_rates(NOTES_REQUEST_LOG_SAMPLE_RATES)
+_REDACTED_FIELDS = frozenset(field.strip().lower() for field in NOTES_LOG_REDACTED_FIELDS.split(",") if field.strip())
+
+def get_sample_rate(handler_name: str) -> float:
+    """Fraction of the successful requests of a handler that are logged"""
+    return _SAMPLE_RATES.get(handler_name, NOTES_REQUEST_LOG_SAMPLE_RATE)
+
+def sanitize(values: Optional[Mapping[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Redact sensitive fields (e.g. 'Authorization') and cap the size of the values and the number of items.
+
+    Args:
+        values: headers, path or query string parameters
+    Returns:
+        the values that can be logged
+    """
+    if not values:
+        return None
+
+    sanitized_values = {}
+    for name, value in list(values.items())[:NOTES_LOG_MAX_ITEMS]:
+        if name.lower() in _REDACTED_FIELDS:
+            sanitized_values[name] = REDACTED_VALUE
+        else:
+            sanitized_values[name] = _truncate(value)
+    if len(values) > NOTES_LOG_MAX_ITEMS:
+        sanitized_values["..."] = f"{len(values) - NOTES_LOG_MAX_ITEMS} more"
+    return sanitized_values
+
+def _truncate(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > NOTES_LOG_MAX_VALUE_SIZE:
+        return f"{value[:NOTES_LOG_MAX_VALUE_SIZE]}...(+{len(value) - NOTES_LOG_MAX_VALUE_SIZE})"
+    return value
+
+def get_request_fields(handler_name: str, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Summary of a request: what was called and with which parameters, without the body"""
+    body = event.get("body")
+    request_context = event.get("requestContext") or {}
+    return {
+        "handler": handler_name,
+        "request_id": getattr(context, "aws_request_id", None) or request_context.get("requestId"),
+        "method": event.get("httpMethod"),
+        "resource": event.get("resource"),
+        "path_parameters": sanitize(event.get("pathParameters")),
+        "query": sanitize(event.get("queryStringParameters")),
+        "headers": sanitize(event.get("headers")),
+        "body_size": len(body) if body else 0,
+    }
+
+def with_request_logging(handler: Callable[[Dict[str, Any], Any], Dict[str, Any]]) -> Callable[[Dict[str, Any], Any], Dict[str, Any]]:
+    """
+    Log a structured record for a sample of the requests of a Lambda handler (all failed requests
+    are logged). Put it above 'with_exception_management', so that the response status is known.
+    """
+    handler_name = handler.__name__
+
+    @functools.wraps(handler)
+    def log_request(event, context) -> Dict[str, Any]:
+        is_sampled = random.random() < get_sample_rate(handler_name)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = handler(event, context)
+            return response
+        finally:
+            # Scheduled handlers return no status code, and no response at all means an exception was raised
+            status_code = response.get("statusCode") if isinstance(response, dict) else None
+            is_failed = response is None or (status_code or 0) >= ALWAYS_LOGGED_STATUS_CODE
+            level = logging.ERROR if is_failed else logging.INFO
+            if (is_sampled or is_failed) and logger.isEnabledFor(level):
+                fields = get_request_fields(handler_name, event or {}, context)
+                fields["status"] = status_code
+                fields["duration_ms"] = round(1000 * (time.perf_counter() - start), 1)
+                logger.log(level, StructuredMessage(fields))
+
+    return log_request
+
+logging.getLogger("mynotes").setLevel(NOTES_LOG_LEVEL)
@@ -0,0 +1,187 @@
+"""
+JSON serialization of API responses.
+
+Encoders turn a value into plain dicts, lists and scalars: the encoder of a class is compiled once,
+from its type hints, and reused for every instance. The output is the same as 'jsons.dumps',
+which was used before (attributes sorted by name, enum names, RFC 3339 date times).
+"""
+import enum
+import functools
+import json
+import threading
+import typing
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+from mynotes.adapter.config import NOTES_JSON_BACKEND
+
+# JSON backends: the json module writes exactly what jsons used to write, orjson is faster but
+# writes the same documents without whitespace and with non-ASCII characters as they are
+JSON_BACKEND = "json"
+ORJSON_BACKEND = "orjson"
+
+# Converts a value into something that the JSON backend can serialize as is
+Encoder = Callable[[Any], Any]
+
+_JSON_SCALAR_TYPES = (str, int, bool, type(None))
+
+def _identity(value: Any) -> Any:
+    return value
+
+def encode_datetime(value: datetime) -> str:
+    """RFC 3339 representation: 'Z' suffix for UTC, no fractional part when there are no microseconds"""
+    # Like jsons, the fractional part is only written when there are microseconds
+    text = value.replace(tzinfo=None).isoformat()
+
+    tzinfo = value.tzinfo
+    if tzinfo is timezone.utc:
+        return text + "Z"
+    if tzinfo is None:
+        # Like jsons: naive date times are local times, and the offset of local times is always reported as UTC
+        return text + "+00:00"
+    if tzinfo.tzname(None) in ("UTC", "UTC+00:00"):
+        return text + "Z"
+
+    offset_seconds = (tzinfo.utcoffset(None) or tzinfo.utcoffset(value)).total_seconds()
+    offset_hours = abs(int(offset_seconds / 3600))
+    offset_minutes = abs(int((offset_seconds / 60) % 60))
+    return f"{text}{'+' if offset_seconds > 0 else '-'}{offset_hours:02}:{offset_minutes:02}"
+
+def _encode_enum(value: enum.Enum) -> str:
+    return value.name
+
+def _encode_float(value: Any) -> Any:
+    return float(value) if value is not None else None
+
+class SerializerRegistry:
+    """
+    Encoders by type. Encoders of classes are compiled from the type hints of their attributes
+    the first time an instance is serialized.
+    """
+    def __init__(self) -> None:
+        self.encoders: Dict[type, Encoder] = {
+            str: _identity,
+            int: _identity,
+            bool: _identity,
+            float: _identity,
+            type(None): _identity,
+            datetime: encode_datetime,
+            dict: self._encode_dict,
+            list: self._encode_sequence,
+            tuple: self._encode_sequence,
+            set: self._encode_sequence,
+            frozenset: self._encode_sequence,
+        }
+        self.lock = threading.Lock()
+
+    def register(self, value_type: type, encoder: Encoder) -> None:
+        """Use a custom encoder for the instances of a type"""
+        with self.lock:
+            self.encoders[value_type] = encoder
+
+    def get_encoder(self, value_type: type) -> Encoder:
+        encoder = self.encoders.get(value_type)
+        if encoder is None:
+            encoder = self._compile(value_type)
+            with self.lock:
+                encoder = self.encoders.setdefault(value_type, encoder)
+        return encoder
+
+    def encode(self, value: Any) -> Any:
+        """Returns the value as plain dicts, lists and scalars"""
+        return self.get_encoder(type(value))(value)
+
+    def _encode_dict(self, value: Dict[Any, Any]) -> Dict[str, Any]:
+        return {str(key): self.encode(item) for key, item in value.items()}
+
+    def _encode_sequence(self, value: Any) -> List[Any]:
+        return [self.encode(item) for item in value]
+
+    def _compile(self, value_type: type) -> Encoder:
+        if issubclass(value_type, enum.Enum):
+            return _encode_enum
+        if issubclass(value_type, datetime):
+            return encode_datetime
+        if issubclass(value_type, dict):
+            return self._encode_dict
+        if issubclass(value_type, (list, tuple, set, frozenset)):
+            return self._encode_sequence
+
+        hints = typing.get_type_hints(value_type)
+        if not hints:
+            # Classes without annotations: their instance attributes
+            return lambda value: {name: self.encode(item) for name, item in sorted(vars(value).items())}
+
+        fields = [(name, self._compile_hint(hint)) for name, hint in hints.items()]
+        if hasattr(value_type, "_is_protocol"):
+            # jsons also serialized this class attribute of typing.Generic subclasses (e.g. DataPage): clients may see it
+            fields.append(("_is_protocol", lambda _: False))
+        fields.sort(key=lambda field: field[0])
+
+        def encode_object(value: Any) -> Dict[str, Any]:
+            return {name: encoder(getattr(value, name, None)) for name, encoder in fields}
+        return encode_object
+
+    def _compile_hint(self, hint: Any) -> Encoder:
+        """Encoder of an attribute, based on its declared type"""
+        origin = typing.get_origin(hint)
+        arguments = typing.get_args(hint)
+
+        if origin is typing.Union:
+            non_null_arguments = [argument for argument in arguments if argument is not type(None)]
+            return self._compile_hint(non_null_arguments[0]) if len(non_null_arguments) == 1 else self.encode
+        if origin in (list, tuple, set, frozenset):
+            item_encoder = self._compile_hint(arguments[0]) if arguments else self.encode
+            # Missing lists are empty lists
+            return lambda value: [item_encoder(item) for item in value] if value is not None else []
+        if hint is float:
+            return _encode_float
+        if hint in _JSON_SCALAR_TYPES:
+            return _identity
+        if isinstance(hint, type):
+            hint_encoder = None
+
+            def encode_hinted(value: Any) -> Any:
+                nonlocal hint_encoder
+                if value is None:
+                    return None
+                if type(value) is not hint:
+                    return self.encode(value)
+                # Compiled on first use: classes may refer to each other
+                hint_encoder = hint_encoder or self.get_encoder(hint)
+                return hint_encoder(value)
+            return encode_hinted
+
+        # Type variables, Any and other generic forms: encoded according to the actual value
+        return self.encode
+
+DEFAULT_REGISTRY = SerializerRegistry()
+
+def encode(value: Any) -> Any:
+    """Returns the value as plain dicts, lists and scalars, using the default registry"""
+    return DEFAULT_REGISTRY.encode(value)
+
+def dumps(value: Any, backend: str = NOTES_JSON_BACKEND) -> str:
+    """
+    Serialize a value as a JSON string.
+
+    Args:
+        value: the object to serialize
+        backend: JSON_BACKEND or ORJSON_BACKEND (the json module is used if orjson is not installed)
+    Returns:
+        the JSON document
+    """
+    encoded_value = encode(value)
+    orjson = _import_orjson() if backend == ORJSON_BACKEND else None
+    if orjson is not None:
+        return orjson.dumps(encoded_value).decode("utf-8")
+    return json.dumps(encoded_value)
+
+@functools.lru_cache(maxsize=None)
+def _import_orjson() -> Any:
+    """The orjson module, imported on first use (None if it is not installed)"""
+    try:
+        import orjson
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+    return orjson
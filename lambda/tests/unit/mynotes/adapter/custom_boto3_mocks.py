@@ -1,7 +1,7 @@
 import os
 import pytest
 
-from moto import mock_s3, mock_dynamodb2
+from moto import mock_s3, mock_dynamodb2, mock_secretsmanager, mock_sqs
 import boto3
 
 @pytest.fixture(scope='module')
@@ -21,4 +21,14 @@ def s3_resource(aws_credentials):
 @pytest.fixture(scope='module')
 def dynamodb_resource(aws_credentials):
     with mock_dynamodb2():
-        yield boto3.resource("dynamodb", region_name="us-east-1")
\ No newline at end of file
+        yield boto3.resource("dynamodb", region_name="us-east-1")
+
+@pytest.fixture(scope='module')
+def sqs_client(aws_credentials):
+    with mock_sqs():
+        yield boto3.client("sqs", region_name="us-east-1")
+
+@pytest.fixture(scope='module')
+def secretsmanager_client(aws_credentials):
+    with mock_secretsmanager():
+        yield boto3.client("secretsmanager", region_name="us-east-1")
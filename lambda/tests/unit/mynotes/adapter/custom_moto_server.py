@@ -0,0 +1,51 @@
+import socket
+import urllib.request
+from typing import Any, Iterator
+
+import boto3
+import pytest
+
+from mynotes.adapter.config import AWS_REGION, NOTE_TAGS_TABLE_NAME, NOTES_CONTENT_BUCKET_NAME, NOTES_TABLE_NAME
+from unit.mynotes.adapter.custom_boto3_mocks import aws_credentials
+
+# Tables with the keys of NoteModel and NoteTagModel (indexes are not needed by the async adapters)
+TABLE_KEY_SCHEMAS = {
+    NOTES_TABLE_NAME: [("id", "HASH")],
+    NOTE_TAGS_TABLE_NAME: [("tag_and_author", "HASH"), ("note_id", "RANGE")]
+}
+
+@pytest.fixture(scope='module')
+def moto_server_url(aws_credentials: Any) -> Iterator[str]:
+    """
+    A moto server running in a background thread: aiobotocore clients can't be mocked in process
+    (moto patches the synchronous HTTP layer of botocore), so they talk to it over HTTP.
+    """
+    pytest.importorskip("aiobotocore")
+    moto_server = pytest.importorskip("moto.server", reason="moto[server] is required")
+
+    with socket.socket() as free_socket:
+        free_socket.bind(("127.0.0.1", 0))
+        port = free_socket.getsockname()[1]
+
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    yield f"http://127.0.0.1:{port}"
+    server.stop()
+
+@pytest.fixture
+def moto_server_resources(moto_server_url: str) -> Iterator[str]:
+    """Empty tables and bucket on the moto server (in the region of the application), dropped after each test"""
+    s3_client = boto3.client("s3", region_name=AWS_REGION, endpoint_url=moto_server_url)
+    s3_client.create_bucket(Bucket=NOTES_CONTENT_BUCKET_NAME, CreateBucketConfiguration={"LocationConstraint": AWS_REGION})
+
+    dynamodb_client = boto3.client("dynamodb", region_name=AWS_REGION, endpoint_url=moto_server_url)
+    for table_name, key_schema in TABLE_KEY_SCHEMAS.items():
+        dynamodb_client.create_table(
+            TableName=table_name,
+            KeySchema=[{"AttributeName": name, "KeyType": key_type} for name, key_type in key_schema],
+            AttributeDefinitions=[{"AttributeName": name, "AttributeType": "S"} for name, _ in key_schema],
+            BillingMode="PAY_PER_REQUEST"
+        )
+    yield moto_server_url
+
+    urllib.request.urlopen(urllib.request.Request(f"{moto_server_url}/moto-api/reset", method="POST"))
@@ -0,0 +1,97 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+
+from unit.mynotes.adapter.custom_boto3_mocks import aws_credentials
+from unit.mynotes.adapter.custom_moto_server import moto_server_resources, moto_server_url
+
+from mynotes.adapter.async_notes_adapter import AsyncDynamoDBNoteRepository
+from mynotes.adapter.config import AWS_REGION, NOTE_TAGS_TABLE_NAME, NOTES_TABLE_NAME
+from mynotes.adapter.notes_adapter import NoteModel, map_to_note
+from mynotes.core.notes import Note, NoteType
+from mynotes.core.utils.common import now
+
+def run_with_repository(moto_server_url: str, action: Callable[[AsyncDynamoDBNoteRepository], Awaitable[Any]]) -> Any:
+    from aiobotocore.session import get_session
+
+    async def run() -> Any:
+        async with get_session().create_client("dynamodb", region_name=AWS_REGION, endpoint_url=moto_server_url) as dynamodb_client:
+            return await action(AsyncDynamoDBNoteRepository(dynamodb_client))
+
+    return asyncio.run(run())
+
+@pytest.fixture
+def dynamodb_client(moto_server_resources: str) -> Any:
+    return boto3.client("dynamodb", region_name=AWS_REGION, endpoint_url=moto_server_resources)
+
+class TestAsyncDynamoDBNoteRepository:
+
+    def test_save_writes_the_note_and_its_tag_postings(self, moto_server_resources: str, dynamodb_client: Any) -> None:
+        note = _test_note("1", tags=["python", "aws"])
+
+        run_with_repository(moto_server_resources, lambda repository: repository.save(note))
+
+        item = dynamodb_client.get_item(TableName=NOTES_TABLE_NAME, Key={"id": {"S": "1"}})["Item"]
+        saved_note = map_to_note(NoteModel.from_raw_data(item))
+        assert (saved_note.id, saved_note.author_id, sorted(saved_note.tags)) == ("1", "mario", ["aws", "python"])
+        assert saved_note.version == note.version == 1
+        assert _get_posting_keys(dynamodb_client) == ["aws#mario", "python#mario"]
+
+    def test_save_updates_only_changed_tags_with_optimistic_locking(self, moto_server_resources: str, dynamodb_client: Any) -> None:
+        note = _test_note("1", tags=["python", "aws"])
+        run_with_repository(moto_server_resources, lambda repository: repository.save(note))
+
+        note.tags = ["python", "cloud"]
+        run_with_repository(moto_server_resources, lambda repository: repository.save(note))
+
+        assert note.version == 2
+        assert _get_posting_keys(dynamodb_client) == ["cloud#mario", "python#mario"]
+
+        stale_note = _test_note("1", tags=["python"], version=1)
+        with pytest.raises(ClientError):
+            run_with_repository(moto_server_resources, lambda repository: repository.save(stale_note))
+
+    def test_find_by_id(self, moto_server_resources: str) -> None:
+        note = _test_note("1", tags=["python"])
+
+        async def save_and_find(repository: AsyncDynamoDBNoteRepository) -> List[Note]:
+            await repository.save(note)
+            return await asyncio.gather(repository.find_by_id("1"), repository.find_by_id("missing"))
+
+        found_note, missing_note = run_with_repository(moto_server_resources, save_and_find)
+
+        assert found_note == note
+        assert found_note.tags == ["python"]
+        assert missing_note is None
+
+    def test_find_by_ids_over_several_batches(self, moto_server_resources: str) -> None:
+        notes = [_test_note(str(index)) for index in range(150)]
+
+        async def save_and_find(repository: AsyncDynamoDBNoteRepository) -> List[Note]:
+            await asyncio.gather(*(repository.save(note) for note in notes))
+            return await repository.find_by_ids([note.id for note in notes] + ["missing"])
+
+        found_notes = run_with_repository(moto_server_resources, save_and_find)
+
+        assert sorted(note.id for note in found_notes) == sorted(note.id for note in notes)
+
+    def test_delete_by_id(self, moto_server_resources: str, dynamodb_client: Any) -> None:
+        note = _test_note("1", tags=["python"])
+
+        async def save_and_delete(repository: AsyncDynamoDBNoteRepository) -> List[Optional[Note]]:
+            await repository.save(note)
+            return [await repository.delete_by_id("1"), await repository.delete_by_id("1")]
+
+        assert run_with_repository(moto_server_resources, save_and_delete) == [note, None]
+        assert "Item" not in dynamodb_client.get_item(TableName=NOTES_TABLE_NAME, Key={"id": {"S": "1"}})
+        assert _get_posting_keys(dynamodb_client) == []
+
+def _test_note(id: str, tags: List[str] = None, version: int = None) -> Note:
+    return Note(id=id, author_id="mario", type=NoteType.FREE, creation_time=now(), tags=tags or [], version=version)
+
+def _get_posting_keys(dynamodb_client: Any) -> List[str]:
+    items = dynamodb_client.scan(TableName=NOTE_TAGS_TABLE_NAME)["Items"]
+    return sorted(item["tag_and_author"]["S"] for item in items)
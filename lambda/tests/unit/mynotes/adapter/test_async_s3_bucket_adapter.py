@@ -0,0 +1,98 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import boto3
+import pytest
+
+from unit.mynotes.adapter.custom_boto3_mocks import aws_credentials
+from unit.mynotes.adapter.custom_moto_server import moto_server_resources, moto_server_url
+
+from mynotes.adapter.async_s3_bucket_adapter import AsyncS3BucketAdapter
+from mynotes.adapter.config import AWS_REGION, NOTES_CONTENT_BUCKET_NAME
+from mynotes.adapter.s3_bucket_adapter import S3BucketAdapter
+from mynotes.core.compression import Codec, GzipCodec, IdentityCodec
+
+def run_with_adapter(moto_server_url: str, codec: Codec, action: Callable[[AsyncS3BucketAdapter], Awaitable[Any]]) -> Any:
+    from aiobotocore.session import get_session
+
+    async def run() -> Any:
+        async with get_session().create_client("s3", region_name=AWS_REGION, endpoint_url=moto_server_url) as s3_client:
+            return await action(AsyncS3BucketAdapter(s3_client, NOTES_CONTENT_BUCKET_NAME, codec))
+
+    return asyncio.run(run())
+
+@pytest.fixture
+def sync_bucket_adapter(moto_server_resources: str) -> S3BucketAdapter:
+    s3_resource = boto3.resource("s3", region_name=AWS_REGION, endpoint_url=moto_server_resources)
+    return S3BucketAdapter(s3_resource, NOTES_CONTENT_BUCKET_NAME, GzipCodec())
+
+class TestAsyncS3BucketAdapter:
+
+    @pytest.mark.parametrize("codec", [IdentityCodec(), GzipCodec()])
+    def test_store_and_load(self, moto_server_resources: str, codec: Codec) -> None:
+        async def store_and_load(bucket_adapter: AsyncS3BucketAdapter) -> str:
+            await bucket_adapter.store("test.md", "Some content with accents: àèìòù")
+            return await bucket_adapter.load("test.md")
+
+        assert run_with_adapter(moto_server_resources, codec, store_and_load) == "Some content with accents: àèìòù"
+
+    def test_objects_are_shared_with_the_sync_adapter(self, moto_server_resources: str, sync_bucket_adapter: S3BucketAdapter) -> None:
+        sync_bucket_adapter.store("sync.md", "Stored by the sync adapter")
+
+        content = run_with_adapter(moto_server_resources, GzipCodec(), lambda bucket_adapter: bucket_adapter.load("sync.md"))
+        run_with_adapter(moto_server_resources, GzipCodec(), lambda bucket_adapter: bucket_adapter.store("async.md", "Stored by the async adapter"))
+
+        assert content == "Stored by the sync adapter"
+        assert sync_bucket_adapter.load("async.md") == "Stored by the async adapter"
+
+    @pytest.mark.parametrize("codec", [IdentityCodec(), GzipCodec()])
+    def test_load_range(self, moto_server_resources: str, codec: Codec) -> None:
+        async def load_ranges(bucket_adapter: AsyncS3BucketAdapter) -> Any:
+            await bucket_adapter.store("test.md", "0123456789")
+            return await asyncio.gather(
+                bucket_adapter.load_range("test.md", 2, 5),
+                bucket_adapter.load_range("test.md", 8, 20),
+                bucket_adapter.load_range("test.md", 10, 20)
+            )
+
+        assert run_with_adapter(moto_server_resources, codec, load_ranges) == [b"2345", b"89", b""]
+
+    def test_load_range_of_compressed_object_with_identity_codec(self, moto_server_resources: str, sync_bucket_adapter: S3BucketAdapter) -> None:
+        sync_bucket_adapter.store("test.md", "0123456789")
+
+        content_range = run_with_adapter(moto_server_resources, IdentityCodec(), lambda bucket_adapter: bucket_adapter.load_range("test.md", 2, 5))
+
+        assert content_range == b"2345"
+
+    def test_load_range_of_uncompressed_object_with_gzip_codec(self, moto_server_resources: str, mocker) -> None:
+        s3_resource = boto3.resource("s3", region_name=AWS_REGION, endpoint_url=moto_server_resources)
+        S3BucketAdapter(s3_resource, NOTES_CONTENT_BUCKET_NAME).store("test.md", "0123456789")
+        slice_content = mocker.spy(AsyncS3BucketAdapter, "_slice_content")
+
+        content_range = run_with_adapter(moto_server_resources, GzipCodec(), lambda bucket_adapter: bucket_adapter.load_range("test.md", 2, 5))
+
+        assert content_range == b"2345"
+        slice_content.assert_not_called()
+
+    def test_get_etag(self, moto_server_resources: str) -> None:
+        async def get_etags(bucket_adapter: AsyncS3BucketAdapter) -> Any:
+            await bucket_adapter.store("test.md", "Some content")
+            return await asyncio.gather(bucket_adapter.get_etag("test.md"), bucket_adapter.get_etag("missing.md"))
+
+        etag, missing_etag = run_with_adapter(moto_server_resources, IdentityCodec(), get_etags)
+
+        assert etag and not etag.startswith('"')
+        assert missing_etag is None
+
+    def test_delete_and_delete_all(self, moto_server_resources: str) -> None:
+        async def store_and_delete(bucket_adapter: AsyncS3BucketAdapter) -> Any:
+            await asyncio.gather(*(bucket_adapter.store(f"{index}.md", "Some content") for index in range(3)))
+            await bucket_adapter.delete("0.md")
+            failed_keys = await bucket_adapter.delete_all(["1.md", "2.md", "missing.md"])
+            etags = await asyncio.gather(*(bucket_adapter.get_etag(f"{index}.md") for index in range(3)))
+            return failed_keys, etags
+
+        failed_keys, etags = run_with_adapter(moto_server_resources, IdentityCodec(), store_and_delete)
+
+        assert failed_keys == []
+        assert etags == [None, None, None]
@@ -0,0 +1,94 @@
+import pytest
+from pytest_mock import MockerFixture
+
+from mynotes.adapter.cached_notes_adapter import CachedNoteRepository
+from mynotes.core.notes import Note, NoteRepository
+
+
+@pytest.fixture
+def mock_note_repository(mocker: MockerFixture) -> NoteRepository:
+    return mocker.Mock(spec=NoteRepository)
+
+@pytest.fixture
+def cached_note_repository(mock_note_repository: NoteRepository) -> CachedNoteRepository:
+    return CachedNoteRepository(mock_note_repository, max_size=10, ttl_seconds=60)
+
+class TestCachedNoteRepository:
+    def test_find_by_id_is_served_from_cache(self, cached_note_repository: CachedNoteRepository, mock_note_repository: NoteRepository) -> None:
+        mock_note_repository.find_by_id.return_value = Note(id="1", author_id="mario", version=1)
+
+        first_note = cached_note_repository.find_by_id("1")
+        second_note = cached_note_repository.find_by_id("1")
+
+        assert first_note == second_note
+        mock_note_repository.find_by_id.assert_called_once_with("1")
+        stats = cached_note_repository.stats()
+        assert (stats.hits, stats.misses) == (1, 1)
+
+    def test_not_existing_notes_are_not_cached(self, cached_note_repository: CachedNoteRepository, mock_note_repository: NoteRepository) -> None:
+        mock_note_repository.find_by_id.return_value = None
+
+        assert cached_note_repository.find_by_id("1") is None
+        assert cached_note_repository.find_by_id("1") is None
+
+        assert mock_note_repository.find_by_id.call_count == 2
+
+    def test_find_latest_by_id_replaces_cached_note(self, cached_note_repository: CachedNoteRepository, mock_note_repository: NoteRepository) -> None:
+        mock_note_repository.find_by_id.return_value = Note(id="1", author_id="mario", version=1)
+        cached_note_repository.find_by_id("1")
+
+        # Changed by another process
+        mock_note_repository.find_by_id.return_value = Note(id="1", author_id="mario", version=2)
+
+        assert cached_note_repository.find_latest_by_id("1").version == 2
+        assert cached_note_repository.find_by_id("1").version == 2
+        assert mock_note_repository.find_by_id.call_count == 2
+
+    def test_save_invalidates_cached_note(self, cached_note_repository: CachedNoteRepository, mock_note_repository: NoteRepository) -> None:
+        mock_note_repository.find_by_id.return_value = Note(id="1", author_id="mario", version=1)
+        cached_note_repository.find_by_id("1")
+
+        cached_note_repository.save(Note(id="1", author_id="mario", version=2))
+        cached_note_repository.find_by_id("1")
+
+        assert mock_note_repository.find_by_id.call_count == 2
+
+    def test_stale_versions_are_not_cached_after_save(self, cached_note_repository: CachedNoteRepository, mock_note_repository: NoteRepository) -> None:
+        cached_note_repository.save(Note(id="1", author_id="mario", version=2))
+
+        # A read that started before the save returns the previous version
+        mock_note_repository.find_by_id.return_value = Note(id="1", author_id="mario", version=1)
+        cached_note_repository.find_by_id("1")
+        cached_note_repository.find_by_id("1")
+
+        assert mock_note_repository.find_by_id.call_count == 2
+
+    def test_delete_by_id_invalidates_cached_note(self, cached_note_repository: CachedNoteRepository, mock_note_repository: NoteRepository) -> None:
+        mock_note_repository.find_by_id.return_value = Note(id="1", author_id="mario", version=1)
+        cached_note_repository.find_by_id("1")
+
+        cached_note_repository.delete_by_id("1")
+        cached_note_repository.find_by_id("1")
+
+        mock_note_repository.delete_by_id.assert_called_once_with("1")
+        assert mock_note_repository.find_by_id.call_count == 2
+
+    def test_find_by_ids_only_reads_missing_notes(self, cached_note_repository: CachedNoteRepository, mock_note_repository: NoteRepository) -> None:
+        mock_note_repository.find_by_id.return_value = Note(id="1", author_id="mario", version=1)
+        cached_note_repository.find_by_id("1")
+        mock_note_repository.find_by_ids.return_value = [Note(id="2", author_id="mario", version=1)]
+
+        notes = cached_note_repository.find_by_ids(["1", "2", "3"])
+
+        mock_note_repository.find_by_ids.assert_called_once_with(["2", "3"])
+        assert sorted(note.id for note in notes) == ["1", "2"]
+
+    def test_delete_all_by_ids_invalidates_cached_notes(self, cached_note_repository: CachedNoteRepository, mock_note_repository: NoteRepository) -> None:
+        mock_note_repository.find_by_id.return_value = Note(id="1", author_id="mario", version=1)
+        cached_note_repository.find_by_id("1")
+        mock_note_repository.delete_all_by_ids.return_value = []
+
+        cached_note_repository.delete_all_by_ids(["1"])
+        cached_note_repository.find_by_id("1")
+
+        assert mock_note_repository.find_by_id.call_count == 2
@@ -0,0 +1,73 @@
+import os
+from typing import Any
+
+import pytest
+
+from unit.mynotes.adapter.custom_boto3_mocks import aws_credentials, secretsmanager_client
+
+from mynotes.adapter import config
+from mynotes.adapter.config import (NOTES_AWS_MAX_ATTEMPTS, NOTES_AWS_MAX_POOL_CONNECTIONS, NOTES_AWS_RETRY_MODE, create_aws_client,
+                                    get_aws_client_config, get_cursor_signing_key)
+from mynotes.core.architecture import ApplicationException
+from mynotes.adapter.notes_adapter import NoteModel, NoteTagModel
+
+def test_aws_client_config() -> None:
+    config = get_aws_client_config()
+
+    assert config.max_pool_connections == NOTES_AWS_MAX_POOL_CONNECTIONS
+    assert config.retries == {"mode": NOTES_AWS_RETRY_MODE, "max_attempts": NOTES_AWS_MAX_ATTEMPTS}
+
+def test_aws_client_config_overrides() -> None:
+    config = get_aws_client_config(max_pool_connections=4, read_timeout=1)
+
+    assert (config.max_pool_connections, config.read_timeout) == (4, 1)
+
+def test_created_clients_use_the_shared_config() -> None:
+    client = create_aws_client("s3", region_name="us-east-1")
+
+    assert client.meta.config.max_pool_connections == NOTES_AWS_MAX_POOL_CONNECTIONS
+
+def test_models_use_the_shared_connection_settings() -> None:
+    for model in (NoteModel, NoteTagModel):
+        connection = model._get_connection().connection
+
+        assert connection._max_pool_connections == NOTES_AWS_MAX_POOL_CONNECTIONS
+        assert connection._max_retry_attempts_exception == NOTES_AWS_MAX_ATTEMPTS - 1
+
+@pytest.fixture
+def unset_cursor_signing_key(mocker) -> None:
+    mocker.patch.object(config, "NOTES_CURSOR_SIGNING_KEY", "")
+    mocker.patch.object(config, "NOTES_CURSOR_SIGNING_KEY_SECRET_ARN", "")
+    mocker.patch.dict(os.environ)
+    os.environ.pop("AWS_LAMBDA_FUNCTION_NAME", None)
+    get_cursor_signing_key.cache_clear()
+    yield
+    get_cursor_signing_key.cache_clear()
+
+def test_cursor_signing_key_given_as_is(mocker, unset_cursor_signing_key: None) -> None:
+    mocker.patch.object(config, "NOTES_CURSOR_SIGNING_KEY", "test-signing-key")
+
+    assert get_cursor_signing_key() == b"test-signing-key"
+
+def test_cursor_signing_key_is_read_once_from_the_secret(mocker, secretsmanager_client: Any, unset_cursor_signing_key: None) -> None:
+    secret_arn = secretsmanager_client.create_secret(Name="test-cursor-signing-key", SecretString="secret-signing-key")["ARN"]
+    mocker.patch.object(config, "NOTES_CURSOR_SIGNING_KEY_SECRET_ARN", secret_arn)
+    mocker.patch.object(config, "AWS_REGION", "us-east-1")
+    create_client = mocker.spy(config, "create_aws_client")
+
+    assert get_cursor_signing_key() == b"secret-signing-key"
+    assert get_cursor_signing_key() == b"secret-signing-key"
+    assert create_client.call_count == 1
+
+def test_missing_cursor_signing_key_is_random_outside_lambda(caplog, unset_cursor_signing_key: None) -> None:
+    signing_key = get_cursor_signing_key()
+
+    assert len(signing_key) == 32
+    assert get_cursor_signing_key() == signing_key
+    assert "No cursor signing key configured" in caplog.text
+
+def test_missing_cursor_signing_key_fails_in_lambda(unset_cursor_signing_key: None) -> None:
+    os.environ["AWS_LAMBDA_FUNCTION_NAME"] = "FindNotesFunction"
+
+    with pytest.raises(ApplicationException):
+        get_cursor_signing_key()
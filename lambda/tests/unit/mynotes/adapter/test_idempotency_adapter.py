@@ -0,0 +1,59 @@
+from datetime import timedelta
+from typing import Any
+
+import pytest
+
+from unit.mynotes.adapter.custom_boto3_mocks import aws_credentials, dynamodb_resource
+
+from mynotes.adapter.idempotency_adapter import DynamoDBIdempotencyStore, IdempotencyRecordModel
+from mynotes.core.idempotency import IdempotencyStatus
+
+@pytest.yield_fixture(scope="class")
+def idempotency_table(dynamodb_resource: Any) -> str:
+    if not IdempotencyRecordModel.exists():
+        IdempotencyRecordModel.create_table(wait=True, read_capacity_units=1, write_capacity_units=1)
+    yield "test-idempotency-table"
+
+    IdempotencyRecordModel.delete_table()
+
+@pytest.fixture
+def store() -> DynamoDBIdempotencyStore:
+    return DynamoDBIdempotencyStore(ttl=timedelta(hours=1), in_progress_timeout=timedelta(minutes=1))
+
+class TestDynamoDBIdempotencyStore:
+    def test_start_records_the_key_once(self, idempotency_table: str, store: DynamoDBIdempotencyStore) -> None:
+        assert store.start("key-1", "fingerprint") is None
+
+        record = store.start("key-1", "fingerprint")
+
+        assert record.status == IdempotencyStatus.IN_PROGRESS
+        assert record.fingerprint == "fingerprint"
+
+    def test_completed_requests_return_their_response(self, idempotency_table: str, store: DynamoDBIdempotencyStore) -> None:
+        store.start("key-2", "fingerprint")
+        store.complete("key-2", {"statusCode": 200, "body": "{}"})
+
+        record = store.start("key-2", "fingerprint")
+
+        assert record.status == IdempotencyStatus.COMPLETED
+        assert record.response == {"statusCode": 200, "body": "{}"}
+
+    def test_cancelled_requests_can_be_retried(self, idempotency_table: str, store: DynamoDBIdempotencyStore) -> None:
+        store.start("key-3", "fingerprint")
+        store.cancel("key-3")
+
+        assert store.start("key-3", "fingerprint") is None
+
+    def test_cancel_keeps_completed_requests(self, idempotency_table: str, store: DynamoDBIdempotencyStore) -> None:
+        store.start("key-4", "fingerprint")
+        store.complete("key-4", {"statusCode": 200})
+
+        store.cancel("key-4")
+
+        assert store.start("key-4", "fingerprint").status == IdempotencyStatus.COMPLETED
+
+    def test_expired_requests_are_taken_over(self, idempotency_table: str) -> None:
+        abandoning_store = DynamoDBIdempotencyStore(ttl=timedelta(hours=1), in_progress_timeout=timedelta(seconds=-1))
+        abandoning_store.start("key-5", "fingerprint")
+
+        assert abandoning_store.start("key-5", "fingerprint") is None
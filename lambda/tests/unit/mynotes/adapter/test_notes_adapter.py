@@ -1,4 +1,5 @@
 from ensurepip import version
+import copy
 import logging
 import os
 from datetime import datetime, timezone
@@ -11,10 +12,12 @@ from unit.mynotes.adapter.custom_boto3_mocks import aws_credentials, dynamodb_re
 #from unit.mynotes.adapter.custom_boto3_localstack import aws_credentials, dynamodb_resource
 
 import pytest
+from pynamodb.exceptions import PutError
 from mynotes.core.architecture import DataPage, DataPageQuery
-from mynotes.adapter.notes_adapter import (PUBLIC_AUTHOR_ID, DynamoDBNoteRepository, NoteModel,
+from mynotes.adapter.notes_adapter import (PUBLIC_AUTHOR_ID, ContentReferenceModel, DynamoDBContentReferenceRepository, DynamoDBNoteRepository, NoteModel, NoteTagModel,
+                                           _intersect_postings, _PostingListCursor, _write_note_item, get_tag_and_author,
                                            map_to_note, map_to_note_model)
-from mynotes.core.notes import Note, NoteType
+from mynotes.core.notes import TAG_MATCH_ALL, TAG_MATCH_ANY, Note, NoteSummary, NoteType
 
 logging.basicConfig()
 log = logging.getLogger("pynamodb")
@@ -37,15 +40,17 @@ SAMPLE_NOTE_TEXT = """
 @pytest.yield_fixture(scope="class")
 def notes_table(dynamodb_resource: Any) -> str:
     """Create/destroy the table along this entire test suite"""
-    if not NoteModel.exists():
-        NoteModel.create_table(
-            wait = True,
-            read_capacity_units=1, write_capacity_units=1
-        )
+    for model in (NoteModel, NoteTagModel):
+        if not model.exists():
+            model.create_table(
+                wait = True,
+                read_capacity_units=1, write_capacity_units=1
+            )
     yield "test-notes-table"
 
     # Clean up After all tests
     NoteModel.delete_table()
+    NoteTagModel.delete_table()
 
 @pytest.fixture
 def note_repository(notes_table: str) -> DynamoDBNoteRepository:
@@ -72,6 +77,20 @@ class TestDynamoDBNoteRepository:
         # This whould throw a NotFound exception if the note is not in table        
         note_model = NoteModel.get(note.id)
         assert note_model.tags == {"test"}
+        assert note.version == note_model.version == 1
+
+    def test_save_stale_note_fails(self, note_repository: DynamoDBNoteRepository) -> None:
+        note = Note(author_id="mario", type=NoteType.FREE, creation_time=datetime.now(timezone.utc), tags=["test"])
+        note_repository.save(note)
+        stale_note = copy.deepcopy(note)
+        note_repository.save(note)
+
+        with pytest.raises(PutError):
+            note_repository.save(stale_note)
+        with pytest.raises(PutError):
+            note_repository.save(Note(id=note.id, author_id="mario", type=NoteType.FREE, creation_time=note.creation_time))
+
+        assert NoteModel.get(note.id).version == note.version == 2
 
     def test_create_note_without_tags(self, note_repository: DynamoDBNoteRepository) -> None:
         note = Note(
@@ -87,6 +106,24 @@ class TestDynamoDBNoteRepository:
         # There are no tags (note_model.tags is none)
         assert not note_model.tags
 
+    def test_save_all(self, note_repository: DynamoDBNoteRepository) -> None:
+        notes = [
+            Note(
+                author_id = "mario",
+                type = NoteType.FREE,
+                creation_time = datetime.now(timezone.utc),
+                tags = ["batch"]
+            ) for _ in range(30)
+        ]
+
+        failed_note_ids = note_repository.save_all(notes)
+
+        assert failed_note_ids == []
+        for note in notes:
+            note_model = NoteModel.get(note.id)
+            assert note_model.tags == {"batch"}
+            assert note_model.version == 1
+
     def test_find_by_id_existing_note(self, note_repository: DynamoDBNoteRepository) -> None:
         existing_note_model = _create_test_note_model_in_table(
             author_id="mario"
@@ -105,18 +142,55 @@ class TestDynamoDBNoteRepository:
         note_from_db = note_repository.find_by_id("not-existing-id")
         assert note_from_db == None
 
+    def test_find_by_ids(self, note_repository: DynamoDBNoteRepository) -> None:
+        existing_ids = [_create_test_note_model_in_table(id=f"multi-{i}").id for i in range(120)]
+
+        notes_from_db = note_repository.find_by_ids(existing_ids + ["not-existing-id"])
+
+        assert sorted(note.id for note in notes_from_db) == sorted(existing_ids)
+
     def test_delete_by_id_existing_note(self, note_repository: DynamoDBNoteRepository, notes_table_data_cleaner: Any) -> None:
         items = [item for item in NoteModel.scan()]
         existing_note = _create_test_note_model_in_table()
 
-        note_repository.delete_by_id(existing_note.id)
+        assert note_repository.delete_by_id(existing_note.id) == map_to_note(existing_note)
 
         self._assert_note_does_not_exist(existing_note.id)
 
     def test_delete_by_id_not_existing_note(self, note_repository: DynamoDBNoteRepository) -> None:
-        note_repository.delete_by_id("not-existing-id")
         # No errors - delete will delete if item is present or do nothing if item is not present
-        assert True
+        assert note_repository.delete_by_id("not-existing-id") is None
+
+    def test_delete_by_id_versioned_note(self, note_repository: DynamoDBNoteRepository) -> None:
+        note = Note(
+            author_id = "mario",
+            type = NoteType.FREE,
+            creation_time = datetime.now(timezone.utc)
+        )
+        note_repository.save(note)
+        note_repository.save(note)
+
+        assert note_repository.delete_by_id(note.id)
+
+        self._assert_note_does_not_exist(note.id)
+
+    def test_write_note_item_returns_the_deleted_item(self, note_repository: DynamoDBNoteRepository) -> None:
+        existing_note = _create_test_note_model_in_table(tags={"test"})
+
+        deleted_note_model = _write_note_item(existing_note.id)
+
+        assert map_to_note(deleted_note_model) == map_to_note(existing_note)
+        assert _write_note_item(existing_note.id) is None
+        self._assert_note_does_not_exist(existing_note.id)
+
+    def test_delete_all_by_ids(self, note_repository: DynamoDBNoteRepository) -> None:
+        existing_ids = [_create_test_note_model_in_table(id=f"bulk-{i}").id for i in range(30)]
+
+        failed_note_ids = note_repository.delete_all_by_ids(existing_ids + ["not-existing-id"])
+
+        assert failed_note_ids == []
+        for id in existing_ids:
+            self._assert_note_does_not_exist(id)
 
     def _assert_note_exists(self, note_id: str) -> None:
         assert self._is_note_present(note_id), f"Note with di {note_id} was not found in table!"
@@ -149,6 +223,19 @@ def test_notes(notes_table: Any) -> str:
     for item in NoteModel.scan():
         item.delete()
 
+@pytest.yield_fixture(scope="function")
+def dated_test_notes(notes_table: Any) -> str:
+    """"Create notes one day apart in the database and clean them up after the test executed"""
+    test_notes_data_set = [
+        _create_test_note_model_in_table(id=f"3{day}", note_type="Q", creation_time=datetime(2022, 3, 1 + day, 10, tzinfo=timezone.utc))
+        for day in (1, 0, 2)
+    ]
+
+    yield test_notes_data_set
+
+    for item in NoteModel.scan():
+        item.delete()
+
 class TestDynamoDBNoteRepositoryQueries:
     """Test access patterns on the main table"""
     test_find_all_by_type_test_data = [
@@ -175,6 +262,167 @@ class TestDynamoDBNoteRepositoryQueries:
         is_continuation_token_set = not data_page.continuation_token == None
         assert is_continuation_token_set == expected_continuation_token_set
 
+    @pytest.mark.parametrize("note_type,expected_n_items", test_find_all_by_type_test_data)
+    def test_find_all_by_type_summary(self, note_type: NoteType, expected_n_items: int, note_repository: DynamoDBNoteRepository, test_notes: List[NoteModel]) -> None:
+        data_page = note_repository.find_all_by_type(note_type, summary=True)
+
+        assert data_page.page_size == expected_n_items
+        assert all(isinstance(item, NoteSummary) and item.id and item.creation_time for item in data_page.items)
+
+    def test_find_all_by_type_summary_pagination(self, note_repository: DynamoDBNoteRepository, test_notes: List[NoteModel]) -> None:
+        first_page = note_repository.find_all_by_type(NoteType.QUESTION, data_page_query=DataPageQuery(page_size=2), summary=True)
+        second_page = note_repository.find_all_by_type(NoteType.QUESTION, data_page_query=DataPageQuery(page_size=2, continuation_token=first_page.continuation_token), summary=True)
+
+        assert sorted(item.id for item in first_page.items + second_page.items) == ["10", "11", "12"]
+
+    test_find_all_by_type_within_time_range_test_data = [
+        (DataPageQuery(since=datetime(2022, 3, 2, tzinfo=timezone.utc)), ["31", "32"]),
+        (DataPageQuery(until=datetime(2022, 3, 2, 12, tzinfo=timezone.utc)), ["30", "31"]),
+        (DataPageQuery(since=datetime(2022, 3, 2, tzinfo=timezone.utc), until=datetime(2022, 3, 2, 12, tzinfo=timezone.utc)), ["31"]),
+        (DataPageQuery(newest_first=True), ["32", "31", "30"]),
+        (DataPageQuery(until=datetime(2022, 3, 2, 12, tzinfo=timezone.utc), newest_first=True), ["31", "30"]),
+    ]
+
+    @pytest.mark.parametrize("data_page_query,expected_ids", test_find_all_by_type_within_time_range_test_data)
+    def test_find_all_by_type_within_time_range(self, data_page_query: DataPageQuery, expected_ids: List[str], note_repository: DynamoDBNoteRepository, dated_test_notes: List[NoteModel]) -> None:
+        data_page = note_repository.find_all_by_type(NoteType.QUESTION, data_page_query=data_page_query)
+        summary_page = note_repository.find_all_by_type(NoteType.QUESTION, data_page_query=data_page_query, summary=True)
+
+        assert [item.id for item in data_page.items] == expected_ids
+        assert [item.id for item in summary_page.items] == expected_ids
+
+    def test_find_all_by_type_newest_first_pagination(self, note_repository: DynamoDBNoteRepository, dated_test_notes: List[NoteModel]) -> None:
+        first_page = note_repository.find_all_by_type(NoteType.QUESTION, data_page_query=DataPageQuery(page_size=2, newest_first=True))
+        second_page = note_repository.find_all_by_type(NoteType.QUESTION, data_page_query=DataPageQuery(page_size=2, continuation_token=first_page.continuation_token, newest_first=True))
+
+        assert [item.id for item in first_page.items + second_page.items] == ["32", "31", "30"]
+
+    def test_iter_all_by_type(self, note_repository: DynamoDBNoteRepository, test_notes: List[NoteModel]) -> None:
+        notes = list(note_repository.iter_all_by_type(NoteType.QUESTION, page_size=2))
+
+        assert sorted(note.id for note in notes) == ["10", "11", "12"]
+
+    test_iter_all_by_type_with_max_items_test_data = [
+        (1, 1),
+        (2, 2),
+        (10, 3)
+    ]
+
+    @pytest.mark.parametrize("max_items,expected_n_items", test_iter_all_by_type_with_max_items_test_data)
+    def test_iter_all_by_type_with_max_items(self, max_items: int, expected_n_items: int, note_repository: DynamoDBNoteRepository, test_notes: List[NoteModel]) -> None:
+        notes = list(note_repository.iter_all_by_type(NoteType.QUESTION, max_items=max_items, page_size=2))
+
+        assert len(notes) == expected_n_items
+
+    def test_iter_all_by_type_can_stop_early(self, note_repository: DynamoDBNoteRepository, test_notes: List[NoteModel]) -> None:
+        notes = note_repository.iter_all_by_type(NoteType.QUESTION, page_size=1)
+
+        assert next(notes).id in {"10", "11", "12"}
+        notes.close()
+
+@pytest.fixture()
+def tag_index_data_cleaner(notes_table: str) -> str:
+    """Ensure that both tables are clean before running the test"""
+    for model in (NoteModel, NoteTagModel):
+        for item in model.scan():
+            item.delete()
+    return "tag_index_data_cleaner"
+
+@pytest.fixture()
+def tagged_test_notes(note_repository: DynamoDBNoteRepository, tag_index_data_cleaner: Any) -> List[Note]:
+    """Notes "00" to "11": tagged 'even' and/or 'three' according to their number, all tagged 'all'"""
+    notes = []
+    for i in range(12):
+        tags = ["all"]
+        if i % 2 == 0:
+            tags.append("even")
+        if i % 3 == 0:
+            tags.append("three")
+        notes.append(Note(id=f"{i:02}", author_id="mario", type=NoteType.FREE, creation_time=datetime.now(timezone.utc), tags=tags))
+
+    assert note_repository.save_all(notes) == []
+    return notes
+
+class TestDynamoDBNoteRepositoryTagIndex:
+    """Test the maintenance of the tag index and the queries by tag"""
+    def test_save_adds_postings(self, note_repository: DynamoDBNoteRepository, tag_index_data_cleaner: Any) -> None:
+        note = Note(author_id="mario", type=NoteType.FREE, creation_time=datetime.now(timezone.utc), tags=["a", "b"])
+
+        note_repository.save(note)
+
+        assert _get_tagged_note_ids("a") == [note.id]
+        assert _get_tagged_note_ids("b") == [note.id]
+        assert NoteTagModel.get(get_tag_and_author("a", "mario"), note.id).creation_time == note.creation_time
+
+    def test_save_only_writes_changed_tags(self, note_repository: DynamoDBNoteRepository, tag_index_data_cleaner: Any, mocker: Any) -> None:
+        note = Note(author_id="mario", type=NoteType.FREE, creation_time=datetime.now(timezone.utc), tags=["a", "b"])
+        note_repository.save(note)
+        note.tags = ["b", "c"]
+        save_spy = mocker.spy(NoteTagModel, "batch_write")
+
+        note_repository.save(note)
+        note_repository.save(note)
+
+        # The second save does not change any tag: the index is not touched
+        assert save_spy.call_count == 1
+        assert _get_tagged_note_ids("a") == []
+        assert _get_tagged_note_ids("b") == [note.id]
+        assert _get_tagged_note_ids("c") == [note.id]
+
+    def test_delete_by_id_removes_postings(self, note_repository: DynamoDBNoteRepository, tag_index_data_cleaner: Any) -> None:
+        note = Note(author_id="mario", type=NoteType.FREE, creation_time=datetime.now(timezone.utc), tags=["a", "b"])
+        note_repository.save(note)
+
+        assert note_repository.delete_by_id(note.id)
+
+        assert list(NoteTagModel.scan()) == []
+
+    def test_delete_all_by_ids_removes_postings(self, note_repository: DynamoDBNoteRepository, tagged_test_notes: List[Note]) -> None:
+        assert note_repository.delete_all_by_ids([note.id for note in tagged_test_notes]) == []
+
+        assert list(NoteTagModel.scan()) == []
+
+    test_find_by_tags_test_data = [
+        (["even"], TAG_MATCH_ALL, ["00", "02", "04", "06", "08", "10"]),
+        (["even", "three"], TAG_MATCH_ALL, ["00", "06"]),
+        (["even", "three", "missing"], TAG_MATCH_ALL, []),
+        (["even", "three"], TAG_MATCH_ANY, ["00", "02", "03", "04", "06", "08", "09", "10"]),
+        (["three", "missing"], TAG_MATCH_ANY, ["00", "03", "06", "09"]),
+    ]
+
+    @pytest.mark.parametrize("tags,mode,expected_ids", test_find_by_tags_test_data)
+    def test_find_by_tags(self, tags: List[str], mode: str, expected_ids: List[str], note_repository: DynamoDBNoteRepository, tagged_test_notes: List[Note]) -> None:
+        data_page = note_repository.find_by_tags(tags, author_id="mario", mode=mode, data_page_query=DataPageQuery(page_size=20))
+        summary_page = note_repository.find_by_tags(tags, author_id="mario", mode=mode, data_page_query=DataPageQuery(page_size=20), summary=True)
+
+        assert [note.id for note in data_page.items] == expected_ids
+        assert all(set(tags) & set(note.tags) for note in data_page.items)
+        assert [summary.id for summary in summary_page.items] == expected_ids
+        assert data_page.continuation_token is None
+
+    def test_find_by_tags_pagination(self, note_repository: DynamoDBNoteRepository, tagged_test_notes: List[Note]) -> None:
+        ids = []
+        continuation_token = None
+        n_pages = 0
+        while True:
+            data_page = note_repository.find_by_tags(["all", "even"], author_id="mario", data_page_query=DataPageQuery(page_size=4, continuation_token=continuation_token))
+            ids.extend(note.id for note in data_page.items)
+            n_pages += 1
+            continuation_token = data_page.continuation_token
+            if not continuation_token:
+                break
+
+        assert ids == ["00", "02", "04", "06", "08", "10"]
+        assert n_pages == 2
+
+    def test_intersect_postings_across_query_pages(self, tagged_test_notes: List[Note]) -> None:
+        cursors = [_PostingListCursor(get_tag_and_author(tag, "mario"), page_size=2) for tag in ("all", "even", "three")]
+
+        assert [posting.note_id for posting in _intersect_postings(cursors)] == ["00", "06"]
+
+def _get_tagged_note_ids(tag: str, author_id: str = "mario") -> List[str]:
+    return [posting.note_id for posting in NoteTagModel.query(get_tag_and_author(tag, author_id))]
+
 def _create_test_note_model(id: str = None, author_id: str = None, note_type: str = None, creation_time: datetime = None, tags: Set[str] = None) -> NoteModel:
     author_id = author_id or PUBLIC_AUTHOR_ID
     note_type = note_type or "F"
@@ -197,6 +445,53 @@ def _create_test_note_model_in_table(id: str = None, author_id: str = None, note
 
     return note_model
 
+@pytest.yield_fixture(scope="class")
+def content_references_table(dynamodb_resource: Any) -> str:
+    if not ContentReferenceModel.exists():
+        ContentReferenceModel.create_table(wait=True, read_capacity_units=1, write_capacity_units=1)
+    yield "test-content-references-table"
+
+    ContentReferenceModel.delete_table()
+
+class TestDynamoDBContentReferenceRepository:
+    def test_acquire_starts_a_generation_once(self, content_references_table: str) -> None:
+        content_references = DynamoDBContentReferenceRepository()
+
+        first_reference = content_references.acquire("hash-1", 2)
+        second_reference = content_references.acquire("hash-1")
+
+        assert first_reference.created and not second_reference.created
+        assert first_reference.generation == second_reference.generation
+        assert ContentReferenceModel.get("hash-1").reference_count == 3
+
+    def test_release_deletes_the_last_reference(self, content_references_table: str) -> None:
+        content_references = DynamoDBContentReferenceRepository()
+        reference = content_references.acquire("hash-2", 2)
+
+        assert not content_references.release("hash-2", reference.generation)
+        assert content_references.release("hash-2", reference.generation)
+        with pytest.raises(ContentReferenceModel.DoesNotExist):
+            ContentReferenceModel.get("hash-2")
+
+        # Referenced again: a new object
+        new_reference = content_references.acquire("hash-2")
+        assert new_reference.created and new_reference.generation != reference.generation
+
+    def test_release_ignores_other_generations(self, content_references_table: str) -> None:
+        content_references = DynamoDBContentReferenceRepository()
+        content_references.acquire("hash-3")
+
+        assert not content_references.release("hash-3", "old-generation")
+        assert not content_references.release("missing-hash", "some-generation")
+        assert ContentReferenceModel.get("hash-3").reference_count == 1
+
+def test_map_content_addressed_note() -> None:
+    note = Note(id="1", author_id="mario", type=NoteType.FREE, creation_time=datetime.now(timezone.utc), tags=[], content_hash="hash-1", content_generation="g1")
+
+    mapped_note = map_to_note(map_to_note_model(note))
+
+    assert (mapped_note.content_hash, mapped_note.content_generation) == ("hash-1", "g1")
+
 def test_map_to_note_model() -> None:
     note = Note(
         id = "1",
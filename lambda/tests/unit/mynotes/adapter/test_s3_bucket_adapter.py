@@ -5,6 +5,7 @@ from botocore.errorfactory import ClientError
 from unit.mynotes.adapter.custom_boto3_mocks import aws_credentials, s3_resource
 
 from mynotes.adapter.s3_bucket_adapter import S3BucketAdapter
+from mynotes.core.compression import GzipCodec
 
 TEST_BUCKET = "my-tests"
 
@@ -12,6 +13,10 @@ TEST_BUCKET = "my-tests"
 def bucket_adapter(s3_resource: Any) -> S3BucketAdapter:
     return S3BucketAdapter(s3_resource, TEST_BUCKET)
 
+@pytest.fixture
+def gzip_bucket_adapter(s3_resource: Any) -> S3BucketAdapter:
+    return S3BucketAdapter(s3_resource, TEST_BUCKET, GzipCodec())
+
 @pytest.fixture
 def s3_bucket(s3_resource: Any) -> Any:
     bucket = s3_resource.Bucket(TEST_BUCKET)
@@ -50,6 +55,118 @@ class TestS3BucketAdapter:
         assert content_from_bucket == content 
 
 
+    def test_load_multibyte_content(self, bucket_adapter: S3BucketAdapter, s3_resource: Any, s3_bucket: Any) -> None:
+        key = "test.md"
+        content = "Perché è già così ✓ " * 1000
+
+        object = s3_resource.Object(TEST_BUCKET, key)
+        object.put(Body = content.encode("utf-8"))
+
+        assert bucket_adapter.load(key) == content
+
+    def test_iter_chunks_does_not_split_characters(self, bucket_adapter: S3BucketAdapter, s3_resource: Any, s3_bucket: Any) -> None:
+        key = "test.md"
+        content = "✓" * 100
+
+        object = s3_resource.Object(TEST_BUCKET, key)
+        object.put(Body = content.encode("utf-8"))
+
+        # Each character is 3 bytes long, so chunks of 7 bytes always split characters
+        chunks = list(bucket_adapter.iter_chunks(key, chunk_size=7))
+
+        assert len(chunks) > 1
+        assert "".join(chunks) == content
+
+    test_load_range_test_data = [
+        (0, 3, b"Some"),
+        (5, 100, b"content"),
+        (100, 200, b"")
+    ]
+
+    @pytest.mark.parametrize("start,end,expected_bytes", test_load_range_test_data)
+    def test_load_range(self, start: int, end: int, expected_bytes: bytes, bucket_adapter: S3BucketAdapter, s3_resource: Any, s3_bucket: Any) -> None:
+        key = "test.md"
+
+        object = s3_resource.Object(TEST_BUCKET, key)
+        object.put(Body = "Some content")
+
+        assert bucket_adapter.load_range(key, start, end) == expected_bytes
+
+    def test_get_etag_changes_with_content(self, bucket_adapter: S3BucketAdapter, s3_resource: Any, s3_bucket: Any) -> None:
+        key = "test.md"
+
+        bucket_adapter.store(key, "First content")
+        first_etag = bucket_adapter.get_etag(key)
+        bucket_adapter.store(key, "Second content")
+        second_etag = bucket_adapter.get_etag(key)
+
+        assert first_etag and second_etag
+        assert first_etag != second_etag
+
+    def test_get_etag_not_existing_key(self, bucket_adapter: S3BucketAdapter, s3_resource: Any, s3_bucket: Any) -> None:
+        assert bucket_adapter.get_etag("not-existing-key") is None
+
+    def test_store_compressed(self, gzip_bucket_adapter: S3BucketAdapter, s3_resource: Any, s3_bucket: Any) -> None:
+        key = "test.md"
+        content = "Some content " * 100
+
+        gzip_bucket_adapter.store(key, content)
+
+        response = s3_resource.Object(TEST_BUCKET, key).get()
+        assert response["ContentEncoding"] == "gzip"
+        assert response["ContentLength"] < len(content)
+        assert gzip_bucket_adapter.load(key) == content
+
+    def test_store_bytes_is_not_compressed(self, gzip_bucket_adapter: S3BucketAdapter, s3_resource: Any, s3_bucket: Any) -> None:
+        key = "test.bin"
+        content = bytes(range(256)) * 4
+
+        gzip_bucket_adapter.store_bytes(key, content)
+
+        response = s3_resource.Object(TEST_BUCKET, key).get()
+        assert "ContentEncoding" not in response
+        assert gzip_bucket_adapter.load_bytes(key) == content
+
+    def test_compressed_content_is_read_by_any_adapter(self, bucket_adapter: S3BucketAdapter, gzip_bucket_adapter: S3BucketAdapter, s3_resource: Any, s3_bucket: Any) -> None:
+        key = "test.md"
+        content = "Perché è già così ✓ " * 1000
+
+        gzip_bucket_adapter.store(key, content)
+
+        assert bucket_adapter.load(key) == content
+        assert "".join(bucket_adapter.iter_chunks(key, chunk_size=10)) == content
+
+    def test_legacy_uncompressed_content_is_read(self, gzip_bucket_adapter: S3BucketAdapter, s3_resource: Any, s3_bucket: Any) -> None:
+        key = "test.md"
+
+        object = s3_resource.Object(TEST_BUCKET, key)
+        object.put(Body = "Some content")
+
+        assert gzip_bucket_adapter.load(key) == "Some content"
+        assert gzip_bucket_adapter.load_range(key, 5, 100) == b"content"
+
+    def test_load_range_of_legacy_uncompressed_content_is_a_ranged_get(self, gzip_bucket_adapter: S3BucketAdapter, s3_resource: Any, s3_bucket: Any, mocker) -> None:
+        key = "test.md"
+
+        object = s3_resource.Object(TEST_BUCKET, key)
+        object.put(Body = "Some content")
+        slice_content = mocker.spy(gzip_bucket_adapter, "_slice_content")
+
+        assert gzip_bucket_adapter.load_range(key, 5, 8) == b"cont"
+        assert gzip_bucket_adapter.load_range(key, 20, 30) == b""
+        slice_content.assert_not_called()
+
+    @pytest.mark.parametrize("start,end", [(0, 3), (5, 100), (70000, 70009), (200000, 200010)])
+    def test_load_range_of_compressed_content(self, start: int, end: int, bucket_adapter: S3BucketAdapter, gzip_bucket_adapter: S3BucketAdapter, s3_resource: Any, s3_bucket: Any) -> None:
+        key = "test.md"
+        content = "".join(f"Line {i}\n" for i in range(20000))
+
+        gzip_bucket_adapter.store(key, content)
+
+        expected_bytes = content.encode("utf-8")[start:end + 1]
+        assert gzip_bucket_adapter.load_range(key, start, end) == expected_bytes
+        assert bucket_adapter.load_range(key, start, end) == expected_bytes
+
     def test_delete_not_existing_key_is_fine(self, bucket_adapter: S3BucketAdapter, s3_resource: Any, s3_bucket: Any) -> None:
         bucket_adapter.delete("not-existing-key")
         # No errors, it is fine!
@@ -66,6 +183,26 @@ class TestS3BucketAdapter:
 
         _assert_object_is_not_present(s3_resource, key)
 
+    def test_delete_all(self, bucket_adapter: S3BucketAdapter, s3_resource: Any, s3_bucket: Any) -> None:
+        keys = [f"notes/{i}.md" for i in range(1005)]
+        for key in keys[:10]:
+            bucket_adapter.store(key, "Some content")
+
+        failed_keys = bucket_adapter.delete_all(keys)
+
+        assert failed_keys == []
+        for key in keys[:10]:
+            assert not _assert_object_is_not_present(s3_resource, key)
+
+    def test_list_objects(self, bucket_adapter: S3BucketAdapter, s3_resource: Any, s3_bucket: Any) -> None:
+        for key in ["notes/1.md", "notes/2.md", "other/3.md"]:
+            bucket_adapter.store(key, "Some content")
+
+        stored_objects = list(bucket_adapter.list_objects("notes/"))
+
+        assert [stored_object.key for stored_object in stored_objects] == ["notes/1.md", "notes/2.md"]
+        assert all(stored_object.last_modified for stored_object in stored_objects)
+
 def _assert_content_for_object_key(s3_resource: Any, object_key: str, expected_content: str) -> None:
     object = s3_resource.Object(TEST_BUCKET, object_key)
     content_from_bucket = object.get()['Body'].read().decode('utf-8')
@@ -0,0 +1,27 @@
+from datetime import datetime, timezone
+from typing import Any
+
+import pytest
+
+from unit.mynotes.adapter.custom_boto3_mocks import aws_credentials, sqs_client
+
+from mynotes.adapter.sqs_queue_adapter import SQSNoteQueue
+from mynotes.core.ingestion import NoteCreationMessage, NoteQueueException, decode_note_creation_message
+
+@pytest.fixture(scope="module")
+def queue_url(sqs_client: Any) -> str:
+    return sqs_client.create_queue(QueueName="test-note-ingestion")["QueueUrl"]
+
+def test_send(sqs_client: Any, queue_url: str) -> None:
+    message = NoteCreationMessage("1", "mario", datetime(2022, 3, 1, tzinfo=timezone.utc), "Some content", ["python"])
+
+    SQSNoteQueue(sqs_client, queue_url).send(message)
+
+    received = sqs_client.receive_message(QueueUrl=queue_url)["Messages"]
+    assert [decode_note_creation_message(received_message["Body"]) for received_message in received] == [message]
+
+def test_send_to_missing_queue(sqs_client: Any, queue_url: str) -> None:
+    message = NoteCreationMessage("1", "mario", datetime(2022, 3, 1, tzinfo=timezone.utc), "Some content")
+
+    with pytest.raises(NoteQueueException):
+        SQSNoteQueue(sqs_client, queue_url + "-missing").send(message)
@@ -1,7 +1,8 @@
 from typing import Any, Dict
+import base64
 import pytest
 
-from mynotes.adapter.utils import encode_dict_to_base64, decode_str_as_dict
+from mynotes.adapter.utils import CURSOR_SIGNATURE_SIZE, InvalidContinuationTokenException, decode_str_as_dict, encode_continuation_token, encode_dict_to_base64
 
 
 SAMPLE_CONTINUATION_TOKEN = {"creation_time": {"S": "2022-03-23T22:02:36.233752+0000"}, "author_id_and_type": {"S": "__PUBLIC__#F"}, "id": {"S": "1"}}
@@ -21,6 +22,66 @@ test_decode_test_data = [
 ]
 
 @pytest.mark.parametrize("continuation_token_as_base64,expected_token_dict", test_decode_test_data)
-def test_decode(continuation_token_as_base64: str, expected_token_dict: Dict[str,Any]) -> None:
+def test_decode(continuation_token_as_base64: str, expected_token_dict: Dict[str,Any], mocker) -> None:
+    mocker.patch("mynotes.adapter.utils.NOTES_LEGACY_CURSORS_ENABLED", True)
+
     assert decode_str_as_dict(continuation_token_as_base64) == expected_token_dict
 
+def test_decode_logs_accepted_legacy_token(mocker, caplog) -> None:
+    mocker.patch("mynotes.adapter.utils.NOTES_LEGACY_CURSORS_ENABLED", True)
+
+    decode_str_as_dict(SAMPLE_CONTINUATION_TOKEN_BASE64)
+
+    assert "unsigned legacy continuation token" in caplog.text
+
+
+SIGNING_KEY = b"test-signing-key"
+
+test_continuation_token_test_data = [
+    SAMPLE_CONTINUATION_TOKEN,
+    {"after_note_id": "2c4e4a1b-5c83-4b9f-9f58-0b3d2a6f7d11"},
+    {"tag_and_author": {"S": "python#mario"}, "note_id": {"S": "n1"}, "count": {"N": "42"}},
+    {"id": {"S": "ünïcödé " * 40}},
+    {}
+]
+
+@pytest.mark.parametrize("continuation_token_dict", test_continuation_token_test_data)
+def test_continuation_token_round_trip(continuation_token_dict: Dict[str,Any]) -> None:
+    token = encode_continuation_token(continuation_token_dict, SIGNING_KEY)
+
+    assert decode_str_as_dict(token, SIGNING_KEY) == continuation_token_dict
+
+def test_continuation_token_is_compact_and_url_safe() -> None:
+    token = encode_continuation_token(SAMPLE_CONTINUATION_TOKEN, SIGNING_KEY)
+
+    assert len(token) < len(SAMPLE_CONTINUATION_TOKEN_BASE64) / 2
+    assert all(char.isalnum() or char in "-_" for char in token)
+
+def test_decode_rejects_token_signed_with_another_key() -> None:
+    token = encode_continuation_token(SAMPLE_CONTINUATION_TOKEN, b"another-key")
+
+    with pytest.raises(InvalidContinuationTokenException):
+        decode_str_as_dict(token, SIGNING_KEY)
+
+def test_decode_rejects_tampered_token() -> None:
+    data = bytearray(base64.urlsafe_b64decode(encode_continuation_token({"after_note_id": "note-1"}, SIGNING_KEY) + "=="))
+    data[-CURSOR_SIGNATURE_SIZE - 1] ^= 0x01
+    tampered_token = base64.urlsafe_b64encode(bytes(data)).rstrip(b"=").decode("utf-8")
+
+    with pytest.raises(InvalidContinuationTokenException):
+        decode_str_as_dict(tampered_token, SIGNING_KEY)
+
+@pytest.mark.parametrize("token", ["AQ", "not a token", "eyJub3QganNvbg", "A" * 64])
+def test_decode_rejects_malformed_token(token: str) -> None:
+    with pytest.raises(InvalidContinuationTokenException):
+        decode_str_as_dict(token, SIGNING_KEY)
+
+def test_decode_rejects_legacy_token_by_default() -> None:
+    with pytest.raises(InvalidContinuationTokenException):
+        decode_str_as_dict(SAMPLE_CONTINUATION_TOKEN_BASE64, SIGNING_KEY)
+
+@pytest.mark.parametrize("creation_time", ["2022-03-23T22:02:36.233752+0000", "1969-12-31T23:59:59.999999+0000", "2022-03-23T23:02:36.233752+0100", "2022-03-23 22:02:36"])
+def test_continuation_token_preserves_date_times(creation_time: str) -> None:
+    continuation_token_dict = {"creation_time": {"S": creation_time}}
+
+    assert decode_str_as_dict(encode_continuation_token(continuation_token_dict, SIGNING_KEY), SIGNING_KEY) == continuation_token_dict
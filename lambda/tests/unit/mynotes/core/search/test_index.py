@@ -0,0 +1,122 @@
+from typing import Any, Dict
+
+import pytest
+from pytest_mock import MockerFixture
+
+from mynotes.core.architecture import ObjectStore, StoredObject
+from mynotes.core.search.index import SEARCH_SEGMENT_PREFIX, SearchIndex
+from mynotes.core.utils.common import now
+
+@pytest.fixture
+def stored_objects() -> Dict[str, bytes]:
+    return {}
+
+@pytest.fixture
+def mock_object_store(mocker: MockerFixture, stored_objects: Dict[str, bytes]) -> ObjectStore:
+    """Object store keeping the objects in a dict"""
+    mock_object_store = mocker.Mock(spec=ObjectStore)
+    mock_object_store.store_bytes.side_effect = stored_objects.__setitem__
+    mock_object_store.load_bytes.side_effect = stored_objects.__getitem__
+    mock_object_store.list_objects.side_effect = lambda prefix: iter([
+        StoredObject(key, now()) for key in sorted(stored_objects) if key.startswith(prefix)
+    ])
+
+    def delete_all(keys: Any) -> list:
+        for key in keys:
+            stored_objects.pop(key, None)
+        return []
+    mock_object_store.delete_all.side_effect = delete_all
+
+    return mock_object_store
+
+@pytest.fixture
+def search_index(mock_object_store: ObjectStore) -> SearchIndex:
+    search_index = SearchIndex(mock_object_store)
+    search_index.add_notes({
+        "apples": "# Apples\nApples are red, green or yellow. I like apples.",
+        "fruit": "Fruit salad: apples, bananas and cherries.",
+        "bananas": "Bananas are yellow.",
+    })
+    search_index.add_notes({"cars": "Yellow cars are fast."})
+    return search_index
+
+class TestSearchIndex:
+    def test_search_ranks_results(self, search_index: SearchIndex) -> None:
+        hits = search_index.search("apples")
+
+        assert [hit.note_id for hit in hits] == ["apples", "fruit"]
+        assert hits[0].score > hits[1].score > 0
+
+    def test_search_matches_any_term(self, search_index: SearchIndex) -> None:
+        hits = search_index.search("yellow cherries", limit=10)
+
+        assert {hit.note_id for hit in hits} == {"apples", "fruit", "bananas", "cars"}
+        # 'cherries' is rare, so the note with it comes first
+        assert hits[0].note_id == "fruit"
+
+    def test_search_with_limit(self, search_index: SearchIndex) -> None:
+        assert len(search_index.search("yellow", limit=2)) == 2
+
+    @pytest.mark.parametrize("query", ["", "the and", "durian"])
+    def test_search_without_matches(self, query: str, search_index: SearchIndex) -> None:
+        assert search_index.search(query) == []
+
+    def test_removed_notes_are_not_found(self, search_index: SearchIndex) -> None:
+        search_index.remove_notes(["apples"])
+
+        assert [hit.note_id for hit in search_index.search("apples")] == ["fruit"]
+
+    def test_segments_are_read_by_other_processes(self, search_index: SearchIndex, mock_object_store: ObjectStore, tmp_path: Any) -> None:
+        other_search_index = SearchIndex(mock_object_store, cache_dir=str(tmp_path))
+
+        assert [hit.note_id for hit in other_search_index.search("bananas")] == ["bananas", "fruit"]
+        assert len(list(tmp_path.iterdir())) == 2
+
+        # Cached segments are memory-mapped, not downloaded again
+        mock_object_store.load_bytes.reset_mock()
+        assert other_search_index.search("cars")[0].note_id == "cars"
+        mock_object_store.load_bytes.assert_not_called()
+
+    def test_compact(self, search_index: SearchIndex, mock_object_store: ObjectStore, stored_objects: Dict[str, bytes], tmp_path: Any) -> None:
+        search_index.remove_notes(["cars"])
+        # Lists the segments on every search
+        other_search_index = SearchIndex(mock_object_store, cache_dir=str(tmp_path), manifest_ttl=0)
+        assert other_search_index.search("yellow apples") == search_index.search("yellow apples")
+
+        compaction_result = search_index.compact()
+
+        assert len(compaction_result.merged_keys) == 3
+        assert list(stored_objects) == [compaction_result.segment_key]
+        assert compaction_result.segment_key.startswith(SEARCH_SEGMENT_PREFIX)
+        # Deleted notes are no longer counted in the statistics, so scores may change
+        assert {hit.note_id for hit in other_search_index.search("yellow apples")} == {"apples", "fruit", "bananas"}
+        # Files of merged segments are removed from the cache
+        assert len(list(tmp_path.iterdir())) == 1
+
+    def test_manifest_is_reused_until_it_expires(self, search_index: SearchIndex, mock_object_store: ObjectStore) -> None:
+        other_search_index = SearchIndex(mock_object_store)
+        other_search_index.search("apples")
+        mock_object_store.list_objects.reset_mock()
+
+        search_index.add_notes({"durians": "Durians smell."})
+        assert other_search_index.search("durians") == []
+        mock_object_store.list_objects.assert_not_called()
+
+        other_search_index.manifest_expiration = 0
+        assert [hit.note_id for hit in other_search_index.search("durians")] == ["durians"]
+        mock_object_store.list_objects.assert_called_once()
+
+    def test_own_segments_are_searched_at_once(self, search_index: SearchIndex, mock_object_store: ObjectStore) -> None:
+        search_index.search("apples")
+        mock_object_store.list_objects.reset_mock()
+
+        search_index.add_notes({"durians": "Durians smell."})
+
+        assert [hit.note_id for hit in search_index.search("durians")] == ["durians"]
+        mock_object_store.list_objects.assert_not_called()
+
+    def test_compact_single_segment(self, mock_object_store: ObjectStore) -> None:
+        search_index = SearchIndex(mock_object_store)
+        search_index.add_notes({"note": "Some content"})
+
+        assert search_index.compact().segment_key is None
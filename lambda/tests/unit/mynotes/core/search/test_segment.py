@@ -0,0 +1,66 @@
+import pytest
+from typing import List
+
+from mynotes.core.search.segment import (InvalidSegmentException, Segment, build_segment, decode_postings, decode_varints,
+                                         encode_postings, encode_varint, merge_segments)
+
+@pytest.mark.parametrize("values", [[0], [1, 127, 128, 300, 16384, 2**32 + 5], []])
+def test_varints(values: List[int]) -> None:
+    buffer = bytearray()
+    for value in values:
+        encode_varint(value, buffer)
+
+    assert decode_varints(bytes(buffer)) == values
+
+def test_postings_are_delta_encoded() -> None:
+    postings = [(1000, 1), (1001, 3), (1003, 1)]
+
+    data = encode_postings(postings)
+
+    # Only the first ordinal needs more than one byte
+    assert len(data) == 7
+    assert decode_postings(data) == postings
+
+def test_segment() -> None:
+    segment = Segment(build_segment({
+        "note-b": ["apple", "banana", "apple"],
+        "note-a": ["banana", "cherry"],
+    }, deleted_note_ids=["note-z"]))
+
+    assert segment.doc_count == 2
+    assert [segment.note_id(ordinal) for ordinal in range(segment.doc_count)] == ["note-a", "note-b"]
+    assert list(segment.doc_lengths) == [2, 3]
+    assert segment.total_doc_length == 5
+    assert segment.find_ordinal("note-b") == 1
+    assert segment.find_ordinal("note-c") is None
+    assert segment.postings("apple") == [(1, 2)]
+    assert segment.postings("banana") == [(0, 1), (1, 1)]
+    assert segment.postings("durian") == []
+    assert segment.doc_freq("banana") == 2
+    assert segment.deleted_note_ids() == ["note-z"]
+
+def test_empty_segment() -> None:
+    segment = Segment(build_segment({}))
+
+    assert segment.doc_count == 0
+    assert segment.postings("apple") == []
+    assert segment.deleted_note_ids() == []
+
+@pytest.mark.parametrize("data", [b"", b"not a segment" * 10, build_segment({"note": ["apple"]})[:-1]])
+def test_invalid_segment(data: bytes) -> None:
+    with pytest.raises(InvalidSegmentException):
+        Segment(data)
+
+def test_merge_segments() -> None:
+    segments = [
+        Segment(build_segment({"note-1": ["apple"], "note-3": ["apple", "banana"]})),
+        Segment(build_segment({"note-2": ["banana"]}, deleted_note_ids=["note-3", "note-9"])),
+    ]
+
+    merged = Segment(merge_segments(segments))
+
+    assert [merged.note_id(ordinal) for ordinal in range(merged.doc_count)] == ["note-1", "note-2"]
+    assert merged.postings("apple") == [(0, 1)]
+    assert merged.postings("banana") == [(1, 1)]
+    # The deletion of note-3 was applied, the one of note-9 may be for a note in a later segment
+    assert merged.deleted_note_ids() == ["note-9"]
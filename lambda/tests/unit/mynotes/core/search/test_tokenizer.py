@@ -0,0 +1,18 @@
+import pytest
+from typing import List
+
+from mynotes.core.search.tokenizer import tokenize
+
+tokenize_test_data = [
+    ("# Title\nSome *emphasis* and `code`", ["title", "some", "emphasis", "code"]),
+    ("See [the docs](https://example.com/docs) or ![diagram](img.png)", ["see", "docs", "diagram"]),
+    ("<b>Bold</b> <br/> HTML", ["bold", "html"]),
+    ("Straße, café: ÉTÉ 2022", ["strasse", "café", "été", "2022"]),
+    ("snake_case x y", ["snake", "case"]),
+    ("", []),
+    (None, []),
+]
+
+@pytest.mark.parametrize("markdown,expected_tokens", tokenize_test_data)
+def test_tokenize(markdown: str, expected_tokens: List[str]) -> None:
+    assert tokenize(markdown) == expected_tokens
@@ -1,6 +1,9 @@
+import asyncio
+from typing import AsyncIterator, Dict, Iterator, List
+
 import pytest
 
-from mynotes.core.architecture import wrap_exceptions, ApplicationException
+from mynotes.core.architecture import MetricsSink, instrumentation, instrumented, timed, wrap_exceptions, ApplicationException
 
 @wrap_exceptions
 def function() -> None:
@@ -18,4 +21,88 @@ def test_exception_is_wrapped() -> None:
 def test_normal_execution_if_no_exception() -> None:
     function()
 
-    assert True
\ No newline at end of file
+    assert True
+
+class CapturingSink(MetricsSink):
+    def __init__(self) -> None:
+        self.emitted = []
+
+    def emit(self, timings: Dict[str, List[float]], dimensions: Dict[str, str]) -> None:
+        self.emitted.append((timings, dimensions))
+
+@pytest.fixture
+def metrics_sink() -> Iterator[CapturingSink]:
+    sink = CapturingSink()
+    instrumentation.enable(sink)
+    yield sink
+    instrumentation.disable()
+
+@instrumented
+class InstrumentedService:
+    def work(self) -> int:
+        return 42
+
+    def fail(self) -> None:
+        raise ValueError("failed")
+
+    def iterate(self) -> Iterator[int]:
+        yield 1
+
+    def _private(self) -> int:
+        return 0
+
+def test_instrumented_methods_are_timed(metrics_sink: CapturingSink) -> None:
+    service = InstrumentedService()
+
+    assert service.work() == 42
+    assert service.work() == 42
+    with pytest.raises(ValueError):
+        service.fail()
+    assert list(service.iterate()) == [1]
+    service._private()
+    instrumentation.flush({"Handler": "test"})
+
+    (timings, dimensions), = metrics_sink.emitted
+    assert dimensions == {"Handler": "test"}
+    assert set(timings) == {"InstrumentedService.work", "InstrumentedService.fail"}
+    assert len(timings["InstrumentedService.work"]) == 2
+
+@instrumented
+class AsyncInstrumentedService:
+    async def work(self) -> int:
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def iterate(self) -> AsyncIterator[int]:
+        yield 1
+
+def test_instrumented_coroutines_are_timed_until_completed(metrics_sink: CapturingSink) -> None:
+    async def run() -> List[int]:
+        service = AsyncInstrumentedService()
+        return [await service.work()] + [item async for item in service.iterate()]
+
+    assert asyncio.run(run()) == [42, 1]
+    instrumentation.flush()
+
+    (timings, _), = metrics_sink.emitted
+    assert list(timings) == ["AsyncInstrumentedService.work"]
+    assert timings["AsyncInstrumentedService.work"][0] >= 10
+
+def test_timed_block(metrics_sink: CapturingSink) -> None:
+    with timed("block"):
+        pass
+    instrumentation.flush()
+
+    assert list(metrics_sink.emitted[0][0]) == ["block"]
+
+def test_nothing_is_recorded_while_disabled() -> None:
+    InstrumentedService().work()
+    with timed("block"):
+        pass
+
+    assert not instrumentation.timings
+
+def test_flush_without_timings_emits_nothing(metrics_sink: CapturingSink) -> None:
+    instrumentation.flush()
+
+    assert metrics_sink.emitted == []
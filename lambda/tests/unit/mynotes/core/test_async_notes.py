@@ -0,0 +1,186 @@
+import asyncio
+
+import pytest
+from pytest_mock import MockerFixture
+
+from mynotes.core.architecture import AsyncObjectStore, ResourceNotFoundException, User
+from mynotes.core.async_notes import AsyncNoteRepository, AsyncNoteUseCases
+from mynotes.core.notes import ContentReference, ContentReferenceRepository, Note, NoteType, get_content_hash
+from mynotes.core.search.index import SearchIndex
+from mynotes.core.utils.common import now
+
+
+@pytest.fixture
+def mock_bucket_adapter(mocker: MockerFixture) -> AsyncObjectStore:
+    return mocker.Mock(spec=AsyncObjectStore)
+
+@pytest.fixture
+def mock_note_repository(mocker: MockerFixture) -> AsyncNoteRepository:
+    return mocker.Mock(spec=AsyncNoteRepository)
+
+@pytest.fixture
+def mock_search_index(mocker: MockerFixture) -> SearchIndex:
+    return mocker.Mock(spec=SearchIndex)
+
+@pytest.fixture
+def usecase(mock_bucket_adapter: AsyncObjectStore, mock_note_repository: AsyncNoteRepository, mock_search_index: SearchIndex) -> AsyncNoteUseCases:
+    return AsyncNoteUseCases(mock_bucket_adapter, mock_note_repository, mock_search_index)
+
+@pytest.fixture
+def mock_content_references(mocker: MockerFixture) -> ContentReferenceRepository:
+    content_references = mocker.Mock(spec=ContentReferenceRepository)
+    content_references.acquire.side_effect = lambda content_hash, count=1: ContentReference(content_hash, "g1", created=False)
+    content_references.release.return_value = True
+    return content_references
+
+@pytest.fixture
+def deduplicating_usecase(mock_bucket_adapter: AsyncObjectStore, mock_note_repository: AsyncNoteRepository,
+    mock_content_references: ContentReferenceRepository) -> AsyncNoteUseCases:
+    return AsyncNoteUseCases(mock_bucket_adapter, mock_note_repository, content_references=mock_content_references)
+
+CONTENT_HASH = get_content_hash("Some content")
+CONTENT_OBJECT_KEY = f"blobs/{CONTENT_HASH}/g1.md"
+
+class TestAsyncNoteUseCases:
+
+    def test_create_note(self, usecase: AsyncNoteUseCases, mock_bucket_adapter: AsyncObjectStore,
+        mock_note_repository: AsyncNoteRepository, mock_search_index: SearchIndex) -> None:
+        note = asyncio.run(usecase.create_note(User("mario"), " Some content ", ["python"]))
+
+        mock_bucket_adapter.store.assert_awaited_once_with(f"notes/{note.id}.md", "Some content")
+        mock_note_repository.save.assert_awaited_once_with(note)
+        mock_search_index.add_notes.assert_called_once_with({note.id: " Some content "})
+        assert note.tags == ["python"]
+
+    def test_create_note_removes_metadata_if_upload_fails(self, usecase: AsyncNoteUseCases,
+        mock_bucket_adapter: AsyncObjectStore, mock_note_repository: AsyncNoteRepository) -> None:
+        mock_bucket_adapter.store.side_effect = Exception("Upload failed!")
+
+        with pytest.raises(Exception):
+            asyncio.run(usecase.create_note(User("mario"), "Some content"))
+
+        mock_note_repository.delete_by_id.assert_awaited_once()
+        mock_bucket_adapter.delete.assert_not_awaited()
+
+    def test_create_note_removes_content_if_save_fails(self, usecase: AsyncNoteUseCases,
+        mock_bucket_adapter: AsyncObjectStore, mock_note_repository: AsyncNoteRepository, mock_search_index: SearchIndex) -> None:
+        mock_note_repository.save.side_effect = Exception("Save failed!")
+
+        with pytest.raises(Exception):
+            asyncio.run(usecase.create_note(User("mario"), "Some content"))
+
+        mock_bucket_adapter.delete.assert_awaited_once()
+        mock_note_repository.delete_by_id.assert_not_awaited()
+        mock_search_index.add_notes.assert_not_called()
+
+    def test_find_notes_by_ids(self, usecase: AsyncNoteUseCases, mock_note_repository: AsyncNoteRepository) -> None:
+        mock_note_repository.find_by_ids.return_value = [_test_note("2"), _test_note("1")]
+
+        lookup_result = asyncio.run(usecase.find_notes_by_ids(["1", "2", "1", "3"]))
+
+        mock_note_repository.find_by_ids.assert_awaited_once_with(["1", "2", "3"])
+        assert [note.id for note in lookup_result.items] == ["1", "2"]
+        assert lookup_result.missing_ids == ["3"]
+
+    def test_find_note_content(self, usecase: AsyncNoteUseCases,
+        mock_bucket_adapter: AsyncObjectStore, mock_note_repository: AsyncNoteRepository) -> None:
+        mock_note_repository.find_by_id.return_value = _test_note("1")
+        mock_bucket_adapter.get_etag.return_value = "etag"
+        mock_bucket_adapter.load.return_value = "Some content"
+
+        lookup = asyncio.run(usecase.find_note_content("1"))
+        lookup_without_content = asyncio.run(usecase.find_note_content("1", load_content=False))
+
+        assert (lookup.note.id, lookup.content_etag, lookup.content) == ("1", "etag", "Some content")
+        assert lookup_without_content.content is None
+        mock_bucket_adapter.load.assert_awaited_once_with("notes/1.md")
+
+    def test_find_note_content_of_missing_note(self, usecase: AsyncNoteUseCases,
+        mock_bucket_adapter: AsyncObjectStore, mock_note_repository: AsyncNoteRepository) -> None:
+        mock_note_repository.find_by_id.return_value = None
+        mock_bucket_adapter.get_etag.return_value = None
+        mock_bucket_adapter.load.side_effect = Exception("NoSuchKey")
+
+        with pytest.raises(ResourceNotFoundException):
+            asyncio.run(usecase.find_note_content("1"))
+
+    def test_load_note_content_range_of_missing_note(self, usecase: AsyncNoteUseCases,
+        mock_bucket_adapter: AsyncObjectStore, mock_note_repository: AsyncNoteRepository) -> None:
+        mock_note_repository.find_by_id.return_value = None
+        mock_bucket_adapter.load_range.side_effect = Exception("NoSuchKey")
+
+        with pytest.raises(ResourceNotFoundException):
+            asyncio.run(usecase.load_note_content_range("1", 0, 10))
+
+    def test_delete_note_by_id(self, usecase: AsyncNoteUseCases, mock_bucket_adapter: AsyncObjectStore,
+        mock_note_repository: AsyncNoteRepository, mock_search_index: SearchIndex) -> None:
+        mock_note_repository.delete_by_id.return_value = _test_note("1")
+
+        asyncio.run(usecase.delete_note_by_id("1"))
+
+        mock_note_repository.delete_by_id.assert_awaited_once_with("1")
+        mock_bucket_adapter.delete.assert_awaited_once_with("notes/1.md")
+        mock_search_index.remove_notes.assert_called_once_with(["1"])
+
+    def test_delete_missing_note_leaves_search_index_alone(self, usecase: AsyncNoteUseCases,
+        mock_note_repository: AsyncNoteRepository, mock_search_index: SearchIndex) -> None:
+        mock_note_repository.delete_by_id.return_value = None
+
+        asyncio.run(usecase.delete_note_by_id("1"))
+
+        mock_search_index.remove_notes.assert_not_called()
+
+class TestAsyncNoteUseCasesContentAddressed:
+
+    def test_create_note_skips_stored_content(self, deduplicating_usecase: AsyncNoteUseCases,
+        mock_bucket_adapter: AsyncObjectStore, mock_note_repository: AsyncNoteRepository) -> None:
+        mock_bucket_adapter.get_etag.return_value = "etag"
+
+        note = asyncio.run(deduplicating_usecase.create_note(User("mario"), "Some content"))
+
+        assert (note.content_hash, note.content_generation) == (CONTENT_HASH, "g1")
+        mock_bucket_adapter.get_etag.assert_awaited_once_with(CONTENT_OBJECT_KEY)
+        mock_bucket_adapter.store.assert_not_awaited()
+        mock_note_repository.save.assert_awaited_once_with(note)
+
+    def test_create_note_releases_content_if_save_fails(self, deduplicating_usecase: AsyncNoteUseCases,
+        mock_bucket_adapter: AsyncObjectStore, mock_note_repository: AsyncNoteRepository, mock_content_references: ContentReferenceRepository) -> None:
+        mock_bucket_adapter.get_etag.return_value = None
+        mock_note_repository.save.side_effect = Exception("Save failed!")
+
+        with pytest.raises(Exception):
+            asyncio.run(deduplicating_usecase.create_note(User("mario"), "Some content"))
+
+        mock_bucket_adapter.store.assert_awaited_once_with(CONTENT_OBJECT_KEY, "Some content")
+        mock_content_references.release.assert_called_once_with(CONTENT_HASH, "g1")
+        mock_bucket_adapter.delete.assert_awaited_once_with(CONTENT_OBJECT_KEY)
+
+    def test_find_note_content(self, deduplicating_usecase: AsyncNoteUseCases,
+        mock_bucket_adapter: AsyncObjectStore, mock_note_repository: AsyncNoteRepository) -> None:
+        mock_note_repository.find_by_id.return_value = _test_note("1", content_hash=CONTENT_HASH, content_generation="g1")
+        mock_bucket_adapter.get_etag.return_value = "etag"
+        mock_bucket_adapter.load.return_value = "Some content"
+
+        lookup = asyncio.run(deduplicating_usecase.find_note_content("1"))
+        content_range = asyncio.run(deduplicating_usecase.load_note_content_range("1", 0, 3))
+
+        assert (lookup.note.id, lookup.content_etag, lookup.content) == ("1", "etag", "Some content")
+        mock_bucket_adapter.load.assert_awaited_once_with(CONTENT_OBJECT_KEY)
+        mock_bucket_adapter.load_range.assert_awaited_once_with(CONTENT_OBJECT_KEY, 0, 3)
+        assert content_range is mock_bucket_adapter.load_range.return_value
+
+    @pytest.mark.parametrize("unreferenced,expected_deletes", [(True, 1), (False, 0)])
+    def test_delete_note_by_id(self, unreferenced: bool, expected_deletes: int, deduplicating_usecase: AsyncNoteUseCases,
+        mock_bucket_adapter: AsyncObjectStore, mock_note_repository: AsyncNoteRepository, mock_content_references: ContentReferenceRepository) -> None:
+        mock_note_repository.delete_by_id.return_value = _test_note("1", content_hash=CONTENT_HASH, content_generation="g1")
+        mock_content_references.release.return_value = unreferenced
+
+        asyncio.run(deduplicating_usecase.delete_note_by_id("1"))
+
+        mock_note_repository.find_by_id.assert_not_awaited()
+
+        mock_content_references.release.assert_called_once_with(CONTENT_HASH, "g1")
+        assert mock_bucket_adapter.delete.await_count == expected_deletes
+
+def _test_note(id: str, **kwargs) -> Note:
+    return Note(id=id, author_id="mario", type=NoteType.FREE, creation_time=now(), tags=[], **kwargs)
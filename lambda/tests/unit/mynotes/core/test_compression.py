@@ -0,0 +1,38 @@
+import pytest
+
+from mynotes.core.compression import (GzipCodec, IdentityCodec, UnsupportedCodecException, ZstdCodec,
+                                      available_codec_names, get_codec)
+
+SAMPLE_CONTENT = ("# Title\nSome **Markdown** content, perché no? ✓\n" * 200).encode("utf-8")
+
+@pytest.mark.parametrize("codec_name", available_codec_names())
+def test_round_trip(codec_name: str) -> None:
+    codec = get_codec(codec_name)
+
+    assert codec.decompress(codec.compress(SAMPLE_CONTENT)) == SAMPLE_CONTENT
+
+@pytest.mark.parametrize("codec_name", available_codec_names())
+def test_incremental_decompression(codec_name: str) -> None:
+    codec = get_codec(codec_name)
+    compressed = codec.compress(SAMPLE_CONTENT)
+
+    decompressor = codec.decompressor()
+    content = b"".join(decompressor.decompress(compressed[i:i + 7]) for i in range(0, len(compressed), 7))
+    content += decompressor.flush()
+
+    assert content == SAMPLE_CONTENT
+
+def test_gzip_compresses_markdown() -> None:
+    assert len(GzipCodec().compress(SAMPLE_CONTENT)) < len(SAMPLE_CONTENT) / 4
+
+def test_zstd_codec_is_available_when_installed() -> None:
+    pytest.importorskip("zstandard")
+
+    assert isinstance(get_codec("zstd"), ZstdCodec)
+
+def test_no_encoding_means_identity() -> None:
+    assert isinstance(get_codec(None), IdentityCodec)
+
+def test_unsupported_codec() -> None:
+    with pytest.raises(UnsupportedCodecException):
+        get_codec("br")
@@ -0,0 +1,75 @@
+from typing import Any
+
+import pytest
+from pytest_mock import MockerFixture
+
+from mynotes.core.architecture import ApplicationException, ValidationException
+from mynotes.core.idempotency import (IdempotencyConflictException, IdempotencyRecord, IdempotencyStatus, IdempotencyStore,
+                                      get_request_fingerprint, run_idempotently)
+
+RESPONSE = {"statusCode": 200, "body": "{}"}
+
+@pytest.fixture
+def mock_store(mocker: MockerFixture) -> Any:
+    store = mocker.Mock(spec=IdempotencyStore)
+    store.start.return_value = None
+    return store
+
+def test_fingerprint_ignores_key_order() -> None:
+    assert get_request_fingerprint({"a": 1, "b": [2]}) == get_request_fingerprint({"b": [2], "a": 1})
+    assert get_request_fingerprint({"a": 1}) != get_request_fingerprint({"a": 2})
+
+class TestRunIdempotently:
+    def test_first_request_runs_and_records_the_response(self, mocker: MockerFixture, mock_store: Any) -> None:
+        operation = mocker.Mock(return_value=RESPONSE)
+
+        assert run_idempotently(mock_store, "key", "fingerprint", operation) == (RESPONSE, False)
+
+        mock_store.start.assert_called_once_with("key", "fingerprint")
+        mock_store.complete.assert_called_once_with("key", RESPONSE)
+
+    def test_retries_get_the_recorded_response(self, mocker: MockerFixture, mock_store: Any) -> None:
+        mock_store.start.return_value = IdempotencyRecord("key", "fingerprint", IdempotencyStatus.COMPLETED, RESPONSE)
+        operation = mocker.Mock()
+
+        assert run_idempotently(mock_store, "key", "fingerprint", operation) == (RESPONSE, True)
+
+        operation.assert_not_called()
+        mock_store.complete.assert_not_called()
+
+    def test_key_reused_with_another_request_is_rejected(self, mocker: MockerFixture, mock_store: Any) -> None:
+        mock_store.start.return_value = IdempotencyRecord("key", "other-fingerprint", IdempotencyStatus.COMPLETED, RESPONSE)
+
+        with pytest.raises(ValidationException):
+            run_idempotently(mock_store, "key", "fingerprint", mocker.Mock())
+
+    def test_requests_in_progress_fail_fast(self, mocker: MockerFixture, mock_store: Any) -> None:
+        mock_store.start.return_value = IdempotencyRecord("key", "fingerprint", IdempotencyStatus.IN_PROGRESS)
+        operation = mocker.Mock()
+
+        with pytest.raises(IdempotencyConflictException):
+            run_idempotently(mock_store, "key", "fingerprint", operation)
+
+        operation.assert_not_called()
+
+    def test_requests_in_progress_are_waited_for(self, mocker: MockerFixture, mock_store: Any) -> None:
+        mock_store.start.side_effect = [
+            IdempotencyRecord("key", "fingerprint", IdempotencyStatus.IN_PROGRESS),
+            IdempotencyRecord("key", "fingerprint", IdempotencyStatus.COMPLETED, RESPONSE)
+        ]
+
+        assert run_idempotently(mock_store, "key", "fingerprint", mocker.Mock(), wait_seconds=1, poll_interval_seconds=0) == (RESPONSE, True)
+
+    def test_failed_requests_are_cancelled(self, mocker: MockerFixture, mock_store: Any) -> None:
+        operation = mocker.Mock(side_effect=ApplicationException("Whops!"))
+
+        with pytest.raises(ApplicationException):
+            run_idempotently(mock_store, "key", "fingerprint", operation)
+
+        mock_store.cancel.assert_called_once_with("key")
+        mock_store.complete.assert_not_called()
+
+    def test_response_is_returned_if_not_recorded(self, mocker: MockerFixture, mock_store: Any) -> None:
+        mock_store.complete.side_effect = ApplicationException("Whops!")
+
+        assert run_idempotently(mock_store, "key", "fingerprint", mocker.Mock(return_value=RESPONSE)) == (RESPONSE, False)
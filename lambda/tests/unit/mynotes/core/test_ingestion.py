@@ -0,0 +1,118 @@
+from datetime import datetime, timezone
+from typing import Any
+
+import pytest
+from pytest_mock import MockerFixture
+
+from mynotes.core.architecture import ApplicationException, User, ValidationException
+from mynotes.core.ingestion import (DEFAULT_MAX_MESSAGE_SIZE, NoteCreationMessage, NoteIngestion, NoteQueue, decode_note_creation_message,
+                                    encode_note_creation_message, get_note_creation_message_size)
+from mynotes.core.notes import Note, NoteCreationResult, NoteLookupResult, NoteType, NoteUseCases
+
+CREATION_TIME = datetime(2022, 3, 1, 12, 30, tzinfo=timezone.utc)
+
+@pytest.fixture
+def mock_usecase(mocker: MockerFixture) -> Any:
+    usecase = mocker.Mock(spec=NoteUseCases)
+    usecase.find_notes_by_ids.return_value = NoteLookupResult(items=[], missing_ids=[])
+    usecase.create_notes.side_effect = lambda author, note_requests: [
+        NoteCreationResult(note=_test_note(note_request.id, author.user_id)) for note_request in note_requests
+    ]
+    return usecase
+
+@pytest.fixture
+def mock_queue(mocker: MockerFixture) -> Any:
+    return mocker.Mock(spec=NoteQueue)
+
+@pytest.fixture
+def ingestion(mock_usecase: Any, mock_queue: Any) -> NoteIngestion:
+    return NoteIngestion(mock_usecase, mock_queue)
+
+def test_message_encoding() -> None:
+    message = NoteCreationMessage("1", "mario", CREATION_TIME, "Some content", ["python"])
+
+    assert decode_note_creation_message(encode_note_creation_message(message)) == message
+
+class TestNoteIngestion:
+    def test_submit_note_queues_the_note(self, ingestion: NoteIngestion, mock_queue: Any) -> None:
+        note = ingestion.submit_note(User("mario"), "Some content", ["python"])
+
+        message = mock_queue.send.call_args[0][0]
+        assert (message.id, message.author_id, message.creation_time) == (note.id, "mario", note.creation_time)
+        assert (message.content, message.tags) == ("Some content", ["python"])
+
+    def test_submit_note_requires_content(self, ingestion: NoteIngestion, mock_queue: Any) -> None:
+        with pytest.raises(ValidationException):
+            ingestion.submit_note(User("mario"), "  ")
+
+        mock_queue.send.assert_not_called()
+
+    def test_multi_byte_content_near_the_limit_is_queued(self, ingestion: NoteIngestion, mock_queue: Any) -> None:
+        # 3 bytes per character in UTF-8, 6 once escaped as JSON
+        content = "漢" * ((DEFAULT_MAX_MESSAGE_SIZE - 1024) // 3)
+
+        assert ingestion.submit_note(User("mario"), content)
+
+        message = mock_queue.send.call_args[0][0]
+        assert get_note_creation_message_size(message) <= DEFAULT_MAX_MESSAGE_SIZE
+
+    def test_notes_not_fitting_in_a_message_are_not_queued(self, ingestion: NoteIngestion, mock_queue: Any) -> None:
+        content = "漢" * (DEFAULT_MAX_MESSAGE_SIZE // 3)
+
+        assert ingestion.submit_note(User("mario"), content) is None
+
+        mock_queue.send.assert_not_called()
+
+    def test_ingest_creates_notes_in_bulk_by_author(self, ingestion: NoteIngestion, mock_usecase: Any) -> None:
+        result = ingestion.ingest({
+            "m1": _message_body("1", "mario"),
+            "m2": _message_body("2", "mario"),
+            "m3": _message_body("3", "luigi")
+        })
+
+        assert sorted(result.created_ids) == ["1", "2", "3"]
+        assert result.failed_message_ids == [] and result.rejected_message_ids == []
+        assert mock_usecase.create_notes.call_count == 2
+        author, note_requests = mock_usecase.create_notes.call_args_list[0][0]
+        assert author.user_id == "mario"
+        assert [(request.id, request.creation_time) for request in note_requests] == [("1", CREATION_TIME), ("2", CREATION_TIME)]
+
+    def test_ingest_reports_failed_messages(self, ingestion: NoteIngestion, mock_usecase: Any) -> None:
+        mock_usecase.create_notes.side_effect = lambda author, note_requests: [
+            NoteCreationResult(error_message="Note content upload failed") if note_request.id == "2" else NoteCreationResult(note=_test_note(note_request.id))
+            for note_request in note_requests
+        ]
+
+        result = ingestion.ingest({"m1": _message_body("1"), "m2": _message_body("2")})
+
+        assert result.created_ids == ["1"]
+        assert result.failed_message_ids == ["m2"]
+
+    def test_ingest_retries_the_notes_of_a_failed_bulk_creation(self, ingestion: NoteIngestion, mock_usecase: Any) -> None:
+        mock_usecase.create_notes.side_effect = ApplicationException("Whops!")
+
+        result = ingestion.ingest({"m1": _message_body("1"), "m2": _message_body("2")})
+
+        assert result.failed_message_ids == ["m1", "m2"]
+
+    def test_ingest_rejects_malformed_messages(self, ingestion: NoteIngestion, mock_usecase: Any) -> None:
+        result = ingestion.ingest({"m1": "not json", "m2": '{"id": "2"}', "m3": _message_body("3", content=" ")})
+
+        assert result.rejected_message_ids == ["m1", "m2", "m3"]
+        assert result.failed_message_ids == []
+        mock_usecase.create_notes.assert_not_called()
+
+    def test_ingest_skips_notes_already_created(self, ingestion: NoteIngestion, mock_usecase: Any) -> None:
+        mock_usecase.find_notes_by_ids.return_value = NoteLookupResult(items=[_test_note("1")], missing_ids=["2"])
+
+        result = ingestion.ingest({"m1": _message_body("1"), "m2": _message_body("2"), "m3": _message_body("2")})
+
+        assert sorted(result.created_ids) == ["1", "2"]
+        note_requests = mock_usecase.create_notes.call_args[0][1]
+        assert [request.id for request in note_requests] == ["2"]
+
+def _message_body(id: str, author_id: str = "mario", content: str = "Some content") -> str:
+    return encode_note_creation_message(NoteCreationMessage(id, author_id, CREATION_TIME, content))
+
+def _test_note(id: str, author_id: str = "mario") -> Note:
+    return Note(id=id, author_id=author_id, type=NoteType.FREE, creation_time=CREATION_TIME, tags=[])
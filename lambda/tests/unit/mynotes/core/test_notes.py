@@ -1,9 +1,13 @@
+from datetime import datetime, timezone
+
 import pytest
-from mynotes.core.architecture import ObjectStore, ResourceNotFoundException, User
-from mynotes.core.notes import (NoteUseCases, Note, NoteRepository,
-                                NoteType)
+from mynotes.core.architecture import DataPageQuery, FeatureNotEnabledException, ObjectStore, ResourceNotFoundException, User, ValidationException
+from mynotes.core.notes import (TAG_MATCH_ALL, TAG_MATCH_ANY, ContentReference, ContentReferenceRepository, NoteCreationRequest, NoteUseCases,
+                                Note, NoteRepository, NoteType, get_content_hash)
 from pytest_mock import MockerFixture
 
+from mynotes.core.search.index import SearchHit, SearchIndex
+
 
 @pytest.fixture
 def mock_bucket_adapter(mocker: MockerFixture) -> ObjectStore:
@@ -13,10 +17,25 @@ def mock_bucket_adapter(mocker: MockerFixture) -> ObjectStore:
 def mock_note_repository(mocker: MockerFixture) -> NoteRepository:
     return mocker.Mock(spec=NoteRepository)
 
+@pytest.fixture
+def mock_search_index(mocker: MockerFixture) -> SearchIndex:
+    return mocker.Mock(spec=SearchIndex)
+
+@pytest.fixture
+def mock_content_references(mocker: MockerFixture) -> ContentReferenceRepository:
+    content_references = mocker.Mock(spec=ContentReferenceRepository)
+    content_references.acquire.side_effect = lambda content_hash, count=1: ContentReference(content_hash, "g1", created=True)
+    content_references.release.return_value = True
+    return content_references
+
 @pytest.fixture
 def usecase(mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> NoteUseCases:
     return NoteUseCases(mock_bucket_adapter, mock_note_repository)
 
+@pytest.fixture
+def searchable_usecase(mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository, mock_search_index: SearchIndex) -> NoteUseCases:
+    return NoteUseCases(mock_bucket_adapter, mock_note_repository, search_index=mock_search_index)
+
 class TestNoteUseCases:
 
     def test_create_note(self, 
@@ -39,6 +58,94 @@ class TestNoteUseCases:
 
         mock_note_repository.save.assert_called_once()
 
+    def test_create_note_removes_metadata_if_upload_fails(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+        mock_bucket_adapter.store.side_effect = Exception("Upload failed!")
+
+        with pytest.raises(Exception):
+            usecase.create_note(User("mario"), "Some content")
+
+        saved_note = mock_note_repository.save.call_args[0][0]
+        mock_note_repository.delete_by_id.assert_called_once_with(saved_note.id)
+
+    def test_create_note_removes_content_if_save_fails(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+        mock_note_repository.save.side_effect = Exception("Save failed!")
+
+        with pytest.raises(Exception):
+            usecase.create_note(User("mario"), "Some content")
+
+        object_key = mock_bucket_adapter.store.call_args[0][0]
+        mock_bucket_adapter.delete.assert_called_once_with(object_key)
+        mock_note_repository.delete_by_id.assert_not_called()
+
+    def test_create_note_does_not_compensate_if_both_writes_fail(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+        mock_bucket_adapter.store.side_effect = Exception("Upload failed!")
+        mock_note_repository.save.side_effect = Exception("Save failed!")
+
+        with pytest.raises(Exception):
+            usecase.create_note(User("mario"), "Some content")
+
+        mock_bucket_adapter.delete.assert_not_called()
+        mock_note_repository.delete_by_id.assert_not_called()
+
+    def test_create_notes(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+        mock_note_repository.save_all.return_value = []
+
+        results = usecase.create_notes(
+            User("mario"),
+            [NoteCreationRequest("First note"), NoteCreationRequest("Second note", ["test"])]
+        )
+
+        assert [result.error_message for result in results] == [None, None]
+        assert results[1].note.tags == ["test"]
+        assert mock_bucket_adapter.store.call_count == 2
+        mock_bucket_adapter.store.assert_any_call(f"notes/{results[0].note.id}.md", "First note")
+        mock_note_repository.save_all.assert_called_once()
+
+    def test_create_notes_keeps_given_ids(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+        mock_note_repository.save_all.return_value = []
+        creation_time = datetime(2022, 3, 1, tzinfo=timezone.utc)
+
+        results = usecase.create_notes(User("mario"), [NoteCreationRequest("Queued note", id="queued-1", creation_time=creation_time)])
+
+        assert (results[0].note.id, results[0].note.creation_time) == ("queued-1", creation_time)
+        mock_bucket_adapter.store.assert_called_once_with("notes/queued-1.md", "Queued note")
+
+    def test_create_notes_reports_failures_per_item(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+        def store(object_key: str, content: str) -> None:
+            if content == "Upload fails":
+                raise Exception("Whops!")
+        mock_bucket_adapter.store.side_effect = store
+        mock_note_repository.save_all.side_effect = lambda notes: [note.id for note in notes if "fail" in note.tags]
+
+        results = usecase.create_notes(
+            User("mario"),
+            [
+                NoteCreationRequest("Good note"),
+                NoteCreationRequest(None),
+                NoteCreationRequest("Upload fails"),
+                NoteCreationRequest("Metadata fails", ["fail"])
+            ]
+        )
+
+        assert results[0].note and not results[0].error_message
+        assert not results[1].note and results[1].error_message
+        assert not results[2].note and results[2].error_message
+        assert not results[3].note and results[3].error_message
+        # Content of the notes whose metadata could not be saved is removed
+        mock_bucket_adapter.delete_all.assert_called_once()
+
     def test_find_note_by_id_must_throw_exception_if_note_does_not_exist(self, 
         usecase: NoteUseCases, 
         mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
@@ -61,12 +168,375 @@ class TestNoteUseCases:
         mock_note_repository.find_by_id.assert_called_once_with("test-id")
         assert found_note == test_note
 
+    def test_find_notes_by_ids(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+
+        mock_note_repository.find_by_ids.return_value = [
+            Note(id="id-2", author_id="test-user"),
+            Note(id="id-1", author_id="test-user")
+        ]
+
+        lookup_result = usecase.find_notes_by_ids(["id-1", "id-2", "id-3", "id-1"])
+
+        mock_note_repository.find_by_ids.assert_called_once_with(["id-1", "id-2", "id-3"])
+        assert [note.id for note in lookup_result.items] == ["id-1", "id-2"]
+        assert lookup_result.missing_ids == ["id-3"]
+
+    def test_find_notes_by_type(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+
+        data_page_query = DataPageQuery(since=datetime(2022, 3, 1, tzinfo=timezone.utc), newest_first=True)
+
+        usecase.find_notes_by_type(User("test-user"), NoteType.QUESTION, data_page_query, summary=True)
+
+        mock_note_repository.find_all_by_type.assert_called_once_with(NoteType.QUESTION, author_id="test-user", data_page_query=data_page_query, summary=True)
+
+    def test_find_notes_by_type_must_throw_exception_if_time_range_is_inverted(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+
+        data_page_query = DataPageQuery(since=datetime(2022, 3, 2, tzinfo=timezone.utc), until=datetime(2022, 3, 1, tzinfo=timezone.utc))
+
+        with pytest.raises(ValidationException):
+            usecase.find_notes_by_type(User("test-user"), NoteType.QUESTION, data_page_query)
+
+        mock_note_repository.find_all_by_type.assert_not_called()
+
+    def test_find_notes_by_tags(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+
+        usecase.find_notes_by_tags(User("test-user"), ["a", "b", "a", ""], mode=TAG_MATCH_ANY)
+
+        mock_note_repository.find_by_tags.assert_called_once_with(["a", "b"], author_id="test-user", mode=TAG_MATCH_ANY, data_page_query=None, summary=False)
+
+    @pytest.mark.parametrize("tags,mode", [([], TAG_MATCH_ALL), ([""], TAG_MATCH_ALL), (["a"], "some")])
+    def test_find_notes_by_tags_must_throw_exception_if_query_is_invalid(self, 
+        tags: list, mode: str,
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+
+        with pytest.raises(ValidationException):
+            usecase.find_notes_by_tags(User("test-user"), tags, mode=mode)
+
+        mock_note_repository.find_by_tags.assert_not_called()
+
+    def test_get_note_content_etag_must_throw_exception_if_content_does_not_exist(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+
+        mock_bucket_adapter.get_etag.return_value = None
+
+        with pytest.raises(ResourceNotFoundException):
+            usecase.get_note_content_etag("some-id")
+
+    def test_iter_note_content(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+
+        mock_note_repository.find_by_id.return_value = Note(id="test-id", author_id="test-user")
+        mock_bucket_adapter.iter_chunks.return_value = iter(["Some ", "content"])
+
+        content = "".join(usecase.iter_note_content("test-id", chunk_size=5))
+
+        mock_bucket_adapter.iter_chunks.assert_called_once_with("notes/test-id.md", 5)
+        assert content == "Some content"
+
+    def test_load_note_content_of_found_note(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+
+        mock_bucket_adapter.load.return_value = "Some content"
+
+        content = usecase.load_note_content("test-id", Note(id="test-id", author_id="test-user"))
+
+        mock_note_repository.find_by_id.assert_not_called()
+        mock_bucket_adapter.load.assert_called_once_with("notes/test-id.md")
+        assert content == "Some content"
+
+    def test_load_note_content_range_must_throw_exception_if_note_does_not_exist(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+
+        mock_note_repository.find_by_id.return_value = None
+
+        with pytest.raises(ResourceNotFoundException):
+            usecase.load_note_content_range("some-id", 0, 10)
+
+        mock_bucket_adapter.load_range.assert_not_called()
+
     def test_delete_note_by_id(self, 
         usecase: NoteUseCases, 
         mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
 
+        mock_note_repository.delete_by_id.return_value = Note(id="test-id")
+
         usecase.delete_note_by_id("test-id")
 
         mock_note_repository.delete_by_id.assert_called_once_with("test-id")
         
-        mock_bucket_adapter.delete.assert_called_once_with("notes/test-id.md")
\ No newline at end of file
+        mock_bucket_adapter.delete.assert_called_once_with("notes/test-id.md")
+
+    def test_delete_note_by_id_not_existing_note(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+
+        mock_note_repository.delete_by_id.return_value = None
+
+        usecase.delete_note_by_id("test-id")
+
+        mock_bucket_adapter.delete.assert_not_called()
+
+    def test_delete_notes_by_ids(self, 
+        usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+
+        mock_note_repository.delete_all_by_ids.return_value = ["id-2"]
+        mock_bucket_adapter.delete_all.return_value = []
+
+        deletion_result = usecase.delete_notes_by_ids(["id-1", "id-2", "id-3", "id-1"])
+
+        mock_note_repository.delete_all_by_ids.assert_called_once_with(["id-1", "id-2", "id-3"])
+        mock_bucket_adapter.delete_all.assert_called_once_with(["notes/id-1.md", "notes/id-3.md"])
+        assert deletion_result.deleted_ids == ["id-1", "id-3"]
+        assert deletion_result.failed_ids == ["id-2"]
+
+@pytest.fixture
+def deduplicating_usecase(mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository, mock_content_references: ContentReferenceRepository) -> NoteUseCases:
+    return NoteUseCases(mock_bucket_adapter, mock_note_repository, content_references=mock_content_references)
+
+CONTENT_HASH = get_content_hash("Some content")
+CONTENT_OBJECT_KEY = f"blobs/{CONTENT_HASH}/g1.md"
+
+class TestNoteUseCasesContentAddressed:
+    def test_create_note(self, 
+        deduplicating_usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository, mock_content_references: ContentReferenceRepository) -> None:
+
+        note = deduplicating_usecase.create_note(User("mario"), " Some content ")
+
+        mock_content_references.acquire.assert_called_once_with(CONTENT_HASH, 1)
+        # New generations are stored without checking
+        mock_bucket_adapter.get_etag.assert_not_called()
+        mock_bucket_adapter.store.assert_called_once_with(CONTENT_OBJECT_KEY, "Some content")
+        mock_note_repository.save.assert_called_once_with(note)
+        assert (note.content_hash, note.content_generation) == (CONTENT_HASH, "g1")
+
+    @pytest.mark.parametrize("etag,expected_uploads", [("some-etag", 0), (None, 1)])
+    def test_create_note_uploads_content_only_if_not_stored(self, etag: str, expected_uploads: int,
+        deduplicating_usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_content_references: ContentReferenceRepository) -> None:
+        mock_content_references.acquire.side_effect = lambda content_hash, count=1: ContentReference(content_hash, "g1", created=False)
+        mock_bucket_adapter.get_etag.return_value = etag
+
+        deduplicating_usecase.create_note(User("mario"), "Some content")
+
+        mock_bucket_adapter.get_etag.assert_called_once_with(CONTENT_OBJECT_KEY)
+        assert mock_bucket_adapter.store.call_count == expected_uploads
+
+    def test_create_note_releases_content_if_save_fails(self, 
+        deduplicating_usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository, mock_content_references: ContentReferenceRepository) -> None:
+        mock_note_repository.save.side_effect = Exception("Save failed!")
+
+        with pytest.raises(Exception):
+            deduplicating_usecase.create_note(User("mario"), "Some content")
+
+        mock_content_references.release.assert_called_once_with(CONTENT_HASH, "g1", 1)
+        mock_bucket_adapter.delete_all.assert_called_once_with([CONTENT_OBJECT_KEY])
+
+    def test_create_note_keeps_content_if_metadata_cannot_be_removed(self, 
+        deduplicating_usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository, mock_content_references: ContentReferenceRepository) -> None:
+        mock_bucket_adapter.store.side_effect = Exception("Upload failed!")
+        mock_note_repository.delete_by_id.side_effect = Exception("Delete failed!")
+
+        with pytest.raises(Exception):
+            deduplicating_usecase.create_note(User("mario"), "Some content")
+
+        mock_content_references.release.assert_not_called()
+
+    def test_create_notes_uploads_same_content_once(self, 
+        deduplicating_usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository, mock_content_references: ContentReferenceRepository) -> None:
+        mock_note_repository.save_all.return_value = []
+
+        results = deduplicating_usecase.create_notes(
+            User("mario"),
+            [NoteCreationRequest("Some content"), NoteCreationRequest("Other content"), NoteCreationRequest(" Some content ")]
+        )
+
+        assert [result.error_message for result in results] == [None, None, None]
+        mock_content_references.acquire.assert_any_call(CONTENT_HASH, 2)
+        assert mock_content_references.acquire.call_count == 2
+        assert mock_bucket_adapter.store.call_count == 2
+        assert results[0].note.content_hash == results[2].note.content_hash != results[1].note.content_hash
+
+    def test_create_notes_releases_content_of_failed_notes(self, 
+        deduplicating_usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository, mock_content_references: ContentReferenceRepository) -> None:
+        mock_note_repository.save_all.side_effect = lambda notes: [note.id for note in notes if "fail" in note.tags]
+        mock_content_references.release.return_value = False
+
+        results = deduplicating_usecase.create_notes(
+            User("mario"),
+            [NoteCreationRequest("Some content"), NoteCreationRequest("Some content", ["fail"])]
+        )
+
+        assert results[0].note and results[1].error_message
+        mock_content_references.release.assert_called_once_with(CONTENT_HASH, "g1", 1)
+        # Still referenced by the first note
+        mock_bucket_adapter.delete_all.assert_not_called()
+
+    def test_iter_note_content(self, 
+        deduplicating_usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+        mock_note_repository.find_by_id.return_value = Note(id="test-id", content_hash=CONTENT_HASH, content_generation="g1")
+
+        deduplicating_usecase.iter_note_content("test-id", chunk_size=5)
+
+        mock_bucket_adapter.iter_chunks.assert_called_once_with(CONTENT_OBJECT_KEY, 5)
+
+    def test_get_note_content_etag_of_found_note(self, 
+        deduplicating_usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+
+        deduplicating_usecase.get_note_content_etag("test-id", Note(id="test-id", content_hash=CONTENT_HASH, content_generation="g1"))
+
+        mock_note_repository.find_by_id.assert_not_called()
+        mock_bucket_adapter.get_etag.assert_called_once_with(CONTENT_OBJECT_KEY)
+
+    def test_get_note_content_etag_of_note_with_own_content(self, 
+        deduplicating_usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+        mock_note_repository.find_by_id.return_value = Note(id="test-id")
+
+        deduplicating_usecase.get_note_content_etag("test-id")
+
+        mock_bucket_adapter.get_etag.assert_called_once_with("notes/test-id.md")
+
+    @pytest.mark.parametrize("unreferenced,expected_deletes", [(True, [[CONTENT_OBJECT_KEY]]), (False, [])])
+    def test_delete_note_by_id(self, unreferenced: bool, expected_deletes: list,
+        deduplicating_usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository, mock_content_references: ContentReferenceRepository) -> None:
+        mock_note_repository.delete_by_id.return_value = Note(id="test-id", content_hash=CONTENT_HASH, content_generation="g1")
+        mock_content_references.release.return_value = unreferenced
+
+        deduplicating_usecase.delete_note_by_id("test-id")
+
+        # The content hash comes from the deleted note: it is not read first
+        mock_note_repository.find_by_id.assert_not_called()
+        mock_content_references.release.assert_called_once_with(CONTENT_HASH, "g1", 1)
+        assert [call.args[0] for call in mock_bucket_adapter.delete_all.call_args_list] == expected_deletes
+        mock_bucket_adapter.delete.assert_not_called()
+
+    def test_delete_notes_by_ids(self, 
+        deduplicating_usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository, mock_content_references: ContentReferenceRepository) -> None:
+        mock_note_repository.find_by_ids.return_value = [
+            Note(id="id-1", content_hash=CONTENT_HASH, content_generation="g1"),
+            Note(id="id-2"),
+            Note(id="id-3", content_hash=CONTENT_HASH, content_generation="g1")
+        ]
+        mock_note_repository.delete_all_by_ids.return_value = []
+        mock_bucket_adapter.delete_all.return_value = []
+
+        deletion_result = deduplicating_usecase.delete_notes_by_ids(["id-1", "id-2", "id-3"])
+
+        assert deletion_result.deleted_ids == ["id-1", "id-2", "id-3"]
+        mock_content_references.release.assert_called_once_with(CONTENT_HASH, "g1", 2)
+        mock_bucket_adapter.delete_all.assert_called_once_with(["notes/id-2.md", CONTENT_OBJECT_KEY])
+
+    def test_delete_notes_by_ids_keeps_content_if_release_fails(self, 
+        deduplicating_usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository, mock_content_references: ContentReferenceRepository) -> None:
+        mock_note_repository.find_by_ids.return_value = [Note(id="id-1", content_hash=CONTENT_HASH, content_generation="g1")]
+        mock_note_repository.delete_all_by_ids.return_value = []
+        mock_content_references.release.side_effect = Exception("Update failed!")
+
+        deletion_result = deduplicating_usecase.delete_notes_by_ids(["id-1"])
+
+        assert deletion_result.deleted_ids == ["id-1"]
+        mock_bucket_adapter.delete_all.assert_not_called()
+
+class TestNoteUseCasesSearch:
+    def test_create_note_indexes_content(self, 
+        searchable_usecase: NoteUseCases, 
+        mock_search_index: SearchIndex) -> None:
+
+        note = searchable_usecase.create_note(User("mario"), "Some content")
+
+        mock_search_index.add_notes.assert_called_once_with({note.id: "Some content"})
+
+    def test_create_note_succeeds_if_indexing_fails(self, 
+        searchable_usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_search_index: SearchIndex) -> None:
+        mock_search_index.add_notes.side_effect = Exception("Index update failed!")
+
+        searchable_usecase.create_note(User("mario"), "Some content")
+
+        mock_bucket_adapter.delete.assert_not_called()
+
+    def test_create_note_does_not_index_failed_notes(self, 
+        searchable_usecase: NoteUseCases, 
+        mock_note_repository: NoteRepository, mock_search_index: SearchIndex) -> None:
+        mock_note_repository.save.side_effect = Exception("Save failed!")
+
+        with pytest.raises(Exception):
+            searchable_usecase.create_note(User("mario"), "Some content")
+
+        mock_search_index.add_notes.assert_not_called()
+
+    def test_create_notes_indexes_created_notes_at_once(self, 
+        searchable_usecase: NoteUseCases, 
+        mock_note_repository: NoteRepository, mock_search_index: SearchIndex) -> None:
+        mock_note_repository.save_all.return_value = []
+
+        results = searchable_usecase.create_notes(User("mario"), [NoteCreationRequest("First"), NoteCreationRequest(""), NoteCreationRequest("Second")])
+
+        mock_search_index.add_notes.assert_called_once_with({results[0].note.id: "First", results[2].note.id: "Second"})
+
+    def test_delete_note_by_id_removes_note_from_index(self, 
+        searchable_usecase: NoteUseCases, 
+        mock_note_repository: NoteRepository, mock_search_index: SearchIndex) -> None:
+        mock_note_repository.delete_by_id.return_value = Note(id="id-1")
+
+        searchable_usecase.delete_note_by_id("id-1")
+
+        mock_search_index.remove_notes.assert_called_once_with(["id-1"])
+
+    def test_delete_notes_by_ids_removes_notes_from_index(self, 
+        searchable_usecase: NoteUseCases, 
+        mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository, mock_search_index: SearchIndex) -> None:
+        mock_note_repository.delete_all_by_ids.return_value = ["id-2"]
+        mock_bucket_adapter.delete_all.return_value = []
+
+        searchable_usecase.delete_notes_by_ids(["id-1", "id-2"])
+
+        mock_search_index.remove_notes.assert_called_once_with(["id-1"])
+
+    def test_search_notes(self, 
+        searchable_usecase: NoteUseCases, 
+        mock_note_repository: NoteRepository, mock_search_index: SearchIndex) -> None:
+        mock_search_index.search.return_value = [SearchHit("id-2", 2.0), SearchHit("id-deleted", 1.5), SearchHit("id-1", 1.0)]
+        mock_note_repository.find_by_ids.return_value = [Note(id="id-1"), Note(id="id-2")]
+
+        hits = searchable_usecase.search_notes("some words", limit=3)
+
+        mock_search_index.search.assert_called_once_with("some words", 3)
+        assert [(hit.note.id, hit.score) for hit in hits] == [("id-2", 2.0), ("id-1", 1.0)]
+
+    def test_search_notes_must_throw_exception_if_query_is_empty(self, 
+        searchable_usecase: NoteUseCases, 
+        mock_search_index: SearchIndex) -> None:
+
+        with pytest.raises(ValidationException):
+            searchable_usecase.search_notes("  ")
+
+        mock_search_index.search.assert_not_called()
+
+    def test_search_notes_must_throw_exception_if_search_is_disabled(self, usecase: NoteUseCases) -> None:
+        with pytest.raises(FeatureNotEnabledException):
+            usecase.search_notes("some words")
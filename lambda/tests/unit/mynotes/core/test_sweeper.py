@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+import pytest
+from pytest_mock import MockerFixture
+
+from mynotes.core.architecture import ObjectStore, StoredObject
+from mynotes.core.notes import Note, NoteRepository
+from mynotes.core.sweeper import OrphanContentSweeper
+from mynotes.core.utils.common import now
+
+OLD = now() - timedelta(days=1)
+RECENT = now()
+
+@pytest.fixture
+def mock_bucket_adapter(mocker: MockerFixture) -> ObjectStore:
+    mock_bucket_adapter = mocker.Mock(spec=ObjectStore)
+    mock_bucket_adapter.list_objects.return_value = iter([
+        StoredObject("notes/1.md", OLD),
+        StoredObject("notes/2.md", OLD),
+        StoredObject("notes/3.md", RECENT),
+        StoredObject("notes/4.md", OLD),
+        StoredObject("notes/not-a-note.txt", OLD),
+    ])
+    mock_bucket_adapter.delete_all.return_value = []
+    return mock_bucket_adapter
+
+@pytest.fixture
+def mock_note_repository(mocker: MockerFixture) -> NoteRepository:
+    mock_note_repository = mocker.Mock(spec=NoteRepository)
+    mock_note_repository.find_by_ids.side_effect = lambda ids: [Note(id=id) for id in ids if id == "1"]
+    return mock_note_repository
+
+@pytest.fixture
+def sweeper(mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> OrphanContentSweeper:
+    return OrphanContentSweeper(mock_bucket_adapter, mock_note_repository, timedelta(hours=1), page_size=2)
+
+class TestOrphanContentSweeper:
+    def test_sweep(self, sweeper: OrphanContentSweeper, mock_bucket_adapter: ObjectStore, mock_note_repository: NoteRepository) -> None:
+        result = sweeper.sweep()
+
+        mock_bucket_adapter.list_objects.assert_called_once_with("notes/")
+        # Notes are checked a page at a time and recent content is never checked
+        assert [call[0][0] for call in mock_note_repository.find_by_ids.call_args_list] == [["1", "2"], ["4"]]
+        assert result.scanned == 5
+        assert result.orphan_keys == ["notes/2.md", "notes/4.md"]
+        assert [call[0][0] for call in mock_bucket_adapter.delete_all.call_args_list] == [["notes/2.md"], ["notes/4.md"]]
+
+    def test_sweep_dry_run(self, sweeper: OrphanContentSweeper, mock_bucket_adapter: ObjectStore) -> None:
+        result = sweeper.sweep(dry_run=True)
+
+        assert result.orphan_keys == ["notes/2.md", "notes/4.md"]
+        mock_bucket_adapter.delete_all.assert_not_called()
@@ -0,0 +1,52 @@
+from mynotes.core.utils.cache import LRUCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_get_returns_cached_value() -> None:
+    cache = LRUCache(max_size=2, ttl_seconds=10)
+    cache.put("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.size) == (1, 1, 1)
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    cache = LRUCache(max_size=2, ttl_seconds=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats().evictions == 1
+
+def test_expired_entries_are_not_returned() -> None:
+    clock = FakeClock()
+    cache = LRUCache(max_size=2, ttl_seconds=10, clock=clock)
+    cache.put("a", 1)
+
+    clock.now = 10
+
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats.expirations, stats.size) == (1, 0)
+
+def test_invalidate() -> None:
+    cache = LRUCache(max_size=2, ttl_seconds=10)
+    cache.put("a", 1)
+
+    cache.invalidate("a")
+    cache.invalidate("not-existing-key")
+
+    assert cache.get("a") is None
@@ -0,0 +1,57 @@
+import json
+from typing import Iterator
+
+import pytest
+
+from unit.mynotes.adapter.custom_boto3_mocks import aws_credentials
+from unit.mynotes.adapter.custom_moto_server import moto_server_resources, moto_server_url
+
+from mynotes.port import notes
+from mynotes.port.container import ApplicationContainer
+
+@pytest.fixture
+def container(moto_server_resources: str) -> Iterator[ApplicationContainer]:
+    """Handlers wired to the moto server, without search"""
+    container = ApplicationContainer()
+    container.aws_endpoint_url = moto_server_resources
+    container.search_index = None
+
+    original_container = notes.container
+    notes.container = container
+    yield container
+    notes.container = original_container
+
+def test_async_handlers_note_lifecycle(container: ApplicationContainer) -> None:
+    response = notes.handler_create_note_async({"body": json.dumps({"content": "Some content", "tags": ["python"]})}, None)
+    assert response["statusCode"] == 200
+    note_id = json.loads(response["body"])["id"]
+
+    response = notes.handler_get_content_async({"pathParameters": {"id": note_id}}, None)
+    assert response["statusCode"] == 200
+    assert response["body"] == "Some content"
+    etag = response["headers"]["ETag"]
+
+    response = notes.handler_get_content_async({"pathParameters": {"id": note_id}, "headers": {"If-None-Match": etag}}, None)
+    assert response["statusCode"] == 304
+
+    response = notes.handler_get_content_async({"pathParameters": {"id": note_id}, "headers": {"If-None-Match": '"other"'}}, None)
+    assert response["body"] == "Some content"
+
+    response = notes.handler_get_content_async({"pathParameters": {"id": note_id}, "headers": {"Range": "bytes=5-11"}}, None)
+    assert response["statusCode"] == 206
+    assert response["headers"]["Content-Range"] == "bytes 5-11/*"
+
+    response = notes.handler_find_by_ids_async({"queryStringParameters": {"ids": f"{note_id},missing"}}, None)
+    body = json.loads(response["body"])
+    assert [note["id"] for note in body["items"]] == [note_id]
+    assert body["missing_ids"] == ["missing"]
+
+    assert notes.handler_delete_by_id_async({"pathParameters": {"id": note_id}}, None) == {"status": 204}
+
+    response = notes.handler_get_content_async({"pathParameters": {"id": note_id}}, None)
+    assert response["statusCode"] == 404
+
+def test_async_handlers_validate_requests(container: ApplicationContainer) -> None:
+    response = notes.handler_find_by_ids_async({"queryStringParameters": {"ids": ""}}, None)
+
+    assert response["statusCode"] == 400
@@ -4,20 +4,27 @@ import json
 from typing import Any
 
 from mynotes.port.exception_management import (
+    CONFLICT_ERROR_CODE,
     INTERNAL_ERROR_CODE,
+    NOT_ENABLED_ERROR_CODE,
     RESOURCE_NOT_FOUND_ERROR_CODE,
     VALIDATION_ERROR_CODE,
     on_application_exception,
+    on_feature_not_enabled_exception,
+    on_idempotency_conflict_exception,
     on_resource_not_found_exception,
     on_validation_exception,
     with_exception_management
 )
 
-from mynotes.core.architecture import ApplicationException, ResourceNotFoundException, ValidationException
+from mynotes.core.architecture import ApplicationException, FeatureNotEnabledException, ResourceNotFoundException, ValidationException
+from mynotes.core.idempotency import IdempotencyConflictException
 
 on_error_handler_test_data = [
     (on_resource_not_found_exception, ResourceNotFoundException("resource-type", "id"), 404, RESOURCE_NOT_FOUND_ERROR_CODE, "was not found"),
     (on_validation_exception, ValidationException("attribute-1", "Something"), 400, VALIDATION_ERROR_CODE, "Invalid attribute"),
+    (on_idempotency_conflict_exception, IdempotencyConflictException("key-1"), 409, CONFLICT_ERROR_CODE, "still in progress"),
+    (on_feature_not_enabled_exception, FeatureNotEnabledException("full-text search"), 501, NOT_ENABLED_ERROR_CODE, "not enabled"),
     (on_application_exception, ApplicationException("Whops!"), 500, INTERNAL_ERROR_CODE, "Internal error")
 ]
 
@@ -38,6 +45,14 @@ def function_throwing_resource_not_found_exception() -> None:
 def function_throwing_validation_exception() -> None:
     raise ValidationException("some-attribute", "very bad error")
 
+@with_exception_management
+def function_throwing_idempotency_conflict_exception() -> None:
+    raise IdempotencyConflictException("key-1")
+
+@with_exception_management
+def function_throwing_feature_not_enabled_exception() -> None:
+    raise FeatureNotEnabledException("full-text search")
+
 @with_exception_management
 def function_throwing_application_exception() -> None:
     raise ApplicationException("Whops!")
@@ -45,6 +60,8 @@ def function_throwing_application_exception() -> None:
 with_exception_management_test_data = [
     (function_throwing_resource_not_found_exception, RESOURCE_NOT_FOUND_ERROR_CODE),
     (function_throwing_validation_exception, VALIDATION_ERROR_CODE),
+    (function_throwing_idempotency_conflict_exception, CONFLICT_ERROR_CODE),
+    (function_throwing_feature_not_enabled_exception, NOT_ENABLED_ERROR_CODE),
     (function_throwing_application_exception, INTERNAL_ERROR_CODE)
 ]
 
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+from typing import Dict
+
+import pytest
+
+# Module loaded by AWS Lambda when the handlers are cold started
+HANDLERS_MODULE = "mynotes.port.notes"
+# Modules that must not be imported until a handler actually needs them
+DEFERRED_MODULES = ["boto3", "botocore", "pynamodb", "jsons"]
+
+LAMBDA_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+
+def measure_import_times(module_name: str) -> Dict[str, int]:
+    """Import the module in a fresh interpreter using '-X importtime' and
+    return the cumulative import time (in microseconds) of every imported module"""
+    completed_process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=LAMBDA_ROOT, capture_output=True, text=True, check=True
+    )
+
+    import_times = {}
+    for line in completed_process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, imported_module = line[len("import time:"):].split("|")
+        import_times[imported_module.strip()] = int(cumulative_us)
+
+    return import_times
+
+def test_measure_import_times_parses_importtime_output() -> None:
+    import_times = measure_import_times("json")
+
+    assert import_times["json"] > 0
+
+@pytest.mark.parametrize("deferred_module", DEFERRED_MODULES)
+def test_heavy_modules_are_not_imported_at_cold_start(deferred_module: str) -> None:
+    import_times = measure_import_times(HANDLERS_MODULE)
+
+    assert deferred_module not in import_times
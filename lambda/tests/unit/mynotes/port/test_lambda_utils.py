@@ -1,11 +1,21 @@
 import pytest
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Optional, Tuple
 
 from mynotes.port.lambda_utils import (
+    get_bool_query_string_parameter,
+    get_byte_range,
+    get_datetime_query_string_parameter,
+    get_header,
+    get_int_query_string_parameter,
     get_path_parameter,
     get_path_parameter_with_default,
+    get_query_string_parameter_with_default,
     get_json_body,
-    to_json_response
+    is_not_modified,
+    to_content_response,
+    to_json_response,
+    to_not_modified_response
 )
 
 from mynotes.core.architecture import ValidationException
@@ -66,6 +76,112 @@ get_path_parameter_with_default_test_data = [
 def test_get_path_parameter_with_default(event: dict, param_name: str, default_value: str, expected_response: Optional[str]) -> None:
     assert get_path_parameter_with_default(event, param_name, default_value) == expected_response
 
+get_query_string_parameter_with_default_test_data = [
+    ({"queryStringParameters": {"ids": "1,2"}}, "ids", None, "1,2"),
+    ({"queryStringParameters": {"ids": "1,2"}}, "not_present_param", "something", "something"),
+    ({"queryStringParameters": None}, "ids", "something", "something"),
+]
+
+@pytest.mark.parametrize("event,param_name,default_value,expected_response", get_query_string_parameter_with_default_test_data)
+def test_get_query_string_parameter_with_default(event: dict, param_name: str, default_value: str, expected_response: Optional[str]) -> None:
+    assert get_query_string_parameter_with_default(event, param_name, default_value) == expected_response
+
+def test_get_int_query_string_parameter() -> None:
+    assert get_int_query_string_parameter({"queryStringParameters": {"page_size": "20"}}, "page_size", 10) == 20
+    assert get_int_query_string_parameter({"queryStringParameters": None}, "page_size", 10) == 10
+    with pytest.raises(ValidationException):
+        get_int_query_string_parameter({"queryStringParameters": {"page_size": "many"}}, "page_size")
+
+get_bool_query_string_parameter_test_data = [
+    ({"queryStringParameters": {"summary": "true"}}, True),
+    ({"queryStringParameters": {"summary": "False"}}, False),
+    ({"queryStringParameters": {"summary": "1"}}, True),
+    ({"queryStringParameters": None}, False),
+]
+
+@pytest.mark.parametrize("event,expected_response", get_bool_query_string_parameter_test_data)
+def test_get_bool_query_string_parameter(event: dict, expected_response: bool) -> None:
+    assert get_bool_query_string_parameter(event, "summary") == expected_response
+
+def test_get_bool_query_string_parameter_expect_exception() -> None:
+    with pytest.raises(ValidationException):
+        get_bool_query_string_parameter({"queryStringParameters": {"summary": "maybe"}}, "summary")
+
+get_datetime_query_string_parameter_test_data = [
+    ({"queryStringParameters": {"since": "2022-03-01"}}, datetime(2022, 3, 1, tzinfo=timezone.utc)),
+    ({"queryStringParameters": {"since": "2022-03-01T10:30:00Z"}}, datetime(2022, 3, 1, 10, 30, tzinfo=timezone.utc)),
+    ({"queryStringParameters": {"since": "2022-03-01T12:30:00+02:00"}}, datetime(2022, 3, 1, 10, 30, tzinfo=timezone.utc)),
+    ({"queryStringParameters": None}, None),
+]
+
+@pytest.mark.parametrize("event,expected_response", get_datetime_query_string_parameter_test_data)
+def test_get_datetime_query_string_parameter(event: dict, expected_response: Optional[datetime]) -> None:
+    assert get_datetime_query_string_parameter(event, "since") == expected_response
+
+def test_get_datetime_query_string_parameter_expect_exception() -> None:
+    with pytest.raises(ValidationException):
+        get_datetime_query_string_parameter({"queryStringParameters": {"since": "last week"}}, "since")
+
+get_header_test_data = [
+    ({"headers": {"range": "bytes=0-10"}}, "Range", "bytes=0-10"),
+    ({"headers": {"Range": "bytes=0-10"}}, "If-None-Match", None),
+    ({"headers": None}, "Range", None),
+]
+
+@pytest.mark.parametrize("event,header_name,expected_response", get_header_test_data)
+def test_get_header(event: dict, header_name: str, expected_response: Optional[str]) -> None:
+    assert get_header(event, header_name) == expected_response
+
+get_byte_range_test_data = [
+    ({"headers": {"Range": "bytes=0-9"}}, (0, 9)),
+    ({"headers": {"Range": "bytes=10-"}}, (10, 109)),
+    ({"headers": {"Range": "bytes=0-1000"}}, (0, 99)),
+    ({}, None),
+]
+
+@pytest.mark.parametrize("event,expected_range", get_byte_range_test_data)
+def test_get_byte_range(event: dict, expected_range: Optional[Tuple[int, int]]) -> None:
+    assert get_byte_range(event, max_range_size=100) == expected_range
+
+@pytest.mark.parametrize("range_header", ["bytes=-10", "bytes=0-1,5-6", "bytes=10-5", "lines=1-2"])
+def test_get_byte_range_expect_exception(range_header: str) -> None:
+    with pytest.raises(ValidationException):
+        get_byte_range({"headers": {"Range": range_header}}, max_range_size=100)
+
+is_not_modified_test_data = [
+    ({"headers": {"If-None-Match": '"v1"'}}, '"v1"', True),
+    ({"headers": {"If-None-Match": '"v0", W/"v1"'}}, '"v1"', True),
+    ({"headers": {"If-None-Match": "*"}}, '"v1"', True),
+    ({"headers": {"If-None-Match": '"v1"'}}, '"v2"', False),
+    ({}, '"v1"', False),
+]
+
+@pytest.mark.parametrize("event,etag,expected_response", is_not_modified_test_data)
+def test_is_not_modified(event: dict, etag: str, expected_response: bool) -> None:
+    assert is_not_modified(event, etag) == expected_response
+
+def test_to_not_modified_response() -> None:
+    assert to_not_modified_response('"v1"') == {
+        "statusCode": 304,
+        "headers": {"ETag": '"v1"'},
+        "body": ""
+    }
+
+def test_to_content_response() -> None:
+    assert to_content_response("Some text") == {
+        "statusCode": 200,
+        "headers": {"Content-Type": "text/markdown; charset=utf-8"},
+        "body": "Some text",
+        "isBase64Encoded": False
+    }
+
+    assert to_content_response(b"Some", 206, headers={"Content-Range": "bytes 0-3/*"}) == {
+        "statusCode": 206,
+        "headers": {"Content-Type": "text/markdown; charset=utf-8", "Content-Range": "bytes 0-3/*"},
+        "body": "U29tZQ==",
+        "isBase64Encoded": True
+    }
+
 get_json_body_test_data = [
     ({"body": "{\"message\": \"test\"}" }, {"message": "test"}),
     ({ }, None),
@@ -0,0 +1,46 @@
+import io
+import json
+from typing import Any, Dict, Iterator
+
+import pytest
+
+from mynotes.core.architecture import instrumentation, timed
+from mynotes.port.metrics import MAX_VALUES_PER_METRIC, EmbeddedMetricFormatSink, with_invocation_metrics
+
+@with_invocation_metrics
+def handler_test(event, context) -> Dict[str, Any]:
+    for _ in range(event.get("calls", 1)):
+        with timed("S3BucketAdapter.load"):
+            pass
+    return {"statusCode": 200}
+
+@pytest.fixture
+def metrics_stream() -> Iterator[io.StringIO]:
+    stream = io.StringIO()
+    instrumentation.enable(EmbeddedMetricFormatSink("MyNotesTest", stream))
+    yield stream
+    instrumentation.disable()
+
+def test_one_emf_line_per_invocation(metrics_stream: io.StringIO) -> None:
+    handler_test({"calls": 2}, None)
+
+    line, = metrics_stream.getvalue().splitlines()
+    document = json.loads(line)
+    metric_directive, = document["_aws"]["CloudWatchMetrics"]
+    assert metric_directive["Namespace"] == "MyNotesTest"
+    assert metric_directive["Dimensions"] == [["Handler"]]
+    assert {metric["Name"] for metric in metric_directive["Metrics"]} == {"S3BucketAdapter.load", "Invocation"}
+    assert document["Handler"] == "handler_test"
+    assert len(document["S3BucketAdapter.load"]) == 2
+    assert len(document["Invocation"]) == 1
+
+def test_values_are_capped(metrics_stream: io.StringIO) -> None:
+    handler_test({"calls": MAX_VALUES_PER_METRIC + 1}, None)
+
+    document = json.loads(metrics_stream.getvalue())
+    assert len(document["S3BucketAdapter.load"]) == MAX_VALUES_PER_METRIC
+
+def test_nothing_is_written_while_disabled(capsys: Any) -> None:
+    assert handler_test({}, None) == {"statusCode": 200}
+
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,356 @@
+import json
+from typing import Any
+
+import pytest
+from pytest_mock import MockerFixture
+
+from datetime import datetime, timezone
+
+from mynotes.adapter.cached_notes_adapter import CachedNoteRepository
+from mynotes.core.architecture import DataPage, DataPageQuery, ObjectStore
+from mynotes.core.idempotency import IdempotencyRecord, IdempotencyStatus, IdempotencyStore
+from mynotes.core.ingestion import IngestionResult, NoteIngestion
+from mynotes.core.notes import Note, NoteBulkDeletionResult, NoteCreationResult, NoteLookupResult, NoteRepository, NoteSearchHit, NoteType, NoteUseCases
+from mynotes.core.utils.common import now
+from mynotes.port import notes
+from mynotes.port.container import ApplicationContainer
+
+
+@pytest.fixture
+def mock_usecase(mocker: MockerFixture) -> NoteUseCases:
+    container = ApplicationContainer()
+    container.usecase = mocker.Mock(spec=NoteUseCases)
+    container.usecase.find_note_by_id.return_value = _test_note("1")
+    container.usecase.get_note_content_etag.return_value = "abc"
+    container.idempotency_store = mocker.Mock(spec=IdempotencyStore)
+    container.idempotency_store.start.return_value = None
+    mocker.patch.object(notes, "container", container)
+
+    return container.usecase
+
+class TestApplicationContainer:
+    def test_nothing_is_built_until_needed(self) -> None:
+        container = ApplicationContainer()
+
+        assert "usecase" not in vars(container)
+        assert "s3_resource" not in vars(container)
+
+    def test_objects_are_reused(self, mocker: MockerFixture) -> None:
+        container = ApplicationContainer()
+        container.s3_resource = mocker.Mock()
+
+        assert container.usecase is container.usecase
+        assert container.usecase.bucket_adapter is container.object_store
+
+    def test_note_cache_is_disabled_by_default(self) -> None:
+        # Every handler is a separate function: caches are not invalidated by the changes made by the others
+        assert not isinstance(ApplicationContainer().note_repository, CachedNoteRepository)
+
+class TestHandlers:
+    def test_handler_create_note_without_idempotency_key(self, mock_usecase: Any) -> None:
+        mock_usecase.create_note.return_value = _test_note("1")
+
+        response = notes.handler_create_note({"body": json.dumps({"content": "A note"})}, None)
+
+        assert json.loads(response["body"])["id"] == "1"
+        notes.container.idempotency_store.start.assert_not_called()
+
+    def test_handler_create_note_records_the_response(self, mock_usecase: Any) -> None:
+        mock_usecase.create_note.return_value = _test_note("1")
+
+        response = notes.handler_create_note({
+            "headers": {"idempotency-key": "key-1"},
+            "body": json.dumps({"content": "A note"})
+        }, None)
+
+        assert response["statusCode"] == 200
+        store = notes.container.idempotency_store
+        assert store.start.call_args[0][0] == "create_note#mario#key-1"
+        store.complete.assert_called_once_with("create_note#mario#key-1", response)
+
+    def test_handler_create_note_replays_the_recorded_response(self, mock_usecase: Any) -> None:
+        notes.container.idempotency_store.start.side_effect = lambda key, fingerprint: IdempotencyRecord(
+            key, fingerprint, IdempotencyStatus.COMPLETED, {"statusCode": 200, "headers": {}, "body": '{"id": "1"}'}
+        )
+
+        response = notes.handler_create_note({"body": json.dumps({"id": "key-1", "content": "A note"})}, None)
+
+        assert json.loads(response["body"])["id"] == "1"
+        assert response["headers"]["Idempotent-Replayed"] == "true"
+        mock_usecase.create_note.assert_not_called()
+
+    def test_handler_create_note_rejects_requests_in_progress(self, mocker: MockerFixture, mock_usecase: Any) -> None:
+        mocker.patch.object(notes, "NOTES_IDEMPOTENCY_WAIT_SECONDS", 0)
+        notes.container.idempotency_store.start.side_effect = lambda key, fingerprint: IdempotencyRecord(
+            key, fingerprint, IdempotencyStatus.IN_PROGRESS
+        )
+
+        response = notes.handler_create_note({
+            "headers": {"Idempotency-Key": "key-1"},
+            "body": json.dumps({"content": "A note"})
+        }, None)
+
+        assert response["statusCode"] == 409
+        mock_usecase.create_note.assert_not_called()
+
+    def test_handler_create_note_queues_the_note(self, mocker: MockerFixture, mock_usecase: Any) -> None:
+        mocker.patch.object(notes, "NOTES_ASYNC_INGESTION_ENABLED", True)
+        notes.container.ingestion = mocker.Mock(spec=NoteIngestion)
+        notes.container.ingestion.submit_note.return_value = _test_note("1")
+
+        response = notes.handler_create_note({"body": json.dumps({"content": "A note"})}, None)
+
+        assert response["statusCode"] == 202
+        assert json.loads(response["body"])["id"] == "1"
+        mock_usecase.create_note.assert_not_called()
+
+    def test_handler_create_note_creates_large_notes_at_once(self, mocker: MockerFixture, mock_usecase: Any) -> None:
+        mocker.patch.object(notes, "NOTES_ASYNC_INGESTION_ENABLED", True)
+        notes.container.ingestion = mocker.Mock(spec=NoteIngestion)
+        # Too large for a message
+        notes.container.ingestion.submit_note.return_value = None
+        mock_usecase.create_note.return_value = _test_note("1")
+
+        response = notes.handler_create_note({"body": json.dumps({"content": "A large note"})}, None)
+
+        assert response["statusCode"] == 200
+        mock_usecase.create_note.assert_called_once()
+
+    def test_handler_ingest_notes_reports_failed_messages(self, mocker: MockerFixture, mock_usecase: Any) -> None:
+        notes.container.ingestion = mocker.Mock(spec=NoteIngestion)
+        notes.container.ingestion.ingest.return_value = IngestionResult(created_ids=["1"], failed_message_ids=["m2"])
+
+        response = notes.handler_ingest_notes({"Records": [
+            {"messageId": "m1", "body": "first"},
+            {"messageId": "m2", "body": "second"}
+        ]}, None)
+
+        notes.container.ingestion.ingest.assert_called_once_with({"m1": "first", "m2": "second"})
+        assert response == {"batchItemFailures": [{"itemIdentifier": "m2"}]}
+
+    def test_handler_create_notes_batch(self, mock_usecase: Any) -> None:
+        mock_usecase.create_notes.return_value = [
+            NoteCreationResult(note=_test_note("1")),
+            NoteCreationResult(error_message="Note content is required")
+        ]
+
+        response = notes.handler_create_notes_batch({
+            "body": json.dumps({"notes": [{"content": "A note"}, {}]})
+        }, None)
+
+        assert response["statusCode"] == 200
+        items = json.loads(response["body"])["items"]
+        assert items[0]["note"]["id"] == "1"
+        assert items[1]["error_message"] == "Note content is required"
+
+    def test_handler_create_notes_batch_requires_notes(self, mock_usecase: Any) -> None:
+        response = notes.handler_create_notes_batch({"body": json.dumps({})}, None)
+
+        assert response["statusCode"] == 400
+        mock_usecase.create_notes.assert_not_called()
+
+    def test_handler_find_by_ids(self, mock_usecase: Any) -> None:
+        mock_usecase.find_notes_by_ids.return_value = NoteLookupResult(
+            items=[_test_note("1")],
+            missing_ids=["2"]
+        )
+
+        response = notes.handler_find_by_ids({"queryStringParameters": {"ids": "1, 2"}}, None)
+
+        mock_usecase.find_notes_by_ids.assert_called_once_with(["1", "2"])
+        body = json.loads(response["body"])
+        assert [item["id"] for item in body["items"]] == ["1"]
+        assert body["missing_ids"] == ["2"]
+
+    def test_handler_find_notes_by_ids(self, mock_usecase: Any) -> None:
+        mock_usecase.find_notes_by_ids.return_value = NoteLookupResult(items=[], missing_ids=["1"])
+
+        notes.handler_find_notes({"queryStringParameters": {"ids": "1"}}, None)
+
+        mock_usecase.find_notes_by_ids.assert_called_once_with(["1"])
+        mock_usecase.find_notes_by_type.assert_not_called()
+
+    def test_handler_find_notes_by_type(self, mock_usecase: Any) -> None:
+        mock_usecase.find_notes_by_type.return_value = DataPage([_test_note("1")], 1, "token")
+
+        response = notes.handler_find_notes({"queryStringParameters": {
+            "type": "question",
+            "page_size": "5",
+            "since": "2022-03-01",
+            "until": "2022-03-08T00:00:00Z",
+            "newest_first": "true"
+        }}, None)
+
+        (author, note_type, data_page_query), kwargs = mock_usecase.find_notes_by_type.call_args
+        assert author.user_id == "mario"
+        assert note_type == NoteType.QUESTION
+        assert data_page_query == DataPageQuery(
+            page_size=5,
+            since=datetime(2022, 3, 1, tzinfo=timezone.utc),
+            until=datetime(2022, 3, 8, tzinfo=timezone.utc),
+            newest_first=True
+        )
+        assert kwargs == {"summary": False}
+        body = json.loads(response["body"])
+        assert [item["id"] for item in body["items"]] == ["1"]
+        assert body["continuation_token"] == "token"
+
+    def test_handler_find_notes_by_tags(self, mock_usecase: Any) -> None:
+        mock_usecase.find_notes_by_tags.return_value = DataPage([_test_note("1")], 1, None)
+
+        response = notes.handler_find_notes({"queryStringParameters": {"tags": "a, b", "mode": "any", "summary": "true"}}, None)
+
+        (author, tags), kwargs = mock_usecase.find_notes_by_tags.call_args
+        assert author.user_id == "mario"
+        assert tags == ["a", "b"]
+        assert kwargs == {"mode": "any", "data_page_query": DataPageQuery(), "summary": True}
+        assert [item["id"] for item in json.loads(response["body"])["items"]] == ["1"]
+        mock_usecase.find_notes_by_type.assert_not_called()
+
+    @pytest.mark.parametrize("query_string_parameters", [{"type": "X"}, {"page_size": "0"}, {"since": "yesterday"}])
+    def test_handler_find_notes_by_type_validates_parameters(self, query_string_parameters: dict, mock_usecase: Any) -> None:
+        response = notes.handler_find_notes({"queryStringParameters": query_string_parameters}, None)
+
+        assert response["statusCode"] == 400
+        mock_usecase.find_notes_by_type.assert_not_called()
+
+    def test_handler_search_notes(self, mock_usecase: Any) -> None:
+        mock_usecase.search_notes.return_value = [NoteSearchHit(_test_note("1"), 1.5)]
+
+        response = notes.handler_search_notes({"queryStringParameters": {"q": "some words", "limit": "5"}}, None)
+
+        mock_usecase.search_notes.assert_called_once_with("some words", 5)
+        items = json.loads(response["body"])["items"]
+        assert items[0]["note"]["id"] == "1"
+        assert items[0]["score"] == 1.5
+
+    def test_handler_search_notes_validates_limit(self, mock_usecase: Any) -> None:
+        response = notes.handler_search_notes({"queryStringParameters": {"q": "words", "limit": "1000"}}, None)
+
+        assert response["statusCode"] == 400
+        mock_usecase.search_notes.assert_not_called()
+
+    def test_handler_find_by_id(self, mock_usecase: Any) -> None:
+        mock_usecase.find_note_by_id.return_value = _test_note("1")
+
+        response = notes.handler_find_by_id({"pathParameters": {"id": "1"}}, None)
+
+        assert response["statusCode"] == 200
+        assert response["headers"]["ETag"] == '"v1"'
+        assert json.loads(response["body"])["id"] == "1"
+
+    def test_handler_find_by_id_not_modified(self, mock_usecase: Any, mocker: MockerFixture) -> None:
+        mock_usecase.find_note_by_id.return_value = _test_note("1")
+        to_json_response = mocker.spy(notes.lambda_utils, "to_json_response")
+
+        response = notes.handler_find_by_id({"pathParameters": {"id": "1"}, "headers": {"If-None-Match": '"v1"'}}, None)
+
+        assert response["statusCode"] == 304
+        assert response["body"] == ""
+        to_json_response.assert_not_called()
+
+    def test_handler_get_content(self, mock_usecase: Any) -> None:
+        note = mock_usecase.find_note_by_id.return_value
+        mock_usecase.load_note_content.return_value = "Some content"
+
+        response = notes.handler_get_content({"pathParameters": {"id": "1"}}, None)
+
+        # The note is read once, then passed down
+        mock_usecase.find_note_by_id.assert_called_once_with("1", revalidate=False)
+        mock_usecase.get_note_content_etag.assert_called_once_with("1", note)
+        mock_usecase.load_note_content.assert_called_once_with("1", note)
+        assert response["statusCode"] == 200
+        assert response["body"] == "Some content"
+        assert response["headers"]["ETag"] == '"v1-abc"'
+
+    def test_handler_get_content_not_modified(self, mock_usecase: Any) -> None:
+        response = notes.handler_get_content({"pathParameters": {"id": "1"}, "headers": {"If-None-Match": '"v1-abc"'}}, None)
+
+        assert response["statusCode"] == 304
+        mock_usecase.load_note_content.assert_not_called()
+
+    def test_handler_get_content_with_range(self, mock_usecase: Any) -> None:
+        mock_usecase.load_note_content_range.return_value = b"Some"
+
+        response = notes.handler_get_content({"pathParameters": {"id": "1"}, "headers": {"Range": "bytes=0-3"}}, None)
+
+        mock_usecase.load_note_content_range.assert_called_once_with("1", 0, 3, mock_usecase.find_note_by_id.return_value)
+        assert response["statusCode"] == 206
+        assert response["headers"]["Content-Range"] == "bytes 0-3/*"
+
+    def test_handler_get_content_with_range_past_the_end(self, mock_usecase: Any) -> None:
+        mock_usecase.load_note_content_range.return_value = b""
+
+        response = notes.handler_get_content({"pathParameters": {"id": "1"}, "headers": {"Range": "bytes=100-"}}, None)
+
+        assert response["statusCode"] == 416
+
+    def test_handler_delete_by_id(self, mock_usecase: Any) -> None:
+        response = notes.handler_delete_by_id({"pathParameters": {"id": "1"}}, None)
+
+        mock_usecase.delete_note_by_id.assert_called_once_with("1")
+        assert response["status"] == 204
+
+    def test_handler_delete_notes_batch(self, mock_usecase: Any) -> None:
+        mock_usecase.delete_notes_by_ids.return_value = NoteBulkDeletionResult(deleted_ids=["1"], failed_ids=["2"])
+
+        response = notes.handler_delete_notes_batch({"body": json.dumps({"ids": ["1", "2"]})}, None)
+
+        mock_usecase.delete_notes_by_ids.assert_called_once_with(["1", "2"])
+        assert json.loads(response["body"]) == {"deleted_ids": ["1"], "failed_ids": ["2"]}
+
+    def test_handler_delete_notes_batch_requires_ids(self, mock_usecase: Any) -> None:
+        response = notes.handler_delete_notes_batch({"body": json.dumps({"ids": [1]})}, None)
+
+        assert response["statusCode"] == 400
+        mock_usecase.delete_notes_by_ids.assert_not_called()
+
+class TestCachedNotesAcrossFunctions:
+    """Every handler is a separate function, with its own note cache"""
+    @pytest.fixture
+    def note_repository(self, mocker: MockerFixture) -> NoteRepository:
+        note_repository = mocker.Mock(spec=NoteRepository)
+        note_repository.find_by_id.return_value = _test_note("1")
+        note_repository.delete_by_id.return_value = _test_note("1")
+        return note_repository
+
+    def _function_container(self, note_repository: NoteRepository, mocker: MockerFixture) -> ApplicationContainer:
+        container = ApplicationContainer()
+        container.object_store = mocker.Mock(spec=ObjectStore)
+        container.object_store.get_etag.return_value = "abc"
+        container.note_repository = CachedNoteRepository(note_repository, 16, 30)
+        container.search_index = None
+        container.content_references = None
+        return container
+
+    def _invoke(self, handler: Any, container: ApplicationContainer, event: dict, mocker: MockerFixture) -> dict:
+        mocker.patch.object(notes, "container", container)
+        return handler(event, None)
+
+    @pytest.mark.parametrize("handler", [notes.handler_find_by_id, notes.handler_get_content])
+    def test_note_deleted_by_another_function_is_not_modified(self, handler: Any, note_repository: NoteRepository, mocker: MockerFixture) -> None:
+        find_container, delete_container = self._function_container(note_repository, mocker), self._function_container(note_repository, mocker)
+        etag = self._invoke(handler, find_container, {"pathParameters": {"id": "1"}}, mocker)["headers"]["ETag"]
+
+        self._invoke(notes.handler_delete_by_id, delete_container, {"pathParameters": {"id": "1"}}, mocker)
+        note_repository.find_by_id.return_value = None
+
+        response = self._invoke(handler, find_container, {"pathParameters": {"id": "1"}, "headers": {"If-None-Match": etag}}, mocker)
+        assert response["statusCode"] == 404
+
+    @pytest.mark.parametrize("handler", [notes.handler_find_by_id, notes.handler_get_content])
+    def test_note_updated_by_another_function_is_not_modified(self, handler: Any, note_repository: NoteRepository, mocker: MockerFixture) -> None:
+        find_container, update_container = self._function_container(note_repository, mocker), self._function_container(note_repository, mocker)
+        etag = self._invoke(handler, find_container, {"pathParameters": {"id": "1"}}, mocker)["headers"]["ETag"]
+
+        updated_note = _test_note("1")
+        updated_note.version = 2
+        update_container.note_repository.save(updated_note)
+        note_repository.find_by_id.return_value = updated_note
+
+        response = self._invoke(handler, find_container, {"pathParameters": {"id": "1"}, "headers": {"If-None-Match": etag}}, mocker)
+        assert response["statusCode"] == 200
+        assert response["headers"]["ETag"] != etag
+
+def _test_note(id: str) -> Note:
+    return Note(id=id, author_id="mario", creation_time=now(), tags=["test"], version=1)
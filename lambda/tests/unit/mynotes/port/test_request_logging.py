@@ -0,0 +1,103 @@
+import json
+import logging
+from typing import Any, Dict
+
+import pytest
+from pytest_mock import MockerFixture
+
+from mynotes.core.architecture import ApplicationException
+from mynotes.port import request_logging
+from mynotes.port.exception_management import with_exception_management
+from mynotes.port.request_logging import REDACTED_VALUE, StructuredMessage, parse_sample_rates, sanitize, with_request_logging
+
+TEST_EVENT = {
+    "httpMethod": "GET",
+    "resource": "/note/{id}",
+    "pathParameters": {"id": "1"},
+    "queryStringParameters": {"continuation_token": "AQMC", "page_size": "10"},
+    "headers": {"Authorization": "Bearer secret", "User-Agent": "test"},
+    "body": "eyJjb250ZW50IjogInNlY3JldCJ9",
+    "requestContext": {"requestId": "request-1"}
+}
+
+@with_request_logging
+@with_exception_management
+def handler_test(event, context) -> Dict[str, Any]:
+    if event.get("fail"):
+        raise ApplicationException("boom")
+    return {"statusCode": 200, "body": "{}"}
+
+@pytest.fixture
+def sample_rate(mocker: MockerFixture):
+    def set_sample_rate(rate: float) -> None:
+        mocker.patch.object(request_logging, "get_sample_rate", return_value=rate)
+    return set_sample_rate
+
+def _logged_records(caplog: Any):
+    return [json.loads(record.getMessage()) for record in caplog.records if record.name == "mynotes.request"]
+
+def test_sampled_request_is_logged_without_body_and_secrets(caplog: Any, sample_rate) -> None:
+    sample_rate(1)
+
+    with caplog.at_level(logging.INFO, logger="mynotes.request"):
+        handler_test(TEST_EVENT, None)
+
+    record, = _logged_records(caplog)
+    assert record["handler"] == "handler_test"
+    assert record["request_id"] == "request-1"
+    assert record["status"] == 200
+    assert record["path_parameters"] == {"id": "1"}
+    assert record["query"] == {"continuation_token": REDACTED_VALUE, "page_size": "10"}
+    assert record["headers"] == {"Authorization": REDACTED_VALUE, "User-Agent": "test"}
+    assert record["body_size"] == len(TEST_EVENT["body"])
+    assert TEST_EVENT["body"] not in caplog.text
+
+def test_request_not_sampled_is_not_logged(caplog: Any, sample_rate) -> None:
+    sample_rate(0)
+
+    with caplog.at_level(logging.INFO, logger="mynotes.request"):
+        handler_test(TEST_EVENT, None)
+
+    assert _logged_records(caplog) == []
+
+def test_failed_request_is_always_logged(caplog: Any, sample_rate) -> None:
+    sample_rate(0)
+
+    with caplog.at_level(logging.INFO, logger="mynotes.request"):
+        response = handler_test({**TEST_EVENT, "fail": True}, None)
+
+    record, = _logged_records(caplog)
+    assert response["statusCode"] == 500
+    assert record["status"] == 500
+    assert caplog.records[-1].levelno == logging.ERROR
+
+def test_message_is_not_formatted_when_level_is_disabled(mocker: MockerFixture, sample_rate) -> None:
+    sample_rate(1)
+    get_request_fields = mocker.spy(request_logging, "get_request_fields")
+
+    logging.getLogger("mynotes.request").setLevel(logging.WARNING)
+    try:
+        handler_test(TEST_EVENT, None)
+    finally:
+        logging.getLogger("mynotes.request").setLevel(logging.NOTSET)
+
+    get_request_fields.assert_not_called()
+
+def test_sanitize_caps_values_and_items(mocker: MockerFixture) -> None:
+    mocker.patch.object(request_logging, "NOTES_LOG_MAX_VALUE_SIZE", 4)
+    mocker.patch.object(request_logging, "NOTES_LOG_MAX_ITEMS", 2)
+
+    assert sanitize({"a": "123456", "b": "12", "c": "1"}) == {"a": "1234...(+2)", "b": "12", "...": "1 more"}
+    assert sanitize(None) is None
+
+def test_structured_message_is_capped() -> None:
+    message = StructuredMessage({"handler": "handler_test", "headers": {"h": "x" * 100}}, max_size=50)
+
+    assert json.loads(str(message)) == {"handler": "handler_test", "truncated": True}
+
+@pytest.mark.parametrize("value,expected_rates", [
+    ("", {}),
+    ("handler_find_notes=0.01, handler_create_note=1", {"handler_find_notes": 0.01, "handler_create_note": 1.0}),
+])
+def test_parse_sample_rates(value: str, expected_rates: Dict[str, float]) -> None:
+    assert parse_sample_rates(value) == expected_rates
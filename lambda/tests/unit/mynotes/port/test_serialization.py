@@ -0,0 +1,103 @@
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import jsons
+import pytest
+
+from mynotes.core.architecture import DataPage, ValidationException
+from mynotes.core.notes import Note, NoteBulkDeletionResult, NoteCreationResult, NoteLookupResult, NoteSearchHit, NoteSummary, NoteType
+from mynotes.port import serialization
+from mynotes.port.exception_management import on_validation_exception
+
+CREATION_TIME = datetime(2022, 3, 23, 22, 2, 36, 233752, tzinfo=timezone.utc)
+
+def _test_note(id: str, **kwargs: Any) -> Note:
+    attributes = {"author_id": "mario", "type": NoteType.QUESTION, "creation_time": CREATION_TIME, "tags": ["python", "aws"], "version": 3}
+    attributes.update(kwargs)
+    return Note(id=id, **attributes)
+
+# API response bodies, with the JSON that jsons used to write for them
+golden_test_data = [
+    (
+        _test_note("1"),
+        '{"author_id": "mario", "content_generation": null, "content_hash": null, "creation_time": "2022-03-23T22:02:36.233752Z", "id": "1", "tags": ["python", "aws"], "type": "QUESTION", "version": 3}'
+    ),
+    (
+        _test_note("3", content_hash="9f86d081", content_generation="g1"),
+        '{"author_id": "mario", "content_generation": "g1", "content_hash": "9f86d081", "creation_time": "2022-03-23T22:02:36.233752Z", "id": "3", "tags": ["python", "aws"], "type": "QUESTION", "version": 3}'
+    ),
+    (
+        _test_note("2", type=NoteType.FREE, tags=None, version=None, creation_time=datetime(2022, 3, 23, 22, 2, 36, tzinfo=timezone.utc)),
+        '{"author_id": "mario", "content_generation": null, "content_hash": null, "creation_time": "2022-03-23T22:02:36Z", "id": "2", "tags": [], "type": "FREE", "version": null}'
+    ),
+    (
+        DataPage([_test_note("1")], 1, "AQMC"),
+        '{"_is_protocol": false, "continuation_token": "AQMC", "items": [{"author_id": "mario", "content_generation": null, "content_hash": null, "creation_time": "2022-03-23T22:02:36.233752Z", "id": "1", "tags": ["python", "aws"], "type": "QUESTION", "version": 3}], "page_size": 1}'
+    ),
+    (
+        DataPage([NoteSummary("1", CREATION_TIME)], 1, None),
+        '{"_is_protocol": false, "continuation_token": null, "items": [{"creation_time": "2022-03-23T22:02:36.233752Z", "id": "1"}], "page_size": 1}'
+    ),
+    (
+        {"items": [NoteCreationResult(note=_test_note("1")), NoteCreationResult(error_message="Content is required")]},
+        '{"items": [{"error_message": null, "note": {"author_id": "mario", "content_generation": null, "content_hash": null, "creation_time": "2022-03-23T22:02:36.233752Z", "id": "1", "tags": ["python", "aws"], "type": "QUESTION", "version": 3}}, {"error_message": "Content is required", "note": null}]}'
+    ),
+    (
+        NoteLookupResult([_test_note("1")], ["2"]),
+        '{"items": [{"author_id": "mario", "content_generation": null, "content_hash": null, "creation_time": "2022-03-23T22:02:36.233752Z", "id": "1", "tags": ["python", "aws"], "type": "QUESTION", "version": 3}], "missing_ids": ["2"]}'
+    ),
+    (
+        {"items": [NoteSearchHit(_test_note("1"), 2)]},
+        '{"items": [{"note": {"author_id": "mario", "content_generation": null, "content_hash": null, "creation_time": "2022-03-23T22:02:36.233752Z", "id": "1", "tags": ["python", "aws"], "type": "QUESTION", "version": 3}, "score": 2.0}]}'
+    ),
+    (
+        NoteBulkDeletionResult(["1", "2"], []),
+        '{"deleted_ids": ["1", "2"], "failed_ids": []}'
+    ),
+    (
+        {"error_message": "Invalid attribute q: Non è valido!", "error_code": "err-0002"},
+        '{"error_message": "Invalid attribute q: Non \\u00e8 valido!", "error_code": "err-0002"}'
+    ),
+    (
+        [NoteType.INTERVIEW, datetime(2022, 3, 23, 22, 2, 36, 5, tzinfo=timezone(timedelta(hours=-5, minutes=-30))), 1.5, True, None],
+        '["INTERVIEW", "2022-03-23T22:02:36.000005-05:30", 1.5, true, null]'
+    ),
+]
+
+@pytest.mark.parametrize("value,expected_json", golden_test_data)
+def test_dumps_writes_golden_json(value: Any, expected_json: str) -> None:
+    assert serialization.dumps(value, serialization.JSON_BACKEND) == expected_json
+
+@pytest.mark.parametrize("value,expected_json", golden_test_data)
+def test_dumps_writes_same_json_as_jsons(value: Any, expected_json: str) -> None:
+    assert serialization.dumps(value, serialization.JSON_BACKEND) == jsons.dumps(value)
+
+@pytest.mark.parametrize("value,expected_json", golden_test_data)
+def test_orjson_backend_writes_same_documents(value: Any, expected_json: str) -> None:
+    pytest.importorskip("orjson")
+
+    orjson_json = serialization.dumps(value, serialization.ORJSON_BACKEND)
+
+    # Same values, in the same order
+    assert json.loads(orjson_json, object_pairs_hook=list) == json.loads(expected_json, object_pairs_hook=list)
+
+def test_encoders_are_compiled_once() -> None:
+    registry = serialization.SerializerRegistry()
+
+    registry.encode(_test_note("1"))
+    encoder = registry.get_encoder(Note)
+    registry.encode(_test_note("2"))
+
+    assert registry.get_encoder(Note) is encoder
+
+def test_custom_encoder() -> None:
+    registry = serialization.SerializerRegistry()
+    registry.register(NoteType, lambda note_type: note_type.value)
+
+    assert registry.encode(_test_note("1"))["type"] == "Q"
+
+def test_error_response_body() -> None:
+    response = on_validation_exception(ValidationException("page_size", "An integer value is required"))
+
+    assert json.loads(response["body"]) == {"error_message": "Invalid attribute page_size: An integer value is required!", "error_code": "err-0002"}